@@ -25,6 +25,22 @@ csrf = CSRFProtect()
 socketio = SocketIO(async_mode='eventlet')
 
 
+def _socketio_queue_options(app):
+    """
+    Формирует параметры брокера сообщений Socket.IO из конфигурации.
+    С брокером emit из любого воркера, CLI-команды или фоновой задачи
+    доходит до клиентов, подключенных к любому другому воркеру.
+    """
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        from .socket_queue import LocalQueueManager
+        return {'client_manager': LocalQueueManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
 def create_app(config_class: Config = DevelopmentConfig):
     
     # --- Инициализация Sentry для мониторинга ошибок ---
@@ -48,7 +64,7 @@ def create_app(config_class: Config = DevelopmentConfig):
     login_manager.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(app, **_socketio_queue_options(app))
 
     # Настраиваем login manager
     login_manager.login_view = 'admin.user.login'
@@ -64,6 +80,14 @@ def create_app(config_class: Config = DevelopmentConfig):
     from . import commands
     app.cli.add_command(commands.seed_command)
     app.cli.add_command(commands.seed_cypress_command)
+    app.cli.add_command(commands.rebuild_progress_command)
+    app.cli.add_command(commands.rebuild_stage_durations_command)
+    app.cli.add_command(commands.rebuild_operator_rollups_command)
+    app.cli.add_command(commands.rebuild_search_index_command)
+    app.cli.add_command(commands.archive_audit_logs_command)
+    app.cli.add_command(commands.create_audit_partitions_command)
+    app.cli.add_command(commands.fail_orphaned_imports_command)
+    app.cli.add_command(commands.load_test_confirm_command)
 
     with app.app_context():
         
@@ -76,10 +100,14 @@ def create_app(config_class: Config = DevelopmentConfig):
             UPLOAD_FOLDER=os.path.join(app.instance_path, 'uploads'),
             DRAWING_UPLOAD_FOLDER=os.path.join(app.instance_path, 'drawings')
         )
+        app.config.setdefault('QR_CACHE_FOLDER', os.path.join(app.instance_path, 'qr_cache'))
+        app.config.setdefault('ARCHIVE_FOLDER', os.path.join(app.instance_path, 'archive'))
         if not os.path.exists(app.config['UPLOAD_FOLDER']):
             os.makedirs(app.config['UPLOAD_FOLDER'])
         if not os.path.exists(app.config['DRAWING_UPLOAD_FOLDER']):
             os.makedirs(app.config['DRAWING_UPLOAD_FOLDER'])
+        if not os.path.exists(app.config['QR_CACHE_FOLDER']):
+            os.makedirs(app.config['QR_CACHE_FOLDER'])
 
         # --- РЕГИСТРАЦИЯ БЛЮПРИНТОВ ---
         from .main import main_bp as main_blueprint
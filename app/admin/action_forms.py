@@ -38,6 +38,8 @@ class ConfirmStageQuantityForm(FlaskForm):
         validators=[Optional(), Length(min=3)]
     )
     action = HiddenField('Действие', default='completed')
+    # Генерируется при показе формы: повторная отправка той же формы не учитывается дважды
+    idempotency_key = HiddenField(validators=[Optional(), Length(max=64)])
     submit = SubmitField('Подтвердить')
 
 
@@ -1,15 +1,18 @@
 # app/admin/routes/data_routes.py
 
+from datetime import datetime
 from flask import (Blueprint, render_template, flash, redirect, url_for,
-                   current_app)
+                   current_app, jsonify, abort, request, Response,
+                   stream_with_context)
 from flask_login import current_user
 
 from app import db
 # --- ИЗМЕНЕНИЕ: Обновляем импорт, чтобы он соответствовал новой структуре моделей ---
-from app.models import Part, Permission, RouteTemplate
+from app.models import Part, Permission, RouteTemplate, ImportJobStatus
 from app.admin.management_forms import FileUploadForm
 from app.admin.part_forms import PartForm
 from app.services import part_import_export_service as pies
+from app.services import import_job_service
 from app.admin.utils import permission_required
 
 data_bp = Blueprint('data', __name__)
@@ -30,6 +33,7 @@ def data_management():
         'data_management.html',
         upload_form=upload_form,
         part_form=part_form,
+        import_jobs=import_job_service.get_recent_jobs(),
         title="Работа с данными"
     )
 
@@ -37,17 +41,17 @@ def data_management():
 @data_bp.route('/upload_excel', methods=['POST'])
 @permission_required(Permission.ADD_PARTS)
 def upload_excel():
-    """Обрабатывает загрузку и импорт деталей из Excel-файла."""
+    """Принимает Excel/CSV-файл и ставит его импорт в очередь фоновых задач."""
     form = FileUploadForm()
     if form.validate_on_submit():
         try:
-            # Вызываем сервис для импорта
-            added, skipped = pies.import_parts_from_excel(
-                form.file.data, current_user
-            )
-            flash(f"Импорт завершен. Добавлено: {added}, пропущено дубликатов: {skipped}.", 'success')
-        except ValueError as e:
-            flash(f"Ошибка валидации: {e}", 'error')
+            job = import_job_service.enqueue_import(form.file.data, current_user)
+            if job.status == ImportJobStatus.COMPLETED:
+                flash(f"Импорт завершен. Добавлено: {job.rows_inserted}, пропущено дубликатов: {job.rows_skipped}.", 'success')
+            elif job.status == ImportJobStatus.FAILED:
+                flash(f"Ошибка импорта: {job.error}", 'error')
+            else:
+                flash(f"Файл принят, импорт выполняется в фоне (задача №{job.id}). Прогресс отображается в таблице ниже.", 'info')
         except Exception as e:
             flash(f"Произошла ошибка при обработке файла: {e}", 'error')
             current_app.logger.error(f"Excel import error: {e}", exc_info=True)
@@ -60,27 +64,49 @@ def upload_excel():
     return redirect(url_for('admin.data.data_management'))
 
 
+@data_bp.route('/import_jobs')
+@permission_required(Permission.ADD_PARTS)
+def import_jobs():
+    """Возвращает в JSON список последних задач импорта."""
+    return jsonify([import_job_service.serialize_job(job) for job in import_job_service.get_recent_jobs()])
+
+
+@data_bp.route('/import_jobs/<int:job_id>')
+@permission_required(Permission.ADD_PARTS)
+def import_job_status(job_id):
+    """Возвращает в JSON состояние, счетчики и ошибку задачи импорта."""
+    job = import_job_service.get_job(job_id)
+    if not job:
+        abort(404)
+    return jsonify(import_job_service.serialize_job(job))
+
+
 @data_bp.route('/export_parts')
 @permission_required(Permission.ADD_PARTS)
 def export_parts():
     """
-    Формирует и отдает CSV-файл со списком всех деталей в базе данных.
+    Потоково отдает файл со списком всех деталей в базе данных.
+    Формат задается параметром `format`: csv (по умолчанию) или xlsx.
     """
-    # Вызываем сервис для экспорта
-    csv_stream = pies.export_all_parts_to_csv()
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        abort(400)
 
-    if not csv_stream:
+    if not pies.has_parts_to_export():
         flash("В базе данных нет деталей для экспорта.", "warning")
         return redirect(url_for('admin.data.data_management'))
 
-    # Формируем HTTP-ответ с файлом
-    from flask import Response
-    from datetime import datetime
-    
+    filename = f"full_parts_export_{datetime.now().strftime('%Y-%m-%d')}.{export_format}"
+    if export_format == 'xlsx':
+        stream = pies.stream_parts_xlsx()
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        stream = pies.stream_parts_csv()
+        mimetype = "text/csv"
+
+    # stream_with_context сохраняет контекст запроса (и сессию БД) на время генерации
     return Response(
-        csv_stream.getvalue(),
-        mimetype="text/csv",
-        headers={
-            "Content-disposition": f"attachment; filename=full_parts_export_{datetime.now().strftime('%Y-%m-%d')}.csv"
-        }
-    )
\ No newline at end of file
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={"Content-disposition": f"attachment; filename={filename}"}
+    )
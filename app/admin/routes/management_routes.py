@@ -5,9 +5,10 @@ from flask_login import login_required, current_user
 
 # --- ИЗМЕНЕНИЕ: Исправляем пути импорта ---
 from app import db
-from app.models import Part, AuditLog, RouteTemplate, RouteStage, Stage, Permission, StatusHistory
+from app.models import Part, RouteTemplate, RouteStage, Stage, Permission, StatusHistory
 from app.admin.management_forms import StageDictionaryForm, RouteTemplateForm
 from app.admin.utils import permission_required
+from app.services import audit_service
 
 management_bp = Blueprint('management', __name__)
 
@@ -120,8 +121,7 @@ def add_route():
                 route_stage = RouteStage(template=new_template, stage_id=stage_id, order=i)
                 db.session.add(route_stage)
 
-            log_entry = AuditLog(user_id=current_user.id, action="Управление маршрутами", details=f"Создан новый маршрут '{new_template.name}'.", category='management')
-            db.session.add(log_entry)
+            audit_service.log_action(user_id=current_user.id, action="Управление маршрутами", details=f"Создан новый маршрут '{new_template.name}'.", category='management', durable=True)
             
             db.session.commit()
             
@@ -177,8 +177,7 @@ def edit_route(route_id):
                 route_stage = RouteStage(template=template, stage_id=stage_id, order=i)
                 db.session.add(route_stage)
 
-            log_entry = AuditLog(user_id=current_user.id, action="Управление маршрутами", details=f"Изменен маршрут '{template.name}'.", category='management')
-            db.session.add(log_entry)
+            audit_service.log_action(user_id=current_user.id, action="Управление маршрутами", details=f"Изменен маршрут '{template.name}'.", category='management', durable=True)
             
             db.session.commit()
             
@@ -204,8 +203,7 @@ def delete_route(route_id):
     else:
         template_name = template.name
         db.session.delete(template)
-        log_entry = AuditLog(user_id=current_user.id, action="Управление маршрутами", details=f"Удален маршрут '{template_name}'.", category='management')
-        db.session.add(log_entry)
+        audit_service.log_action(user_id=current_user.id, action="Управление маршрутами", details=f"Удален маршрут '{template_name}'.", category='management', durable=True)
         db.session.commit()
         flash(f'Маршрут "{template_name}" успешно удален.', 'success')
     return redirect(url_for('admin.management.list_routes'))
\ No newline at end of file
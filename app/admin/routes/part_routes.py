@@ -1,19 +1,23 @@
 # app/admin/routes/part_routes.py
 
 from flask import (Blueprint, render_template, request, flash, redirect, url_for,
-                   current_app, send_file, send_from_directory)
+                   current_app, send_file, send_from_directory, Response,
+                   stream_with_context)
 from flask_login import login_required, current_user
 from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.models import Part, RouteTemplate, Permission, StatusHistory, AuditLog
+from app.models import Part, RouteTemplate, Permission, StatusHistory
 from app.admin.part_forms import PartForm, EditPartForm, AddChildPartForm
 from app.admin.action_forms import ChangeRouteForm, ConfirmForm, ChangeResponsibleForm
 from app.services import (
     part_creation_service as pcs,
     part_management_service as pms,
     part_status_service as pss,
-    part_utils_service as pus
+    part_utils_service as pus,
+    audit_service,
+    qr_cache_service,
+    qr_label_service
 )
 from app.admin.utils import permission_required
 
@@ -103,10 +107,15 @@ def generate_single_qr(part_id):
     """Генерирует и отдает для скачивания QR-код для одной детали."""
     form = ConfirmForm()
     if form.validate_on_submit():
-        from app.utils import generate_qr_code, create_safe_file_name
-        qr_img_bytes = generate_qr_code(part_id)
+        from io import BytesIO
+        from app.utils import create_safe_file_name
+        try:
+            qr_img_bytes = BytesIO(qr_cache_service.get_part_qr_image(part_id))
+        except Exception as e:
+            current_app.logger.error(f"QR generation error for {part_id}: {e}", exc_info=True)
+            qr_img_bytes = None
         if qr_img_bytes:
-            db.session.add(AuditLog(part_id=part_id, user_id=current_user.id, action="Генерация QR", details=f"Создан QR-код для детали '{part_id}'.", category='part'))
+            audit_service.log_action(part_id=part_id, user_id=current_user.id, action="Генерация QR", details=f"Создан QR-код для детали '{part_id}'.", category='part')
             db.session.commit()
             safe_filename = create_safe_file_name(f"part_{part_id}_qr.png")
             return send_file(qr_img_bytes, mimetype='image/png', as_attachment=True, download_name=safe_filename)
@@ -127,10 +136,38 @@ def qr_print_preview():
         flash('Вы не выбрали ни одной детали для печати.', 'error')
         return redirect(url_for('main.main_pages.dashboard'))
 
-    parts_for_print = pus.get_parts_for_printing(part_ids)
+    qr_format = request.form.get('qr_format', current_app.config.get('QR_FORMAT', 'png'))
+    if qr_format not in qr_cache_service.QR_FORMATS:
+        qr_format = 'png'
+
+    parts_for_print = pus.get_parts_for_printing(part_ids, qr_format)
     return render_template('qr_print_preview.html', parts_for_print=parts_for_print)
 
 
+@part_bp.route('/qr_labels_pdf', methods=['POST'])
+@permission_required(Permission.GENERATE_QR)
+def qr_labels_pdf():
+    """
+    Потоково формирует PDF с листами этикеток QR-кодов для выбранных деталей
+    или для всех деталей изделия (поле product_designation).
+    Сетку можно переопределить полями columns и rows.
+    """
+    part_ids = request.form.getlist('part_ids')
+    product_designation = request.form.get('product_designation')
+    if not part_ids and not product_designation:
+        flash('Вы не выбрали ни одной детали для печати.', 'error')
+        return redirect(url_for('main.main_pages.dashboard'))
+
+    layout = qr_label_service.get_label_layout(
+        request.form.get('columns', type=int), request.form.get('rows', type=int)
+    )
+    return Response(
+        stream_with_context(qr_label_service.stream_labels_pdf(part_ids, product_designation, layout)),
+        mimetype='application/pdf',
+        headers={"Content-Disposition": "inline; filename=qr_labels.pdf"}
+    )
+
+
 @part_bp.route('/change_route/<path:part_id>', methods=['GET', 'POST'])
 @permission_required(Permission.EDIT_PARTS)
 def change_part_route(part_id):
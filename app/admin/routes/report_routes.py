@@ -1,9 +1,11 @@
 # app/admin/routes/report_routes.py
 
+import hashlib
+from functools import wraps
 from flask import (Blueprint, render_template, request, jsonify, flash,
                    redirect, url_for, send_file, current_app)
 from flask_login import login_required
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy import func
 
 # --- ИЗМЕНЕНИЕ: Исправляем пути импорта ---
@@ -11,11 +13,62 @@ from app import db
 from app.models import StatusHistory, Part, Permission, StatusType
 from app.admin.utils import permission_required
 from app.admin.management_forms import GenerateFromCloudForm
-from app.services import graph_service, document_service
+from app.services import graph_service, document_service, report_service, cache_service
+from app.services.dashboard_service import get_product_summary
 
 report_bp = Blueprint('report', __name__)
 
 
+def cached_report(view):
+    """
+    Кэширует ответ API отчета по эндпоинту и параметрам запроса до изменения
+    истории статусов (report_service.invalidate_reports) или истечения REPORT_CACHE_TTL.
+    Успешный ответ получает ETag и Last-Modified: повторный опрос открытого
+    отчета без изменений данных возвращает 304 Not Modified без тела.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        def compute():
+            response = current_app.make_response(view(*args, **kwargs))
+            body = response.get_data()
+            return {
+                'status': response.status_code,
+                'body': body,
+                'etag': hashlib.sha1(body).hexdigest(),
+                'last_modified': datetime.now(timezone.utc).replace(microsecond=0),
+            }
+
+        key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+        entry = cache_service.get_or_compute(
+            report_service.REPORTS_CACHE, compute, key=key, ttl=current_app.config.get('REPORT_CACHE_TTL', 0)
+        )
+        response = current_app.response_class(entry['body'], status=entry['status'], mimetype='application/json')
+        if entry['status'] == 200:
+            response.set_etag(entry['etag'])
+            response.last_modified = entry['last_modified']
+            # Браузер хранит ответ, но перед использованием перепроверяет его условным запросом
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.make_conditional(request)
+        return response
+    return wrapper
+
+
+def _parse_report_period():
+    """
+    Читает период отчета из параметров date_from и date_to (ГГГГ-ММ-ДД).
+    :return: Кортеж (date_from, date_to); отсутствующая дата — None.
+    :raises ValueError: Если дата в неверном формате.
+    """
+    try:
+        return tuple(
+            datetime.strptime(request.args[name], '%Y-%m-%d') if request.args.get(name) else None
+            for name in ('date_from', 'date_to')
+        )
+    except ValueError:
+        raise ValueError('Дата должна быть в формате ГГГГ-ММ-ДД.')
+
+
 @report_bp.route('/')
 @permission_required(Permission.VIEW_REPORTS)
 def reports_index():
@@ -32,7 +85,8 @@ def report_operator_performance():
     return render_template(
         'reports/operator_performance.html',
         date_from=date_from_str,
-        date_to=date_to_str
+        date_to=date_to_str,
+        granularity=request.args.get('granularity', 'day')
     )
 
 
@@ -40,7 +94,13 @@ def report_operator_performance():
 @permission_required(Permission.VIEW_REPORTS)
 def report_stage_duration():
     """Отображает страницу отчета по средней длительности этапов."""
-    return render_template('reports/stage_duration.html')
+    return render_template(
+        'reports/stage_duration.html',
+        date_from=request.args.get('date_from', ''),
+        date_to=request.args.get('date_to', ''),
+        product=request.args.get('product', ''),
+        products=[row['product_designation'] for row in get_product_summary()]
+    )
 
 
 @report_bp.route('/order_completion')
@@ -104,21 +164,14 @@ def generate_from_cloud():
 
 @report_bp.route('/api/reports/operator_performance')
 @login_required
+@cached_report
 def api_report_operator_performance():
-    date_from_str = request.args.get('date_from')
-    date_to_str = request.args.get('date_to')
-    query = db.session.query(
-        StatusHistory.operator_name,
-        func.count(StatusHistory.id).label('stages_completed')
-    ).group_by(StatusHistory.operator_name).order_by(func.count(StatusHistory.id).desc())
-    if date_from_str:
-        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-        query = query.filter(StatusHistory.timestamp >= date_from)
-    if date_to_str:
-        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-        query = query.filter(StatusHistory.timestamp <= date_to)
-    
-    data = query.all()
+    """Возвращает количество записей истории по операторам за период (конечная дата включительно)."""
+    try:
+        date_from, date_to = _parse_report_period()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    data = report_service.get_operator_performance(date_from, date_to)
     
     chart_data = {
         'labels': [row.operator_name for row in data],
@@ -129,20 +182,37 @@ def api_report_operator_performance():
     return jsonify(chart_data)
 
 
+@report_bp.route('/api/reports/operator_activity')
+@login_required
+@cached_report
+def api_report_operator_activity():
+    """Возвращает временной ряд активности операторов с шагом granularity (hour, day, week, month)."""
+    granularity = request.args.get('granularity', 'day')
+    try:
+        date_from, date_to = _parse_report_period()
+        activity = report_service.get_operator_activity(date_from, date_to, granularity)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    label_format = {'hour': '%Y-%m-%d %H:00', 'month': '%Y-%m'}.get(granularity, '%Y-%m-%d')
+    chart_data = {
+        'labels': [bucket.strftime(label_format) for bucket in activity['buckets']],
+        'datasets': [{'label': operator_name, 'data': values}
+                     for operator_name, values in activity['series'].items()]
+    }
+    return jsonify(chart_data)
+
+
 @report_bp.route('/api/reports/stage_duration')
 @login_required
+@cached_report
 def api_report_stage_duration():
-    engine_name = db.engine.name
-    duration_expr = ((func.julianday(StatusHistory.timestamp) - func.coalesce(func.lag(func.julianday(StatusHistory.timestamp)).over(
-        partition_by=StatusHistory.part_id, order_by=StatusHistory.timestamp), func.julianday(Part.date_added))) * 86400.0
-    ) if engine_name == 'sqlite' else func.extract('epoch', StatusHistory.timestamp - func.coalesce(func.lag(
-        StatusHistory.timestamp).over(partition_by=StatusHistory.part_id, order_by=StatusHistory.timestamp), Part.date_added))
-    
-    cte = db.session.query(StatusHistory.status.label('stage_name'), duration_expr.label('duration_seconds')
-                          ).join(Part, Part.part_id == StatusHistory.part_id).subquery()
-    
-    report_data = db.session.query(cte.c.stage_name, func.avg(cte.c.duration_seconds).label('avg_duration_seconds')
-                                  ).group_by(cte.c.stage_name).order_by(func.avg(cte.c.duration_seconds).desc()).all()
+    """Возвращает среднюю длительность этапов по таблице фактов (с фильтрами по периоду и изделию)."""
+    try:
+        date_from, date_to = _parse_report_period()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    report_data = report_service.get_stage_duration_report(date_from, date_to, request.args.get('product') or None)
 
     chart_data = {
         'labels': [row.stage_name for row in report_data],
@@ -155,6 +225,7 @@ def api_report_stage_duration():
 
 @report_bp.route('/api/reports/order_completion')
 @login_required
+@cached_report
 def api_report_order_completion():
     """Возвращает данные о времени выполнения для завершенных деталей."""
     last_stage_time = db.session.query(
@@ -184,6 +255,7 @@ def api_report_order_completion():
 
 @report_bp.route('/api/reports/defect_analysis')
 @login_required
+@cached_report
 def api_report_defect_analysis():
     """Возвращает данные по количеству брака на каждом этапе."""
     data = db.session.query(
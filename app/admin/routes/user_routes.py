@@ -1,11 +1,13 @@
 # app/admin/routes/user_routes.py
 
+from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
 from sqlalchemy.orm import joinedload, outerjoin
 
 from app import db
-from app.models import User, AuditLog, Role, Permission, Part
+from app.models import User, Role, Permission
+from app.services import query_service, audit_service
 from app.admin.user_forms import LoginForm, AddUserForm, EditUserForm, RoleForm
 from app.admin.utils import admin_required, permission_required
 
@@ -23,8 +25,7 @@ def login():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
             login_user(user)
-            log_entry = AuditLog(user_id=user.id, action="Вход в систему", details=f"Пользователь '{user.username}' вошел в систему.", category='auth')
-            db.session.add(log_entry)
+            audit_service.log_action(user_id=user.id, action="Вход в систему", details=f"Пользователь '{user.username}' вошел в систему.", category='auth')
             db.session.commit()
             flash('Вы успешно вошли в систему!', 'success')
             return redirect(url_for('main.main_pages.dashboard'))
@@ -35,8 +36,7 @@ def login():
 @user_bp.route('/logout')
 @login_required
 def logout():
-    log_entry = AuditLog(user_id=current_user.id, action="Выход из системы", details=f"Пользователь '{current_user.username}' вышел из системы.", category='auth')
-    db.session.add(log_entry)
+    audit_service.log_action(user_id=current_user.id, action="Выход из системы", details=f"Пользователь '{current_user.username}' вышел из системы.", category='auth')
     db.session.commit()
     logout_user()
     flash('Вы вышли из системы.', 'success')
@@ -44,37 +44,75 @@ def logout():
 
 # --- Маршруты для журналов аудита ---
 
+def _render_audit_log(template, categories, endpoint):
+    """
+    Отображает страницу журнала аудита с фильтрами (период, пользователь, деталь)
+    и курсорной пагинацией (параметры cursor и newer).
+    """
+    filters = {name: request.args.get(name, '').strip() for name in ('date_from', 'date_to', 'user', 'part')}
+    filters = {name: value for name, value in filters.items() if value}
+    try:
+        dates = {name: datetime.strptime(filters[name], '%Y-%m-%d') if filters.get(name) else None
+                 for name in ('date_from', 'date_to')}
+        user_id = int(filters['user']) if filters.get('user') else None
+    except ValueError:
+        flash('Некорректный фильтр: дата должна быть в формате ГГГГ-ММ-ДД.', 'error')
+        return redirect(url_for(endpoint))
+
+    try:
+        page = query_service.get_audit_log_page(
+            categories, cursor=request.args.get('cursor'), newer=request.args.get('newer') == '1',
+            user_id=user_id, part_id=filters.get('part'), **dates
+        )
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for(endpoint, **filters))
+
+    users = User.query.order_by(User.username).all()
+    return render_template(template, logs=page, filters=filters, users=users, endpoint=endpoint,
+                           is_first_page=not request.args.get('cursor'))
+
+
 @user_bp.route('/audit_log')
 @permission_required(Permission.VIEW_AUDIT_LOG)
 def audit_log():
     """Отображает журнал аудита, связанный с деталями."""
-    page = request.args.get('page', 1, type=int)
-    
-    # --- НАЧАЛО ИСПРАВЛЕНИЯ: Добавляем outerjoin для проверки существования детали ---
-    # Мы "левым" соединением присоединяем деталь к логу.
-    # Если деталь была удалена, `Part` будет NULL, что мы сможем проверить в шаблоне.
-    logs_query = db.session.query(AuditLog, Part).outerjoin(
-        Part, AuditLog.part_id == Part.part_id
-    ).options(
-        joinedload(AuditLog.user)
-    ).filter(
-        AuditLog.category == 'part'
-    ).order_by(AuditLog.timestamp.desc())
-    
-    logs_pagination = logs_query.paginate(page=page, per_page=25)
-    # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
-    
-    return render_template('audit_log.html', logs=logs_pagination)
+    return _render_audit_log('audit_log.html', ['part'], 'admin.user.audit_log')
 
 @user_bp.route('/user_log')
 @permission_required(Permission.VIEW_AUDIT_LOG)
 def user_log():
     """Отображает журнал аудита, связанный с пользователями и управлением."""
-    page = request.args.get('page', 1, type=int)
-    user_logs = AuditLog.query.options(joinedload(AuditLog.user)).filter(
-        AuditLog.category.in_(['auth', 'management'])
-    ).order_by(AuditLog.timestamp.desc()).paginate(page=page, per_page=25)
-    return render_template('user_log.html', logs=user_logs)
+    return _render_audit_log('user_log.html', ['auth', 'management'], 'admin.user.user_log')
+
+@user_bp.route('/text_search')
+@permission_required(Permission.VIEW_AUDIT_LOG)
+def text_search():
+    """
+    Полнотекстовый поиск по примечаниям, комментариям к операциям и журналу аудита
+    с фильтрами (период, этап) и курсорной пагинацией (параметр cursor).
+    """
+    filters = {name: request.args.get(name, '').strip() for name in ('q', 'date_from', 'date_to', 'stage')}
+    filters = {name: value for name, value in filters.items() if value}
+    try:
+        dates = {name: datetime.strptime(filters[name], '%Y-%m-%d') if filters.get(name) else None
+                 for name in ('date_from', 'date_to')}
+        stage_id = int(filters['stage']) if filters.get('stage') else None
+    except ValueError:
+        flash('Некорректный фильтр: дата должна быть в формате ГГГГ-ММ-ДД.', 'error')
+        return redirect(url_for('admin.user.text_search'))
+
+    try:
+        page = query_service.get_text_search_page(
+            filters.get('q', ''), cursor=request.args.get('cursor'), stage_id=stage_id, **dates
+        )
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin.user.text_search', **filters))
+
+    return render_template('text_search.html', results=page, filters=filters,
+                           stages=query_service.get_stages_query().all(),
+                           is_first_page=not request.args.get('cursor'))
 
 # ... (остальной код файла остается без изменений) ...
 
@@ -92,8 +130,7 @@ def add_role():
         permissions_sum = sum(form.permissions.data)
         new_role = Role(name=form.name.data, permissions=permissions_sum)
         db.session.add(new_role)
-        log_entry = AuditLog(user_id=current_user.id, action="Управление ролями", details=f"Создана новая роль '{new_role.name}'.", category='management')
-        db.session.add(log_entry)
+        audit_service.log_action(user_id=current_user.id, action="Управление ролями", details=f"Создана новая роль '{new_role.name}'.", category='management', durable=True)
         db.session.commit()
         flash(f'Роль "{new_role.name}" успешно создана.', 'success')
         return redirect(url_for('admin.user.list_roles'))
@@ -109,8 +146,7 @@ def edit_role(role_id):
     if form.validate_on_submit():
         role.name = form.name.data
         role.permissions = sum(form.permissions.data)
-        log_entry = AuditLog(user_id=current_user.id, action="Управление ролями", details=f"Изменена роль '{role.name}'.", category='management')
-        db.session.add(log_entry)
+        audit_service.log_action(user_id=current_user.id, action="Управление ролями", details=f"Изменена роль '{role.name}'.", category='management', durable=True)
         db.session.commit()
         flash(f'Роль "{role.name}" успешно обновлена.', 'success')
         return redirect(url_for('admin.user.list_roles'))
@@ -129,8 +165,7 @@ def delete_role(role_id):
     else:
         role_name = role.name
         db.session.delete(role)
-        log_entry = AuditLog(user_id=current_user.id, action="Управление ролями", details=f"Удалена роль '{role_name}'.", category='management')
-        db.session.add(log_entry)
+        audit_service.log_action(user_id=current_user.id, action="Управление ролями", details=f"Удалена роль '{role_name}'.", category='management', durable=True)
         db.session.commit()
         flash(f'Роль "{role_name}" успешно удалена.', 'success')
     return redirect(url_for('admin.user.list_roles'))
@@ -157,10 +192,7 @@ def add_user():
         )
         new_user.set_password(form.password.data)
         db.session.add(new_user)
-        db.session.commit()
-        
-        log_entry = AuditLog(user_id=current_user.id, action="Управление пользователями", details=f"Создан новый пользователь '{new_user.username}'.", category='management')
-        db.session.add(log_entry)
+        audit_service.log_action(user_id=current_user.id, action="Управление пользователями", details=f"Создан новый пользователь '{new_user.username}'.", category='management', durable=True)
         db.session.commit()
         flash(f'Пользователь {new_user.username} успешно создан.', 'success')
         return redirect(url_for('admin.user.list_users'))
@@ -181,8 +213,7 @@ def edit_user(user_id):
             user.role = form.role.data
             if form.password.data:
                 user.set_password(form.password.data)
-            log_entry = AuditLog(user_id=current_user.id, action="Управление пользователями", details=f"Изменены данные пользователя '{user.username}'.", category='management')
-            db.session.add(log_entry)
+            audit_service.log_action(user_id=current_user.id, action="Управление пользователями", details=f"Изменены данные пользователя '{user.username}'.", category='management', durable=True)
             db.session.commit()
             flash(f'Данные пользователя {user.username} обновлены.', 'success')
             return redirect(url_for('admin.user.list_users'))
@@ -206,8 +237,7 @@ def delete_user(user_id):
         return redirect(url_for('admin.user.list_users'))
 
     username_deleted = user_to_delete.username
-    log_entry = AuditLog(user_id=current_user.id, action="Управление пользователями", details=f"Удален пользователь '{username_deleted}'.", category='management')
-    db.session.add(log_entry)
+    audit_service.log_action(user_id=current_user.id, action="Управление пользователями", details=f"Удален пользователь '{username_deleted}'.", category='management', durable=True)
     db.session.delete(user_to_delete)
     db.session.commit()
     flash(f'Пользователь {username_deleted} удален.', 'success')
@@ -4,6 +4,10 @@ import click
 import secrets
 import string
 import os
+import threading
+import time
+import uuid
+from sqlalchemy import func
 from flask import current_app
 from flask.cli import with_appcontext
 
@@ -12,7 +16,10 @@ from flask.cli import with_appcontext
 from app import db
 # Импортируем все модели из пакета 'app.models'
 from app.models import (User, Role, Part, Stage, RouteTemplate, 
-                          RouteStage, AuditLog, PartNote, ResponsibleHistory, StatusHistory)
+                          RouteStage, AuditLog, PartNote, ResponsibleHistory, StatusHistory,
+                          PartStageProgress, StageDuration, OperatorActivityRollup)
+from app.services import part_status_service, report_service, archive_service, search_service, import_job_service
+from app.services.dashboard_service import invalidate_product_summary
 
 
 @click.command('seed')
@@ -70,6 +77,9 @@ def seed_cypress_command():
     db.session.query(AuditLog).delete()
     db.session.query(PartNote).delete()
     db.session.query(ResponsibleHistory).delete()
+    db.session.query(PartStageProgress).delete()
+    db.session.query(StageDuration).delete()
+    db.session.query(OperatorActivityRollup).delete()
     db.session.query(StatusHistory).delete()
     db.session.query(Part).delete() 
     db.session.query(RouteStage).delete()
@@ -125,4 +135,196 @@ def seed_cypress_command():
     db.session.add_all([rs1, rs2, part1, part2])
     db.session.commit()
 
-    click.secho("✅ База данных готова для Cypress-тестов.", fg="green")
\ No newline at end of file
+    click.secho("✅ База данных готова для Cypress-тестов.", fg="green")
+
+
+@click.command('rebuild-progress')
+@with_appcontext
+def rebuild_progress_command():
+    """
+    Пересобирает материализованные счетчики прогресса по этапам
+    (PartStageProgress) из полной истории статусов и готовность сборок.
+    """
+    click.echo("Пересборка счетчиков прогресса по этапам...")
+    rows_count = part_status_service.rebuild_stage_progress()
+    click.secho(f"✅ Счетчики пересобраны. Записей прогресса: {rows_count}.", fg="green")
+
+
+@click.command('rebuild-stage-durations')
+@with_appcontext
+def rebuild_stage_durations_command():
+    """
+    Пересобирает таблицу фактов длительности этапов (StageDurations)
+    из полной истории статусов. Нужна после миграции и для сверки.
+    """
+    click.echo("Пересборка фактов длительности этапов...")
+    facts_count = report_service.rebuild_stage_durations()
+    click.secho(f"✅ Факты пересобраны. Записей: {facts_count}.", fg="green")
+
+
+@click.command('rebuild-operator-rollups')
+@with_appcontext
+def rebuild_operator_rollups_command():
+    """
+    Пересобирает почасовые и суточные агрегаты активности операторов
+    (OperatorActivityRollups) из полной истории статусов.
+    """
+    click.echo("Пересборка агрегатов активности операторов...")
+    rows_count = report_service.rebuild_operator_rollups()
+    click.secho(f"✅ Агрегаты пересобраны. Записей: {rows_count}.", fg="green")
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """
+    Пересобирает поисковые индексы деталей и текстов (теневые таблицы FTS5 на SQLite).
+    Нужна, если данные менялись в обход триггеров.
+    """
+    click.echo("Пересборка поисковых индексов...")
+    parts_count = search_service.rebuild_part_search_index()
+    texts_count = search_service.rebuild_text_search_index()
+    click.secho(f"✅ Индексы пересобраны. Деталей: {parts_count}, текстов: {texts_count}.", fg="green")
+
+
+@click.command('archive-audit-logs')
+@click.option('--keep-months', type=int, default=None,
+              help='Сколько последних месяцев журнала оставить в базе (по умолчанию AUDIT_RETENTION_MONTHS).')
+@click.option('--months-ahead', type=int, default=3, show_default=True,
+              help='На сколько месяцев вперед создать партиции журнала (PostgreSQL).')
+@with_appcontext
+def archive_audit_logs_command(keep_months, months_ahead):
+    """
+    Переносит закрытые месяцы журнала аудита в сжатые JSONL-файлы в папке
+    архива и создает партиции на будущие месяцы. Запускается по расписанию (раз в месяц).
+    """
+    keep_months = keep_months or current_app.config['AUDIT_RETENTION_MONTHS']
+    created = archive_service.ensure_audit_partitions(months_ahead)
+    if created:
+        click.echo(f"Созданы партиции: {', '.join(created)}.")
+    try:
+        archived = archive_service.archive_audit_logs(keep_months)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--keep-months')
+    for month, rows_count in archived.items():
+        click.echo(f"  {month}: {rows_count} записей")
+    click.secho(f"✅ Архивация завершена. Перенесено записей: {sum(archived.values())}.", fg="green")
+
+
+@click.command('create-audit-partitions')
+@click.option('--months-ahead', type=int, default=3, show_default=True,
+              help='На сколько месяцев вперед создать партиции журнала.')
+@with_appcontext
+def create_audit_partitions_command(months_ahead):
+    """
+    Создает партиции журнала аудита на будущие месяцы и переносит в них записи,
+    попавшие в партицию по умолчанию (PostgreSQL). Запускается при старте сервера.
+    """
+    created = archive_service.ensure_audit_partitions(months_ahead)
+    click.secho(f"✅ Создано партиций журнала: {len(created)}.", fg="green")
+    for name in created:
+        click.echo(f"  {name}")
+
+
+@click.command('fail-orphaned-imports')
+@with_appcontext
+def fail_orphaned_imports_command():
+    """
+    Помечает как прерванные задачи импорта, оставшиеся в очереди или в работе
+    после остановки сервера. Запускается при старте до запуска воркеров.
+    """
+    jobs_count = import_job_service.fail_orphaned_jobs()
+    click.secho(f"✅ Прерванных задач импорта: {jobs_count}.", fg="green")
+
+
+
+@click.command('load-test-confirm')
+@click.option('--clients', default=20, show_default=True, help='Количество параллельных клиентов (потоков).')
+@click.option('--requests', 'requests_per_client', default=10, show_default=True, help='Подтверждений на клиента.')
+@click.option('--quantity', default=50, show_default=True, help='Количество в партии тестовой детали.')
+@click.option('--keep', is_flag=True, help='Не удалять тестовую деталь после прогона.')
+@with_appcontext
+def load_test_confirm_command(clients, requests_per_client, quantity, keep):
+    """
+    Нагрузочный тест подтверждения этапов: много клиентов одновременно
+    подтверждают по 1 шт. первого этапа одной временной детали, каждое
+    подтверждение отправляется дважды с одним ключом идемпотентности.
+    Проверяет, что деталь не перевыполнена, повторы не учтены, а счетчик
+    прогресса совпадает с историей. Запускать на PostgreSQL (тестовый стенд).
+    """
+    route = RouteTemplate.query.filter_by(is_default=True).first()
+    if not route or not route.stages:
+        raise click.ClickException("Не найден маршрут по умолчанию с этапами.")
+    stage_id = sorted(route.stages, key=lambda rs: rs.order)[0].stage_id
+    run_id = uuid.uuid4().hex[:8]
+    part_id = f"LOADTEST-{run_id}"
+    db.session.add(Part(part_id=part_id, product_designation='Нагрузочный тест', name='Нагрузочный тест',
+                        material='-', quantity_total=quantity, route_template_id=route.id))
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    counters = {'accepted': 0, 'duplicates': 0, 'rejected': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index):
+        # Каждый поток работает в своем контексте приложения и своей сессии БД
+        with app.app_context():
+            for number in range(requests_per_client):
+                op_id = f"load-{run_id}-{index}-{number}"
+                for _attempt in range(2):
+                    started = time.perf_counter()
+                    try:
+                        applied = part_status_service.complete_stage(
+                            db.session.get(Part, part_id), db.session.get(Stage, stage_id), 1, f"load-{index}", op_id
+                        )
+                        outcome = 'accepted' if applied else 'duplicates'
+                    except ValueError:
+                        outcome = 'rejected'
+                    except Exception as e:
+                        db.session.rollback()
+                        app.logger.error(f"Load test request failed: {e}")
+                        outcome = 'errors'
+                    with lock:
+                        counters[outcome] += 1
+                        latencies.append(time.perf_counter() - started)
+
+    click.echo(f"Деталь {part_id}: {clients} клиентов x {requests_per_client} подтверждений (x2 с повтором)...")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db.session.expire_all()
+    stage_name = db.session.get(Stage, stage_id).name
+    recorded = db.session.query(func.coalesce(func.sum(StatusHistory.quantity), 0)).filter(
+        StatusHistory.part_id == part_id
+    ).scalar()
+    progress = db.session.get(PartStageProgress, (part_id, stage_name))
+    counted = progress.quantity_completed if progress else 0
+    expected = min(quantity, clients * requests_per_client)
+
+    latencies.sort()
+    click.echo(f"Запросов: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} в секунду). "
+               f"Задержка p50: {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+               f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.0f} мс, max: {latencies[-1] * 1000:.0f} мс.")
+    click.echo(f"Учтено: {counters['accepted']}, повторов: {counters['duplicates']}, "
+               f"отклонено: {counters['rejected']}, ошибок: {counters['errors']}.")
+    click.echo(f"В истории: {recorded} шт., в счетчике этапа: {counted} шт., ожидалось: {expected} шт.")
+
+    if not keep:
+        StageDuration.query.filter_by(part_id=part_id).delete()
+        history_query = StatusHistory.query.filter_by(part_id=part_id)
+        report_service.update_operator_rollups(history_query.all(), sign=-1)
+        history_query.delete()
+        PartStageProgress.query.filter_by(part_id=part_id).delete()
+        Part.query.filter_by(part_id=part_id).delete()
+        db.session.commit()
+        invalidate_product_summary()
+
+    if recorded != expected or counted != recorded or counters['duplicates'] != counters['accepted'] or counters['errors']:
+        raise click.ClickException("Нарушена согласованность: деталь перевыполнена, повтор учтен или запросы завершились ошибкой.")
+    click.secho("✅ Перевыполнения и повторного учета нет.", fg="green")
@@ -7,7 +7,7 @@ main_bp = Blueprint('main', __name__)
 
 # 2. Импортируем наши новые, разделенные файлы с маршрутами.
 # --- ИЗМЕНЕНИЕ: Импортируем `main_pages_bp` из `main_routes` ---
-from . import main_routes, api_routes, action_routes
+from . import main_routes, api_routes, action_routes, socket_events
 
 # 3. Регистрируем каждый дочерний блюпринт внутри нашего главного блюпринта.
 # --- ИЗМЕНЕНИЕ: Регистрируем `main_pages_bp` ---
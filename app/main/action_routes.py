@@ -1,14 +1,13 @@
 # app/main/action_routes.py
 
+from datetime import datetime, timezone
 from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify
-from sqlalchemy import func
 
 from app import db
 from flask_login import current_user, login_required
-from app.models import (Part, Stage, PartNote, Permission, StatusHistory,
-                        StatusType, RouteStage, AuditLog)
+from app.models import Part, Stage, PartNote, Permission, RouteStage
 from app.admin.action_forms import ConfirmStageQuantityForm, AddNoteForm, ReworkScrapForm
-from app.services import part_status_service as pss
+from app.services import part_status_service as pss, audit_service
 from app.services.part_utils_service import _send_websocket_notification
 
 # Создаем новый блюпринт специально для действий
@@ -34,17 +33,16 @@ def confirm_stage(part_id, stage_id):
                 return render_template('select_stage.html', part=part, next_stage=stage, form=form, rework_scrap_form=ReworkScrapForm())
             operator_name = form.operator_name.data
         
-        completed_on_this_stage = db.session.query(func.sum(StatusHistory.quantity)).filter_by(
-            part_id=part.part_id, status=stage.name, status_type=StatusType.COMPLETED
-        ).scalar() or 0
-        remaining_on_stage = part.quantity_total - completed_on_this_stage
-        
-        if quantity_done > remaining_on_stage:
-            flash(f'Ошибка: Нельзя выполнить {quantity_done} шт. На этом этапе осталось {remaining_on_stage} шт.', 'error')
+        # Остаток проверяется в сервисе под блокировкой строки детали
+        try:
+            applied = pss.complete_stage(part, stage, quantity_done, operator_name, form.idempotency_key.data or None)
+        except ValueError as e:
+            flash(str(e), 'error')
             # --- ИЗМЕНЕНИЕ: Обновляем url_for ---
             return redirect(url_for('main.main_pages.select_stage', part_id=part.part_id))
-
-        pss.complete_stage(part, stage, quantity_done, operator_name)
+        if not applied:
+            flash('Это подтверждение уже было учтено.', 'info')
+            return redirect(url_for('main.main_pages.dashboard'))
         
         notification_message = f"Деталь {part_id} перешла на этап '{stage.name}'. Готово: {quantity_done} шт."
         flash(notification_message, "success")
@@ -57,6 +55,113 @@ def confirm_stage(part_id, stage_id):
     return render_template('select_stage.html', part=part, next_stage=stage, form=form, rework_scrap_form=ReworkScrapForm())
 
 
+def _parse_bulk_items(raw_items):
+    """
+    Проверяет формат позиций пакетного подтверждения и приводит числа к int.
+    :return: Список словарей {'part_id', 'stage_id', 'quantity'}.
+    """
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValueError("Список позиций пуст.")
+    items = []
+    for raw in raw_items:
+        if not isinstance(raw, dict) or not str(raw.get('part_id') or '').strip():
+            raise ValueError("Каждая позиция должна содержать part_id.")
+        try:
+            stage_id = int(raw['stage_id']) if raw.get('stage_id') not in (None, '') else None
+            quantity = int(raw['quantity']) if raw.get('quantity') not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ValueError(f"Некорректный этап или количество для детали {raw.get('part_id')}.")
+        items.append({'part_id': str(raw['part_id']).strip(), 'stage_id': stage_id, 'quantity': quantity})
+    return items
+
+
+def _parse_client_time(value):
+    """Разбирает время операции из ISO-строки клиента (без часового пояса — UTC)."""
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _parse_sync_operations(raw_items):
+    """
+    Проверяет операции офлайн-очереди: к полям позиции добавляются
+    обязательный op_id и необязательное время выполнения performed_at.
+    """
+    items = _parse_bulk_items(raw_items)
+    for item, raw in zip(items, raw_items):
+        op_id = str(raw.get('op_id') or '').strip()
+        if not op_id or len(op_id) > 64:
+            raise ValueError("Каждая операция должна содержать op_id (не длиннее 64 символов).")
+        item['op_id'] = op_id
+        item['performed_at'] = _parse_client_time(raw.get('performed_at'))
+    return items
+
+
+def _bulk_operator_name(payload):
+    """Имя оператора для пакетных запросов: текущий пользователь или ФИО из запроса."""
+    if current_user.is_authenticated:
+        return current_user.full_name or current_user.username
+    operator_name = str(payload.get('operator_name') or '').strip()
+    if len(operator_name) < 3:
+        raise ValueError("Поле 'Ваше ФИО' обязательно для выполнения этапа.")
+    return operator_name
+
+
+@action_bp.route('/confirm_stages', methods=['POST'])
+def confirm_stages_bulk():
+    """
+    JSON API пакетного подтверждения этапов (режим сканирования на конвейере).
+    Тело запроса: {"items": [{"part_id", "stage_id", "quantity"}, ...], "operator_name"}.
+    Позиции проверяются и сохраняются одной транзакцией, ошибочные позиции
+    возвращаются в результатах и не мешают сохранению остальных.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        operator_name = _bulk_operator_name(payload)
+        items = _parse_bulk_items(payload.get('items'))
+        results = pss.complete_stages_bulk(items, operator_name)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    accepted = sum(1 for result in results if result['status'] == 'ok')
+    return jsonify({
+        'status': 'success',
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results,
+    })
+
+
+@action_bp.route('/sync_stages', methods=['POST'])
+def sync_stages():
+    """
+    JSON API синхронизации офлайн-очереди страницы сканирования.
+    Тело запроса: {"items": [{"op_id", "part_id", "stage_id", "quantity", "performed_at"}, ...],
+    "operator_name"}. Запрос идемпотентен: повторно отправленные операции
+    возвращаются со статусом 'duplicate' и не учитываются второй раз.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        operator_name = _bulk_operator_name(payload)
+        items = _parse_sync_operations(payload.get('items'))
+        results = pss.sync_offline_operations(items, operator_name)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    counts = {'ok': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return jsonify({
+        'status': 'success',
+        'accepted': counts['ok'],
+        'duplicates': counts['duplicate'],
+        'rejected': counts['error'],
+        'results': results,
+    })
+
+
 @action_bp.route('/handle_action/<path:part_id>/<int:stage_id>', methods=['POST'])
 @login_required
 def handle_action(part_id, stage_id):
@@ -113,8 +218,8 @@ def add_note(part_id):
         db.session.add(new_note)
 
         log_details = f"К детали '{part.part_id}' добавлено примечание."
-        db.session.add(AuditLog(user_id=current_user.id, action="Добавлено примечание",
-                                details=log_details, category='part', part_id=part.part_id))
+        audit_service.log_action(user_id=current_user.id, action="Добавлено примечание",
+                                 details=log_details, category='part', part_id=part.part_id)
         db.session.commit()
         flash('Примечание успешно добавлено.', 'success')
     else:
@@ -137,8 +242,8 @@ def edit_note(note_id):
     if new_text and new_text.strip():
         note.text = new_text
         log_details = f"В детали '{note.part_id}' изменено примечание (ID: {note.id})."
-        db.session.add(AuditLog(user_id=current_user.id, action="Изменено примечание",
-                                details=log_details, category='management', part_id=note.part_id))
+        audit_service.log_action(user_id=current_user.id, action="Изменено примечание",
+                                 details=log_details, category='management', part_id=note.part_id)
         db.session.commit()
         return jsonify({'status': 'success', 'message': 'Примечание обновлено.', 'new_text': new_text})
     else:
@@ -157,8 +262,8 @@ def delete_note(note_id):
 
     part_id = note.part_id
     log_details = f"В детали '{part_id}' удалено примечание (ID: {note.id})."
-    db.session.add(AuditLog(user_id=current_user.id, action="Удалено примечание",
-                            details=log_details, category='management', part_id=part_id))
+    audit_service.log_action(user_id=current_user.id, action="Удалено примечание",
+                             details=log_details, category='management', part_id=part_id)
 
     db.session.delete(note)
     db.session.commit()
@@ -1,65 +1,162 @@
 # app/main/api_routes.py
 
-from flask import Blueprint, jsonify, request, url_for
-from sqlalchemy.orm import joinedload
-from collections import defaultdict
+from datetime import datetime
+from flask import Blueprint, jsonify, request, url_for, render_template
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 
 from app import db
 from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
 # --- ИЗМЕНЕНИЕ: Обновляем импорт, чтобы он соответствовал новой структуре моделей ---
-from app.models import Part, RouteTemplate, RouteStage, Permission, StatusType
+from app.models import Part, RouteTemplate, RouteStage, Permission
+from app.services import part_status_service as pss, query_service, search_service
 
 # Создаем новый блюпринт специально для API
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 
+# Размер страницы по умолчанию и максимальный размер для keyset-пагинации
+PARTS_PAGE_SIZE = 100
+PARTS_PAGE_SIZE_MAX = 500
+
+
+@api_bp.route('/history/<path:part_id>')
+def part_history(part_id):
+    """
+    API-эндпоинт догрузки ленты истории детали ("Показать еще").
+    Параметр `after` — курсор из предыдущей страницы, `limit` — размер страницы.
+    Возвращает готовый HTML событий и курсор следующей страницы.
+    """
+    db.get_or_404(Part, part_id)
+    limit = request.args.get('limit', query_service.HISTORY_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, query_service.HISTORY_PAGE_SIZE_MAX))
+    try:
+        page = query_service.get_history_page(part_id, request.args.get('after'), limit)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    return jsonify({
+        'html': render_template('_history_items.html', items=page['items']),
+        'next_cursor': page['next_cursor'],
+    })
+
+
+@api_bp.route('/search/parts')
+def search_parts():
+    """
+    API-эндпоинт глобального поиска деталей по всем изделиям.
+    Параметр `q` — строка поиска, `limit` — максимальное количество результатов.
+    Результаты упорядочены по релевантности, найденные слова выделены в полях `highlight`.
+    """
+    limit = request.args.get('limit', search_service.PART_SEARCH_LIMIT, type=int)
+    limit = max(1, min(limit, search_service.PART_SEARCH_LIMIT_MAX))
+    return jsonify({'results': search_service.search_parts(request.args.get('q', ''), limit)})
+
+
+@api_bp.route('/search/texts')
+def search_texts():
+    """
+    API-эндпоинт полнотекстового поиска по примечаниям, комментариям к операциям
+    и журналу аудита. Параметры: `q` — строка поиска, `date_from`/`date_to` — период
+    (ГГГГ-ММ-ДД), `stage_id` — этап, `cursor` и `limit` — курсорная пагинация.
+    """
+    if not current_user.is_authenticated or not current_user.can(Permission.VIEW_AUDIT_LOG):
+        return jsonify({'status': 'error', 'message': 'Нет прав'}), 403
+
+    limit = request.args.get('limit', query_service.TEXT_SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, query_service.TEXT_SEARCH_PAGE_SIZE_MAX))
+    try:
+        dates = {name: datetime.strptime(request.args[name], '%Y-%m-%d') if request.args.get(name) else None
+                 for name in ('date_from', 'date_to')}
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Дата должна быть в формате ГГГГ-ММ-ДД.'}), 400
+    try:
+        page = query_service.get_text_search_page(
+            request.args.get('q', ''), cursor=request.args.get('cursor'), limit=limit,
+            stage_id=request.args.get('stage_id', type=int), **dates
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    return jsonify({
+        'results': [{
+            **item,
+            'timestamp': item['timestamp'].isoformat() if item['timestamp'] else None,
+            'snippet': str(item['snippet']),
+            'history_url': url_for('main.main_pages.history', part_id=item['part_id']) if item['part_exists'] else None,
+        } for item in page['items']],
+        'next_cursor': page['next_cursor'],
+    })
+
+
+@api_bp.route('/csrf_token')
+def csrf_token():
+    """
+    API-эндпоинт свежего CSRF-токена. Страницы сканирования могут быть открыты
+    из кэша service worker'а с просроченным токеном, поэтому офлайн-очередь
+    запрашивает токен перед каждой синхронизацией.
+    """
+    response = jsonify({'csrf_token': generate_csrf()})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 @api_bp.route('/parts/<path:product_designation>')
 def parts_for_product(product_designation):
     """
-    API-эндпоинт для динамической загрузки списка деталей для конкретного изделия
+    API-эндпоинт для постраничной загрузки списка деталей конкретного изделия
     с поддержкой поиска и фильтрации.
+    Пагинация курсорная (keyset) по `part_id`: параметр `limit` задает размер
+    страницы, `after` — ID последней детали предыдущей страницы.
     """
-    # Начинаем строить запрос к БД
-    query = Part.query.options(
-        # Жадная загрузка связанных данных для минимизации запросов
-        joinedload(Part.route_template).joinedload(RouteTemplate.stages).joinedload(RouteStage.stage),
-        joinedload(Part.responsible),
-        joinedload(Part.history) # Явно подгружаем историю для расчета прогресса
-    ).filter(
+    limit = request.args.get('limit', PARTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, PARTS_PAGE_SIZE_MAX))
+    after = request.args.get('after')
+
+    filters = [
         Part.product_designation == product_designation,
-        ~Part.parent_associations.any()  # Выбираем только верхнеуровневые детали
-    )
-
-    # Применяем фильтр поиска, если он есть в параметрах запроса
-    search_term = request.args.get('search')
-    if search_term:
-        search_filter = f"%{search_term}%"
-        query = query.filter(
-            db.or_(
-                Part.part_id.ilike(search_filter),
-                Part.name.ilike(search_filter),
-                Part.material.ilike(search_filter)
-            )
-        )
+        Part.is_top_level  # Выбираем только верхнеуровневые детали (частичный индекс)
+    ]
+
+    # Применяем фильтр поиска, если он есть в параметрах запроса (через поисковый индекс)
+    search_filter = search_service.part_search_filter(request.args.get('search'))
+    if search_filter is not None:
+        filters.append(search_filter)
     
     # Применяем фильтр по ответственному, если он есть
     responsible_id = request.args.get('responsible_id')
     if responsible_id and responsible_id.isdigit():
-        query = query.filter(Part.responsible_id == int(responsible_id))
+        filters.append(Part.responsible_id == int(responsible_id))
+
+    # Общее количество считаем только для первой страницы — это подсказка для UI
+    total = None
+    if not after:
+        total = db.session.query(func.count(Part.part_id)).filter(*filters).scalar()
+
+    query = Part.query.options(
+        # Маршруты общие для многих деталей, поэтому грузим их отдельным запросом без "взрыва" строк
+        selectinload(Part.route_template).selectinload(RouteTemplate.stages).joinedload(RouteStage.stage),
+        joinedload(Part.responsible)
+    ).filter(*filters)
+    if after:
+        query = query.filter(Part.part_id > after)
+
+    # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+    parts_from_query = query.order_by(Part.part_id.asc()).limit(limit + 1).all()
+    has_more = len(parts_from_query) > limit
+    parts_from_query = parts_from_query[:limit]
+    next_cursor = parts_from_query[-1].part_id if has_more else None
 
-    # Выполняем запрос
-    parts_from_query = query.order_by(Part.part_id.asc()).all()
+    # Прогресс по этапам читаем одним запросом из материализованных счетчиков
+    progress_map = pss.get_stage_progress_for_parts([p.part_id for p in parts_from_query])
 
     # Формируем список словарей для JSON-ответа
     parts_list = []
     for part in parts_from_query:
         route_stages_data = []
         if part.route_template:
-            # Считаем прогресс по каждому этапу
-            completed_quantities = defaultdict(int)
-            for h in part.history:
-                if h.status_type == StatusType.COMPLETED:
-                    completed_quantities[h.status] += h.quantity
+            completed_quantities = progress_map.get(part.part_id, {})
 
             ordered_stages = sorted(part.route_template.stages, key=lambda s: s.order)
             
@@ -87,7 +184,7 @@ def parts_for_product(product_designation):
             'creation_date': part.date_added.strftime('%Y-%m-%d'),
             'quantity_completed': part.quantity_completed,
             'quantity_total': part.quantity_total,
-            'history_url': url_for('main.history', part_id=part.part_id),
+            'history_url': url_for('main.main_pages.history', part_id=part.part_id),
             'route_stages': route_stages_data,
             'delete_url': url_for('admin.part.delete_part', part_id=part.part_id),
             'edit_url': url_for('admin.part.edit_part', part_id=part.part_id),
@@ -102,4 +199,10 @@ def parts_for_product(product_designation):
         'can_generate_qr': current_user.can(Permission.GENERATE_QR)
     } if current_user.is_authenticated else None
 
-    return jsonify({'parts': parts_list, 'permissions': permissions})
\ No newline at end of file
+    return jsonify({
+        'parts': parts_list,
+        'permissions': permissions,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': total
+    })
\ No newline at end of file
@@ -1,16 +1,16 @@
 # app/main/main_routes.py
 
-from flask import Blueprint, render_template, flash, redirect, url_for
-from sqlalchemy import func
+import os
+import uuid
+from flask import Blueprint, render_template, flash, redirect, url_for, current_app, send_from_directory
 from sqlalchemy.orm import joinedload
-from collections import defaultdict
 
 from app import db
-from app.models import Part, StatusHistory, Stage, RouteStage, User, StatusType
+from app.models import Part, Stage, RouteStage, User
 from app.admin.action_forms import ConfirmStageQuantityForm, ReworkScrapForm
 from app.admin.part_forms import AddChildPartForm
 from app.admin.action_forms import AddNoteForm
-from app.services import query_service
+from app.services import query_service, part_status_service, dashboard_service, hierarchy_service
 
 # --- ИЗМЕНЕНИЕ: Переименовываем блюпринт, чтобы избежать конфликта ---
 main_pages_bp = Blueprint('main_pages', __name__)
@@ -20,23 +20,9 @@ main_pages_bp = Blueprint('main_pages', __name__)
 def dashboard():
     """
     Отображает главную страницу (панель мониторинга).
-    Выполняет агрегированный запрос для отображения общего прогресса по каждому изделию.
+    Сводка прогресса по изделиям берется из кэша и пересчитывается только после изменений деталей.
     """
-    # Запрос для получения общего прогресса по каждому изделию (только для верхнеуровневых деталей)
-    product_progress_query = db.session.query(
-        Part.product_designation,
-        func.count(Part.part_id).label('total_parts'),
-        func.sum(Part.quantity_total).label('total_quantity'),
-        func.sum(Part.quantity_completed).label('completed_quantity')
-    ).filter(~Part.parent_associations.any()).group_by(Part.product_designation).all()
-
-    # Формируем список продуктов для передачи в шаблон
-    products = [{
-        'product_designation': row.product_designation,
-        'total_parts': row.total_parts,
-        'total_possible_stages': row.total_quantity or 0,
-        'total_completed_stages': row.completed_quantity or 0
-    } for row in product_progress_query]
+    products = dashboard_service.get_product_summary()
 
     # Получаем список пользователей для фильтра "Ответственный"
     responsible_users = User.query.order_by(User.username).all()
@@ -50,7 +36,10 @@ def history(part_id):
     Отображает страницу с полной историей и составом для конкретной детали.
     """
     part = db.get_or_404(Part, part_id)
-    combined_history = query_service.get_combined_history(part)
+    # Первая страница ленты истории; следующие догружаются через API по курсору
+    timeline = query_service.get_history_page(part.part_id)
+    # Состав и сборки, в которые входит деталь, загружаются одним рекурсивным запросом
+    hierarchy = hierarchy_service.get_part_hierarchy(part.part_id)
     
     # Инициализируем формы для добавления примечаний и дочерних узлов
     note_form = AddNoteForm()
@@ -68,12 +57,45 @@ def history(part_id):
     return render_template(
         'history.html',
         part=part,
-        combined_history=combined_history,
+        timeline=timeline,
+        hierarchy=hierarchy,
         note_form=note_form,
         child_form=child_form
     )
 
 
+@main_pages_bp.route('/batch_scan')
+def batch_scan():
+    """
+    Отображает страницу пакетного сканирования: оператор сканирует несколько
+    QR-кодов подряд и подтверждает все этапы одним запросом.
+    """
+    return render_template('batch_scan.html', max_items=part_status_service.BULK_COMPLETION_MAX_ITEMS)
+
+
+@main_pages_bp.route('/scan-sw.js')
+def scan_service_worker():
+    """
+    Отдает service worker офлайн-режима сканирования с корня сайта,
+    чтобы его область действия охватывала страницы /scan/.
+    """
+    response = send_from_directory(
+        os.path.join(current_app.static_folder, 'js'), 'scan-sw.js', mimetype='application/javascript'
+    )
+    # Браузер должен сразу видеть новую версию воркера
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@main_pages_bp.route('/scan_offline')
+def scan_offline():
+    """
+    Резервная страница сканирования, которую service worker показывает без связи
+    для деталей, не открывавшихся ранее: подтверждается следующий этап маршрута.
+    """
+    return render_template('scan_offline.html')
+
+
 @main_pages_bp.route('/scan/<path:part_id>')
 def select_stage(part_id):
     """
@@ -85,11 +107,8 @@ def select_stage(part_id):
         flash('Ошибка: Этой детали не присвоен технологический маршрут.', 'error')
         return redirect(url_for('main.dashboard'))
 
-    # Рассчитываем количество уже выполненных изделий на каждом этапе
-    completed_quantities = defaultdict(int)
-    for h in part.history:
-        if h.status_type == StatusType.COMPLETED:
-            completed_quantities[h.status] += h.quantity
+    # Читаем материализованные счетчики выполненного количества по этапам
+    completed_quantities = part_status_service.get_stage_progress(part.part_id)
         
     # Находим следующий невыполненный этап в маршруте
     ordered_stages = sorted(part.route_template.stages, key=lambda s: s.order)
@@ -101,6 +120,7 @@ def select_stage(part_id):
 
     # Инициализируем формы
     form = ConfirmStageQuantityForm()
+    form.idempotency_key.data = uuid.uuid4().hex
     rework_scrap_form = ReworkScrapForm()
 
     # Предзаполняем поле "количество" оставшимся количеством на этом этапе
@@ -0,0 +1,22 @@
+# app/main/socket_events.py
+
+from flask_socketio import join_room, leave_room
+
+from app import socketio
+from app.services.notification_service import product_room
+
+
+@socketio.on('join_product')
+def handle_join_product(data):
+    """Подписывает клиента на уведомления деталей раскрытого изделия."""
+    product_designation = (data or {}).get('product_designation')
+    if product_designation:
+        join_room(product_room(product_designation))
+
+
+@socketio.on('leave_product')
+def handle_leave_product(data):
+    """Отписывает клиента от уведомлений свернутого изделия."""
+    product_designation = (data or {}).get('product_designation')
+    if product_designation:
+        leave_room(product_room(product_designation))
@@ -6,5 +6,9 @@
 
 from .user_models import User, Role, Permission, AnonymousUser
 from .route_models import Stage, RouteTemplate, RouteStage
-from .part_models import Part, AssemblyComponent
-from .history_models import StatusHistory, AuditLog, PartNote, ResponsibleHistory, StatusType
\ No newline at end of file
+from .part_models import Part, AssemblyComponent, PartStageProgress
+from .history_models import (StatusHistory, AuditLog, PartNote, ResponsibleHistory, StatusType, StageDuration,
+                             OperatorActivityRollup)
+from .job_models import ImportJob, ImportJobStatus
+from .search_models import (PART_SEARCH_DOCUMENT_SQL, PARTS_FTS_TABLE, PARTS_FTS_KEYS_TABLE, TEXT_SEARCH_SOURCES,
+                            TEXT_SEARCH_CONFIG, text_search_document_sql, text_fts_table)
@@ -15,6 +15,10 @@ class StatusType(enum.Enum):
 class StatusHistory(db.Model):
     """Хранит историю прохождения деталью производственных этапов."""
     __tablename__ = 'StatusHistory'
+    __table_args__ = (
+        # Лента истории детали читается от новых событий к старым (keyset-пагинация)
+        db.Index('ix_StatusHistory_part_id_timestamp', 'part_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.String, db.ForeignKey('Parts.part_id'), nullable=False, index=True)
     status = db.Column(db.String, nullable=False)
@@ -23,6 +27,9 @@ class StatusHistory(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     status_type = db.Column(db.Enum(StatusType), nullable=False, default=StatusType.COMPLETED)
     comment = db.Column(db.Text, nullable=True)
+    # ID операции, сгенерированный клиентом (офлайн-очередь сканирования).
+    # Уникальный индекс отсекает повторную отправку той же операции.
+    client_op_id = db.Column(db.String(64), nullable=True, unique=True, index=True)
     
     # --- НАЧАЛО ИСПРАВЛЕНИЯ: Заменяем backref на back_populates ---
     part = db.relationship('Part', back_populates='history')
@@ -32,9 +39,59 @@ class StatusHistory(db.Model):
         return f'<StatusHistory part={self.part_id} status={self.status}>'
 
 
+class StageDuration(db.Model):
+    """
+    Факт отчета о длительности этапов: сколько времени прошло от предыдущего
+    события детали (или от ее добавления) до выполнения этапа.
+    Одна запись на каждую запись StatusHistory типа COMPLETED; таблица
+    поддерживается инкрементально при изменении истории детали.
+    """
+    __tablename__ = 'StageDurations'
+    __table_args__ = (
+        # Отчеты фильтруют факты по периоду и, при необходимости, по изделию
+        db.Index('ix_StageDurations_product_designation_finished_at', 'product_designation', 'finished_at'),
+    )
+    history_id = db.Column(db.Integer, db.ForeignKey('StatusHistory.id', ondelete='CASCADE'), primary_key=True)
+    part_id = db.Column(db.String, db.ForeignKey('Parts.part_id'), nullable=False, index=True)
+    product_designation = db.Column(db.String, nullable=False)
+    stage_name = db.Column(db.String, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=False, index=True)
+    duration_seconds = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+
+    part = db.relationship('Part', back_populates='stage_durations')
+
+    def __repr__(self):
+        return f'<StageDuration part={self.part_id} stage={self.stage_name} seconds={self.duration_seconds}>'
+
+
+class OperatorActivityRollup(db.Model):
+    """
+    Агрегат истории статусов по временным корзинам (час или сутки, UTC):
+    сколько записей и изделий оператор провел по этапу с данным типом записи.
+    Обновляется инкрементально вместе с StatusHistory, поэтому отчеты по
+    операторам не зависят от объема накопленной истории.
+    """
+    __tablename__ = 'OperatorActivityRollups'
+    granularity = db.Column(db.String(8), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    operator_name = db.Column(db.String, primary_key=True)
+    stage_name = db.Column(db.String, primary_key=True)
+    status_type = db.Column(db.Enum(StatusType), primary_key=True)
+    entries_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    quantity = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<OperatorActivityRollup {self.granularity} {self.bucket_start} {self.operator_name}>'
+
+
 class AuditLog(db.Model):
     """Хранит журнал всех значимых действий в системе."""
     __tablename__ = 'AuditLogs'
+    __table_args__ = (
+        # Журнал читается по категории от новых записей к старым (keyset-пагинация)
+        db.Index('ix_AuditLogs_category_timestamp_id', 'category', 'timestamp', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.String, nullable=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.id', ondelete='SET NULL'), nullable=True)
@@ -51,6 +108,9 @@ class AuditLog(db.Model):
 class PartNote(db.Model):
     """Модель для хранения текстовых примечаний к деталям."""
     __tablename__ = 'PartNotes'
+    __table_args__ = (
+        db.Index('ix_PartNotes_part_id_timestamp', 'part_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.String, db.ForeignKey('Parts.part_id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False)
@@ -68,6 +128,9 @@ class PartNote(db.Model):
 class ResponsibleHistory(db.Model):
     """Хранит историю смены ответственных за деталь."""
     __tablename__ = 'ResponsibleHistory'
+    __table_args__ = (
+        db.Index('ix_ResponsibleHistory_part_id_timestamp', 'part_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.String, db.ForeignKey('Parts.part_id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=True, index=True)
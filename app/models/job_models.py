@@ -0,0 +1,39 @@
+# app/models/job_models.py
+
+import enum
+from datetime import datetime, timezone
+from app import db
+
+
+class ImportJobStatus(enum.Enum):
+    """Перечисление состояний фоновой задачи импорта."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class ImportJob(db.Model):
+    """
+    Фоновая задача массового импорта деталей из Excel/CSV.
+    Хранит исходный файл, состояние обработки и итоговые счетчики,
+    чтобы результат и ошибки можно было запросить после завершения.
+    """
+    __tablename__ = 'ImportJobs'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.id', ondelete='SET NULL'), nullable=True, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    stored_filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.Enum(ImportJobStatus), nullable=False, default=ImportJobStatus.QUEUED, index=True)
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.filename} status={self.status.name}>'
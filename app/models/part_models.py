@@ -21,9 +21,36 @@ class AssemblyComponent(db.Model):
     # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
 
 
+class PartStageProgress(db.Model):
+    """
+    Материализованный счетчик выполненного количества по этапу детали.
+    Обновляется в той же транзакции, что и запись в StatusHistory,
+    поэтому прогресс читается без пересуммирования всей истории.
+    """
+    __tablename__ = 'PartStageProgress'
+    part_id = db.Column(db.String, db.ForeignKey('Parts.part_id'), primary_key=True)
+    stage_name = db.Column(db.String, primary_key=True)
+    quantity_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    part = db.relationship('Part', back_populates='stage_progress')
+
+    def __repr__(self):
+        return f'<PartStageProgress part={self.part_id} stage={self.stage_name} qty={self.quantity_completed}>'
+
+
 class Part(db.Model):
     """Основная модель, представляющая деталь, изделие или узел."""
     __tablename__ = 'Parts'
+    __table_args__ = (
+        # Составной индекс для keyset-пагинации деталей внутри изделия
+        db.Index('ix_Parts_product_designation_part_id', 'product_designation', 'part_id'),
+        # Частичный индекс только по верхнеуровневым деталям: списки корневых деталей
+        # изделия и сводка панели читаются диапазонным сканированием индекса
+        db.Index(
+            'ix_Parts_top_level_product_designation_part_id', 'product_designation', 'part_id',
+            postgresql_where=db.text('is_top_level'), sqlite_where=db.text('is_top_level = 1')
+        ),
+    )
     
     # Основные идентификаторы
     part_id = db.Column(db.String, primary_key=True)
@@ -44,6 +71,13 @@ class Part(db.Model):
     quantity_total = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     quantity_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     quantity_scrapped = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Сколько полностью готовых единиц можно собрать с учетом готовности состава.
+    # Поддерживается инкрементально (см. assembly_progress_service)
+    quantity_buildable = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Денормализованный признак "деталь не входит ни в одну сборку".
+    # Поддерживается сервисами, изменяющими AssemblyComponents (см. update_top_level_flags)
+    is_top_level = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     
     # Внешние ключи
     route_template_id = db.Column(db.Integer, db.ForeignKey('RouteTemplates.id'), nullable=True)
@@ -72,6 +106,8 @@ class Part(db.Model):
     
     # Обратные связи (Many-to-One), определены через back_populates в других моделях
     history = db.relationship("StatusHistory", back_populates="part", cascade="all, delete-orphan")
+    stage_progress = db.relationship("PartStageProgress", back_populates="part", cascade="all, delete-orphan")
+    stage_durations = db.relationship("StageDuration", back_populates="part", cascade="all, delete-orphan")
     notes = db.relationship("PartNote", back_populates="part", cascade="all, delete-orphan")
     responsible_history = db.relationship("ResponsibleHistory", back_populates="part", cascade="all, delete-orphan")
     # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
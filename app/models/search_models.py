@@ -0,0 +1,121 @@
+# app/models/search_models.py
+
+# Объекты полнотекстового поиска, которых нет в метаданных моделей:
+# на PostgreSQL — GIN-индексы по выражению (pg_trgm для деталей, tsvector для текстов),
+# на SQLite — теневые таблицы FTS5, поддерживаемые триггерами.
+# Создаются вместе с таблицами (create_all) и миграциями.
+
+from sqlalchemy import DDL, event
+
+from .part_models import Part
+from .history_models import AuditLog, PartNote, StatusHistory
+
+# Текст детали для поиска. Выражение должно совпадать с выражением индекса
+# ix_Parts_search_trgm, иначе PostgreSQL не сможет его использовать.
+PART_SEARCH_DOCUMENT_SQL = (
+    '("Parts".part_id || \' \' || "Parts".name || \' \' || "Parts".material '
+    '|| \' \' || "Parts".product_designation)'
+)
+PARTS_FTS_TABLE = 'PartsSearch'
+# Ключи строк FTS5 для деталей: rowid таблицы Parts (первичный ключ — строка) нестабилен
+# и может измениться при VACUUM, поэтому строки индекса адресуются собственным целым ключом
+PARTS_FTS_KEYS_TABLE = 'PartsSearchKeys'
+
+# Тексты для полнотекстового поиска: тип записи -> (модель, столбец с текстом)
+TEXT_SEARCH_SOURCES = {
+    'note': (PartNote, 'text'),
+    'status': (StatusHistory, 'comment'),
+    'audit': (AuditLog, 'details'),
+}
+# Конфигурация полнотекстового поиска PostgreSQL (русская морфология)
+TEXT_SEARCH_CONFIG = 'russian'
+
+
+def text_search_document_sql(model, column: str) -> str:
+    """
+    Выражение tsvector для текстового столбца. Должно совпадать с выражением
+    индекса ix_<таблица>_<столбец>_fts, иначе PostgreSQL не сможет его использовать.
+    """
+    return f'to_tsvector(\'{TEXT_SEARCH_CONFIG}\', COALESCE("{model.__tablename__}".{column}, \'\'))'
+
+
+def text_fts_table(model) -> str:
+    """Имя теневой таблицы FTS5 (SQLite) для текстов модели."""
+    return f'{model.__tablename__}Search'
+
+
+_POSTGRESQL_PART_SEARCH = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS "ix_Parts_search_trgm" ON "Parts" USING gin ({PART_SEARCH_DOCUMENT_SQL} gin_trgm_ops)',
+]
+
+# Поиск связывает строки FTS5 с деталями по столбцу part_id; триггеры находят строку
+# индекса по ключу из PartsSearchKeys, не просматривая всю теневую таблицу
+_PART_KEY = f'(SELECT id FROM "{PARTS_FTS_KEYS_TABLE}" WHERE part_id = {{}}.part_id)'
+_INSERT_PART_ROW = (
+    f'INSERT INTO "{PARTS_FTS_TABLE}" (rowid, part_id, name, material, product_designation) '
+    f'VALUES ({_PART_KEY.format("new")}, new.part_id, new.name, new.material, new.product_designation); '
+)
+_SQLITE_PART_SEARCH = [
+    f'CREATE TABLE IF NOT EXISTS "{PARTS_FTS_KEYS_TABLE}" (id INTEGER PRIMARY KEY, part_id VARCHAR NOT NULL UNIQUE)',
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{PARTS_FTS_TABLE}" USING fts5('
+    'part_id, name, material, product_designation, '
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f'CREATE TRIGGER IF NOT EXISTS "Parts_search_insert" AFTER INSERT ON "Parts" BEGIN '
+    f'INSERT INTO "{PARTS_FTS_KEYS_TABLE}" (part_id) VALUES (new.part_id); '
+    f'{_INSERT_PART_ROW}END',
+    f'CREATE TRIGGER IF NOT EXISTS "Parts_search_delete" AFTER DELETE ON "Parts" BEGIN '
+    f'DELETE FROM "{PARTS_FTS_TABLE}" WHERE rowid = {_PART_KEY.format("old")}; '
+    f'DELETE FROM "{PARTS_FTS_KEYS_TABLE}" WHERE part_id = old.part_id; END',
+    f'CREATE TRIGGER IF NOT EXISTS "Parts_search_update" '
+    'AFTER UPDATE OF part_id, name, material, product_designation ON "Parts" BEGIN '
+    f'DELETE FROM "{PARTS_FTS_TABLE}" WHERE rowid = {_PART_KEY.format("old")}; '
+    f'UPDATE "{PARTS_FTS_KEYS_TABLE}" SET part_id = new.part_id WHERE part_id = old.part_id; '
+    f'{_INSERT_PART_ROW}END',
+]
+
+
+
+
+def _postgresql_text_search(model, column):
+    return [
+        f'CREATE INDEX IF NOT EXISTS "ix_{model.__tablename__}_{column}_fts" ON "{model.__tablename__}" '
+        f'USING gin ({text_search_document_sql(model, column)})',
+    ]
+
+
+def _sqlite_text_search(model, column):
+    """Теневая таблица FTS5 с одним столбцом body; rowid строки равен id записи."""
+    table, fts = model.__tablename__, text_fts_table(model)
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5('
+        "body, tokenize = 'unicode61 remove_diacritics 2', prefix = '3')",
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_search_insert" AFTER INSERT ON "{table}" '
+        f'WHEN new.{column} IS NOT NULL BEGIN '
+        f'INSERT INTO "{fts}" (rowid, body) VALUES (new.id, new.{column}); END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_search_delete" AFTER DELETE ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = old.id; END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_search_update" AFTER UPDATE OF {column} ON "{table}" BEGIN '
+        f'DELETE FROM "{fts}" WHERE rowid = old.id; '
+        f'INSERT INTO "{fts}" (rowid, body) SELECT new.id, new.{column} WHERE new.{column} IS NOT NULL; END',
+    ]
+
+
+def _listen_ddl(table, statements, dialect):
+    for statement in statements:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect=dialect))
+
+
+def _drop_fts_with(table, fts):
+    # Триггеры удаляются вместе с таблицей, теневую таблицу удаляем явно
+    event.listen(table, 'after_drop', DDL(f'DROP TABLE IF EXISTS "{fts}"').execute_if(dialect='sqlite'))
+
+
+_listen_ddl(Part.__table__, _POSTGRESQL_PART_SEARCH, 'postgresql')
+_listen_ddl(Part.__table__, _SQLITE_PART_SEARCH, 'sqlite')
+_drop_fts_with(Part.__table__, PARTS_FTS_TABLE)
+_drop_fts_with(Part.__table__, PARTS_FTS_KEYS_TABLE)
+for _model, _column in TEXT_SEARCH_SOURCES.values():
+    _listen_ddl(_model.__table__, _postgresql_text_search(_model, _column), 'postgresql')
+    _listen_ddl(_model.__table__, _sqlite_text_search(_model, _column), 'sqlite')
+    _drop_fts_with(_model.__table__, text_fts_table(_model))
@@ -0,0 +1,308 @@
+# app/services/archive_service.py
+
+import gzip
+import json
+import os
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import select, text
+
+from app import db
+from app.models import AuditLog
+from app.services import cache_service
+
+# Поля записи журнала в архиве (по одной JSON-строке на запись)
+ARCHIVE_FIELDS = ('id', 'part_id', 'user_id', 'timestamp', 'action', 'details', 'category')
+# Запись журнала из архива: повторяет атрибуты AuditLog, которые читают шаблоны
+ArchivedAuditLog = namedtuple('ArchivedAuditLog', ARCHIVE_FIELDS + ('user',))
+MANIFEST_NAME = 'manifest.json'
+# Сколько строк читается из базы за один проход при архивации
+ARCHIVE_READ_BATCH_SIZE = 1000
+# Партиция AuditLogs для записей вне созданных месяцев (см. миграцию секционирования)
+DEFAULT_PARTITION = f"{AuditLog.__tablename__}_default"
+# Архив меняется только командой архивации, поэтому подсчеты по нему кэшируются надолго
+ARCHIVE_CACHE = 'audit_archive'
+ARCHIVE_COUNT_CACHE_TTL = 3600
+
+
+def _archive_folder() -> str:
+    """Папка архива журнала аудита (помесячные файлы и манифест)."""
+    return os.path.join(current_app.config['ARCHIVE_FOLDER'], AuditLog.__tablename__)
+
+
+def _month_start(value: datetime) -> datetime:
+    """Начало месяца, к которому относится момент времени (без часового пояса, как в AuditLogs)."""
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    """Начало месяца через count месяцев."""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _month_key(month: datetime) -> str:
+    """Ключ месяца в манифесте и имени файла архива ('YYYY-MM')."""
+    return month.strftime('%Y-%m')
+
+
+def partition_name(month: datetime) -> str:
+    """Имя партиции AuditLogs за месяц (совпадает с именами из миграции)."""
+    return f"{AuditLog.__tablename__}_p{month.strftime('%Y_%m')}"
+
+
+def load_manifest() -> dict:
+    """
+    Читает манифест архива: {'YYYY-MM': {'rows': число, 'categories': {категория: число}}}.
+    По манифесту без чтения файлов определяется граница архива и считаются записи.
+    """
+    path = os.path.join(_archive_folder(), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def _save_manifest(manifest: dict):
+    """Атомарно записывает манифест архива."""
+    path = os.path.join(_archive_folder(), MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as stream:
+        json.dump(manifest, stream, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def archive_horizon(manifest: dict = None):
+    """
+    Граница архива: все записи в архиве старше этого момента (начала месяца,
+    следующего за последним архивным). None, если архив пуст.
+    """
+    manifest = load_manifest() if manifest is None else manifest
+    if not manifest:
+        return None
+    return _add_months(datetime.strptime(max(manifest), '%Y-%m'), 1)
+
+
+def ensure_audit_partitions(months_ahead: int = 3) -> list:
+    """
+    Создает партиции AuditLogs с текущего месяца на months_ahead месяцев вперед,
+    а также для месяцев, записи которых уже попали в партицию по умолчанию
+    (если партиции не были созданы вовремя). Такие записи переносятся в новые партиции.
+    Действует только на PostgreSQL после миграции секционирования.
+    :return: Имена созданных партиций.
+    """
+    if db.engine.name != 'postgresql' or not _is_partitioned():
+        return []
+    created = []
+    month = _month_start(datetime.now(timezone.utc))
+    last_month = _add_months(month, months_ahead)
+    oldest_default = db.session.scalar(text(f'SELECT MIN("timestamp") FROM "{DEFAULT_PARTITION}"'))
+    if oldest_default is not None:
+        month = min(month, _month_start(oldest_default))
+    while month <= last_month:
+        name = partition_name(month)
+        if db.session.scalar(text("SELECT to_regclass(:name)"), {'name': f'"{name}"'}) is None:
+            _create_month_partition(month)
+            created.append(name)
+        month = _add_months(month, 1)
+    db.session.commit()
+    return created
+
+
+def _create_month_partition(month: datetime):
+    """
+    Создает партицию AuditLogs за месяц (в текущей транзакции). Если записи месяца
+    уже лежат в партиции по умолчанию, PostgreSQL не даст создать партицию:
+    партиция по умолчанию отсоединяется, записи месяца переносятся в новую партицию,
+    и она присоединяется обратно.
+    """
+    table = AuditLog.__tablename__
+    bounds = {'start': month, 'end': _add_months(month, 1)}
+    in_month = '"timestamp" >= :start AND "timestamp" < :end'
+    create = (f'CREATE TABLE "{partition_name(month)}" PARTITION OF "{table}" '
+              f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')")
+    if not db.session.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_month})'), bounds):
+        db.session.execute(text(create))
+        return
+
+    columns = ', '.join(f'"{field}"' for field in ARCHIVE_FIELDS)
+    db.session.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{DEFAULT_PARTITION}"'))
+    db.session.execute(text(create))
+    db.session.execute(text(
+        f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{DEFAULT_PARTITION}" WHERE {in_month}'
+    ), bounds)
+    db.session.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_month}'), bounds)
+    db.session.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT'))
+
+
+def _is_partitioned() -> bool:
+    """Проверяет, что таблица AuditLogs секционирована (PostgreSQL)."""
+    return bool(db.session.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name))"
+    ), {'name': f'"{AuditLog.__tablename__}"'}))
+
+
+def _serialize(row) -> str:
+    """JSON-строка архива для записи журнала."""
+    values = dict(zip(ARCHIVE_FIELDS, row))
+    values['timestamp'] = values['timestamp'].isoformat() if values['timestamp'] else None
+    return json.dumps(values, ensure_ascii=False)
+
+
+def _archive_month(month: datetime, manifest: dict) -> int:
+    """
+    Переносит записи журнала за месяц в сжатый JSONL-файл и удаляет их из базы.
+    Файл (вместе с ранее архивированными записями месяца) записывается и переименовывается
+    до удаления из базы, поэтому сбой между шагами приводит лишь к повторной архивации.
+    :return: Количество перенесенных записей.
+    """
+    next_month = _add_months(month, 1)
+    path = os.path.join(_archive_folder(), f"{_month_key(month)}.jsonl.gz")
+    columns = [getattr(AuditLog, field) for field in ARCHIVE_FIELDS]
+    query = select(*columns).where(AuditLog.timestamp >= month, AuditLog.timestamp < next_month)\
+        .order_by(AuditLog.timestamp, AuditLog.id)
+
+    moved, archived_ids, categories = 0, set(), Counter()
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as stream:
+        for row in db.session.execute(query.execution_options(yield_per=ARCHIVE_READ_BATCH_SIZE)):
+            stream.write(_serialize(row) + '\n')
+            archived_ids.add(row.id)
+            categories[row.category] += 1
+            moved += 1
+        # Записи, перенесенные в этот месяц ранее (повторный запуск после сбоя)
+        for entry in _read_month_file(path):
+            if entry['id'] not in archived_ids:
+                stream.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                categories[entry['category']] += 1
+    if categories:
+        os.replace(path + '.tmp', path)
+        manifest[_month_key(month)] = {'rows': sum(categories.values()), 'categories': dict(categories)}
+        _save_manifest(manifest)
+    else:
+        os.remove(path + '.tmp')
+
+    # Закрытая партиция отсоединяется и удаляется целиком, без построчного DELETE
+    name = partition_name(month)
+    if db.engine.name == 'postgresql' and db.session.scalar(text("SELECT to_regclass(:name)"), {'name': f'"{name}"'}):
+        db.session.execute(text(f'ALTER TABLE "{AuditLog.__tablename__}" DETACH PARTITION "{name}"'))
+        db.session.execute(text(f'DROP TABLE "{name}"'))
+    else:
+        AuditLog.query.filter(AuditLog.timestamp >= month, AuditLog.timestamp < next_month)\
+            .delete(synchronize_session=False)
+    db.session.commit()
+    return moved
+
+
+def archive_audit_logs(keep_months: int) -> dict:
+    """
+    Переносит в архив журнал аудита за закрытые месяцы старше последних keep_months
+    (текущий месяц всегда остается в базе).
+    :param keep_months: Сколько последних месяцев хранить в базе (не меньше 1).
+    :return: Словарь {'YYYY-MM': количество перенесенных записей}.
+    """
+    if keep_months < 1:
+        raise ValueError("В базе должен оставаться хотя бы текущий месяц.")
+    os.makedirs(_archive_folder(), exist_ok=True)
+    cutoff = _add_months(_month_start(datetime.now(timezone.utc)), 1 - keep_months)
+    oldest = db.session.scalar(select(AuditLog.timestamp).where(AuditLog.timestamp < cutoff)
+                               .order_by(AuditLog.timestamp).limit(1))
+    result = {}
+    if oldest is None:
+        return result
+
+    manifest = load_manifest()
+    month = _month_start(oldest)
+    while month < cutoff:
+        moved = _archive_month(month, manifest)
+        if moved:
+            result[_month_key(month)] = moved
+        month = _add_months(month, 1)
+    cache_service.invalidate(ARCHIVE_CACHE)
+    return result
+
+
+def _read_month_file(path):
+    """Построчно читает архивный файл месяца (словари полей записи)."""
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+def _months_in_range(manifest, date_from=None, date_to=None, newest_first=False):
+    """Архивные месяцы, пересекающиеся с периодом [date_from, date_to), по возрастанию или от новых к старым."""
+    for key in sorted(manifest, reverse=newest_first):
+        month = datetime.strptime(key, '%Y-%m')
+        if date_from and _add_months(month, 1) <= date_from:
+            continue
+        if date_to and month >= date_to:
+            continue
+        yield month
+
+
+def _matches(entry, categories, date_from, date_to, user_id, part_id):
+    """Проверяет архивную запись по фильтрам журнала."""
+    return (entry['category'] in categories
+            and (not date_from or entry['timestamp'] >= date_from)
+            and (not date_to or entry['timestamp'] < date_to)
+            and (not user_id or entry['user_id'] == user_id)
+            and (not part_id or entry['part_id'] == part_id))
+
+
+def iter_archived_audit_months(categories, position=None, newer=False,
+                               date_from=None, date_to=None, user_id=None, part_id=None):
+    """
+    Выдает архивные записи журнала, подходящие под фильтры, помесячно в порядке
+    обхода страниц: от месяца курсора к старым месяцам (при newer — к новым).
+    Месяцы по другую сторону курсора и вне периода не читаются, поэтому
+    вызывающий может остановиться, как только наберет страницу.
+    :param categories: Категории записей.
+    :param position: Курсор (timestamp, id) или None; записи по другую сторону отбрасываются.
+    :param newer: True — записи новее курсора, False — старее.
+    :param date_from: Начало периода (включительно) или None.
+    :param date_to: Конец периода (не включая) или None.
+    :return: Генератор списков словарей полей записи (timestamp — datetime), по списку на месяц.
+    """
+    manifest = load_manifest()
+    cursor_month = _month_start(position[0]) if position else None
+    for month in _months_in_range(manifest, date_from, date_to, newest_first=not newer):
+        if cursor_month and (month < cursor_month if newer else month > cursor_month):
+            continue
+        entries = _iter_month(manifest, month, categories, date_from, date_to, user_id, part_id)
+        if position:
+            entries = (entry for entry in entries
+                       if ((entry['timestamp'], entry['id']) > position if newer
+                           else (entry['timestamp'], entry['id']) < position))
+        yield list(entries)
+
+
+def _iter_month(manifest, month, categories, date_from, date_to, user_id, part_id):
+    """Записи одного архивного месяца, подходящие под фильтры."""
+    if not any(manifest[_month_key(month)]['categories'].get(category) for category in categories):
+        return
+    for entry in _read_month_file(os.path.join(_archive_folder(), f"{_month_key(month)}.jsonl.gz")):
+        entry['timestamp'] = datetime.fromisoformat(entry['timestamp']) if entry['timestamp'] else datetime.min
+        if _matches(entry, categories, date_from, date_to, user_id, part_id):
+            yield entry
+
+
+def count_archived_audit_logs(categories, date_from=None, date_to=None, user_id=None, part_id=None) -> int:
+    """
+    Количество архивных записей журнала. Месяцы, целиком попадающие в период,
+    при отсутствии фильтров по пользователю и детали считаются по манифесту,
+    остальные — чтением файлов; результат кэшируется до следующей архивации.
+    """
+    def compute():
+        manifest = load_manifest()
+        total = 0
+        for month in _months_in_range(manifest, date_from, date_to):
+            whole_month = (not date_from or month >= date_from) and (not date_to or _add_months(month, 1) <= date_to)
+            if whole_month and not user_id and not part_id:
+                total += sum(manifest[_month_key(month)]['categories'].get(category, 0) for category in categories)
+            else:
+                total += sum(1 for _ in _iter_month(manifest, month, categories, date_from, date_to, user_id, part_id))
+        return total
+
+    key = (_archive_folder(), tuple(categories), date_from, date_to, user_id, part_id)
+    return cache_service.get_or_compute(ARCHIVE_CACHE, compute, key=key, ttl=ARCHIVE_COUNT_CACHE_TTL)
@@ -0,0 +1,139 @@
+# app/services/assembly_progress_service.py
+
+from collections import defaultdict
+
+from app import db
+from app.models import Part, AssemblyComponent
+
+
+# Ограничение числа уровней распространения: защищает от циклических связей в составе
+MAX_PROPAGATION_LEVELS = 50
+IN_CLAUSE_CHUNK_SIZE = 1000
+
+
+def compute_buildable(quantity_total, quantity_completed, has_route, child_limits) -> int:
+    """
+    Вычисляет, сколько полностью готовых единиц узла можно собрать сейчас.
+    Собственные этапы узла ограничивают результат его выполненным количеством,
+    каждая связь — количеством готовых дочерних узлов на одну сборку.
+    Дочерний узел, партия которого меньше количества в связи (при создании и импорте
+    узлы заводятся с quantity_total=1, а количество хранится в связи), учитывается
+    одной партией на всю связь: готовая партия покрывает связь целиком, неготовая — ничего.
+    :param quantity_total: Количество в партии узла (верхняя граница).
+    :param quantity_completed: Выполненное количество по маршруту узла.
+    :param has_route: Есть ли у узла собственный маршрут.
+    :param child_limits: Список кортежей (готово дочерних узлов, количество в связи,
+                         количество в партии дочернего узла); последний элемент можно опустить,
+                         тогда дочерние узлы считаются поштучно.
+    :return: Количество готовых к сборке единиц.
+    """
+    limits = [quantity_total or 0]
+    # Сборка без маршрута (например, изделие-контейнер) ограничена только составом
+    if has_route or not child_limits:
+        limits.append(quantity_completed or 0)
+    for child_buildable, per_assembly, *child_total in child_limits:
+        per_assembly = max(per_assembly or 1, 1)
+        child_total = child_total[0] if child_total else None
+        if child_total is not None and child_total < per_assembly:
+            limits.append((quantity_total or 0) if (child_buildable or 0) >= max(child_total, 1) else 0)
+        else:
+            limits.append((child_buildable or 0) // per_assembly)
+    return max(0, min(limits))
+
+
+def _chunks(items, size=IN_CLAUSE_CHUNK_SIZE):
+    """Разбивает список на части для IN-выражений."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _load_level(part_ids):
+    """Загружает детали уровня и готовность их прямых дочерних узлов (два запроса на пакет)."""
+    parts, child_limits = [], defaultdict(list)
+    for chunk in _chunks(part_ids):
+        parts.extend(Part.query.filter(Part.part_id.in_(chunk)).all())
+        rows = db.session.query(
+            AssemblyComponent.parent_id, AssemblyComponent.quantity, Part.quantity_buildable, Part.quantity_total
+        ).join(Part, Part.part_id == AssemblyComponent.child_id).filter(AssemblyComponent.parent_id.in_(chunk))
+        for row in rows:
+            child_limits[row.parent_id].append((row.quantity_buildable, row.quantity, row.quantity_total))
+    return parts, child_limits
+
+
+def _parents_of(part_ids) -> list:
+    """Возвращает ID сборок, в которые входят указанные детали."""
+    parent_ids = set()
+    for chunk in _chunks(part_ids):
+        parent_ids.update(row.parent_id for row in db.session.query(AssemblyComponent.parent_id).filter(
+            AssemblyComponent.child_id.in_(chunk)
+        ))
+    return sorted(parent_ids)
+
+
+def update_assembly_progress(part_ids) -> int:
+    """
+    Инкрементально пересчитывает Part.quantity_buildable для указанных деталей
+    и поднимается вверх по сборкам только пока значение меняется.
+    Вызывается в транзакции, изменившей прогресс или состав, до ее фиксации.
+    :param part_ids: ID деталей, у которых изменился прогресс или состав.
+    :return: Количество деталей, у которых изменилась готовность.
+    """
+    level = sorted(set(part_ids))
+    changed_total = 0
+    for _ in range(MAX_PROPAGATION_LEVELS):
+        if not level:
+            break
+        parts, child_limits = _load_level(level)
+        changed = []
+        for part in parts:
+            buildable = compute_buildable(
+                part.quantity_total, part.quantity_completed,
+                part.route_template_id is not None, child_limits.get(part.part_id, [])
+            )
+            if part.quantity_buildable != buildable:
+                part.quantity_buildable = buildable
+                changed.append(part.part_id)
+        if not changed:
+            break
+        changed_total += len(changed)
+        db.session.flush()
+        level = _parents_of(changed)
+    return changed_total
+
+
+def rebuild_assembly_progress() -> int:
+    """
+    Полностью пересчитывает готовность всех деталей снизу вверх
+    (после массовых изменений или для восстановления).
+    :return: Количество деталей, у которых изменилась готовность.
+    """
+    links = defaultdict(list)
+    for row in db.session.query(AssemblyComponent.parent_id, AssemblyComponent.child_id, AssemblyComponent.quantity):
+        links[row.parent_id].append((row.child_id, row.quantity))
+    parts = {part.part_id: part for part in Part.query.all()}
+
+    buildable = {}
+    changed = 0
+
+    def resolve(part_id, visiting):
+        if part_id in buildable:
+            return buildable[part_id]
+        part = parts[part_id]
+        visiting.add(part_id)
+        child_limits = [
+            (resolve(child_id, visiting) if child_id not in visiting else 0, quantity, parts[child_id].quantity_total)
+            for child_id, quantity in links.get(part_id, []) if child_id in parts
+        ]
+        visiting.discard(part_id)
+        buildable[part_id] = compute_buildable(
+            part.quantity_total, part.quantity_completed, part.route_template_id is not None, child_limits
+        )
+        return buildable[part_id]
+
+    for part_id, part in parts.items():
+        # Обход итеративен по деталям, рекурсивен только по глубине состава
+        value = resolve(part_id, set())
+        if part.quantity_buildable != value:
+            part.quantity_buildable = value
+            changed += 1
+    return changed
@@ -0,0 +1,237 @@
+# app/services/audit_service.py
+
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app import db, socketio
+from app.models import AuditLog
+
+# Режимы записи журнала (AUDIT_LOG_MODE):
+# 'sync' — запись добавляется в транзакцию вызывающего кода (как раньше);
+# 'async' — после фиксации транзакции запись уходит в буфер и вставляется пакетом в фоне.
+AUDIT_MODE_SYNC = 'sync'
+AUDIT_MODE_ASYNC = 'async'
+# Ключ в Session.info, под которым копятся записи до фиксации транзакции
+_PENDING_KEY = 'audit_pending'
+
+_writer = None
+
+
+class AuditWriter:
+    """
+    Ограниченный буфер записей журнала аудита. Записи накапливаются в течение
+    короткого интервала (или до размера пакета) и вставляются одним многострочным
+    INSERT в фоновой задаче, поэтому запрос не ждет отдельной вставки в журнал.
+    """
+
+    def __init__(self, write_batch, max_size: int = 10000, batch_size: int = 500,
+                 interval_ms: int = 500, start_task=None, sleep=None,
+                 max_attempts: int = 5, on_drop=None):
+        """
+        :param write_batch: Функция вставки write_batch(rows), rows — список словарей полей AuditLog.
+        :param max_size: Максимальное количество записей в буфере.
+        :param batch_size: Максимальное количество записей в одном INSERT.
+        :param interval_ms: Интервал накопления перед вставкой в миллисекундах.
+        :param start_task: Функция запуска фоновой задачи (socketio.start_background_task);
+                           без нее записи вставляются только при явном вызове flush().
+        :param sleep: Функция ожидания, совместимая с асинхронным режимом (socketio.sleep).
+        :param max_attempts: Сколько раз пытаться вставить запись, прежде чем отбросить ее.
+        :param on_drop: Функция on_drop(row, error), вызываемая для отброшенной записи.
+        """
+        self.write_batch = write_batch
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self.start_task = start_task
+        self.sleep = sleep
+        self.max_attempts = max_attempts
+        self.on_drop = on_drop
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_scheduled = False
+
+    def add(self, rows) -> bool:
+        """
+        Ставит записи в буфер.
+        :param rows: Список словарей полей AuditLog.
+        :return: False, если в буфере нет места (записи не приняты).
+        """
+        with self._lock:
+            if len(self._queue) + len(rows) > self.max_size:
+                return False
+            # Элемент буфера — [запись, число неудачных попыток вставки]
+            self._queue.extend([row, 0] for row in rows)
+            schedule = self.start_task is not None and not self._flush_scheduled
+            self._flush_scheduled = self._flush_scheduled or schedule
+
+        if schedule:
+            self.start_task(self._flush_later)
+        return True
+
+    def _flush_later(self):
+        """Фоновая задача: ждет окончания интервала и вставляет накопленное."""
+        self.sleep(self.interval_ms / 1000)
+        with self._lock:
+            self._flush_scheduled = False
+        try:
+            self.flush()
+        except Exception:
+            # Ошибка уже записана в лог; пакет остался в буфере до следующей отправки
+            pass
+
+    def flush(self) -> int:
+        """
+        Вставляет все накопленные записи пакетами не больше batch_size.
+        Если пакет не вставился, его записи вставляются по одной: так одна
+        некорректная запись не задерживает остальные. Не вставленные записи
+        возвращаются в начало буфера, а после max_attempts попыток отбрасываются
+        (через on_drop). Если не вставилась ни одна запись пакета (база недоступна),
+        отправка прерывается с исключением до следующего раза.
+        :return: Количество вставленных записей.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return written
+                try:
+                    self.write_batch([row for row, _ in batch])
+                    written += len(batch)
+                    continue
+                except Exception as e:
+                    error = e
+                failed = []
+                for item in batch:
+                    if len(batch) > 1:
+                        try:
+                            self.write_batch([item[0]])
+                            written += 1
+                            continue
+                        except Exception as e:
+                            error = e
+                    item[1] += 1
+                    if item[1] < self.max_attempts:
+                        failed.append(item)
+                    elif self.on_drop:
+                        self.on_drop(item[0], error)
+                with self._lock:
+                    self._queue.extendleft(reversed(failed))
+                if failed and len(failed) == len(batch):
+                    raise error
+
+    def __len__(self):
+        return len(self._queue)
+
+
+def _write_batch_in_context(app, rows):
+    """Вставляет пакет записей журнала в собственном контексте приложения."""
+    with app.app_context():
+        try:
+            db.session.execute(insert(AuditLog), rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Audit log batch of {len(rows)} entries failed: {e}", exc_info=True)
+            raise
+
+
+def _log_dropped_entry(app, row, error):
+    """Записывает в лог приложения запись журнала, которую не удалось вставить."""
+    app.logger.error(f"Audit log entry dropped after repeated failures: {row!r} ({error})")
+
+
+def _flush_at_exit():
+    """Дописывает буфер при остановке процесса."""
+    try:
+        _writer.flush()
+    except Exception:
+        pass
+
+
+def _get_writer() -> AuditWriter:
+    """Лениво создает общий для процесса буфер журнала аудита."""
+    global _writer
+    if _writer is None:
+        app = current_app._get_current_object()
+        _writer = AuditWriter(
+            lambda rows: _write_batch_in_context(app, rows),
+            max_size=app.config.get('AUDIT_QUEUE_SIZE', 10000),
+            batch_size=app.config.get('AUDIT_BATCH_SIZE', 500),
+            interval_ms=app.config.get('AUDIT_FLUSH_INTERVAL_MS', 500),
+            start_task=socketio.start_background_task,
+            sleep=socketio.sleep,
+            max_attempts=app.config.get('AUDIT_MAX_ATTEMPTS', 5),
+            on_drop=lambda row, error: _log_dropped_entry(app, row, error)
+        )
+        atexit.register(_flush_at_exit)
+    return _writer
+
+
+def log_action(action: str, details: str = None, category: str = 'general',
+               user_id: int = None, part_id: str = None, durable: bool = False):
+    """
+    Записывает действие в журнал аудита.
+    В синхронном режиме или для критичных действий (durable=True) запись добавляется
+    в текущую транзакцию и фиксируется вместе с изменениями вызывающего кода.
+    В асинхронном режиме запись попадает в буфер только после фиксации транзакции
+    (при откате отбрасывается) и вставляется в фоне пакетом с другими записями.
+    Время действия фиксируется в момент вызова.
+    :param action: Краткое название действия.
+    :param details: Подробности.
+    :param category: Категория журнала ('part', 'auth', 'management').
+    :param user_id: ID пользователя, выполнившего действие.
+    :param part_id: ID детали, к которой относится действие.
+    :param durable: True — записать синхронно независимо от режима.
+    """
+    entry = {
+        'part_id': part_id,
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'category': category,
+        'timestamp': datetime.now(timezone.utc),
+    }
+    if durable or current_app.config.get('AUDIT_LOG_MODE', AUDIT_MODE_SYNC) != AUDIT_MODE_ASYNC:
+        db.session.add(AuditLog(**entry))
+        return
+    session = db.session()
+    if not session.in_transaction():
+        # Записи привязываются к транзакции, чтобы ее откат их отбросил
+        session.begin()
+    session.info.setdefault(_PENDING_KEY, []).append(entry)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_pending(session):
+    """
+    Передает записи зафиксированной транзакции в буфер.
+    Транзакция к этому моменту уже зафиксирована, поэтому ошибки журнала
+    только записываются в лог и не доходят до вызывающего commit().
+    """
+    rows = session.info.pop(_PENDING_KEY, None)
+    if not rows:
+        return
+    writer = _get_writer()
+    try:
+        if not writer.add(rows):
+            # Буфер переполнен: вставляем накопленное в текущем потоке, не теряя записей
+            writer.flush()
+            if not writer.add(rows):
+                writer.write_batch(rows)
+    except Exception as e:
+        current_app.logger.error(f"Audit log entries were not saved: {rows!r} ({e})", exc_info=True)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    """Отбрасывает записи отмененной транзакции (откат точки сохранения их не затрагивает)."""
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
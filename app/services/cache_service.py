@@ -0,0 +1,110 @@
+# app/services/cache_service.py
+
+import time
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+
+# Размер кэша в памяти процесса по умолчанию (записей всех пространств имен)
+DEFAULT_MAX_ITEMS = 256
+# Префикс ключей счетчиков поколений в общем хранилище (Redis)
+SHARED_GENERATION_PREFIX = 'check-control:cache-generation:'
+
+_entries = OrderedDict()
+_generations = {}
+_lock = threading.Lock()
+_shared_client = None
+
+
+def _get_shared_client():
+    """
+    Лениво создает клиент общего хранилища счетчиков поколений (CACHE_REDIS_URL).
+    Без него кэш и его сброс действуют только в пределах процесса.
+    """
+    global _shared_client
+    url = current_app.config.get('CACHE_REDIS_URL')
+    if not url:
+        return None
+    if _shared_client is None:
+        import redis
+        _shared_client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _shared_client
+
+
+def _current_generation(namespace: str):
+    """
+    Возвращает текущее поколение пространства имен или None, если общее хранилище недоступно.
+    Записи, сохраненные с другим поколением, считаются устаревшими.
+    """
+    client = _get_shared_client()
+    if client is not None:
+        try:
+            return int(client.get(SHARED_GENERATION_PREFIX + namespace) or 0)
+        except Exception as e:
+            current_app.logger.warning(f"Shared cache backend unavailable: {e}")
+            return None
+    with _lock:
+        return _generations.get(namespace, 0)
+
+
+def get_or_compute(namespace: str, compute, key=None, ttl: int = 60):
+    """
+    Возвращает значение из кэша в памяти или вычисляет и сохраняет его.
+    Значение действительно, пока не истек TTL и не было вызова invalidate(namespace).
+    Возвращаемые объекты общие для всех запросов процесса — их нельзя изменять.
+    :param namespace: Пространство имен (сбрасывается целиком).
+    :param compute: Функция без аргументов, вычисляющая значение.
+    :param key: Ключ внутри пространства имен (например, параметры запроса).
+    :param ttl: Время жизни записи в секундах; 0 — кэш отключен.
+    """
+    if not ttl or ttl <= 0:
+        return compute()
+    # Поколение читается до вычисления: если данные изменятся во время запроса,
+    # запись сохранится со старым поколением и будет пересчитана при следующем обращении
+    generation = _current_generation(namespace)
+    if generation is None:
+        return compute()
+
+    cache_key = (namespace, key)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(cache_key)
+        if entry and entry[0] == generation and entry[1] > now:
+            _entries.move_to_end(cache_key)
+            return entry[2]
+
+    value = compute()
+
+    limit = current_app.config.get('CACHE_MAX_ITEMS', DEFAULT_MAX_ITEMS)
+    with _lock:
+        _entries[cache_key] = (generation, now + ttl, value)
+        _entries.move_to_end(cache_key)
+        while len(_entries) > limit:
+            _entries.popitem(last=False)
+    return value
+
+
+def invalidate(namespace: str):
+    """
+    Сбрасывает все записи пространства имен в этом процессе
+    и (при наличии общего хранилища) во всех остальных воркерах.
+    Вызывается после фиксации транзакции, изменившей исходные данные.
+    """
+    with _lock:
+        _generations[namespace] = _generations.get(namespace, 0) + 1
+        for cache_key in [k for k in _entries if k[0] == namespace]:
+            del _entries[cache_key]
+
+    client = _get_shared_client()
+    if client is not None:
+        try:
+            client.incr(SHARED_GENERATION_PREFIX + namespace)
+        except Exception as e:
+            current_app.logger.warning(f"Shared cache invalidation failed for '{namespace}': {e}")
+
+
+def clear():
+    """Очищает кэш в памяти процесса."""
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,51 @@
+# app/services/dashboard_service.py
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models import Part
+from app.services import cache_service
+
+
+# Пространство имен кэша сводки по изделиям
+PRODUCT_SUMMARY_CACHE = 'dashboard:product_summary'
+
+
+def _query_product_summary() -> list:
+    """Агрегирует прогресс по каждому изделию (только для верхнеуровневых деталей)."""
+    rows = db.session.query(
+        Part.product_designation,
+        func.count(Part.part_id).label('total_parts'),
+        func.sum(Part.quantity_total).label('total_quantity'),
+        func.sum(Part.quantity_completed).label('completed_quantity'),
+        func.sum(Part.quantity_buildable).label('buildable_quantity')
+    ).filter(Part.is_top_level).group_by(Part.product_designation).all()
+
+    return [{
+        'product_designation': row.product_designation,
+        'total_parts': row.total_parts,
+        'total_possible_stages': row.total_quantity or 0,
+        'total_completed_stages': row.completed_quantity or 0,
+        # Готовые изделия с учетом состава (assembly_progress_service)
+        'total_ready': row.buildable_quantity or 0
+    } for row in rows]
+
+
+def get_product_summary() -> list:
+    """
+    Возвращает сводку прогресса по изделиям для панели мониторинга.
+    Результат кэшируется и пересчитывается только после изменения деталей
+    (см. invalidate_product_summary) или по истечении DASHBOARD_CACHE_TTL.
+    :return: Список словарей с данными по изделиям (только для чтения).
+    """
+    return cache_service.get_or_compute(
+        PRODUCT_SUMMARY_CACHE,
+        _query_product_summary,
+        ttl=current_app.config.get('DASHBOARD_CACHE_TTL', 0)
+    )
+
+
+def invalidate_product_summary():
+    """Сбрасывает кэш сводки по изделиям. Вызывается после фиксации изменений деталей."""
+    cache_service.invalidate(PRODUCT_SUMMARY_CACHE)
@@ -0,0 +1,189 @@
+# app/services/hierarchy_service.py
+
+from sqlalchemy import select, literal, cast, null, union_all, String, Text
+
+from app import db
+from app.models import Part, AssemblyComponent
+
+
+# Ограничение глубины обхода: защищает от циклических связей в составе
+MAX_BOM_DEPTH = 50
+# Разделитель ID деталей в пути узла (ID могут содержать '/')
+PATH_SEPARATOR = '\x1f'
+# Сколько цепочек "входит в состав" показывать для одной детали
+MAX_ANCESTOR_PATHS = 20
+
+
+class BomNode:
+    """Узел дерева состава изделия с количествами и прогрессом, свернутыми по поддереву."""
+
+    __slots__ = ('part_id', 'name', 'material', 'current_status', 'quantity', 'required_quantity',
+                 'quantity_total', 'quantity_completed', 'quantity_scrapped', 'quantity_buildable', 'depth', 'children',
+                 'subtree_total', 'subtree_completed')
+
+    def __init__(self, row, quantity=1, required_quantity=1):
+        """
+        :param row: Строка результата запроса с полями детали.
+        :param quantity: Количество на одну родительскую сборку (из AssemblyComponent).
+        :param required_quantity: Количество на одно изделие-корень (произведение по пути).
+        """
+        self.part_id = row.part_id
+        self.name = row.name
+        self.material = row.material
+        self.current_status = row.current_status
+        self.quantity = quantity
+        self.required_quantity = required_quantity
+        self.quantity_total = row.quantity_total or 0
+        self.quantity_completed = row.quantity_completed or 0
+        self.quantity_scrapped = row.quantity_scrapped or 0
+        self.quantity_buildable = row.quantity_buildable or 0
+        self.depth = row.depth
+        self.children = []
+        self.subtree_total = 0
+        self.subtree_completed = 0
+
+    @property
+    def progress_percent(self) -> int:
+        """Прогресс самой детали в процентах."""
+        if not self.quantity_total:
+            return 0
+        return int(min(self.quantity_completed, self.quantity_total) * 100 / self.quantity_total)
+
+    @property
+    def rolled_up_percent(self) -> int:
+        """Прогресс узла вместе со всеми вложенными деталями в процентах."""
+        if not self.subtree_total:
+            return 0
+        return int(self.subtree_completed * 100 / self.subtree_total)
+
+    def iter_nodes(self):
+        """Обходит поддерево в глубину, начиная с этого узла."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def _part_columns():
+    """Колонки детали, возвращаемые для каждого узла дерева."""
+    return (Part.part_id, Part.name, Part.material, Part.current_status,
+            Part.quantity_total, Part.quantity_completed, Part.quantity_scrapped, Part.quantity_buildable)
+
+
+def _hierarchy_query(part_id: str, max_depth: int):
+    """
+    Строит один запрос с двумя рекурсивными CTE: состав детали (вниз по связям)
+    и сборки, в которые она входит (вверх по связям).
+    Каждая строка — узел с полями детали, ID связанной детали и количеством по связи.
+    """
+    components = AssemblyComponent.__table__
+
+    # Вниз: корень и все вложенные узлы; путь однозначно определяет узел дерева
+    down = select(
+        Part.part_id.label('node_id'),
+        cast(null(), String).label('linked_id'),
+        literal(1).label('quantity'),
+        literal(0).label('depth'),
+        cast(Part.part_id, Text).label('path'),
+    ).where(Part.part_id == part_id).cte('bom_down', recursive=True)
+    down = down.union_all(
+        select(
+            components.c.child_id,
+            components.c.parent_id,
+            components.c.quantity,
+            down.c.depth + 1,
+            down.c.path + PATH_SEPARATOR + components.c.child_id,
+        ).join(down, components.c.parent_id == down.c.node_id).where(down.c.depth < max_depth)
+    )
+
+    # Вверх: связи "родитель -> деталь" для всех предков
+    up = select(
+        components.c.parent_id.label('node_id'),
+        components.c.child_id.label('linked_id'),
+        components.c.quantity,
+        literal(1).label('depth'),
+    ).where(components.c.child_id == part_id).cte('bom_up', recursive=True)
+    up = up.union_all(
+        select(
+            components.c.parent_id,
+            components.c.child_id,
+            components.c.quantity,
+            up.c.depth + 1,
+        ).join(up, components.c.child_id == up.c.node_id).where(up.c.depth < max_depth)
+    )
+
+    return union_all(
+        select(literal('down').label('direction'), down.c.linked_id, down.c.quantity, down.c.depth,
+               down.c.path, *_part_columns()).join(Part, Part.part_id == down.c.node_id),
+        select(literal('up').label('direction'), up.c.linked_id, up.c.quantity, up.c.depth,
+               cast(null(), Text).label('path'), *_part_columns()).join(Part, Part.part_id == up.c.node_id),
+    )
+
+
+def _build_tree(rows):
+    """Собирает дерево BomNode из строк обхода вниз и сворачивает итоги по поддеревьям."""
+    nodes = {}
+    root = None
+    for row in sorted(rows, key=lambda r: (r.depth, r.path)):
+        if row.depth == 0:
+            root = nodes[row.path] = BomNode(row)
+            continue
+        parent = nodes.get(row.path.rsplit(PATH_SEPARATOR, 1)[0])
+        if parent is None:
+            continue
+        node = BomNode(row, row.quantity, parent.required_quantity * row.quantity)
+        parent.children.append(node)
+        nodes[row.path] = node
+
+    if root is None:
+        return None
+    for node in nodes.values():
+        node.children.sort(key=lambda child: child.part_id)
+    # Узлы отсортированы по глубине, поэтому обход с конца сворачивает итоги снизу вверх
+    for node in reversed(list(nodes.values())):
+        node.subtree_total += node.quantity_total
+        node.subtree_completed += min(node.quantity_completed, node.quantity_total)
+        for child in node.children:
+            node.subtree_total += child.subtree_total
+            node.subtree_completed += child.subtree_completed
+    return root
+
+
+def _build_ancestor_paths(part_id, rows, limit=MAX_ANCESTOR_PATHS):
+    """
+    Строит цепочки сборок от верхнеуровневой детали до прямого родителя.
+    Деталь может входить в несколько сборок, поэтому цепочек может быть несколько.
+    """
+    parents = {}
+    info = {}
+    for row in rows:
+        parents.setdefault(row.linked_id, []).append(row.part_id)
+        info[row.part_id] = {'part_id': row.part_id, 'name': row.name}
+
+    paths = []
+    stack = [(part_id, [])]
+    while stack and len(paths) < limit:
+        current, chain = stack.pop()
+        current_parents = parents.get(current, [])
+        if not current_parents and chain:
+            paths.append([info[ancestor_id] for ancestor_id in reversed(chain)])
+        for parent_id in sorted(set(current_parents), reverse=True):
+            if parent_id not in chain and len(chain) < MAX_BOM_DEPTH:
+                stack.append((parent_id, chain + [parent_id]))
+    return paths
+
+
+def get_part_hierarchy(part_id: str, max_depth: int = MAX_BOM_DEPTH) -> dict:
+    """
+    Загружает полный состав детали и сборки, в которые она входит, одним запросом
+    (рекурсивные CTE, работают в PostgreSQL и SQLite).
+    :param part_id: ID детали.
+    :param max_depth: Максимальная глубина обхода.
+    :return: Словарь {'tree': BomNode или None, 'ancestor_paths': список цепочек предков}.
+    """
+    rows = db.session.execute(_hierarchy_query(part_id, max_depth)).all()
+    return {
+        'tree': _build_tree([row for row in rows if row.direction == 'down']),
+        'ancestor_paths': _build_ancestor_paths(part_id, [row for row in rows if row.direction == 'up']),
+    }
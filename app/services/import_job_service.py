@@ -0,0 +1,290 @@
+# app/services/import_job_service.py
+
+import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from eventlet import patcher, tpool
+from flask import current_app
+from sqlalchemy import select, update, func
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from app import db, socketio
+from app.models import ImportJob, ImportJobStatus
+from app.services import part_import_export_service as pies
+from .part_utils_service import _send_websocket_notification
+
+
+# Количество фоновых потоков импорта в процессе по умолчанию.
+# Сами импорты выполняются строго по одному во всех процессах (см. _import_lock).
+DEFAULT_IMPORT_WORKERS = 1
+# Сколько последних задач показывать на странице "Работа с данными"
+RECENT_JOBS_LIMIT = 10
+# Ключ advisory-блокировки PostgreSQL, которой воркеры делят очередь импорта
+IMPORT_LOCK_ID = 7_302_001
+# Как часто (в секундах) ожидающий процесс проверяет, свободна ли очередь
+IMPORT_QUEUE_POLL_SECONDS = 2
+INTERRUPTED_JOB_ERROR = "Импорт прерван: обработчик был остановлен до завершения задачи."
+
+_executor = None
+_executor_lock = threading.Lock()
+# На SQLite работает один процесс: блокировки внутри процесса достаточно
+_local_import_lock = threading.Lock()
+
+
+def _get_executor(app) -> ThreadPoolExecutor:
+    """Лениво создает общий пул потоков для фоновых задач импорта."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('IMPORT_JOB_WORKERS', DEFAULT_IMPORT_WORKERS),
+                thread_name_prefix='import-job'
+            )
+    return _executor
+
+
+@contextmanager
+def _import_lock():
+    """
+    Пытается без ожидания захватить право выполнять импорт.
+    На PostgreSQL это сессионная advisory-блокировка на отдельном соединении,
+    общая для всех воркеров; на других СУБД — блокировка внутри процесса.
+    :return: Контекстный менеджер, отдающий True, если блокировка захвачена.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        acquired = _local_import_lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _local_import_lock.release()
+        return
+
+    with db.engine.connect() as connection:
+        acquired = connection.execute(select(func.pg_try_advisory_lock(IMPORT_LOCK_ID))).scalar()
+        # Блокировка сессионная: фиксируем транзакцию, чтобы соединение не висело в ней весь импорт
+        connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(select(func.pg_advisory_unlock(IMPORT_LOCK_ID)))
+                connection.commit()
+
+
+def _fail_jobs(statuses) -> int:
+    """
+    Помечает задачи в указанных статусах как прерванные и удаляет их файлы.
+    :param statuses: Статусы задач, которые больше некому выполнить.
+    :return: Количество помеченных задач.
+    """
+    jobs = ImportJob.query.filter(ImportJob.status.in_(statuses)).all()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    for job in jobs:
+        job.status = ImportJobStatus.FAILED
+        job.error = INTERRUPTED_JOB_ERROR
+        job.finished_at = datetime.now(timezone.utc)
+        file_path = os.path.join(upload_folder, job.stored_filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    db.session.commit()
+    return len(jobs)
+
+
+def fail_orphaned_jobs() -> int:
+    """
+    Помечает как прерванные все задачи в очереди и в работе.
+    Вызывается при запуске сервера до старта воркеров, когда выполнять их уже некому.
+    :return: Количество помеченных задач.
+    """
+    return _fail_jobs([ImportJobStatus.QUEUED, ImportJobStatus.RUNNING])
+
+
+def process_queue() -> bool:
+    """
+    Выполняет задачи из очереди по одной, от старых к новым, пока очередь не опустеет.
+    Одновременно очередь обрабатывает только один процесс: задачи, поставленные
+    другими воркерами, тоже выполняются здесь.
+    :return: False, если очередь уже обрабатывает другой процесс.
+    """
+    with _import_lock() as acquired:
+        if not acquired:
+            return False
+        # Пока блокировка свободна, импорт не выполняется нигде: задачи в работе остались от упавшего процесса
+        _fail_jobs([ImportJobStatus.RUNNING])
+        while True:
+            job_id = db.session.scalar(
+                select(ImportJob.id)
+                .where(ImportJob.status == ImportJobStatus.QUEUED)
+                .order_by(ImportJob.created_at, ImportJob.id)
+                .limit(1)
+            )
+            if job_id is None or not run_import_job(job_id):
+                break
+    return True
+
+
+def serialize_job(job: ImportJob) -> dict:
+    """Преобразует задачу импорта в словарь для JSON-ответов и уведомлений."""
+    return {
+        'job_id': job.id,
+        'filename': job.filename,
+        'status': job.status.value,
+        'rows_parsed': job.rows_parsed,
+        'rows_inserted': job.rows_inserted,
+        'rows_skipped': job.rows_skipped,
+        'error': job.error,
+        'user': job.user.username if job.user else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def enqueue_import(file_storage, user) -> ImportJob:
+    """
+    Сохраняет загруженный файл в UPLOAD_FOLDER, создает задачу импорта
+    и передает ее в пул фоновых обработчиков.
+    При IMPORT_JOBS_ASYNC = False задача выполняется сразу в текущем потоке.
+    :param file_storage: Объект FileStorage из Flask.
+    :param user: Пользователь, запустивший импорт.
+    :return: Созданный экземпляр ImportJob.
+    """
+    app = current_app._get_current_object()
+    filename = secure_filename(file_storage.filename) or 'import'
+    # Расширение сохраняем отдельно: secure_filename удаляет кириллицу из имени
+    extension = os.path.splitext(file_storage.filename)[1].lower()
+    stored_filename = f"import_{uuid.uuid4().hex}{extension}"
+    file_storage.save(os.path.join(app.config['UPLOAD_FOLDER'], stored_filename))
+
+    job = ImportJob(
+        user_id=user.id,
+        filename=file_storage.filename or filename,
+        stored_filename=stored_filename,
+        status=ImportJobStatus.QUEUED
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _send_websocket_notification('import_queued', f"Импорт файла {job.filename} поставлен в очередь.", serialize_job(job))
+
+    if app.config.get('IMPORT_JOBS_ASYNC', True):
+        _get_executor(app).submit(_run_job_in_context, app, job.id)
+    else:
+        process_queue()
+        db.session.refresh(job)
+    return job
+
+
+def _run_job_in_context(app, job_id: int):
+    """
+    Точка входа фонового потока: в собственном контексте приложения ждет,
+    пока задачу не выполнит этот или другой процесс.
+    """
+    with app.app_context():
+        try:
+            while not process_queue():
+                job = db.session.get(ImportJob, job_id)
+                if job is None or job.status != ImportJobStatus.QUEUED:
+                    return
+                # Сбрасываем сессию, чтобы следующая проверка увидела изменения других процессов
+                db.session.remove()
+                socketio.sleep(IMPORT_QUEUE_POLL_SECONDS)
+        except Exception as e:
+            app.logger.error(f"Import job {job_id} crashed: {e}", exc_info=True)
+
+
+def _run_cpu_bound(func, *args):
+    """
+    Выполняет чтение и разбор файла импорта в потоке ОС (eventlet.tpool), если процесс
+    работает под eventlet: иначе pandas на все время разбора блокирует цикл событий
+    воркера вместе со страницами сканирования и WebSocket. Без eventlet вызывает функцию напрямую.
+    """
+    if patcher.is_monkey_patched('thread'):
+        return tpool.execute(func, *args)
+    return func(*args)
+
+
+def run_import_job(job_id: int) -> bool:
+    """
+    Выполняет задачу импорта: читает сохраненный файл, вызывает движок импорта,
+    транслирует прогресс через Socket.IO и сохраняет итог или ошибку в задаче.
+    :param job_id: ID задачи импорта.
+    :return: False, если задача уже не в очереди (ее взял другой обработчик).
+    """
+    # Задача переводится в работу одним условным UPDATE, чтобы ее не взяли дважды
+    claimed = db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status == ImportJobStatus.QUEUED)
+        .values(status=ImportJobStatus.RUNNING, started_at=datetime.now(timezone.utc))
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+
+    job = db.session.get(ImportJob, job_id)
+    _send_websocket_notification('import_started', f"Начат импорт файла {job.filename}.", serialize_job(job))
+
+    def on_progress(progress):
+        _send_websocket_notification(
+            'import_progress',
+            f"Импорт {job.filename}: разобрано {progress['rows_parsed']}, "
+            f"добавлено {progress['rows_inserted']}, пропущено {progress['rows_skipped']}.",
+            dict(progress, job_id=job_id)
+        )
+        # Отдаем управление другим гринлетам eventlet между пакетами
+        socketio.sleep(0)
+
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], job.stored_filename)
+    timings = {}
+    try:
+        with open(file_path, 'rb') as stream:
+            added, skipped = pies.import_parts_from_excel(
+                FileStorage(stream=stream, filename=job.filename), job.user, timings, on_progress,
+                run_cpu_bound=_run_cpu_bound
+            )
+        job = db.session.get(ImportJob, job_id)
+        job.status = ImportJobStatus.COMPLETED
+        job.rows_inserted = added
+        job.rows_skipped = skipped
+        job.rows_parsed = added + skipped
+    except Exception as e:
+        db.session.rollback()
+        if not isinstance(e, ValueError):
+            current_app.logger.error(f"Import job {job_id} failed: {e}", exc_info=True)
+        job = db.session.get(ImportJob, job_id)
+        job.status = ImportJobStatus.FAILED
+        job.error = str(e)
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    if job.status == ImportJobStatus.COMPLETED:
+        _send_websocket_notification(
+            'import_completed',
+            f"Импорт {job.filename} завершен за {timings.get('total', 0):.1f} с. "
+            f"Добавлено: {job.rows_inserted}, пропущено дубликатов: {job.rows_skipped}.",
+            serialize_job(job)
+        )
+    else:
+        _send_websocket_notification(
+            'import_failed', f"Ошибка импорта {job.filename}: {job.error}", serialize_job(job)
+        )
+    return True
+
+
+def get_job(job_id: int):
+    """Возвращает задачу импорта по ID или None."""
+    return db.session.get(ImportJob, job_id)
+
+
+def get_recent_jobs(limit: int = RECENT_JOBS_LIMIT) -> list:
+    """Возвращает последние задачи импорта, от новых к старым."""
+    return ImportJob.query.order_by(ImportJob.created_at.desc(), ImportJob.id.desc()).limit(limit).all()
@@ -0,0 +1,99 @@
+# app/services/notification_service.py
+
+import threading
+from collections import OrderedDict
+from itertools import count
+
+
+# События, относящиеся к строке конкретной детали: их получают только клиенты,
+# у которых раскрыто соответствующее изделие (комната изделия).
+ROOM_SCOPED_EVENTS = {'part_updated', 'stage_completed'}
+# Окно накопления событий перед отправкой по умолчанию (мс)
+DEFAULT_BATCH_WINDOW_MS = 100
+
+
+def product_room(product_designation: str) -> str:
+    """Возвращает имя Socket.IO-комнаты изделия."""
+    return f"product:{product_designation}"
+
+
+def _coalesce_key(payload: dict, sequence: int):
+    """
+    Ключ объединения событий: повторные события одного типа для одной детали
+    (или задачи импорта) в пределах окна заменяют предыдущие.
+    События без идентификатора объекта не объединяются.
+    """
+    object_id = payload.get('part_id') or payload.get('job_id')
+    if object_id is None:
+        return ('unique', sequence)
+    return (payload.get('event'), object_id)
+
+
+class NotificationBatcher:
+    """
+    Накапливает уведомления в течение короткого окна и отправляет их
+    одним сообщением на комнату. События одного типа для одной детали
+    объединяются (последние данные дополняют предыдущие).
+    """
+
+    def __init__(self, emit, window_ms: int = DEFAULT_BATCH_WINDOW_MS, start_task=None, sleep=None):
+        """
+        :param emit: Функция отправки emit(payload, room), room=None — всем клиентам.
+        :param window_ms: Окно накопления в миллисекундах; 0 — отправлять сразу.
+        :param start_task: Функция запуска фоновой задачи (socketio.start_background_task).
+        :param sleep: Функция ожидания, совместимая с асинхронным режимом (socketio.sleep).
+        """
+        self.emit = emit
+        self.window_ms = window_ms
+        self.start_task = start_task
+        self.sleep = sleep
+        self._pending = OrderedDict()
+        self._sequence = count()
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+
+    def add(self, payload: dict, room: str = None):
+        """Ставит уведомление в очередь (или отправляет сразу, если окно отключено)."""
+        if self.window_ms <= 0 or not self.start_task:
+            self.emit(payload, room)
+            return
+
+        with self._lock:
+            events = self._pending.setdefault(room, OrderedDict())
+            key = _coalesce_key(payload, next(self._sequence))
+            if key in events:
+                events[key].update(payload)
+            else:
+                events[key] = dict(payload)
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+
+        if schedule:
+            self.start_task(self._flush_later)
+
+    def _flush_later(self):
+        """Фоновая задача: ждет окончания окна и отправляет накопленное."""
+        self.sleep(self.window_ms / 1000)
+        self.flush()
+
+    def flush(self):
+        """
+        Отправляет накопленные уведомления: по одному сообщению на комнату.
+        Одиночное событие отправляется как есть, несколько — как событие 'batch'.
+        :return: Количество отправленных сообщений.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+            self._flush_scheduled = False
+
+        for room, events in pending.items():
+            batch = list(events.values())
+            if len(batch) == 1:
+                self.emit(batch[0], room)
+            else:
+                self.emit({
+                    'event': 'batch',
+                    'message': f"Получено обновлений: {len(batch)}. {batch[-1].get('message', '')}",
+                    'events': batch,
+                }, room)
+        return len(pending)
@@ -4,12 +4,15 @@ from flask import current_app
 from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.models import Part, AuditLog, AssemblyComponent
+from app.models import Part, AssemblyComponent
 from .part_utils_service import (
     _send_websocket_notification, 
     save_part_drawing, 
     _render_part_row_html
 )
+from .dashboard_service import invalidate_product_summary
+from .assembly_progress_service import update_assembly_progress
+from .audit_service import log_action
 
 
 def create_single_part(form, user, config):
@@ -38,20 +41,20 @@ def create_single_part(form, user, config):
     )
     
     db.session.add(new_part)
-    log_entry = AuditLog(
+    log_action(
         part_id=new_part.part_id,
         user_id=user.id,
         action="Создание",
         details="Деталь создана вручную.",
         category='part'
     )
-    db.session.add(log_entry)
     
     try:
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
         raise
+    invalidate_product_summary()
     
     with current_app.app_context():
         part_html = _render_part_row_html(new_part, user)
@@ -82,7 +85,8 @@ def create_child_part(form, parent_part_id, user):
         name=form.name.data,
         material=form.material.data,
         quantity_total=1,
-        route_template_id=parent_part.route_template_id
+        route_template_id=parent_part.route_template_id,
+        is_top_level=False
     )
     db.session.add(new_part)
 
@@ -93,20 +97,22 @@ def create_child_part(form, parent_part_id, user):
     )
     db.session.add(component_link)
 
-    log_entry = AuditLog(
+    log_action(
         part_id=parent_part_id,
         user_id=user.id,
         action="Обновление состава",
         details=f"В состав '{parent_part.name}' добавлен узел '{new_part.name}' ({form.quantity_total.data} шт.).",
         category='part'
     )
-    db.session.add(log_entry)
 
     try:
+        # Новый узел еще не готов, поэтому готовность сборки и ее родителей пересчитывается
+        update_assembly_progress([parent_part_id])
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
         raise
+    invalidate_product_summary()
 
     _send_websocket_notification(
         'part_updated',
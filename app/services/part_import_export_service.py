@@ -1,104 +1,225 @@
 # app/services/part_import_export_service.py
 
 import io
+import csv
+import time
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
-from sqlalchemy import func
+from flask import current_app
+from openpyxl import Workbook
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload
 
 # --- ИЗМЕНЕНИЕ: Исправляем пути импорта ---
 from app import db
-from app.models import Part, RouteTemplate, Stage, RouteStage, AssemblyComponent
+from app.models import Part, RouteTemplate, Stage, RouteStage, AssemblyComponent, User
+from app.services.dashboard_service import invalidate_product_summary
+from app.services.assembly_progress_service import update_assembly_progress
 
 
-def _get_or_create_route_from_operations(operations_str: str) -> RouteTemplate:
+# Размер пакета для массовой вставки строк (executemany / COPY)
+IMPORT_CHUNK_SIZE = 5000
+# Размер пакета значений для запросов вида `IN (...)`
+IN_CLAUSE_CHUNK_SIZE = 500
+# Количество строк, читаемых из БД и отдаваемых клиенту за один шаг экспорта
+EXPORT_BATCH_SIZE = 2000
+# Размер блока (байт) при отдаче готового XLSX-файла
+EXPORT_FILE_CHUNK_SIZE = 64 * 1024
+
+# Колонки файла экспорта
+EXPORT_COLUMNS = [
+    'Изделие', 'Обозначение', 'Наименование', 'Материал', 'Размер',
+    'Кол-во в партии', 'Кол-во выполнено', 'Кол-во в браке', 'Текущий этап',
+    'Ответственный', 'Маршрут', 'Дата создания',
+]
+
+# Карта возможных названий колонок
+IMPORT_HEADER_MAP = {
+    'Обозначение': ['Обозначение', 'Артикул', 'part_id'],
+    'Наименование': ['Наименование', 'name'],
+    'Кол-во': ['Кол-во', 'Количество', 'quantity'],
+    'Размер': ['Размер', 'size'],
+    'Операции': ['Операции', 'Маршрут', 'route'],
+    'Прим.': ['Прим.', 'Примечание', 'Материал', 'material']
+}
+
+
+def _chunks(items, size):
+    """Разбивает список на последовательные пакеты заданного размера."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _split_operations(operations_str: str) -> list:
     """
-    Находит существующий маршрут по набору операций или создает новый.
-    :param operations_str: Строка с операциями, разделенными ';' или ','.
-    :return: Экземпляр RouteTemplate или None.
+    Разбирает строку с операциями, разделенными ';' или ',', в список этапов.
+    :param operations_str: Строка с операциями.
+    :return: Список названий этапов (может быть пустым).
     """
-    operations = [op.strip() for op in operations_str.replace(',', ';').split(';') if op.strip()]
-    if not operations:
-        return None
+    return [op.strip() for op in operations_str.replace(',', ';').split(';') if op.strip()]
+
 
-    # Ищем существующий маршрут с таким же именем
-    route_name = " -> ".join(operations)
-    route = RouteTemplate.query.filter_by(name=route_name).first()
+def _resolve_routes(operation_strings) -> dict:
+    """
+    Сопоставляет все уникальные строки операций из файла с маршрутами,
+    создавая недостающие маршруты и этапы за несколько пакетных запросов.
+    :param operation_strings: Итерируемый набор уникальных строк операций.
+    :return: Словарь {строка операций: ID маршрута или None}.
+    """
+    operations_by_route = {}
+    route_name_by_ops = {}
+    for ops_str in operation_strings:
+        operations = _split_operations(ops_str)
+        if not operations:
+            route_name_by_ops[ops_str] = None
+            continue
+        route_name = " -> ".join(operations)
+        route_name_by_ops[ops_str] = route_name
+        operations_by_route[route_name] = operations
 
-    if route:
-        return route
+    # Ищем уже существующие маршруты одним запросом на пакет имен
+    route_ids = {}
+    for chunk in _chunks(list(operations_by_route), IN_CLAUSE_CHUNK_SIZE):
+        rows = db.session.query(RouteTemplate.id, RouteTemplate.name).filter(RouteTemplate.name.in_(chunk)).all()
+        route_ids.update({row.name: row.id for row in rows})
 
-    # Если не нашли, создаем новый
-    new_route = RouteTemplate(name=route_name, is_default=False)
-    db.session.add(new_route)
-    db.session.flush() # Получаем ID для new_route
+    missing_routes = [name for name in operations_by_route if name not in route_ids]
+    if missing_routes:
+        # Справочник этапов небольшой: сравниваем без учета регистра в Python,
+        # так как lower() в SQLite не работает с кириллицей
+        stages_by_name = {}
+        for stage in Stage.query.all():
+            stages_by_name.setdefault(stage.name.lower(), stage)
 
-    # Находим или создаем этапы и привязываем их к маршруту
-    for i, op_name in enumerate(operations):
-        # Ищем этап без учета регистра
-        stage = Stage.query.filter(func.lower(Stage.name) == func.lower(op_name)).first()
-        if not stage:
-            stage = Stage(name=op_name)
-            db.session.add(stage)
-            db.session.flush() # Получаем ID для stage
-        
-        route_stage = RouteStage(template_id=new_route.id, stage_id=stage.id, order=i)
-        db.session.add(route_stage)
+        new_stages = []
+        for route_name in missing_routes:
+            for op_name in operations_by_route[route_name]:
+                if op_name.lower() not in stages_by_name:
+                    stage = Stage(name=op_name)
+                    stages_by_name[op_name.lower()] = stage
+                    new_stages.append(stage)
 
-    return new_route
+        new_routes = {name: RouteTemplate(name=name, is_default=False) for name in missing_routes}
+        db.session.add_all(new_stages)
+        db.session.add_all(new_routes.values())
+        db.session.flush() # Получаем ID для новых этапов и маршрутов
 
+        db.session.add_all([
+            RouteStage(template_id=new_routes[name].id, stage_id=stages_by_name[op_name.lower()].id, order=i)
+            for name in missing_routes
+            for i, op_name in enumerate(operations_by_route[name])
+        ])
+        route_ids.update({name: route.id for name, route in new_routes.items()})
 
-def import_parts_from_excel(file_storage, user):
+    return {
+        ops_str: route_ids[route_name] if route_name else None
+        for ops_str, route_name in route_name_by_ops.items()
+    }
+
+
+def _copy_rows(table, rows, on_chunk=None):
     """
-    Обрабатывает Excel/CSV файл для массового импорта деталей и их иерархии.
-    :param file_storage: Объект FileStorage из Flask.
-    :param user: Текущий пользователь.
-    :return: Кортеж (количество добавленных, количество пропущенных).
+    Загружает строки в таблицу PostgreSQL через COPY в текущей транзакции сессии.
+    :param table: Объект Table SQLAlchemy.
+    :param rows: Список словарей с одинаковым набором ключей.
+    :param on_chunk: Необязательный обработчик, вызываемый с размером каждого загруженного пакета.
     """
+    columns = list(rows[0].keys())
+    columns_sql = ", ".join(f'"{c}"' for c in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        for chunk in _chunks(rows, IMPORT_CHUNK_SIZE):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([
+                    '\\N' if row[c] is None else (row[c].isoformat() if isinstance(row[c], datetime) else row[c])
+                    for c in columns
+                ])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY "{table.name}" ({columns_sql}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer
+            )
+            if on_chunk:
+                on_chunk(len(chunk))
+    finally:
+        cursor.close()
+
+
+def _bulk_insert(model, rows, on_chunk=None):
+    """
+    Массово вставляет строки пакетами: COPY на PostgreSQL,
+    многострочный executemany на остальных СУБД.
+    :param model: Класс модели.
+    :param rows: Список словарей со значениями колонок.
+    :param on_chunk: Необязательный обработчик, вызываемый с размером каждого вставленного пакета.
+    """
+    if not rows:
+        return
+    if db.engine.name == 'postgresql':
+        _copy_rows(model.__table__, rows, on_chunk)
+        return
+    for chunk in _chunks(rows, IMPORT_CHUNK_SIZE):
+        db.session.execute(model.__table__.insert(), chunk)
+        if on_chunk:
+            on_chunk(len(chunk))
+
+
+def _read_import_file(file_storage) -> pd.DataFrame:
+    """Читает Excel/CSV файл в DataFrame, определяя формат по расширению."""
     try:
-        # Пытаемся прочитать файл, определяя формат по расширению
         if file_storage.filename.endswith('.csv'):
-            df = pd.read_csv(file_storage, sep=None, engine='python', header=None, dtype=str)
-        else:
-            df = pd.read_excel(file_storage, header=None, dtype=str)
+            # Определение разделителя (sep=None) работает только с текстовым потоком
+            raw = file_storage.read()
+            try:
+                text = raw.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                text = raw.decode('cp1251') # CSV, сохраненный русскоязычным Excel
+            if not text.strip():
+                return pd.DataFrame()
+            return pd.read_csv(io.StringIO(text), sep=None, engine='python', header=None, dtype=str)
+        return pd.read_excel(file_storage, header=None, dtype=str)
     except Exception as e:
         raise ValueError(f"Не удалось прочитать файл. Убедитесь, что он не поврежден. Ошибка: {e}")
 
-    if df.empty:
-        return 0, 0
 
-    # Карта возможных названий колонок
-    header_map = {
-        'Обозначение': ['Обозначение', 'Артикул', 'part_id'],
-        'Наименование': ['Наименование', 'name'],
-        'Кол-во': ['Кол-во', 'Количество', 'quantity'],
-        'Размер': ['Размер', 'size'],
-        'Операции': ['Операции', 'Маршрут', 'route'],
-        'Прим.': ['Прим.', 'Примечание', 'Материал', 'material']
-    }
+def _forward_fill(values: pd.Series, mask: pd.Series, default) -> pd.Series:
+    """
+    Протягивает вниз значения из строк, отмеченных маской, до следующей
+    отмеченной строки. Строки до первой отмеченной получают значение по умолчанию.
+    """
+    positions = np.where(mask.to_numpy(), np.arange(len(values)), -1)
+    positions = np.maximum.accumulate(positions) if len(positions) else positions
+    source = values.to_numpy(dtype=object)
+    filled = np.where(positions >= 0, source[np.maximum(positions, 0)], default)
+    return pd.Series(filled, index=values.index, dtype=object)
+
 
+def _prepare_import_frame(df: pd.DataFrame):
+    """
+    Находит строку заголовков и векторно разбирает файл в нормализованный DataFrame
+    с колонками part_id, name, quantity, material, size, operations,
+    product_designation, parent_id, is_parent.
+    :return: Кортеж (DataFrame с валидными строками, признак наличия колонки операций).
+    """
     # Поиск строки с заголовками
-    header_row_index = -1
-    for i, row in df.iterrows():
-        # Преобразуем всю строку в одну строку в нижнем регистре для поиска
-        row_str = ' '.join(str(s).lower() for s in row.values)
-        if 'обозначение' in row_str and 'наименование' in row_str:
-            header_row_index = i
-            break
-    
-    if header_row_index == -1:
+    cells = df.fillna('').astype(str).apply(lambda col: col.str.lower())
+    header_matches = (cells.apply(lambda col: col.str.contains('обозначение', regex=False)).any(axis=1)
+                      & cells.apply(lambda col: col.str.contains('наименование', regex=False)).any(axis=1))
+    if not header_matches.any():
         raise ValueError("В файле не найдена строка с заголовками (должна содержать 'Обозначение' и 'Наименование').")
+    header_pos = int(np.argmax(header_matches.to_numpy()))
 
-    headers = [str(h).strip() for h in df.iloc[header_row_index]]
-    df = df.iloc[header_row_index + 1:]
-    df.columns = headers
-    df = df.fillna('') # Заменяем NaN на пустые строки для удобства
+    headers = [str(h).strip() for h in df.iloc[header_pos]]
+    df = df.iloc[header_pos + 1:].fillna('').astype(str).reset_index(drop=True)
 
-    # Определение имен колонок по синонимам
+    # Определение позиций колонок по синонимам
     def find_col(name):
-        for alias in header_map[name]:
-            if alias in df.columns:
-                return alias
+        for alias in IMPORT_HEADER_MAP[name]:
+            if alias in headers:
+                return headers.index(alias)
         return None
 
     col_id = find_col('Обозначение')
@@ -107,123 +228,251 @@ def import_parts_from_excel(file_storage, user):
     col_material = find_col('Прим.')
     col_size = find_col('Размер')
     col_ops = find_col('Операции')
-    
-    if not all([col_id, col_name, col_qty, col_material]):
+
+    if None in (col_id, col_name, col_qty, col_material):
         raise ValueError("Не найдены обязательные колонки: 'Обозначение', 'Наименование', 'Кол-во', 'Прим.'")
 
-    added_count = 0
-    skipped_count = 0
-    current_product_id = None
-    current_product_designation = "Не определено"
+    empty = pd.Series('', index=df.index)
+
+    def column(pos):
+        return df.iloc[:, pos].str.strip() if pos is not None else empty
+
+    part_ids = column(col_id)
+    names = column(col_name)
+    qty_raw = column(col_qty)
+
+    # Строка без обозначения, но с текстом во второй колонке задает название всего изделия
+    second_col = column(1) if df.shape[1] > 1 else empty
+    is_product_row = (part_ids == '') & (second_col != '')
+    product_designation = _forward_fill(second_col, is_product_row, "Не определено")
+
+    is_valid = ~is_product_row & (part_ids != '') & (names != '')
+    # Строка является родительской (сборкой), если в обозначении есть 'СБ' или не указано количество
+    is_parent = is_valid & (part_ids.str.upper().str.contains('СБ', regex=False) | (qty_raw == ''))
+
+    # Текущий родитель "протягивается" вниз до следующей сборки и сбрасывается при смене изделия
+    parent_id = _forward_fill(part_ids.where(~is_product_row, ''), is_parent | is_product_row, '')
+    parent_id = parent_id.where(parent_id != '', None)
+
+    quantity = pd.to_numeric(qty_raw.str.replace(',', '.', regex=False), errors='coerce')
+    quantity = np.trunc(quantity.where(np.isfinite(quantity), 1)).astype(int)
+
+    frame = pd.DataFrame({
+        'part_id': part_ids,
+        'name': names,
+        'quantity': quantity,
+        'material': column(col_material),
+        'size': column(col_size),
+        'operations': column(col_ops),
+        'product_designation': product_designation,
+        'parent_id': parent_id,
+        'is_parent': is_parent,
+    })
+    return frame[is_valid].reset_index(drop=True), col_ops is not None
+
+
+def _find_existing_part_ids(part_ids) -> set:
+    """Возвращает множество ID из переданного списка, уже существующих в БД."""
+    existing = set()
+    for chunk in _chunks(list(part_ids), IN_CLAUSE_CHUNK_SIZE):
+        existing.update(row.part_id for row in db.session.query(Part.part_id).filter(Part.part_id.in_(chunk)))
+    return existing
+
+
+def import_parts_from_excel(file_storage, user, timings=None, progress=None, run_cpu_bound=None):
+    """
+    Обрабатывает Excel/CSV файл для массового импорта деталей и их иерархии.
+    Разбор выполняется векторно в pandas, маршруты и этапы разрешаются
+    пакетно, а детали и связи вставляются массово (COPY на PostgreSQL).
+    :param file_storage: Объект FileStorage из Flask.
+    :param user: Текущий пользователь.
+    :param timings: Необязательный словарь, в который записываются длительности этапов импорта (сек.).
+    :param progress: Необязательный обработчик прогресса, вызываемый со словарем
+                     {'phase', 'rows_parsed', 'rows_inserted', 'rows_skipped'}.
+    :param run_cpu_bound: Необязательная функция run_cpu_bound(func, *args) для чтения и разбора
+                          файла (без обращений к БД), например в потоке ОС вне цикла eventlet.
+    :return: Кортеж (количество добавленных, количество пропущенных).
+    """
+    timings = timings if timings is not None else {}
+    run_cpu_bound = run_cpu_bound or (lambda func, *args: func(*args))
+    started = phase_started = time.perf_counter()
+    counters = {'rows_parsed': 0, 'rows_inserted': 0, 'rows_skipped': 0}
+
+    def report(phase):
+        if progress:
+            progress(dict(counters, phase=phase))
+
+    def mark(phase):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[phase] = round(now - phase_started, 3)
+        phase_started = now
+
+    df = run_cpu_bound(_read_import_file, file_storage)
+    mark('read')
+
+    if df.empty:
+        return 0, 0
+
+    rows, has_ops_column = run_cpu_bound(_prepare_import_frame, df)
 
     default_route = RouteTemplate.query.filter_by(is_default=True).first()
-    if not default_route and col_ops is None:
+    if not default_route and not has_ops_column:
         raise ValueError("В файле не указаны операции и не найден маршрут по умолчанию в системе. Импорт невозможен.")
 
-    existing_parts_ids = {p.part_id for p in Part.query.with_entities(Part.part_id).all()}
+    # Дубликаты внутри файла и уже существующие в БД детали пропускаем
+    existing_parts_ids = _find_existing_part_ids(rows['part_id'].unique())
+    is_skipped = rows['part_id'].duplicated(keep='first') | rows['part_id'].isin(existing_parts_ids)
+    skipped_count = int(is_skipped.sum())
+    new_rows = rows[~is_skipped]
+    mark('parse')
+    counters.update(rows_parsed=len(rows), rows_skipped=skipped_count)
+    report('parse')
 
-    for _, row in df.iterrows():
-        part_id = str(row.get(col_id, '')).strip()
-        name = str(row.get(col_name, '')).strip()
-        
-        # Ищем строку, которая определяет название всего изделия
-        if not part_id and len(row.iloc) > 1 and str(row.iloc[1]).strip():
-             current_product_designation = str(row.iloc[1]).strip()
-             current_product_id = None # Сбрасываем родителя при смене изделия
-             continue
+    route_by_ops = _resolve_routes(new_rows.loc[new_rows['operations'] != '', 'operations'].unique())
+    default_route_id = default_route.id if default_route else None
+    route_ids = new_rows['operations'].map(lambda ops: route_by_ops[ops] if ops else default_route_id)
+    db.session.flush()
+    mark('routes')
 
-        if not part_id or not name:
-            continue
-        
-        # Определяем, является ли строка родительской (сборкой)
-        is_parent = 'СБ' in part_id.upper() or not str(row.get(col_qty, '')).strip()
-        
-        if is_parent:
-            current_product_id = part_id
-        
-        if part_id in existing_parts_ids:
-            skipped_count += 1
-            continue
-        
-        # Обработка количества
-        try:
-            quantity = int(float(str(row.get(col_qty, '1')).replace(',', '.')))
-        except (ValueError, TypeError):
-            quantity = 1
-
-        # Определение маршрута
-        route = None
-        if col_ops and str(row.get(col_ops, '')).strip():
-            route = _get_or_create_route_from_operations(str(row[col_ops]))
-        else:
-            route = default_route
-
-        new_part = Part(
-            part_id=part_id,
-            product_designation=current_product_designation,
-            name=name,
-            quantity_total=quantity if is_parent else 1,
-            material=str(row.get(col_material, '')),
-            size=str(row.get(col_size, '')) if col_size else '',
-            route_template_id=route.id if route else None
+    links = new_rows[~new_rows['is_parent'] & new_rows['parent_id'].notna()]
+    child_ids = set(links['part_id'])
+
+    now = datetime.now(timezone.utc)
+    parts_rows = [
+        {
+            'part_id': part_id,
+            'product_designation': product_designation,
+            'name': name,
+            'material': material,
+            'size': size,
+            'quantity_total': int(quantity) if is_parent else 1,
+            'quantity_completed': 0,
+            'quantity_scrapped': 0,
+            'current_status': 'На складе',
+            'date_added': now,
+            'last_update': now,
+            'route_template_id': None if pd.isna(route_id) else int(route_id),
+            'is_top_level': part_id not in child_ids,
+        }
+        for part_id, product_designation, name, material, size, quantity, is_parent, route_id in zip(
+            new_rows['part_id'], new_rows['product_designation'], new_rows['name'], new_rows['material'],
+            new_rows['size'], new_rows['quantity'], new_rows['is_parent'], route_ids
         )
-        db.session.add(new_part)
-        
-        if not is_parent and current_product_id:
-            link = AssemblyComponent(parent_id=current_product_id, child_id=part_id, quantity=quantity)
-            db.session.add(link)
-
-        existing_parts_ids.add(part_id)
-        added_count += 1
-        
+    ]
+    link_rows = [
+        {'parent_id': parent_id, 'child_id': child_id, 'quantity': int(quantity)}
+        for parent_id, child_id, quantity in zip(links['parent_id'], links['part_id'], links['quantity'])
+    ]
+
+    def on_parts_chunk(size):
+        counters['rows_inserted'] += size
+        report('insert')
+
     try:
+        _bulk_insert(Part, parts_rows, on_parts_chunk)
+        _bulk_insert(AssemblyComponent, link_rows)
         db.session.commit()
     except IntegrityError as e:
         db.session.rollback()
         raise ValueError(f"Ошибка целостности данных при импорте. Возможно, дубликат ID. Ошибка: {e}")
-    
-    return added_count, skipped_count
+    # Новые детали не имеют выполненных этапов, поэтому их готовность (0) не пересчитывается.
+    # Сборки, которые уже были в базе, получили новые неготовые узлы — их готовность пересчитывается.
+    new_part_ids = {row['part_id'] for row in parts_rows}
+    existing_parents = sorted({row['parent_id'] for row in link_rows} - new_part_ids)
+    if existing_parents:
+        update_assembly_progress(existing_parents)
+        db.session.commit()
+    if parts_rows:
+        invalidate_product_summary()
+    mark('insert')
 
+    timings['total'] = round(time.perf_counter() - started, 3)
+    current_app.logger.info(
+        f"Импорт: добавлено {len(parts_rows)}, связей {len(link_rows)}, пропущено {skipped_count}. Этапы (сек.): {timings}"
+    )
+    return len(parts_rows), skipped_count
 
-def export_all_parts_to_csv():
+
+def _route_strings() -> dict:
     """
-    Выгружает все детали из базы данных в CSV-файл.
-    :return: Потоковый объект io.StringIO с данными CSV.
+    Строит карту маршрутов вида {route_template_id: "Этап 1 -> Этап 2 -> ..."}
+    одним запросом, чтобы не загружать маршрут отдельно для каждой детали.
     """
-    parts = Part.query.options(
-        joinedload(Part.route_template).subqueryload(RouteTemplate.stages).joinedload(RouteStage.stage),
-        joinedload(Part.responsible)
-    ).order_by(Part.product_designation, Part.part_id).all()
+    stage_names = defaultdict(list)
+    rows = db.session.query(RouteStage.template_id, Stage.name)\
+        .join(Stage, RouteStage.stage_id == Stage.id)\
+        .order_by(RouteStage.template_id, RouteStage.order)
+    for template_id, stage_name in rows:
+        stage_names[template_id].append(stage_name)
+    return {template_id: " -> ".join(names) for template_id, names in stage_names.items()}
 
-    if not parts:
-        return None
 
-    data_for_export = []
-    for part in parts:
-        route_str = ""
-        if part.route_template and part.route_template.stages:
-            sorted_stages = sorted(part.route_template.stages, key=lambda s: s.order)
-            route_str = " -> ".join([rs.stage.name for rs in sorted_stages])
-        
-        data_for_export.append({
-            'Изделие': part.product_designation,
-            'Обозначение': part.part_id,
-            'Наименование': part.name,
-            'Материал': part.material,
-            'Размер': part.size,
-            'Кол-во в партии': part.quantity_total,
-            'Кол-во выполнено': part.quantity_completed,
-            'Кол-во в браке': part.quantity_scrapped,
-            'Текущий этап': part.current_status,
-            'Ответственный': part.responsible.username if part.responsible else '',
-            'Маршрут': route_str,
-            'Дата создания': part.date_added.strftime('%Y-%m-%d %H:%M:%S'),
-        })
-
-    df = pd.DataFrame(data_for_export)
-    
-    output = io.StringIO()
-    # Используем точку с запятой как разделитель для лучшей совместимости с Excel
-    df.to_csv(output, index=False, sep=';', encoding='utf-8-sig')
-    
-    return output
\ No newline at end of file
+def _iter_export_rows():
+    """
+    Построчно выдает данные деталей для экспорта в порядке EXPORT_COLUMNS.
+    Строки читаются пакетами по EXPORT_BATCH_SIZE (серверный курсор на PostgreSQL),
+    поэтому потребление памяти не зависит от количества деталей.
+    """
+    route_strings = _route_strings()
+    query = db.session.query(
+        Part.product_designation, Part.part_id, Part.name, Part.material, Part.size,
+        Part.quantity_total, Part.quantity_completed, Part.quantity_scrapped,
+        Part.current_status, User.username, Part.route_template_id, Part.date_added
+    ).outerjoin(User, Part.responsible_id == User.id)\
+        .order_by(Part.product_designation, Part.part_id)\
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    for (product, part_id, name, material, size, qty_total, qty_completed, qty_scrapped,
+         status, responsible, route_id, date_added) in query:
+        yield (
+            product, part_id, name, material, size or '',
+            qty_total, qty_completed, qty_scrapped, status,
+            responsible or '', route_strings.get(route_id, ''),
+            date_added.strftime('%Y-%m-%d %H:%M:%S') if date_added else '',
+        )
+
+
+def has_parts_to_export() -> bool:
+    """Проверяет, есть ли в базе данных хотя бы одна деталь для экспорта."""
+    return db.session.query(Part.part_id).first() is not None
+
+
+def stream_parts_csv():
+    """
+    Генератор CSV-выгрузки всех деталей, отдающий данные частями
+    по EXPORT_BATCH_SIZE строк для потокового HTTP-ответа.
+    """
+    buffer = io.StringIO()
+    # Точка с запятой и BOM — для корректного открытия файла в русскоязычном Excel
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(_iter_export_rows(), start=1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_parts_xlsx():
+    """
+    Генератор XLSX-выгрузки всех деталей. Книга формируется openpyxl
+    в режиме write-only во временный файл, который затем отдается частями.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Детали')
+    sheet.append(EXPORT_COLUMNS)
+    for row in _iter_export_rows():
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(EXPORT_FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
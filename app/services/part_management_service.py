@@ -5,12 +5,17 @@ from flask import current_app
 
 # --- ИЗМЕНЕНИЕ: Исправляем пути импорта ---
 from app import db
-from app.models import AuditLog, ResponsibleHistory, Part
+from app.models import ResponsibleHistory, Part
 from .part_utils_service import (
     _send_websocket_notification,
     save_part_drawing,
-    to_safe_key
+    to_safe_key,
+    update_top_level_flags
 )
+from .dashboard_service import invalidate_product_summary
+from .assembly_progress_service import update_assembly_progress
+from .report_service import update_operator_rollups, invalidate_reports, refresh_stage_durations
+from .audit_service import log_action
 
 
 def update_part_from_form(part, form, user, config):
@@ -22,7 +27,8 @@ def update_part_from_form(part, form, user, config):
     :param config: Конфигурация приложения.
     """
     changes = []
-    if part.product_designation != form.product_designation.data:
+    product_changed = part.product_designation != form.product_designation.data
+    if product_changed:
         changes.append(f"Изделие: '{part.product_designation}' -> '{form.product_designation.data}'")
         part.product_designation = form.product_designation.data
     if part.name != form.name.data:
@@ -45,8 +51,14 @@ def update_part_from_form(part, form, user, config):
         
     if changes:
         log_details = "; ".join(changes)
-        db.session.add(AuditLog(part_id=part.part_id, user_id=user.id, action="Редактирование", details=log_details, category='part'))
+        log_action(part_id=part.part_id, user_id=user.id, action="Редактирование", details=log_details, category='part')
+        if product_changed:
+            # Факты длительности хранят изделие детали для фильтра отчета
+            refresh_stage_durations([part.part_id])
         db.session.commit()
+        if product_changed:
+            invalidate_product_summary()
+            invalidate_reports()
         
         _send_websocket_notification(
             'part_updated',
@@ -75,9 +87,19 @@ def delete_single_part(part, user, config):
         if os.path.exists(file_path):
             os.remove(file_path)
             
-    db.session.add(AuditLog(part_id=part_id, user_id=user.id, action="Удаление", details=f"Деталь '{part_id}' и вся ее история были удалены.", category='part'))
+    # Узлы, входившие только в эту сборку, после удаления становятся верхнеуровневыми
+    child_ids = [link.child_id for link in part.child_associations]
+    # Сборки, из состава которых удаляется деталь, меняют готовность
+    parent_ids = [link.parent_id for link in part.parent_associations]
+    log_action(part_id=part_id, user_id=user.id, action="Удаление", details=f"Деталь '{part_id}' и вся ее история были удалены.", category='part', durable=True)
+    # История удаляется вместе с деталью: вычитаем ее из агрегатов отчетов
+    update_operator_rollups(part.history, sign=-1)
     db.session.delete(part)
+    update_top_level_flags(child_ids)
+    update_assembly_progress(parent_ids)
     db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
     
     _send_websocket_notification(
         'part_deleted',
@@ -101,6 +123,8 @@ def delete_multiple_parts(part_ids, user, config):
     parts_to_delete = db.session.query(Part).filter(Part.part_id.in_(part_ids)).all()
     deleted_count = 0
     deleted_data = []
+    child_ids = []
+    parent_ids = []
 
     for part in parts_to_delete:
         if part.drawing_filename:
@@ -109,13 +133,21 @@ def delete_multiple_parts(part_ids, user, config):
                 os.remove(file_path)
         
         deleted_data.append({'part_id': part.part_id, 'product_designation': part.product_designation})
-        db.session.add(AuditLog(part_id=part.part_id, user_id=user.id, action="Массовое удаление", details=f"Деталь '{part.part_id}' удалена.", category='part'))
+        child_ids.extend(link.child_id for link in part.child_associations)
+        parent_ids.extend(link.parent_id for link in part.parent_associations)
+        log_action(part_id=part.part_id, user_id=user.id, action="Массовое удаление", details=f"Деталь '{part.part_id}' удалена.", category='part', durable=True)
+        update_operator_rollups(part.history, sign=-1)
         db.session.delete(part)
         deleted_count += 1
         
+    deleted_ids = set(part_ids)
+    update_top_level_flags([child_id for child_id in child_ids if child_id not in deleted_ids])
+    update_assembly_progress([parent_id for parent_id in parent_ids if parent_id not in deleted_ids])
     db.session.commit()
     
     if deleted_count > 0:
+        invalidate_product_summary()
+        invalidate_reports()
         _send_websocket_notification(
             'bulk_delete',
             f"Пользователь {user.username} удалил {deleted_count} деталей.",
@@ -136,8 +168,11 @@ def change_part_route(part, new_route, user):
     if part.route_template_id != new_route.id:
         old_route_name = part.route_template.name if part.route_template else "Не назначен"
         part.route_template_id = new_route.id
-        db.session.add(AuditLog(part_id=part.part_id, user_id=user.id, action="Редактирование", details=f"Маршрут изменен с '{old_route_name}' на '{new_route.name}'.", category='part'))
+        update_assembly_progress([part.part_id])
+        log_action(part_id=part.part_id, user_id=user.id, action="Редактирование", details=f"Маршрут изменен с '{old_route_name}' на '{new_route.name}'.", category='part')
         db.session.commit()
+        invalidate_product_summary()
+        invalidate_reports()
         _send_websocket_notification('part_updated', f"Для детали {part.part_id} изменен маршрут.", {'part_id': part.part_id})
         return True
     return False
@@ -160,7 +195,7 @@ def change_responsible_user(part, new_user, current_user):
         part.responsible_id = new_responsible_id
         
         db.session.add(ResponsibleHistory(part_id=part.part_id, user_id=new_responsible_id))
-        db.session.add(AuditLog(part_id=part.part_id, user_id=current_user.id, action="Смена ответственного", details=f"Ответственный изменен с '{old_user_name}' на '{new_user_name}'.", category='management'))
+        log_action(part_id=part.part_id, user_id=current_user.id, action="Смена ответственного", details=f"Ответственный изменен с '{old_user_name}' на '{new_user_name}'.", category='management')
         db.session.commit()
         
         _send_websocket_notification(
@@ -1,66 +1,369 @@
 # app/services/part_status_service.py
 
 from collections import defaultdict
+from datetime import datetime, timezone
 from flask import render_template_string
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 # --- ИЗМЕНЕНИЕ: Исправляем пути импорта ---
 from app import db
-from app.models import StatusHistory, StatusType, AuditLog
+from app.models import (StatusHistory, StatusType, PartStageProgress,
+                        Part, RouteTemplate, RouteStage)
 from .part_utils_service import _send_websocket_notification
+from .dashboard_service import invalidate_product_summary
+from .assembly_progress_service import update_assembly_progress, rebuild_assembly_progress
+from .report_service import refresh_stage_durations, update_operator_rollups, invalidate_reports
+from .audit_service import log_action
 
 
-def _recalculate_part_progress(part):
+# Максимальное количество позиций в одном пакетном подтверждении
+BULK_COMPLETION_MAX_ITEMS = 500
+# Сколько раз повторять синхронизацию, если параллельный запрос записал те же операции
+SYNC_CONFLICT_RETRIES = 2
+
+
+def _apply_stage_progress(part_id, stage_name, delta):
+    """
+    Инкрементально изменяет счетчик выполненного количества по этапу детали.
+    Вызывается в той же транзакции, что и запись/удаление StatusHistory.
+    """
+    progress = db.session.get(PartStageProgress, (part_id, stage_name), populate_existing=True)
+    if progress is None:
+        progress = PartStageProgress(part_id=part_id, stage_name=stage_name, quantity_completed=0)
+        db.session.add(progress)
+    progress.quantity_completed = max((progress.quantity_completed or 0) + delta, 0)
+
+
+def _lock_parts(part_ids):
+    """
+    Блокирует строки деталей до конца транзакции (SELECT ... FOR UPDATE) и перечитывает их.
+    Параллельные изменения прогресса одной детали выполняются по очереди, а детали,
+    не входящие в набор, не блокируются. Строки блокируются в порядке part_id,
+    чтобы пакеты с пересекающимися деталями не приводили к взаимоблокировке.
+    SQLite (разработка, тесты) не поддерживает FOR UPDATE: там блокировка не выполняется.
+    :param part_ids: Список ID деталей.
+    :return: Список заблокированных деталей.
+    """
+    return Part.query.filter(Part.part_id.in_(part_ids)).order_by(Part.part_id)\
+        .with_for_update().populate_existing().all()
+
+
+def _reset_stage_progress(part_id, stage_names=None):
+    """
+    Удаляет счетчики прогресса детали (все или только по указанным этапам).
+    Используется при удалении истории (брак, доработка).
+    """
+    query = PartStageProgress.query.filter(PartStageProgress.part_id == part_id)
+    if stage_names is not None:
+        query = query.filter(PartStageProgress.stage_name.in_(stage_names))
+    query.delete(synchronize_session='fetch')
+
+
+def get_stage_progress(part_id):
+    """
+    Возвращает выполненное количество по каждому этапу детали.
+    :param part_id: ID детали.
+    :return: Словарь {имя этапа: количество}.
+    """
+    rows = db.session.query(
+        PartStageProgress.stage_name, PartStageProgress.quantity_completed
+    ).filter(PartStageProgress.part_id == part_id).all()
+    return {row.stage_name: row.quantity_completed for row in rows}
+
+
+def get_stage_progress_for_parts(part_ids):
+    """
+    Возвращает прогресс по этапам сразу для набора деталей одним запросом.
+    :param part_ids: Список ID деталей.
+    :return: Словарь {part_id: {имя этапа: количество}}.
+    """
+    progress_map = {part_id: {} for part_id in part_ids}
+    if not part_ids:
+        return progress_map
+    rows = db.session.query(
+        PartStageProgress.part_id, PartStageProgress.stage_name, PartStageProgress.quantity_completed
+    ).filter(PartStageProgress.part_id.in_(part_ids)).all()
+    for row in rows:
+        progress_map[row.part_id][row.stage_name] = row.quantity_completed
+    return progress_map
+
+
+def rebuild_stage_progress():
+    """
+    Полностью пересобирает таблицу PartStageProgress из StatusHistory
+    и пересчитывает Part.quantity_completed для всех деталей.
+    :return: Количество созданных записей прогресса.
+    """
+    db.session.query(PartStageProgress).delete()
+
+    aggregated = db.session.query(
+        StatusHistory.part_id,
+        StatusHistory.status,
+        func.sum(StatusHistory.quantity).label('qty')
+    ).filter(
+        StatusHistory.status_type == StatusType.COMPLETED
+    ).group_by(StatusHistory.part_id, StatusHistory.status).all()
+
+    progress_map = defaultdict(dict)
+    for row in aggregated:
+        progress_map[row.part_id][row.status] = row.qty or 0
+        db.session.add(PartStageProgress(part_id=row.part_id, stage_name=row.status, quantity_completed=row.qty or 0))
+
+    parts = Part.query.options(
+        selectinload(Part.route_template).selectinload(RouteTemplate.stages).joinedload(RouteStage.stage)
+    ).all()
+    for part in parts:
+        part.quantity_completed = _compute_quantity_completed(part, progress_map.get(part.part_id, {}))
+    db.session.flush()
+    rebuild_assembly_progress()
+
+    db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
+    return len(aggregated)
+
+
+def _compute_quantity_completed(part, completed_quantities):
     """
-    Вспомогательная функция для пересчета общего прогресса выполнения детали.
     Находит минимальное количество выполненных изделий по всем этапам маршрута.
+    :param part: Экземпляр Part.
+    :param completed_quantities: Словарь {имя этапа: количество}.
     """
     if not part.route_template:
-        part.quantity_completed = 0
-        return
+        return 0
 
-    all_history = StatusHistory.query.filter_by(
-        part_id=part.part_id, status_type=StatusType.COMPLETED
-    ).all()
-    
-    completed_quantities = defaultdict(int)
-    for h in all_history:
-        completed_quantities[h.status] += h.quantity
-        
     stage_names = [rs.stage.name for rs in sorted(part.route_template.stages, key=lambda s: s.order)]
-    
     if not stage_names:
-        part.quantity_completed = 0
-        return
+        return 0
 
     min_completed = part.quantity_total
     for stage_name in stage_names:
         qty = completed_quantities.get(stage_name, 0)
         if qty < min_completed:
             min_completed = qty
-            
-    part.quantity_completed = min_completed
+    return min_completed
 
 
-def complete_stage(part, stage, quantity, operator_name):
+def _recalculate_part_progress(part):
+    """
+    Вспомогательная функция для пересчета общего прогресса выполнения детали.
+    Читает материализованные счетчики PartStageProgress (O(этапов)).
+    """
+    if not part.route_template:
+        part.quantity_completed = 0
+        return
+
+    part.quantity_completed = _compute_quantity_completed(part, get_stage_progress(part.part_id))
+
+
+def complete_stage(part, stage, quantity, operator_name, op_id=None):
     """
     Обрабатывает успешное завершение этапа для указанного количества деталей.
+    Остаток на этапе проверяется после блокировки строки детали, поэтому два
+    оператора, одновременно подтверждающие один этап, не превысят количество.
     :param part: Экземпляр Part.
     :param stage: Экземпляр Stage.
     :param quantity: Количество выполненных изделий.
     :param operator_name: Имя оператора.
+    :param op_id: Ключ идемпотентности операции (необязательный).
+    :return: True, если этап учтен; False, если операция с таким ключом уже записана.
+    :raises ValueError: Если количество превышает остаток на этапе.
     """
-    db.session.add(StatusHistory(
+    _lock_parts([part.part_id])
+    if op_id and db.session.query(StatusHistory.id).filter(StatusHistory.client_op_id == op_id).first():
+        db.session.rollback()
+        return False
+
+    remaining = part.quantity_total - get_stage_progress(part.part_id).get(stage.name, 0)
+    if quantity > remaining:
+        db.session.rollback()
+        raise ValueError(f'Ошибка: Нельзя выполнить {quantity} шт. На этом этапе осталось {remaining} шт.')
+
+    history_entry = StatusHistory(
         part_id=part.part_id,
         status=stage.name,
         operator_name=operator_name,
         quantity=quantity,
-        status_type=StatusType.COMPLETED
-    ))
+        status_type=StatusType.COMPLETED,
+        client_op_id=op_id
+    )
+    db.session.add(history_entry)
+    _apply_stage_progress(part.part_id, stage.name, quantity)
     
     part.current_status = stage.name
     _recalculate_part_progress(part)
+    update_assembly_progress([part.part_id])
+    refresh_stage_durations([part.part_id])
+    update_operator_rollups([history_entry])
     
     db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
+    return True
+
+
+def _bulk_item_error(item, message):
+    """Формирует результат отклоненной позиции пакетного подтверждения."""
+    return {'op_id': item.get('op_id'), 'part_id': item.get('part_id'), 'stage_id': item.get('stage_id'),
+            'status': 'error', 'message': message}
+
+
+def complete_stages_bulk(items, operator_name):
+    """
+    Пакетно подтверждает выполнение этапов (режим сканирования на конвейере).
+    Детали блокируются (см. _lock_parts), маршруты и счетчики прогресса загружаются
+    пакетно, остатки проверяются в памяти с учетом предыдущих позиций пакета, все
+    записи истории фиксируются одной транзакцией, а клиентам отправляется одно уведомление.
+    :param items: Список словарей {'part_id', 'stage_id' (необяз.), 'quantity' (необяз.),
+                  'op_id' (необяз.), 'performed_at' (необяз.)}.
+                  Без stage_id берется следующий невыполненный этап маршрута,
+                  без quantity — весь остаток на этапе. op_id сохраняется в записи
+                  истории, performed_at (не позже текущего момента) — ее время.
+    :param operator_name: Имя оператора.
+    :return: Список результатов по каждой позиции в исходном порядке.
+    """
+    if len(items) > BULK_COMPLETION_MAX_ITEMS:
+        raise ValueError(f"За один раз можно подтвердить не более {BULK_COMPLETION_MAX_ITEMS} позиций.")
+
+    part_ids = list({str(item.get('part_id') or '') for item in items} - {''})
+    parts = {}
+    progress = {}
+    if part_ids:
+        _lock_parts(part_ids)
+        parts = {part.part_id: part for part in Part.query.options(
+            selectinload(Part.route_template).selectinload(RouteTemplate.stages).joinedload(RouteStage.stage)
+        ).filter(Part.part_id.in_(part_ids))}
+        # Счетчики всех деталей пакета одним запросом после блокировки; дальше они изменяются в памяти
+        progress = {(row.part_id, row.stage_name): row for row in
+                    PartStageProgress.query.filter(PartStageProgress.part_id.in_(part_ids)).populate_existing()}
+
+    def completed_on(part_id, stage_name):
+        row = progress.get((part_id, stage_name))
+        return row.quantity_completed if row else 0
+
+    now = datetime.now(timezone.utc)
+    results = []
+    touched = {}
+    history_entries = []
+    for item in items:
+        part = parts.get(str(item.get('part_id') or ''))
+        if part is None:
+            results.append(_bulk_item_error(item, "Деталь не найдена."))
+            continue
+        route_stages = sorted(part.route_template.stages, key=lambda s: s.order) if part.route_template else []
+        if item.get('stage_id'):
+            stage = next((rs.stage for rs in route_stages if rs.stage_id == item['stage_id']), None)
+            if stage is None:
+                results.append(_bulk_item_error(item, "Этап не входит в маршрут детали."))
+                continue
+        else:
+            stage = next((rs.stage for rs in route_stages
+                          if completed_on(part.part_id, rs.stage.name) < part.quantity_total), None)
+            if stage is None:
+                results.append(_bulk_item_error(item, "Все этапы детали уже выполнены."))
+                continue
+
+        remaining = part.quantity_total - completed_on(part.part_id, stage.name)
+        quantity = remaining if item.get('quantity') is None else item['quantity']
+        if quantity <= 0 or quantity > remaining:
+            results.append(_bulk_item_error(
+                item, f"Нельзя выполнить {quantity} шт. На этапе '{stage.name}' осталось {remaining} шт."
+            ))
+            continue
+
+        history_entries.append(StatusHistory(
+            part_id=part.part_id,
+            status=stage.name,
+            operator_name=operator_name,
+            quantity=quantity,
+            status_type=StatusType.COMPLETED,
+            timestamp=min(item.get('performed_at') or now, now),
+            client_op_id=item.get('op_id')
+        ))
+        db.session.add(history_entries[-1])
+        row = progress.get((part.part_id, stage.name))
+        if row is None:
+            row = progress[(part.part_id, stage.name)] = PartStageProgress(
+                part_id=part.part_id, stage_name=stage.name, quantity_completed=0
+            )
+            db.session.add(row)
+        row.quantity_completed += quantity
+        part.current_status = stage.name
+        touched[part.part_id] = part
+        results.append({'op_id': item.get('op_id'), 'part_id': part.part_id, 'stage_id': stage.id, 'stage': stage.name,
+                        'quantity': quantity, 'status': 'ok', 'message': 'Выполнено.'})
+
+    if not touched:
+        db.session.rollback()  # Снимаем блокировки деталей
+        return results
+
+    for part in touched.values():
+        part.quantity_completed = _compute_quantity_completed(part, {
+            stage_name: row.quantity_completed for (part_id, stage_name), row in progress.items()
+            if part_id == part.part_id
+        })
+    update_assembly_progress(list(touched))
+    refresh_stage_durations(list(touched))
+    update_operator_rollups(history_entries)
+    db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
+
+    accepted = sum(1 for result in results if result['status'] == 'ok')
+    _send_websocket_notification(
+        'bulk_stage_completed',
+        f"Оператор {operator_name} подтвердил этапы: {accepted} поз. по {len(touched)} дет.",
+        {'parts': [{
+            'part_id': part.part_id,
+            'product_designation': part.product_designation,
+            'current_status': part.current_status,
+            'quantity_completed': part.quantity_completed,
+            'quantity_total': part.quantity_total,
+        } for part in touched.values()]}
+    )
+    return results
+
+
+def sync_offline_operations(operations, operator_name):
+    """
+    Идемпотентно применяет подтверждения этапов, накопленные офлайн-очередью
+    страницы сканирования. Уже записанные операции (по client_op_id) пропускаются
+    одним запросом к уникальному индексу, поэтому повторная отправка очереди
+    после обрыва связи не увеличивает счетчики повторно.
+    :param operations: Список словарей как в complete_stages_bulk с обязательным 'op_id'.
+    :param operator_name: Имя оператора.
+    :return: Список результатов в исходном порядке; повторы имеют статус 'duplicate'.
+    """
+    for attempt in range(SYNC_CONFLICT_RETRIES + 1):
+        op_ids = [operation['op_id'] for operation in operations]
+        recorded = {op_id for (op_id,) in db.session.query(StatusHistory.client_op_id)
+                    .filter(StatusHistory.client_op_id.in_(op_ids))}
+        fresh = {}
+        for operation in operations:
+            if operation['op_id'] not in recorded:
+                fresh.setdefault(operation['op_id'], operation)
+        try:
+            applied = {result['op_id']: result for result in complete_stages_bulk(list(fresh.values()), operator_name)}
+            break
+        except IntegrityError:
+            # Ту же операцию одновременно записал параллельный запрос (повтор клиента):
+            # откатываемся и пересчитываем набор новых операций
+            db.session.rollback()
+            if attempt == SYNC_CONFLICT_RETRIES:
+                raise
+
+    results = []
+    for operation in operations:
+        result = applied.get(operation['op_id'])
+        if result is None or fresh.get(operation['op_id']) is not operation:
+            results.append({'op_id': operation['op_id'], 'part_id': operation['part_id'],
+                            'stage_id': operation.get('stage_id'), 'status': 'duplicate',
+                            'message': 'Операция уже была учтена.'})
+        else:
+            results.append(result)
+    return results
 
 
 def scrap_part(part, stage, quantity, user, comment):
@@ -72,31 +375,42 @@ def scrap_part(part, stage, quantity, user, comment):
     :param user: Пользователь, отправивший в брак.
     :param comment: Причина брака.
     """
+    _lock_parts([part.part_id])
     # Сбрасываем историю, так как партия больше не в работе
-    StatusHistory.query.filter_by(part_id=part.part_id).delete()
+    history_query = StatusHistory.query.filter_by(part_id=part.part_id)
+    update_operator_rollups(history_query.all(), sign=-1)
+    history_query.delete()
+    _reset_stage_progress(part.part_id)
     
     part.quantity_scrapped = (part.quantity_scrapped or 0) + quantity
     part.quantity_completed = 0
     part.current_status = "В браке"
+    update_assembly_progress([part.part_id])
     
-    db.session.add(StatusHistory(
+    scrap_entry = StatusHistory(
         part_id=part.part_id,
         status=stage.name,
         operator_name=user.full_name or user.username,
         quantity=quantity,
         status_type=StatusType.SCRAPPED,
         comment=comment
-    ))
+    )
+    db.session.add(scrap_entry)
     
-    db.session.add(AuditLog(
+    log_action(
         part_id=part.part_id,
         user_id=user.id,
         action="Отправка в брак",
         details=f"Этап: {stage.name}. Причина: {comment}",
-        category='part'
-    ))
+        category='part',
+        durable=True
+    )
+    refresh_stage_durations([part.part_id])
+    update_operator_rollups([scrap_entry])
     
     db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
     _send_websocket_notification('part_updated', f"Деталь {part.part_id} отправлена в брак.", {'part_id': part.part_id})
 
 
@@ -123,34 +437,45 @@ def rework_part(part, current_stage, quantity, user, comment):
     # Определяем этапы, историю которых нужно "откатить"
     stages_to_revert_names = [rs.stage.name for rs in ordered_stages[current_stage_index-1:]]
     
+    _lock_parts([part.part_id])
     # Удаляем историю для откатываемых этапов
-    StatusHistory.query.filter(
+    history_query = StatusHistory.query.filter(
         StatusHistory.part_id == part.part_id,
         StatusHistory.status.in_(stages_to_revert_names)
-    ).delete()
+    )
+    update_operator_rollups(history_query.all(), sign=-1)
+    history_query.delete()
+    _reset_stage_progress(part.part_id, stages_to_revert_names)
 
     part.current_status = f"Доработка ({rework_to_stage.name})"
     
     # Добавляем запись о самой доработке
-    db.session.add(StatusHistory(
+    rework_entry = StatusHistory(
         part_id=part.part_id,
         status=current_stage.name,
         operator_name=user.full_name or user.username,
         quantity=quantity,
         status_type=StatusType.REWORK,
         comment=comment
-    ))
+    )
+    db.session.add(rework_entry)
     
-    db.session.add(AuditLog(
+    log_action(
         part_id=part.part_id,
         user_id=user.id,
         action="Отправка на доработку",
         details=f"Возврат на этап '{rework_to_stage.name}'. Причина: {comment}",
-        category='part'
-    ))
+        category='part',
+        durable=True
+    )
     
     _recalculate_part_progress(part)
+    update_assembly_progress([part.part_id])
+    refresh_stage_durations([part.part_id])
+    update_operator_rollups([rework_entry])
     db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
     
     _send_websocket_notification('part_updated', f"Деталь {part.part_id} отправлена на доработку.", {'part_id': part.part_id})
 
@@ -164,16 +489,23 @@ def cancel_stage_by_history_id(history_id, user):
     """
     history_entry = db.get_or_404(StatusHistory, history_id)
     part = history_entry.part
+    _lock_parts([part.part_id])
+    # Перечитываем запись после блокировки: параллельный запрос мог ее уже отменить
+    history_entry = db.get_or_404(StatusHistory, history_id, populate_existing=True)
     stage_name = history_entry.status
     
-    db.session.add(AuditLog(
+    log_action(
         part_id=part.part_id,
         user_id=user.id,
         action="Отмена этапа",
         details=f"Отменен этап: '{stage_name}' ({history_entry.quantity} шт.).",
-        category='part'
-    ))
+        category='part',
+        durable=True
+    )
     
+    if history_entry.status_type == StatusType.COMPLETED:
+        _apply_stage_progress(part.part_id, stage_name, -history_entry.quantity)
+    update_operator_rollups([history_entry], sign=-1)
     db.session.delete(history_entry)
     db.session.flush() # Применяем удаление, чтобы пересчет был корректным
     
@@ -185,8 +517,12 @@ def cancel_stage_by_history_id(history_id, user):
     ).order_by(StatusHistory.timestamp.desc()).first()
     
     part.current_status = new_last_history.status if new_last_history else 'На складе'
+    update_assembly_progress([part.part_id])
+    refresh_stage_durations([part.part_id])
     
     db.session.commit()
+    invalidate_product_summary()
+    invalidate_reports()
 
     # Рендерим новый HTML для прогресс-бара для отправки по WebSocket
     progress_html = render_template_string(
@@ -7,25 +7,79 @@ from PIL import Image
 from flask import render_template_string, url_for, current_app
 from flask_wtf.csrf import generate_csrf
 
+from sqlalchemy import exists
+
 from app import db, socketio
-from app.models import Permission
-from app.utils import to_safe_key, generate_qr_code_as_base64
+from app.models import Permission, Part, AssemblyComponent
+from app.utils import to_safe_key
+from app.services import qr_cache_service
+from app.services.notification_service import NotificationBatcher, ROOM_SCOPED_EVENTS, product_room
+
+_batcher = None
+
+
+def _emit_notification(payload: dict, room: str = None):
+    """Отправляет уведомление в комнату или всем клиентам (room=None)."""
+    try:
+        socketio.emit('notification', payload, to=room)
+    except RuntimeError:
+        print(f"WebSocket emit skipped (not in a Socket.IO server context): {payload.get('message')}")
+
+
+def _get_batcher() -> NotificationBatcher:
+    """Лениво создает общий для процесса накопитель уведомлений."""
+    global _batcher
+    if _batcher is None:
+        _batcher = NotificationBatcher(
+            _emit_notification,
+            window_ms=current_app.config.get('NOTIFICATION_BATCH_WINDOW_MS', 100),
+            start_task=socketio.start_background_task,
+            sleep=socketio.sleep
+        )
+    return _batcher
 
 
 def _send_websocket_notification(event_type: str, message: str, data: dict = None):
     """
     Централизованная функция для отправки WebSocket-уведомлений.
+    События строк деталей уходят только в комнату изделия, остальные — всем клиентам.
+    Уведомления накапливаются в коротком окне и объединяются (см. NotificationBatcher).
     :param event_type: Тип события (например, 'part_created').
     :param message: Текст уведомления.
     :param data: Словарь с дополнительными данными.
     """
-    try:
-        payload = {'event': event_type, 'message': message}
-        if data:
-            payload.update(data)
-        socketio.emit('notification', payload)
-    except RuntimeError:
-        print(f"WebSocket emit skipped (not in a Socket.IO server context): {message}")
+    payload = {'event': event_type, 'message': message}
+    if data:
+        payload.update(data)
+
+    room = None
+    if event_type in ROOM_SCOPED_EVENTS:
+        product_designation = payload.get('product_designation')
+        if not product_designation and payload.get('part_id'):
+            part = db.session.get(Part, payload['part_id'])
+            product_designation = part.product_designation if part else None
+        if product_designation:
+            payload['product_designation'] = product_designation
+            room = product_room(product_designation)
+
+    _get_batcher().add(payload, room)
+
+
+def update_top_level_flags(part_ids):
+    """
+    Пересчитывает признак is_top_level для указанных деталей по наличию у них родителей.
+    Выполняется в текущей транзакции после изменения связей AssemblyComponents.
+    :param part_ids: ID деталей, у которых могли измениться родительские связи.
+    """
+    part_ids = list(dict.fromkeys(part_ids))
+    if not part_ids:
+        return
+    db.session.flush()
+    has_parent = exists().where(AssemblyComponent.child_id == Part.part_id)
+    for i in range(0, len(part_ids), 1000):
+        db.session.query(Part).filter(Part.part_id.in_(part_ids[i:i + 1000])).update(
+            {Part.is_top_level: ~has_parent}, synchronize_session=False
+        )
 
 
 def save_part_drawing(file_storage, config):
@@ -88,23 +142,17 @@ def _render_part_row_html(part, user):
     )
 
 
-def get_parts_for_printing(part_ids):
+def get_parts_for_printing(part_ids, qr_format='png'):
     """
-    Получает детали по списку ID и генерирует для каждой QR-код в формате Base64.
+    Получает детали по списку ID и подбирает для каждой QR-код из кэша
+    (недостающие изображения рендерятся пакетно).
     :param part_ids: Список ID деталей.
-    :return: Список словарей, каждый из которых содержит объект Part и его QR-код.
+    :param qr_format: Формат изображений QR-кодов ('png' или 'svg').
+    :return: Список словарей, каждый из которых содержит объект Part и его QR-код (Data URI).
     """
     from app.models import Part
     
     parts = db.session.query(Part).filter(Part.part_id.in_(part_ids)).all()
-    
-    with current_app.app_context():
-        parts_for_print = [
-            {
-                'part': part,
-                'qr_image': generate_qr_code_as_base64(part.part_id)
-            }
-            for part in parts
-        ]
-        
-    return parts_for_print
\ No newline at end of file
+    qr_images = qr_cache_service.get_part_qr_data_uris([part.part_id for part in parts], qr_format)
+
+    return [{'part': part, 'qr_image': qr_images[part.part_id]} for part in parts]
\ No newline at end of file
@@ -0,0 +1,162 @@
+# app/services/qr_cache_service.py
+
+import os
+import base64
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+from app.utils import build_scan_url, render_qr_code
+
+
+QR_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+# Размер LRU-кэша изображений в памяти процесса по умолчанию
+DEFAULT_MEMORY_ITEMS = 4096
+# Меньше этого количества промахов рендерим в текущем процессе:
+# запуск задач в пуле дороже, чем несколько QR-кодов
+DEFAULT_POOL_THRESHOLD = 16
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _cache_key(url: str, fmt: str) -> str:
+    """Адрес в кэше определяется содержимым QR-кода и форматом изображения."""
+    return hashlib.sha256(f"{fmt}:{url}".encode('utf-8')).hexdigest()
+
+
+def _disk_path(key: str, fmt: str) -> str:
+    """Путь к файлу кэша; подкаталоги по первым символам ключа ограничивают размер каталогов."""
+    return os.path.join(current_app.config['QR_CACHE_FOLDER'], key[:2], f"{key}.{fmt}")
+
+
+def _memory_get(key: str):
+    """Читает изображение из LRU-кэша в памяти, отмечая его как недавно использованное."""
+    with _memory_lock:
+        data = _memory_cache.get(key)
+        if data is not None:
+            _memory_cache.move_to_end(key)
+        return data
+
+
+def _memory_put(key: str, data: bytes):
+    """Кладет изображение в LRU-кэш, вытесняя самые давно использованные записи."""
+    limit = current_app.config.get('QR_CACHE_MEMORY_ITEMS', DEFAULT_MEMORY_ITEMS)
+    with _memory_lock:
+        _memory_cache[key] = data
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > limit:
+            _memory_cache.popitem(last=False)
+
+
+def _disk_get(key: str, fmt: str):
+    """Читает изображение из кэша на диске или возвращает None."""
+    try:
+        with open(_disk_path(key, fmt), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _disk_put(key: str, fmt: str, data: bytes):
+    """Атомарно записывает изображение в кэш на диске (через временный файл)."""
+    path = _disk_path(key, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Лениво создает пул процессов для рендеринга QR-кодов."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: дочерние процессы не наследуют состояние eventlet и соединения с БД
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _render_missing(urls: list, fmt: str) -> list:
+    """
+    Рендерит изображения для промахов кэша в текущем процессе или, если пул
+    явно включен (QR_RENDER_WORKERS > 1), пакетом в пуле процессов.
+    """
+    workers = current_app.config.get('QR_RENDER_WORKERS') or 0
+    threshold = current_app.config.get('QR_RENDER_POOL_THRESHOLD', DEFAULT_POOL_THRESHOLD)
+    if workers > 1 and len(urls) >= threshold:
+        chunksize = max(1, len(urls) // (workers * 4))
+        return list(_get_pool(workers).map(render_qr_code, urls, [fmt] * len(urls), chunksize=chunksize))
+    return [render_qr_code(url, fmt) for url in urls]
+
+
+def get_qr_images(urls, fmt: str = 'png') -> dict:
+    """
+    Возвращает изображения QR-кодов для набора строк, используя кэш:
+    LRU в памяти -> файлы в instance/qr_cache -> рендеринг промахов.
+    :param urls: Итерируемый набор кодируемых строк.
+    :param fmt: Формат изображения ('png' или 'svg').
+    :return: Словарь {url: байты изображения}.
+    """
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат QR-кода: {fmt}")
+
+    images = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        key = _cache_key(url, fmt)
+        data = _memory_get(key)
+        if data is None:
+            data = _disk_get(key, fmt)
+            if data is not None:
+                _memory_put(key, data)
+        if data is None:
+            missing.append(url)
+        else:
+            images[url] = data
+
+    if missing:
+        for url, data in zip(missing, _render_missing(missing, fmt)):
+            key = _cache_key(url, fmt)
+            _disk_put(key, fmt, data)
+            _memory_put(key, data)
+            images[url] = data
+    return images
+
+
+def to_data_uri(data: bytes, fmt: str = 'png') -> str:
+    """Преобразует байты изображения в Data URI для вставки в <img src="...">."""
+    return f"data:{QR_FORMATS[fmt]};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def get_part_qr_data_uris(part_ids, fmt: str = 'png') -> dict:
+    """
+    Возвращает Data URI QR-кодов для списка деталей.
+    :param part_ids: Список ID деталей.
+    :param fmt: Формат изображения ('png' или 'svg').
+    :return: Словарь {part_id: Data URI}.
+    """
+    urls = {part_id: build_scan_url(part_id) for part_id in part_ids}
+    images = get_qr_images(urls.values(), fmt)
+    return {part_id: to_data_uri(images[url], fmt) for part_id, url in urls.items()}
+
+
+def get_part_qr_image(part_id, fmt: str = 'png') -> bytes:
+    """Возвращает изображение QR-кода одной детали из кэша."""
+    url = build_scan_url(part_id)
+    return get_qr_images([url], fmt)[url]
+
+
+def clear_memory_cache():
+    """Очищает LRU-кэш в памяти процесса (файлы на диске не затрагиваются)."""
+    with _memory_lock:
+        _memory_cache.clear()
@@ -0,0 +1,223 @@
+# app/services/qr_label_service.py
+
+import io
+import os
+import zlib
+from PIL import Image, ImageDraw, ImageFont
+from flask import current_app
+
+from app import db
+from app.models import Part
+from app.services import qr_cache_service
+from app.utils import build_scan_url
+
+
+MM_PER_INCH = 25.4
+POINTS_PER_INCH = 72
+# Шрифты с кириллицей, которые ищутся, если LABEL_FONT_PATH не задан
+FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf',
+]
+# Ограничения сетки, задаваемой из запроса
+MAX_LABEL_COLUMNS = 10
+MAX_LABEL_ROWS = 20
+
+
+def get_label_layout(columns=None, rows=None) -> dict:
+    """
+    Возвращает параметры листа этикеток из конфигурации приложения.
+    Количество колонок и строк можно переопределить (в разумных пределах).
+    :param columns: Количество колонок этикеток на листе.
+    :param rows: Количество строк этикеток на листе.
+    :return: Словарь с размерами листа, полей и сетки.
+    """
+    config = current_app.config
+    layout = {
+        'page_width_mm': config.get('QR_LABEL_PAGE_WIDTH_MM', 210),
+        'page_height_mm': config.get('QR_LABEL_PAGE_HEIGHT_MM', 297),
+        'margin_mm': config.get('QR_LABEL_MARGIN_MM', 8),
+        'gap_mm': config.get('QR_LABEL_GAP_MM', 2),
+        'columns': config.get('QR_LABEL_COLUMNS', 3),
+        'rows': config.get('QR_LABEL_ROWS', 8),
+        'dpi': config.get('QR_LABEL_DPI', 200),
+    }
+    if columns:
+        layout['columns'] = max(1, min(int(columns), MAX_LABEL_COLUMNS))
+    if rows:
+        layout['rows'] = max(1, min(int(rows), MAX_LABEL_ROWS))
+    layout['labels_per_page'] = layout['columns'] * layout['rows']
+    return layout
+
+
+def _load_font(size_px: int):
+    """Загружает TrueType-шрифт с поддержкой кириллицы или шрифт Pillow по умолчанию."""
+    configured = current_app.config.get('LABEL_FONT_PATH')
+    for path in ([configured] if configured else []) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size_px)
+    return ImageFont.load_default(size_px)
+
+
+def _fit_text(draw, text: str, font, max_width: int) -> str:
+    """Обрезает строку с многоточием, чтобы она поместилась в заданную ширину."""
+    text = text or ''
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    # Двоичный поиск самой длинной помещающейся части строки
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if draw.textlength(text[:middle] + '…', font=font) <= max_width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '…'
+
+
+def _iter_part_pages(part_ids, product_designation, per_page):
+    """
+    Постранично выдает данные деталей для этикеток (part_id, name, product_designation).
+    Для списка ID сохраняется порядок выбора, для изделия — порядок по part_id (keyset).
+    """
+    columns = (Part.part_id, Part.name, Part.product_designation)
+    if part_ids:
+        unique_ids = list(dict.fromkeys(part_ids))
+        for i in range(0, len(unique_ids), per_page):
+            chunk = unique_ids[i:i + per_page]
+            found = {row.part_id: row for row in db.session.query(*columns).filter(Part.part_id.in_(chunk))}
+            page = [found[part_id] for part_id in chunk if part_id in found]
+            if page:
+                yield page
+        return
+
+    last_part_id = None
+    while True:
+        query = db.session.query(*columns).filter(Part.product_designation == product_designation)
+        if last_part_id is not None:
+            query = query.filter(Part.part_id > last_part_id)
+        page = query.order_by(Part.part_id).limit(per_page).all()
+        if not page:
+            return
+        yield page
+        last_part_id = page[-1].part_id
+
+
+def _render_page(parts, layout, fonts) -> Image.Image:
+    """Рисует одну страницу листа этикеток в оттенках серого."""
+    px_per_mm = layout['dpi'] / MM_PER_INCH
+    width = round(layout['page_width_mm'] * px_per_mm)
+    height = round(layout['page_height_mm'] * px_per_mm)
+    margin = layout['margin_mm'] * px_per_mm
+    gap = layout['gap_mm'] * px_per_mm
+    cell_w = (width - 2 * margin - (layout['columns'] - 1) * gap) / layout['columns']
+    cell_h = (height - 2 * margin - (layout['rows'] - 1) * gap) / layout['rows']
+    padding = round(min(cell_w, cell_h) * 0.06)
+
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    qr_images = qr_cache_service.get_qr_images([build_scan_url(p.part_id) for p in parts], 'png')
+
+    for index, part in enumerate(parts):
+        row, col = divmod(index, layout['columns'])
+        x0 = round(margin + col * (cell_w + gap))
+        y0 = round(margin + row * (cell_h + gap))
+        x1, y1 = round(x0 + cell_w), round(y0 + cell_h)
+        draw.rectangle([x0, y0, x1, y1], outline=180, width=max(1, round(px_per_mm * 0.2)))
+
+        # QR-код масштабируется без сглаживания, чтобы модули оставались четкими
+        qr_size = max(1, min(y1 - y0, x1 - x0) - 2 * padding)
+        qr = Image.open(io.BytesIO(qr_images[build_scan_url(part.part_id)])).convert('L')
+        page.paste(qr.resize((qr_size, qr_size), Image.NEAREST), (x0 + padding, y0 + padding))
+
+        text_x = x0 + 2 * padding + qr_size
+        text_width = x1 - padding - text_x
+        if text_width <= 0:
+            continue
+        text_y = y0 + padding
+        for text, font in (
+            (part.name, fonts['title']),
+            (part.part_id, fonts['body']),
+            (f"Изделие: {part.product_designation}", fonts['small']),
+        ):
+            draw.text((text_x, text_y), _fit_text(draw, text, font, text_width), font=font, fill=0)
+            text_y += round(font.size * 1.3)
+    return page
+
+
+def _pdf_object(number: int, body: bytes, stream: bytes = None) -> bytes:
+    """Сериализует объект PDF (при необходимости — с потоком данных)."""
+    if stream is None:
+        return b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    return b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (number, body, stream)
+
+
+def stream_labels_pdf(part_ids=None, product_designation=None, layout=None):
+    """
+    Генератор многостраничного PDF с листами этикеток QR-кодов.
+    Детали читаются и страницы рисуются по одной, каждая страница сразу
+    отдается клиенту, поэтому память не зависит от количества этикеток.
+    :param part_ids: Список ID деталей (в порядке печати).
+    :param product_designation: Изделие, все детали которого нужно напечатать (если не задан part_ids).
+    :param layout: Параметры листа из get_label_layout().
+    """
+    layout = layout or get_label_layout()
+    px_per_mm = layout['dpi'] / MM_PER_INCH
+    cell_h_px = (layout['page_height_mm'] - 2 * layout['margin_mm']) * px_per_mm / layout['rows']
+    fonts = {
+        'title': _load_font(max(8, round(cell_h_px * 0.11))),
+        'body': _load_font(max(8, round(cell_h_px * 0.10))),
+        'small': _load_font(max(8, round(cell_h_px * 0.08))),
+    }
+    page_w_pt = layout['page_width_mm'] / MM_PER_INCH * POINTS_PER_INCH
+    page_h_pt = layout['page_height_mm'] / MM_PER_INCH * POINTS_PER_INCH
+
+    # Объекты 1 (каталог) и 2 (дерево страниц) записываются в конце, когда известен список страниц
+    offsets = {}
+    position = 0
+    page_numbers = []
+    next_number = 3
+
+    def write(number, data):
+        nonlocal position
+        offsets[number] = position
+        position += len(data)
+        return data
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header
+
+    pages = _iter_part_pages(part_ids, product_designation, layout['labels_per_page'])
+    for parts in pages:
+        image = _render_page(parts, layout, fonts)
+        image_number, content_number, page_number = next_number, next_number + 1, next_number + 2
+        next_number += 3
+
+        pixels = zlib.compress(image.tobytes(), 6)
+        yield write(image_number, _pdf_object(
+            image_number,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>" % (image.width, image.height, len(pixels)),
+            pixels
+        ))
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_w_pt, page_h_pt)
+        yield write(content_number, _pdf_object(content_number, b"<< /Length %d >>" % len(content), content))
+        yield write(page_number, _pdf_object(
+            page_number,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_w_pt, page_h_pt, image_number, content_number)
+        ))
+        page_numbers.append(page_number)
+
+    kids = b" ".join(b"%d 0 R" % number for number in page_numbers)
+    yield write(2, _pdf_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_numbers))))
+    yield write(1, _pdf_object(1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+
+    xref = [b"xref\n0 %d\n0000000000 65535 f \n" % next_number]
+    xref.extend(b"%010d 00000 n \n" % offsets[number] for number in range(1, next_number))
+    xref.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_number, position))
+    yield b"".join(xref)
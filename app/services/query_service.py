@@ -1,66 +1,463 @@
 # app/services/query_service.py
 
-from sqlalchemy.orm import joinedload
+import heapq
 from collections import namedtuple
+from datetime import datetime, timedelta
 from itertools import groupby
+from sqlalchemy import Integer, String, Text, and_, cast, func, literal, null, or_, select, union_all
+from sqlalchemy.orm import aliased, joinedload
 
 from app import db
 # --- ИЗМЕНЕНИЕ: Обновляем импорт, чтобы он соответствовал новой структуре моделей ---
 from app.models import (PartNote, StatusHistory, ResponsibleHistory, Stage,
-                        RouteStage)
+                        RouteStage, User, AuditLog, Part)
+from app.services import archive_service, search_service
+
+
+# Размер страницы ленты истории по умолчанию и максимальный размер
+HISTORY_PAGE_SIZE = 50
+HISTORY_PAGE_SIZE_MAX = 200
+# Размер страницы журнала аудита
+AUDIT_PAGE_SIZE = 25
+# До этого количества записей журнал считается точно, дальше показывается оценка
+AUDIT_COUNT_EXACT_LIMIT = 10000
+# Размер страницы полнотекстового поиска по текстам по умолчанию и максимальный
+TEXT_SEARCH_PAGE_SIZE = 25
+TEXT_SEARCH_PAGE_SIZE_MAX = 100
+
+
+def encode_history_cursor(item):
+    """Курсор ленты истории: ключ сортировки последнего показанного события."""
+    return f"{item['timestamp'].isoformat()}|{item['type']}|{item['id']}"
+
+
+def _decode_history_cursor(cursor):
+    """Разбирает курсор ленты истории в кортеж (timestamp, тип, id)."""
+    try:
+        timestamp, kind, item_id = cursor.split('|')
+        return datetime.fromisoformat(timestamp), kind, int(item_id)
+    except (AttributeError, ValueError):
+        raise ValueError("Некорректный курсор истории.")
+
+
+def _before_cursor(kind, timestamp_column, id_column, cursor):
+    """
+    Условие keyset-пагинации для одной ветви UNION ALL: (timestamp, тип, id) < курсора.
+    Тип события в ветви постоянен, поэтому условие сводится к сравнению по
+    (part_id, timestamp), которое обслуживается составным индексом таблицы.
+    """
+    cursor_timestamp, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        return timestamp_column <= cursor_timestamp
+    if kind > cursor_kind:
+        return timestamp_column < cursor_timestamp
+    return or_(timestamp_column < cursor_timestamp,
+               and_(timestamp_column == cursor_timestamp, id_column < cursor_id))
+
+
+def _timeline_branch(kind, model, columns, part_id, cursor, limit, joins=()):
+    """
+    Одна ветвь ленты истории: события одного типа для детали от новых к старым.
+    Каждая ветвь ограничивается отдельно, чтобы база читала из каждой таблицы
+    не больше одной страницы событий.
+    """
+    query = select(literal(kind, String).label('type'), model.id.label('id'),
+                   model.timestamp.label('timestamp'), *columns)
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+    query = query.where(model.part_id == part_id)
+    if cursor:
+        query = query.where(_before_cursor(kind, model.timestamp, model.id, cursor))
+    query = query.order_by(model.timestamp.desc(), model.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return select(query.subquery())
+
+
+def _timeline_item(row):
+    """Преобразует строку ленты в словарь события для шаблона."""
+    item = {'type': row.type, 'id': row.id, 'timestamp': row.timestamp, 'stage': row.stage}
+    if row.type == 'status':
+        item.update({
+            'user': row.user,
+            'details': f"Этап '{row.stage}' выполнен. Количество: {row.quantity} шт.",
+            'comment': row.comment,
+            'status_type': row.status_type,
+        })
+    elif row.type == 'note':
+        item.update({'user': row.user or 'Система', 'details': row.text, 'author_id': row.author_id})
+    else:
+        item.update({
+            'user': 'Система',  # Это системное событие
+            'details': f"Назначен новый ответственный: {row.text}" if row.text else "Ответственный снят.",
+        })
+    return item
+
+
+def get_history_page(part_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Возвращает страницу ленты истории детали (смена статусов, примечания,
+    смена ответственных), от новых событий к старым, одним запросом UNION ALL.
+    Пагинация курсорная (keyset) по (timestamp, тип, id), поэтому стоимость
+    запроса зависит от размера страницы, а не от длины всей истории.
+    :param part_id: ID детали.
+    :param cursor: Курсор из предыдущей страницы (next_cursor) или None.
+    :param limit: Размер страницы; None — вся история.
+    :return: Словарь {'items': список событий, 'next_cursor': курсор или None}.
+    """
+    position = _decode_history_cursor(cursor) if cursor else None
+    branch_limit = limit + 1 if limit is not None else None
+    author = aliased(User)
+    assignee = aliased(User)
+
+    timeline = union_all(
+        _timeline_branch('status', StatusHistory, [
+            StatusHistory.operator_name.label('user'),
+            StatusHistory.status.label('stage'),
+            cast(null(), Text).label('text'),
+            StatusHistory.comment.label('comment'),
+            cast(StatusHistory.status_type, String).label('status_type'),
+            StatusHistory.quantity.label('quantity'),
+            cast(null(), Integer).label('author_id'),
+        ], part_id, position, branch_limit),
+        _timeline_branch('note', PartNote, [
+            author.username.label('user'),
+            Stage.name.label('stage'),
+            PartNote.text.label('text'),
+            cast(null(), Text).label('comment'),
+            cast(null(), String).label('status_type'),
+            cast(null(), Integer).label('quantity'),
+            PartNote.user_id.label('author_id'),
+        ], part_id, position, branch_limit,
+            joins=[(author, author.id == PartNote.user_id), (Stage, Stage.id == PartNote.stage_id)]),
+        _timeline_branch('responsible', ResponsibleHistory, [
+            cast(null(), String).label('user'),
+            cast(null(), String).label('stage'),
+            assignee.username.label('text'),
+            cast(null(), Text).label('comment'),
+            cast(null(), String).label('status_type'),
+            cast(null(), Integer).label('quantity'),
+            cast(null(), Integer).label('author_id'),
+        ], part_id, position, branch_limit,
+            joins=[(assignee, assignee.id == ResponsibleHistory.user_id)]),
+    ).subquery('timeline')
+
+    query = select(timeline).order_by(timeline.c.timestamp.desc(), timeline.c.type.desc(), timeline.c.id.desc())
+    if branch_limit is not None:
+        query = query.limit(branch_limit)
+    items = [_timeline_item(row) for row in db.session.execute(query)]
+
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_history_cursor(items[-1])
+    return {'items': items, 'next_cursor': next_cursor}
 
 
 def get_combined_history(part):
     """
-    Собирает, объединяет и сортирует по дате всю историю, связанную с деталью:
-    смену статусов, смену ответственных и примечания.
+    Возвращает всю историю детали (смену статусов, смену ответственных
+    и примечания), отсортированную от новых событий к старым.
+    Для страниц используйте get_history_page: она читает только одну страницу.
     :param part: Экземпляр Part.
     :return: Отсортированный список всех исторических событий.
     """
-    # Загружаем все связанные истории одним махом для производительности
-    notes = PartNote.query.options(joinedload(PartNote.author), joinedload(PartNote.stage)).filter_by(part_id=part.part_id).all()
-    status_changes = StatusHistory.query.filter_by(part_id=part.part_id).all()
-    responsible_changes = ResponsibleHistory.query.options(joinedload(ResponsibleHistory.user)).filter_by(part_id=part.part_id).all()
+    return get_history_page(part.part_id, limit=None)['items']
 
-    combined = []
-    
-    # Добавляем примечания
-    for note in notes:
-        combined.append({
-            'type': 'note',
-            'timestamp': note.timestamp,
-            'user': note.author.username if note.author else 'Система',
-            'details': note.text,
-            'stage': note.stage.name if note.stage else None,
-            'id': note.id
-        })
-        
-    # Добавляем смену статусов
-    for change in status_changes:
-        combined.append({
-            'type': 'status',
-            'timestamp': change.timestamp,
-            'user': change.operator_name,
-            'details': f"Этап '{change.status}' выполнен. Количество: {change.quantity} шт.",
-            'stage': change.status,
-            'comment': change.comment,
-            'status_type': change.status_type.name,
-            'id': change.id
-        })
 
-    # Добавляем смену ответственных
-    for change in responsible_changes:
-        details_text = f"Назначен новый ответственный: {change.user.username}" if change.user else "Ответственный снят."
-        combined.append({
-            'type': 'responsible',
-            'timestamp': change.timestamp,
-            'user': 'Система', # Это системное событие
-            'details': details_text,
-            'stage': None
-        })
+def encode_audit_cursor(log):
+    """Курсор журнала аудита: ключ сортировки (timestamp, id) записи на границе страницы."""
+    return f"{log.timestamp.isoformat()}|{log.id}"
+
+
+def _decode_audit_cursor(cursor):
+    """Разбирает курсор журнала аудита в кортеж (timestamp, id)."""
+    try:
+        timestamp, log_id = cursor.split('|')
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (AttributeError, ValueError):
+        raise ValueError("Некорректный курсор журнала.")
+
+
+def _audit_conditions(date_from=None, date_to=None, user_id=None, part_id=None):
+    """Условия фильтров журнала аудита (конечная дата включается целиком)."""
+    conditions = []
+    if date_from:
+        conditions.append(AuditLog.timestamp >= date_from)
+    if date_to:
+        conditions.append(AuditLog.timestamp < date_to + timedelta(days=1))
+    if user_id:
+        conditions.append(AuditLog.user_id == user_id)
+    if part_id:
+        conditions.append(AuditLog.part_id == part_id)
+    return conditions
+
+
+def _audit_branch(category, conditions, position, newer, limit):
+    """
+    Ключи одной страницы журнала для одной категории. Каждая категория читается
+    отдельным диапазоном индекса (category, timestamp, id) с собственным LIMIT.
+    :param newer: True — записи новее курсора (назад), False — старее (вперед).
+    """
+    query = select(AuditLog.id.label('id'), AuditLog.timestamp.label('timestamp'))\
+        .where(AuditLog.category == category, *conditions)
+    if position:
+        cursor_timestamp, cursor_id = position
+        if newer:
+            query = query.where(or_(AuditLog.timestamp > cursor_timestamp,
+                                    and_(AuditLog.timestamp == cursor_timestamp, AuditLog.id > cursor_id)))
+        else:
+            query = query.where(or_(AuditLog.timestamp < cursor_timestamp,
+                                    and_(AuditLog.timestamp == cursor_timestamp, AuditLog.id < cursor_id)))
+    if newer:
+        query = query.order_by(AuditLog.timestamp.asc(), AuditLog.id.asc())
+    else:
+        query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+    return select(query.limit(limit).subquery())
+
+
+def _explain_sql(statement, dialect):
+    """
+    SQL и параметры EXPLAIN для запроса. Раскрывающиеся параметры (IN-списки)
+    подставляются при компиляции: exec_driver_sql их сам не раскрывает.
+    """
+    compiled = statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+
+
+def _planner_row_estimate(statement):
+    """Оценка числа строк запроса по статистике планировщика PostgreSQL (EXPLAIN, без выполнения)."""
+    sql, params = _explain_sql(statement, db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql(sql, params).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _audit_count_statement(categories, conditions):
+    """Выборка записей журнала для подсчета в заголовке страницы."""
+    return select(AuditLog.id).where(AuditLog.category.in_(categories), *conditions)
+
+
+def count_audit_entries(categories, conditions):
+    """
+    Количество записей журнала для заголовка страницы без полного COUNT(*).
+    Небольшие выборки считаются точно (COUNT по не более чем AUDIT_COUNT_EXACT_LIMIT
+    строкам); на PostgreSQL большие выборки оцениваются планировщиком.
+    :return: Словарь {'value': число, 'qualifier': '' (точно), '≈' (оценка) или 'более'}.
+    """
+    statement = _audit_count_statement(categories, conditions)
+    if db.engine.name == 'postgresql':
+        estimate = _planner_row_estimate(statement)
+        if estimate > AUDIT_COUNT_EXACT_LIMIT:
+            return {'value': estimate, 'qualifier': '≈'}
+    value = db.session.scalar(select(func.count()).select_from(statement.limit(AUDIT_COUNT_EXACT_LIMIT + 1).subquery()))
+    if value > AUDIT_COUNT_EXACT_LIMIT:
+        return {'value': AUDIT_COUNT_EXACT_LIMIT, 'qualifier': 'более'}
+    return {'value': value, 'qualifier': ''}
+
+
+def _archived_audit_keys(categories, position, newer, limit, hot_exhausted, filters):
+    """
+    Ключи архивных записей журнала для страницы: (timestamp, id, запись).
+    Архив читается, только если страница до него доходит: при движении к старым
+    записям — когда записи в базе закончились, к новым — когда курсор в архиве.
+    :param filters: Фильтры периода (date_to — не включая), пользователя и детали.
+    """
+    horizon = archive_service.archive_horizon()
+    if horizon is None or (filters['date_from'] and filters['date_from'] >= horizon):
+        return []
+    if newer and (not position or position >= (horizon, 0)):
+        return []
+    if not newer and not hot_exhausted:
+        return []
+
+    # Месяцы идут от курсора вглубь архива: следующий месяц уже не может улучшить набранную страницу
+    select_page = heapq.nsmallest if newer else heapq.nlargest
+    page = []
+    for entries in archive_service.iter_archived_audit_months(categories, position, newer, **filters):
+        page = select_page(limit, page + [(entry['timestamp'], entry['id'], entry) for entry in entries],
+                           key=lambda key: key[:2])
+        if len(page) >= limit:
+            break
+    return page
+
+
+def _archived_audit_items(entries):
+    """Архивные записи журнала с пользователями и признаком существования детали."""
+    user_ids = {entry['user_id'] for entry in entries if entry['user_id']}
+    part_ids = {entry['part_id'] for entry in entries if entry['part_id']}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    existing = set(db.session.scalars(select(Part.part_id).where(Part.part_id.in_(part_ids)))) if part_ids else set()
+    return {
+        entry['id']: (
+            archive_service.ArchivedAuditLog(**entry, user=users.get(entry['user_id'])),
+            entry['part_id'] if entry['part_id'] in existing else None
+        )
+        for entry in entries
+    }
+
+
+def get_audit_log_page(categories, cursor=None, newer=False, limit=AUDIT_PAGE_SIZE,
+                       date_from=None, date_to=None, user_id=None, part_id=None):
+    """
+    Возвращает страницу журнала аудита от новых записей к старым.
+    Пагинация курсорная (keyset) по (timestamp, id): глубокие страницы стоят
+    столько же, сколько первая. Сначала выбираются ключи страницы (по ветви
+    UNION ALL на категорию), затем сами записи с пользователями и признаком
+    существования детали — только для строк страницы. Записи, перенесенные
+    в архив (archive_service), продолжают журнал после записей из базы.
+    :param categories: Категории записей (например, ['part']).
+    :param cursor: Курсор границы страницы (next_cursor или prev_cursor) или None.
+    :param newer: True — страница записей новее курсора, False — старее.
+    :param limit: Размер страницы.
+    :return: Словарь {'items': [(AuditLog или ArchivedAuditLog, part_id существующей детали или None)],
+             'next_cursor', 'prev_cursor', 'count'}.
+    :raises ValueError: При некорректном курсоре.
+    """
+    position = _decode_audit_cursor(cursor) if cursor else None
+    conditions = _audit_conditions(date_from, date_to, user_id, part_id)
+    keys = union_all(*[
+        _audit_branch(category, conditions, position, newer, limit + 1) for category in categories
+    ]).subquery('audit_keys')
+    keys_query = select(keys.c.timestamp, keys.c.id)
+    if newer:
+        keys_query = keys_query.order_by(keys.c.timestamp.asc(), keys.c.id.asc())
+    else:
+        keys_query = keys_query.order_by(keys.c.timestamp.desc(), keys.c.id.desc())
+    page_keys = [(row.timestamp, row.id, None) for row in db.session.execute(keys_query.limit(limit + 1))]
+
+    archive_filters = {'date_from': date_from, 'date_to': date_to + timedelta(days=1) if date_to else None,
+                       'user_id': user_id, 'part_id': part_id}
+    archived = _archived_audit_keys(categories, position, newer, limit + 1, len(page_keys) <= limit, archive_filters)
+    if archived:
+        page_keys = sorted(page_keys + archived, key=lambda key: key[:2], reverse=not newer)[:limit + 1]
+
+    has_more = len(page_keys) > limit
+    if newer and not has_more:
+        # Новее курсора меньше полной страницы: показываем первую страницу целиком
+        return get_audit_log_page(categories, limit=limit, date_from=date_from, date_to=date_to,
+                                  user_id=user_id, part_id=part_id)
+    page_keys = page_keys[:limit]
+    if newer:
+        page_keys.reverse()
+
+    ids = [log_id for _, log_id, entry in page_keys if entry is None]
+    rows = db.session.query(AuditLog, Part.part_id).outerjoin(Part, AuditLog.part_id == Part.part_id)\
+        .options(joinedload(AuditLog.user)).filter(AuditLog.id.in_(ids)).all() if ids else []
+    by_id = {log.id: (log, existing_part_id) for log, existing_part_id in rows}
+    archived_by_id = _archived_audit_items([entry for _, _, entry in page_keys if entry is not None])
+    items = [archived_by_id[log_id] if entry is not None else by_id[log_id]
+             for _, log_id, entry in page_keys if entry is not None or log_id in by_id]
+
+    count = count_audit_entries(categories, conditions)
+    if archive_service.archive_horizon() is not None:
+        count['value'] += archive_service.count_archived_audit_logs(categories, **archive_filters)
+
+    has_older = True if newer else has_more
+    has_newer = True if newer else position is not None
+    return {
+        'items': items,
+        'next_cursor': encode_audit_cursor(items[-1][0]) if items and has_older else None,
+        'prev_cursor': encode_audit_cursor(items[0][0]) if items and has_newer else None,
+        'count': count,
+    }
+
+
+def _text_search_branch(kind, model, columns, match, conditions, position, limit, joins=()):
+    """
+    Одна ветвь поиска по текстам: найденные записи одного типа от новых к старым.
+    Совпадения отбираются поисковым индексом, каждая ветвь ограничивается отдельно.
+    """
+    query = select(literal(kind, String).label('type'), model.id.label('id'),
+                   model.timestamp.label('timestamp'), model.part_id.label('part_id'), *columns)
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+    query = query.where(match, *conditions)
+    if position:
+        query = query.where(_before_cursor(kind, model.timestamp, model.id, position))
+    return select(query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit).subquery())
+
+
+def get_text_search_page(query, cursor=None, limit=TEXT_SEARCH_PAGE_SIZE,
+                         date_from=None, date_to=None, stage_id=None):
+    """
+    Полнотекстовый поиск по примечаниям к деталям, комментариям к операциям и
+    подробностям журнала аудита. Результаты идут от новых к старым с курсорной
+    пагинацией по (timestamp, тип, id), как лента истории детали. Записи журнала,
+    перенесенные в архив, не ищутся.
+    :param query: Строка поиска.
+    :param cursor: Курсор из предыдущей страницы (next_cursor) или None.
+    :param limit: Размер страницы.
+    :param date_from: Начало периода или None.
+    :param date_to: Последний день периода (включается целиком) или None.
+    :param stage_id: ID этапа или None; при фильтре по этапу журнал аудита не ищется.
+    :return: Словарь {'items': список найденных записей, 'next_cursor': курсор или None}.
+    :raises ValueError: При некорректном курсоре или несуществующем этапе.
+    """
+    position = _decode_history_cursor(cursor) if cursor else None
+    terms = search_service.text_search_terms(query)
+    if not terms:
+        return {'items': [], 'next_cursor': None}
+    stage = None
+    if stage_id:
+        stage = db.session.get(Stage, stage_id)
+        if stage is None:
+            raise ValueError("Этап не найден.")
+
+    def period(model):
+        conditions = []
+        if date_from:
+            conditions.append(model.timestamp >= date_from)
+        if date_to:
+            conditions.append(model.timestamp < date_to + timedelta(days=1))
+        return conditions
+
+    author = aliased(User)
+    branches = [
+        _text_search_branch('status', StatusHistory, [
+            StatusHistory.comment.label('text'),
+            StatusHistory.status.label('stage'),
+            StatusHistory.operator_name.label('user'),
+            cast(null(), String).label('action'),
+        ], search_service.text_search_filter('status', query),
+            period(StatusHistory) + ([StatusHistory.status == stage.name] if stage else []), position, limit + 1),
+        _text_search_branch('note', PartNote, [
+            PartNote.text.label('text'),
+            Stage.name.label('stage'),
+            author.username.label('user'),
+            cast(null(), String).label('action'),
+        ], search_service.text_search_filter('note', query),
+            period(PartNote) + ([PartNote.stage_id == stage.id] if stage else []), position, limit + 1,
+            joins=[(author, author.id == PartNote.user_id), (Stage, Stage.id == PartNote.stage_id)]),
+    ]
+    if stage is None:
+        branches.append(_text_search_branch('audit', AuditLog, [
+            AuditLog.details.label('text'),
+            cast(null(), String).label('stage'),
+            author.username.label('user'),
+            AuditLog.action.label('action'),
+        ], search_service.text_search_filter('audit', query), period(AuditLog), position, limit + 1,
+            joins=[(author, author.id == AuditLog.user_id)]))
+    found = union_all(*branches).subquery('found')
+    rows = db.session.execute(
+        select(found).order_by(found.c.timestamp.desc(), found.c.type.desc(), found.c.id.desc()).limit(limit + 1)
+    ).all()
 
-    # Сортируем все события по дате в обратном порядке (самые новые вверху)
-    return sorted(combined, key=lambda x: x['timestamp'], reverse=True)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    part_ids = {row.part_id for row in rows if row.part_id}
+    existing = set(db.session.scalars(select(Part.part_id).where(Part.part_id.in_(part_ids)))) if part_ids else set()
+    items = [{
+        'type': row.type,
+        'id': row.id,
+        'timestamp': row.timestamp,
+        'part_id': row.part_id,
+        'part_exists': row.part_id in existing,
+        'stage': row.stage,
+        'user': row.user,
+        'action': row.action,
+        'snippet': search_service.snippet(row.text, terms),
+    } for row in rows]
+    return {'items': items, 'next_cursor': encode_history_cursor(items[-1]) if has_more else None}
 
 
 def get_stages_query():
@@ -0,0 +1,320 @@
+# app/services/report_service.py
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import Part, StatusHistory, StatusType, StageDuration, OperatorActivityRollup
+from app.services import cache_service
+
+
+# Пространство имен кэша результатов API отчетов; его поколение — версия истории статусов
+REPORTS_CACHE = 'reports'
+# Сколько деталей обрабатывается за один шаг полной пересборки фактов
+REBUILD_BATCH_SIZE = 500
+# Корзины, которые хранятся в OperatorActivityRollups
+ROLLUP_GRANULARITIES = ('hour', 'day')
+# Шаги временного ряда в отчете: недели и месяцы собираются из суточных корзин
+REPORT_GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Почасовой ряд строится не более чем за этот период (дней)
+HOURLY_REPORT_MAX_DAYS = 31
+# Период временного ряда по умолчанию (дней)
+DEFAULT_ACTIVITY_DAYS = 30
+# Сколько записей истории читается за раз при пересборке агрегатов
+ROLLUP_REBUILD_YIELD = 5000
+
+
+def invalidate_reports():
+    """
+    Увеличивает версию истории: закэшированные результаты отчетов становятся устаревшими.
+    Вызывается после фиксации транзакции, изменившей StatusHistory или детали.
+    """
+    cache_service.invalidate(REPORTS_CACHE)
+
+
+def _as_naive_utc(value):
+    """Приводит время к наивному UTC — так оно хранится в столбцах DateTime без часового пояса."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _build_part_facts(part, events):
+    """
+    Строит факты длительности этапов детали по ее истории.
+    Длительность этапа — время от предыдущего события детали любого типа
+    (или от добавления детали) до записи о выполнении этапа.
+    :param part: Строка (part_id, product_designation, date_added).
+    :param events: События истории детали в хронологическом порядке.
+    :return: Список словарей для вставки в StageDurations.
+    """
+    facts = []
+    previous = _as_naive_utc(part.date_added)
+    for event in events:
+        finished_at = _as_naive_utc(event.timestamp)
+        if event.status_type == StatusType.COMPLETED:
+            started_at = previous if previous is not None else finished_at
+            facts.append({
+                'history_id': event.id,
+                'part_id': part.part_id,
+                'product_designation': part.product_designation,
+                'stage_name': event.status,
+                'finished_at': finished_at,
+                'duration_seconds': max((finished_at - started_at).total_seconds(), 0.0),
+                'quantity': event.quantity,
+            })
+        previous = finished_at
+    return facts
+
+
+def _insert_facts_for_parts(part_ids):
+    """Вычисляет и вставляет факты для набора деталей (без удаления старых). :return: Количество фактов."""
+    parts = db.session.query(Part.part_id, Part.product_designation, Part.date_added)\
+        .filter(Part.part_id.in_(part_ids)).all()
+    events = db.session.query(
+        StatusHistory.id, StatusHistory.part_id, StatusHistory.status, StatusHistory.status_type,
+        StatusHistory.timestamp, StatusHistory.quantity
+    ).filter(StatusHistory.part_id.in_(part_ids))\
+        .order_by(StatusHistory.part_id, StatusHistory.timestamp, StatusHistory.id).all()
+    events_by_part = {part_id: list(rows) for part_id, rows in groupby(events, key=lambda row: row.part_id)}
+
+    facts = []
+    for part in parts:
+        facts.extend(_build_part_facts(part, events_by_part.get(part.part_id, [])))
+    if facts:
+        db.session.execute(insert(StageDuration), facts)
+    return len(facts)
+
+
+def refresh_stage_durations(part_ids):
+    """
+    Пересчитывает факты длительности этапов указанных деталей по их истории.
+    Вызывается в транзакции, изменяющей StatusHistory (до commit). Длительность
+    зависит от предыдущего события, поэтому после отмены или записи задним числом
+    пересчитываются все факты детали — это O(истории детали), а не всей таблицы.
+    :param part_ids: Список ID деталей, история которых изменилась.
+    :return: Количество фактов по этим деталям.
+    """
+    part_ids = list(dict.fromkeys(part_ids))
+    if not part_ids:
+        return 0
+    db.session.flush()
+    StageDuration.query.filter(StageDuration.part_id.in_(part_ids)).delete(synchronize_session='fetch')
+    return _insert_facts_for_parts(part_ids)
+
+
+def rebuild_stage_durations():
+    """
+    Полностью пересобирает таблицу фактов StageDurations из StatusHistory
+    (пакетами деталей в порядке part_id).
+    :return: Количество созданных фактов.
+    """
+    db.session.query(StageDuration).delete()
+    total = 0
+    last_part_id = None
+    while True:
+        query = db.session.query(Part.part_id)
+        if last_part_id is not None:
+            query = query.filter(Part.part_id > last_part_id)
+        part_ids = [part_id for (part_id,) in query.order_by(Part.part_id).limit(REBUILD_BATCH_SIZE)]
+        if not part_ids:
+            break
+        total += _insert_facts_for_parts(part_ids)
+        last_part_id = part_ids[-1]
+    db.session.commit()
+    invalidate_reports()
+    return total
+
+
+def _filter_period(query, column, date_from=None, date_to=None):
+    """Ограничивает запрос периодом [date_from, date_to]; конечная дата включается целиком."""
+    if date_from:
+        query = query.filter(column >= date_from)
+    if date_to:
+        query = query.filter(column < date_to + timedelta(days=1))
+    return query
+
+
+def _bucket_start(timestamp, granularity):
+    """Начало часовой или суточной корзины (UTC), в которую попадает момент времени."""
+    timestamp = _as_naive_utc(timestamp)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_deltas(entries, sign):
+    """Группирует записи истории по ключам агрегатов: {ключ: [записей, изделий]}."""
+    deltas = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (granularity, _bucket_start(entry.timestamp, granularity),
+                   entry.operator_name, entry.status, entry.status_type)
+            deltas[key][0] += sign
+            deltas[key][1] += sign * (entry.quantity or 0)
+    return deltas
+
+
+def _upsert_rollups(deltas):
+    """
+    Прибавляет приращения к агрегатам одним INSERT ... ON CONFLICT DO UPDATE.
+    Атомарное прибавление на стороне БД не теряет приращения параллельных
+    транзакций, которые обновляют одну корзину для разных деталей.
+    """
+    if not deltas:
+        return
+    table = OperatorActivityRollup.__table__
+    dialect_insert = postgresql.insert if db.engine.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key.columns],
+        set_={
+            'entries_count': table.c.entries_count + statement.excluded.entries_count,
+            'quantity': table.c.quantity + statement.excluded.quantity,
+        }
+    )
+    db.session.execute(statement, [{
+        'granularity': granularity,
+        'bucket_start': bucket_start,
+        'operator_name': operator_name,
+        'stage_name': stage_name,
+        'status_type': status_type,
+        'entries_count': entries_count,
+        'quantity': quantity,
+    } for (granularity, bucket_start, operator_name, stage_name, status_type), (entries_count, quantity)
+        in deltas.items()])
+
+
+def update_operator_rollups(entries, sign=1):
+    """
+    Инкрементально обновляет почасовые и суточные агрегаты операторов.
+    Вызывается в транзакции, изменяющей StatusHistory (до commit).
+    :param entries: Добавленные (sign=1) или удаляемые (sign=-1) записи StatusHistory.
+    :param sign: Направление изменения.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    if any(entry.timestamp is None or entry.status_type is None for entry in entries):
+        db.session.flush()  # Значения по умолчанию (время, тип записи) назначаются при сохранении
+    _upsert_rollups(_rollup_deltas(entries, sign))
+
+
+def rebuild_operator_rollups():
+    """
+    Полностью пересобирает агрегаты операторов из StatusHistory.
+    :return: Количество созданных записей агрегатов.
+    """
+    db.session.query(OperatorActivityRollup).delete()
+    rows = db.session.query(
+        StatusHistory.operator_name, StatusHistory.status, StatusHistory.status_type,
+        StatusHistory.timestamp, StatusHistory.quantity
+    ).filter(StatusHistory.timestamp.isnot(None)).yield_per(ROLLUP_REBUILD_YIELD)
+    deltas = _rollup_deltas(rows, 1)
+    _upsert_rollups(deltas)
+    db.session.commit()
+    invalidate_reports()
+    return len(deltas)
+
+
+def get_operator_performance(date_from=None, date_to=None):
+    """
+    Количество записей истории по операторам за период (по суточным агрегатам).
+    :param date_from: Начальная дата (включительно).
+    :param date_to: Конечная дата (включительно).
+    :return: Список строк (operator_name, stages_completed), от большего к меньшему.
+    """
+    stages_completed = func.sum(OperatorActivityRollup.entries_count)
+    query = db.session.query(
+        OperatorActivityRollup.operator_name, stages_completed.label('stages_completed')
+    ).filter(OperatorActivityRollup.granularity == 'day')
+    query = _filter_period(query, OperatorActivityRollup.bucket_start, date_from, date_to)
+    return query.group_by(OperatorActivityRollup.operator_name)\
+        .having(stages_completed > 0).order_by(stages_completed.desc()).all()
+
+
+def _report_bucket(bucket_start, granularity):
+    """Начало шага временного ряда отчета для корзины агрегата."""
+    if granularity == 'week':
+        return bucket_start - timedelta(days=bucket_start.weekday())
+    if granularity == 'month':
+        return bucket_start.replace(day=1)
+    return bucket_start
+
+
+def _next_report_bucket(bucket_start, granularity):
+    """Начало следующего шага временного ряда."""
+    if granularity == 'hour':
+        return bucket_start + timedelta(hours=1)
+    if granularity == 'week':
+        return bucket_start + timedelta(weeks=1)
+    if granularity == 'month':
+        return (bucket_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bucket_start + timedelta(days=1)
+
+
+def get_operator_activity(date_from=None, date_to=None, granularity='day'):
+    """
+    Временной ряд активности операторов за произвольный период.
+    Почасовой ряд строится по часовым агрегатам, остальные — по суточным,
+    поэтому запрос за год читает не более 366 корзин на оператора.
+    :param date_from: Начальная дата (по умолчанию — DEFAULT_ACTIVITY_DAYS дней до конечной).
+    :param date_to: Конечная дата включительно (по умолчанию — сегодня, UTC).
+    :param granularity: Шаг ряда: 'hour', 'day', 'week' или 'month'.
+    :return: Словарь {'buckets': [начала шагов], 'series': {оператор: [значения по шагам]}}.
+    :raises ValueError: При неизвестном шаге, пустом или слишком длинном для почасового ряда периоде.
+    """
+    if granularity not in REPORT_GRANULARITIES:
+        raise ValueError(f"Неизвестный шаг отчета: {granularity}.")
+    date_to = date_to or datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    date_from = date_from or date_to - timedelta(days=DEFAULT_ACTIVITY_DAYS - 1)
+    if date_from > date_to:
+        raise ValueError("Начальная дата периода позже конечной.")
+    if granularity == 'hour' and (date_to - date_from).days >= HOURLY_REPORT_MAX_DAYS:
+        raise ValueError(f"Почасовой отчет строится не более чем за {HOURLY_REPORT_MAX_DAYS} дн.")
+
+    source = 'hour' if granularity == 'hour' else 'day'
+    entries_count = func.sum(OperatorActivityRollup.entries_count)
+    query = db.session.query(
+        OperatorActivityRollup.bucket_start, OperatorActivityRollup.operator_name, entries_count.label('entries_count')
+    ).filter(OperatorActivityRollup.granularity == source)
+    rows = _filter_period(query, OperatorActivityRollup.bucket_start, date_from, date_to)\
+        .group_by(OperatorActivityRollup.bucket_start, OperatorActivityRollup.operator_name).all()
+
+    buckets = []
+    bucket = _report_bucket(date_from, granularity)
+    while bucket < date_to + timedelta(days=1):
+        buckets.append(bucket)
+        bucket = _next_report_bucket(bucket, granularity)
+    positions = {bucket: index for index, bucket in enumerate(buckets)}
+
+    series = {}
+    for row in rows:
+        if not row.entries_count:
+            continue
+        values = series.setdefault(row.operator_name, [0] * len(buckets))
+        values[positions[_report_bucket(row.bucket_start, granularity)]] += row.entries_count
+    return {'buckets': buckets, 'series': dict(sorted(series.items()))}
+
+
+def get_stage_duration_report(date_from=None, date_to=None, product_designation=None):
+    """
+    Агрегирует факты длительности этапов: среднее время по каждому этапу.
+    :param date_from: Начальная дата (включительно) выполнения этапа.
+    :param date_to: Конечная дата (включительно) выполнения этапа.
+    :param product_designation: Фильтр по изделию.
+    :return: Список строк (stage_name, avg_duration_seconds, stages_count), от долгих этапов к быстрым.
+    """
+    avg_duration = func.avg(StageDuration.duration_seconds)
+    query = db.session.query(
+        StageDuration.stage_name,
+        avg_duration.label('avg_duration_seconds'),
+        func.count(StageDuration.history_id).label('stages_count')
+    )
+    query = _filter_period(query, StageDuration.finished_at, date_from, date_to)
+    if product_designation:
+        query = query.filter(StageDuration.product_designation == product_designation)
+    return query.group_by(StageDuration.stage_name).order_by(avg_duration.desc()).all()
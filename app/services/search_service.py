@@ -0,0 +1,230 @@
+# app/services/search_service.py
+
+import re
+from flask import url_for
+from markupsafe import Markup, escape
+from sqlalchemy import case, func, literal_column, select, table, text
+
+from app import db
+from app.models import (Part, PART_SEARCH_DOCUMENT_SQL, PARTS_FTS_TABLE, PARTS_FTS_KEYS_TABLE, TEXT_SEARCH_SOURCES,
+                        TEXT_SEARCH_CONFIG, text_search_document_sql, text_fts_table)
+
+# Размер выдачи поиска деталей по умолчанию и максимальный
+PART_SEARCH_LIMIT = 20
+PART_SEARCH_LIMIT_MAX = 100
+# Ограничение числа слов запроса: каждое слово — отдельное условие поиска
+MAX_QUERY_TOKENS = 8
+# Веса столбцов FTS5 в bm25: part_id, name, material, product_designation
+_FTS_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+# Длина фрагмента текста в результатах полнотекстового поиска
+SNIPPET_LENGTH = 200
+
+_TOKEN_RE = re.compile(r'\w+')
+# Окончания, которые отбрасываются при поиске по текстам на SQLite: в FTS5 нет русской
+# морфологии, поэтому основа слова ищется как префикс ("трещина" -> "трещин"*)
+_ENDING_RE = re.compile(r'(ами|ями|ого|его|ому|ему|ыми|ими|ах|ях|ов|ев|ей|ой|ый|ий|ая|яя|ое|ее|ые|ие'
+                        r'|ам|ям|ом|ем|ую|юю|а|я|о|е|ы|и|у|ю|ь|й)$')
+_MIN_STEM_LENGTH = 4
+
+
+def _tokens(query: str) -> list:
+    """Слова запроса в нижнем регистре (без повторов, не больше MAX_QUERY_TOKENS)."""
+    return list(dict.fromkeys(token.lower() for token in _TOKEN_RE.findall(query or '')))[:MAX_QUERY_TOKENS]
+
+
+def highlight(value, tokens) -> Markup:
+    """
+    Экранирует строку и выделяет в ней найденные слова тегом <mark>.
+    :param value: Исходная строка.
+    :param tokens: Слова запроса.
+    :return: Безопасная HTML-строка.
+    """
+    if not value:
+        return Markup('')
+    if not tokens:
+        return escape(value)
+    pattern = re.compile('|'.join(re.escape(token) for token in sorted(tokens, key=len, reverse=True)), re.IGNORECASE)
+    parts, position = [], 0
+    for match in pattern.finditer(value):
+        parts.append(escape(value[position:match.start()]))
+        parts.append(Markup('<mark>%s</mark>') % match.group())
+        position = match.end()
+    parts.append(escape(value[position:]))
+    return Markup('').join(parts)
+
+
+def _stem(token: str) -> str:
+    """Грубая основа слова: окончание отбрасывается, если основа не короче _MIN_STEM_LENGTH."""
+    match = _ENDING_RE.search(token)
+    return token[:match.start()] if match and match.start() >= _MIN_STEM_LENGTH else token
+
+
+def text_search_terms(query: str) -> list:
+    """Основы слов запроса для поиска по текстам и подсветки найденного."""
+    return list(dict.fromkeys(_stem(token) for token in _tokens(query)))
+
+
+def text_search_filter(kind: str, query: str):
+    """
+    Индексируемое условие полнотекстового поиска по текстам записей одного типа:
+    на PostgreSQL — tsvector с русской морфологией (GIN-индекс), на SQLite —
+    основы слов как префиксы в теневой таблице FTS5.
+    :param kind: Тип записи из TEXT_SEARCH_SOURCES ('note', 'status', 'audit').
+    :param query: Строка поиска.
+    :return: Условие для модели записи или None, если в запросе нет слов.
+    """
+    model, column = TEXT_SEARCH_SOURCES[kind]
+    terms = text_search_terms(query)
+    if not terms:
+        return None
+    if db.engine.name == 'postgresql':
+        document = literal_column(text_search_document_sql(model, column))
+        return document.op('@@')(func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query))
+    fts = text_fts_table(model)
+    matches = select(literal_column('rowid')).select_from(table(fts))\
+        .where(literal_column(f'"{fts}"').op('MATCH')(_fts_match(terms)))
+    return model.id.in_(matches)
+
+
+def snippet(value, terms, length: int = SNIPPET_LENGTH) -> Markup:
+    """
+    Фрагмент текста вокруг первого найденного слова с подсветкой.
+    :param value: Исходный текст.
+    :param terms: Основы слов запроса.
+    :param length: Максимальная длина фрагмента.
+    :return: Безопасная HTML-строка.
+    """
+    value = value or ''
+    if len(value) > length:
+        lowered = value.lower()
+        first = min((position for position in (lowered.find(term) for term in terms) if position >= 0), default=0)
+        start = max(0, min(first - length // 4, len(value) - length))
+        value = ('…' if start else '') + value[start:start + length] + ('…' if start + length < len(value) else '')
+    return highlight(value, terms)
+
+
+def _fts_match(tokens: list) -> str:
+    """Запрос FTS5: все слова как префиксы."""
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def part_search_filter(query: str):
+    """
+    Индексируемое условие поиска деталей: на PostgreSQL — каждое слово как подстрока
+    текста детали (GIN-индекс pg_trgm), на SQLite — совпадение в теневой таблице FTS5.
+    :param query: Строка поиска.
+    :return: Условие для Part или None, если в запросе нет слов.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return None
+    if db.engine.name == 'postgresql':
+        document = literal_column(PART_SEARCH_DOCUMENT_SQL)
+        return db.and_(*[document.ilike('%' + token.replace('\\', '\\\\').replace('_', '\\_') + '%', escape='\\')
+                         for token in tokens])
+    fts = table(PARTS_FTS_TABLE)
+    matches = select(literal_column('part_id')).select_from(fts)\
+        .where(literal_column(f'"{PARTS_FTS_TABLE}"').op('MATCH')(_fts_match(tokens)))
+    return Part.part_id.in_(matches)
+
+
+def _search_parts_postgresql(query: str, tokens: list, limit: int) -> list:
+    """
+    Поиск по GIN-индексу pg_trgm: каждое слово ищется как подстрока (ILIKE),
+    ранжирование — по совпадению обозначения и похожести слов (word_similarity).
+    """
+    document = literal_column(PART_SEARCH_DOCUMENT_SQL)
+    part_id = func.lower(Part.part_id)
+    rank = sum(func.word_similarity(token, document) for token in tokens) + case(
+        (part_id == query.strip().lower(), 10),
+        (part_id.startswith(tokens[0], autoescape=True), 3),
+        else_=0
+    )
+    return db.session.scalars(
+        select(Part).where(part_search_filter(query)).order_by(rank.desc(), Part.part_id).limit(limit)
+    ).all()
+
+
+def _search_parts_sqlite(tokens: list, limit: int) -> list:
+    """Поиск по теневой таблице FTS5: все слова как префиксы, ранжирование bm25."""
+    match = _fts_match(tokens)
+    weights = ', '.join(str(weight) for weight in _FTS_WEIGHTS)
+    ranked = db.session.execute(text(
+        f'SELECT part_id, bm25("{PARTS_FTS_TABLE}", {weights}) AS rank FROM "{PARTS_FTS_TABLE}" '
+        f'WHERE "{PARTS_FTS_TABLE}" MATCH :match ORDER BY rank LIMIT :limit'
+    ), {'match': match, 'limit': limit}).all()
+    if not ranked:
+        return []
+    parts = {part.part_id: part for part in Part.query.filter(Part.part_id.in_([row.part_id for row in ranked]))}
+    return [parts[row.part_id] for row in ranked if row.part_id in parts]
+
+
+def rebuild_part_search_index() -> int:
+    """
+    Заново заполняет теневую таблицу FTS5 из таблицы деталей (SQLite).
+    Нужна, если данные деталей менялись в обход триггеров. Индекс PostgreSQL
+    обновляется самой СУБД и не пересобирается.
+    :return: Количество проиндексированных деталей.
+    """
+    if db.engine.name == 'postgresql':
+        return db.session.scalar(select(func.count(Part.part_id)))
+    db.session.execute(text(f'DELETE FROM "{PARTS_FTS_TABLE}"'))
+    db.session.execute(text(f'DELETE FROM "{PARTS_FTS_KEYS_TABLE}"'))
+    db.session.execute(text(f'INSERT INTO "{PARTS_FTS_KEYS_TABLE}" (part_id) SELECT part_id FROM "Parts"'))
+    result = db.session.execute(text(
+        f'INSERT INTO "{PARTS_FTS_TABLE}" (rowid, part_id, name, material, product_designation) '
+        f'SELECT k.id, p.part_id, p.name, p.material, p.product_designation '
+        f'FROM "Parts" p JOIN "{PARTS_FTS_KEYS_TABLE}" k ON k.part_id = p.part_id'
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def rebuild_text_search_index() -> int:
+    """
+    Заново заполняет теневые таблицы FTS5 текстов примечаний, комментариев и журнала (SQLite).
+    :return: Количество проиндексированных записей.
+    """
+    if db.engine.name == 'postgresql':
+        return sum(db.session.scalar(select(func.count()).where(getattr(model, column).isnot(None)))
+                   for model, column in TEXT_SEARCH_SOURCES.values())
+    total = 0
+    for model, column in TEXT_SEARCH_SOURCES.values():
+        fts = text_fts_table(model)
+        db.session.execute(text(f'DELETE FROM "{fts}"'))
+        total += db.session.execute(text(
+            f'INSERT INTO "{fts}" (rowid, body) SELECT id, {column} FROM "{model.__tablename__}" '
+            f'WHERE {column} IS NOT NULL'
+        )).rowcount
+    db.session.commit()
+    return total
+
+
+def search_parts(query: str, limit: int = PART_SEARCH_LIMIT) -> list:
+    """
+    Ищет детали по всем изделиям: по обозначению, наименованию, материалу и изделию.
+    Слова запроса ищутся по началу слов (и как подстроки на PostgreSQL),
+    результаты упорядочены по релевантности.
+    :param query: Строка поиска.
+    :param limit: Максимальное количество результатов.
+    :return: Список словарей с данными детали и подсветкой найденных слов.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    if db.engine.name == 'postgresql':
+        parts = _search_parts_postgresql(query, tokens, limit)
+    else:
+        parts = _search_parts_sqlite(tokens, limit)
+
+    return [{
+        'part_id': part.part_id,
+        'name': part.name,
+        'material': part.material,
+        'product_designation': part.product_designation,
+        'current_status': part.current_status,
+        'history_url': url_for('main.main_pages.history', part_id=part.part_id),
+        'highlight': {field: str(highlight(getattr(part, field), tokens))
+                      for field in ('part_id', 'name', 'material', 'product_designation')},
+    } for part in parts]
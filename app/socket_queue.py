@@ -0,0 +1,46 @@
+# app/socket_queue.py
+
+import json
+import queue
+import threading
+import socketio
+
+
+class LocalQueueManager(socketio.PubSubManager):
+    """
+    Внутрипроцессная замена брокера сообщений Socket.IO (URL 'local://').
+    Все менеджеры одного канала в процессе обмениваются сообщениями
+    через общие очереди так же, как воркеры через Redis. Используется
+    в тестах и для локальной проверки многосерверного режима без Redis.
+    """
+    name = 'local'
+    _subscribers = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url='local://', channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.url = url
+        self._queue = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        """Рассылает сообщение всем подписчикам канала (в сериализованном виде, как брокер)."""
+        message = json.dumps(data)
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(self.channel, []))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _listen(self):
+        """Бесконечно выдает сообщения, пришедшие в очередь этого менеджера."""
+        while True:
+            yield self._queue.get()
+
+    def close(self):
+        """Отписывает менеджер от канала."""
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(self.channel, [])
+            if self._queue in subscribers:
+                subscribers.remove(self._queue)
@@ -0,0 +1,171 @@
+// app/static/js/batch-scan.js
+
+// Ключ localStorage, в котором запоминается ФИО оператора между сменами страниц
+const OPERATOR_NAME_KEY = 'batchScanOperatorName';
+
+// Очередь отсканированных позиций: {partId, quantity, result}
+const batchQueue = [];
+
+/**
+ * Извлекает ID детали из отсканированной строки.
+ * QR-код содержит ссылку вида .../scan/<part_id>, но ID можно ввести и вручную.
+ * @param {string} value - Отсканированная строка.
+ * @returns {string} ID детали.
+ */
+function parseScannedPartId(value) {
+    const text = value.trim();
+    const marker = '/scan/';
+    const index = text.indexOf(marker);
+    if (index === -1) return text;
+    try {
+        return decodeURIComponent(text.slice(index + marker.length));
+    } catch (error) {
+        return text.slice(index + marker.length);
+    }
+}
+
+/**
+ * Экранирует текст для вставки в HTML.
+ * @param {string} text - Исходный текст.
+ * @returns {string} Безопасный HTML.
+ */
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text ?? '';
+    return div.innerHTML;
+}
+
+/**
+ * Перерисовывает таблицу очереди.
+ */
+function renderBatchQueue() {
+    const tbody = document.getElementById('batch-scan-queue');
+    document.getElementById('batch-scan-empty').classList.toggle('hidden', batchQueue.length > 0);
+    tbody.innerHTML = batchQueue.map((item, index) => {
+        let resultHtml = '<span class="text-gray-400">Ожидает</span>';
+        if (item.result?.status === 'ok') {
+            resultHtml = `<span class="text-green-700">${escapeHtml(item.result.stage)}: ${item.result.quantity} шт.</span>`;
+        } else if (item.result) {
+            resultHtml = `<span class="text-red-600">${escapeHtml(item.result.message)}</span>`;
+        }
+        return `<tr>
+                    <td class="px-6 py-4 text-sm font-medium break-all">${escapeHtml(item.partId)}</td>
+                    <td class="px-6 py-4"><input type="number" min="1" data-index="${index}" value="${item.quantity ?? ''}" placeholder="Весь остаток" class="batch-quantity w-32 p-1 border border-gray-300 rounded-md"></td>
+                    <td class="px-6 py-4 text-sm">${resultHtml}</td>
+                    <td class="px-6 py-4 text-right"><button type="button" data-index="${index}" class="batch-remove text-red-600 hover:underline">Убрать</button></td>
+                </tr>`;
+    }).join('');
+}
+
+/**
+ * Добавляет отсканированную деталь в очередь.
+ * Повторное сканирование уже ожидающей детали не создает дубликат.
+ * @param {string} value - Отсканированная строка.
+ */
+function addToBatchQueue(value) {
+    const partId = parseScannedPartId(value);
+    if (!partId) return;
+    const maxItems = parseInt(document.getElementById('batch-scan').dataset.maxItems, 10);
+    if (batchQueue.some(item => item.partId === partId && !item.result)) {
+        Swal.fire({ toast: true, position: 'top-end', icon: 'info', title: `Деталь ${partId} уже в очереди`, showConfirmButton: false, timer: 2000 });
+        return;
+    }
+    if (batchQueue.filter(item => !item.result).length >= maxItems) {
+        Swal.fire('Очередь заполнена', `Подтвердите текущие позиции: не более ${maxItems} за один раз.`, 'warning');
+        return;
+    }
+    batchQueue.unshift({ partId: partId, quantity: null, result: null });
+    renderBatchQueue();
+}
+
+/**
+ * Отправляет все ожидающие позиции одним запросом и показывает результат по каждой.
+ */
+async function submitBatchQueue() {
+    const pending = batchQueue.filter(item => !item.result);
+    if (pending.length === 0) return;
+
+    const operatorInput = document.getElementById('batch-operator-name');
+    const operatorName = operatorInput ? operatorInput.value.trim() : '';
+    if (operatorInput && operatorName.length < 3) {
+        Swal.fire('Ошибка', "Поле 'Ваше ФИО' обязательно для выполнения этапа.", 'error');
+        return;
+    }
+    if (operatorInput) localStorage.setItem(OPERATOR_NAME_KEY, operatorName);
+
+    const button = document.getElementById('batch-scan-submit');
+    button.disabled = true;
+    button.classList.add('opacity-50', 'cursor-not-allowed');
+    try {
+        const response = await fetch(document.getElementById('batch-scan').dataset.confirmUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': document.querySelector('meta[name="csrf-token"]').getAttribute('content'),
+            },
+            body: JSON.stringify({
+                operator_name: operatorName,
+                items: pending.map(item => ({ part_id: item.partId, quantity: item.quantity })),
+            }),
+        });
+        const result = await response.json();
+        if (!response.ok || result.status !== 'success') {
+            throw new Error(result.message || 'Неизвестная ошибка');
+        }
+        // Результаты возвращаются в порядке отправленных позиций
+        pending.forEach((item, index) => { item.result = result.results[index]; });
+        renderBatchQueue();
+        Swal.fire({
+            toast: true,
+            position: 'top-end',
+            icon: result.rejected ? 'warning' : 'success',
+            title: `Подтверждено: ${result.accepted}, отклонено: ${result.rejected}`,
+            showConfirmButton: false,
+            timer: 4000,
+        });
+    } catch (error) {
+        Swal.fire('Ошибка', `Не удалось подтвердить этапы: ${error.message}`, 'error');
+    } finally {
+        button.disabled = false;
+        button.classList.remove('opacity-50', 'cursor-not-allowed');
+        document.getElementById('batch-scan-input').focus();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('batch-scan');
+    if (!container) return;
+
+    const operatorInput = document.getElementById('batch-operator-name');
+    if (operatorInput) operatorInput.value = localStorage.getItem(OPERATOR_NAME_KEY) || '';
+
+    // Сканер штрихкодов вводит строку как клавиатура и завершает ее нажатием Enter
+    const scanInput = document.getElementById('batch-scan-input');
+    scanInput.addEventListener('keydown', (event) => {
+        if (event.key !== 'Enter') return;
+        event.preventDefault();
+        addToBatchQueue(scanInput.value);
+        scanInput.value = '';
+    });
+
+    container.addEventListener('input', (event) => {
+        if (event.target.matches('.batch-quantity')) {
+            const value = parseInt(event.target.value, 10);
+            batchQueue[event.target.dataset.index].quantity = value > 0 ? value : null;
+        }
+    });
+    container.addEventListener('click', (event) => {
+        if (event.target.matches('.batch-remove')) {
+            batchQueue.splice(parseInt(event.target.dataset.index, 10), 1);
+            renderBatchQueue();
+        }
+    });
+    document.getElementById('batch-scan-submit').addEventListener('click', submitBatchQueue);
+    document.getElementById('batch-scan-clear').addEventListener('click', () => {
+        batchQueue.length = 0;
+        renderBatchQueue();
+        scanInput.focus();
+    });
+
+    renderBatchQueue();
+});
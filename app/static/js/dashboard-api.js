@@ -1,7 +1,152 @@
 // app/static/js/dashboard-api.js
 
+// Размер страницы при постраничной загрузке деталей
+const PARTS_PAGE_SIZE = 100;
+
+/**
+ * Формирует строку запроса к API деталей с учетом фильтров и курсора.
+ * @param {string} productDesignation - Наименование изделия.
+ * @param {string|null} cursor - ID последней загруженной детали.
+ * @returns {string} URL для fetch.
+ */
+function buildPartsUrl(productDesignation, cursor) {
+    const params = new URLSearchParams();
+    const searchTerm = document.getElementById('searchInput').value;
+    const responsibleId = document.getElementById('responsibleFilter').value;
+
+    if (searchTerm) params.append('search', searchTerm);
+    if (responsibleId) params.append('responsible_id', responsibleId);
+    params.append('limit', PARTS_PAGE_SIZE);
+    if (cursor) params.append('after', cursor);
+
+    return `/api/parts/${encodeURIComponent(productDesignation)}?${params.toString()}`;
+}
+
+/**
+ * Формирует HTML-код полосы прогресса детали.
+ * @param {number} completed - Выполненное количество.
+ * @param {number} total - Общее количество.
+ * @returns {string} HTML-код полосы прогресса.
+ */
+function renderProgressBar(completed, total) {
+    const progress = total > 0 ? (completed / total) * 100 : 0;
+    return `<div class="w-full bg-gray-200 rounded-full h-2.5"><div class="bg-blue-600 h-2.5 rounded-full" style="width: ${progress}%"></div></div><small>${completed} из ${total}</small>`;
+}
+
+/**
+ * Формирует HTML-код одной строки таблицы деталей.
+ * @param {object} part - Данные детали из API.
+ * @param {object|null} permissions - Права текущего пользователя.
+ * @returns {string} HTML-код строки.
+ */
+function renderPartRow(part, permissions) {
+    const routeHtml = part.route_stages.length > 0 ? `
+        <div class="route-timeline flex items-center space-x-1">
+            ${part.route_stages.map((stage, index) => {
+                let stageClass = 'bg-gray-300'; // pending
+                let title = `Ожидание: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
+                if (stage.status === 'completed') {
+                    stageClass = 'bg-green-500';
+                    title = `Выполнено: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
+                } else if (stage.status === 'in_progress') {
+                    stageClass = 'bg-blue-500 animate-pulse';
+                    title = `В процессе: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
+                }
+                const barHtml = `<div class="w-full h-1.5 ${stageClass} rounded-full" title="${title}"></div>`;
+                const separatorHtml = index < part.route_stages.length - 1 ? '<div class="w-2 h-px bg-gray-300"></div>' : '';
+                return `<div class="flex-1 flex items-center">${barHtml}${separatorHtml}</div>`;
+            }).join('')}
+        </div>
+    ` : '<span class="text-gray-400 italic">Маршрут не назначен</span>';
+
+    const progressBarHtml = renderProgressBar(part.quantity_completed, part.quantity_total);
+    const encodedPartId = encodeURIComponent(part.part_id).replace(/[.'()]/g, c => '%' + c.charCodeAt(0).toString(16));
+
+    // --- НАЧАЛО ИСПРАВЛЕНИЯ: Генерируем data-атрибуты корректно ---
+    const dataAttrs = `
+        data-history-url="${part.history_url}"
+        data-edit-url="${permissions?.can_edit ? part.edit_url : ''}"
+        data-qr-url="${permissions?.can_generate_qr ? part.qr_url : ''}"
+        data-delete-url="${permissions?.can_delete ? part.delete_url : ''}"
+        data-part-id="${part.part_id}"
+    `;
+    // --- КОНЕЦ ИСПРАВЛЕНИЯ ---
+
+    return `<tr class="hover:bg-gray-100 context-menu-target" id="part-row-${encodedPartId}" ${dataAttrs}>
+                <td class="px-6 py-4"><input type="checkbox" value="${part.part_id}" class="part-checkbox rounded border-gray-300"></td>
+                <td class="px-6 py-4"><a href="${part.history_url}" class="text-blue-600 hover:underline font-medium">${part.part_id}</a></td>
+                <td class="px-6 py-4 text-sm text-gray-900 name-cell">${part.name}</td>
+                <td class="px-6 py-4 text-sm text-gray-500 material-cell">${part.material}</td>
+                <td class="px-6 py-4 text-sm route-cell">${routeHtml}</td>
+                <td class="px-6 py-4 progress-cell">${progressBarHtml}</td>
+                <td class="px-6 py-4 text-sm text-gray-500 responsible-cell">${part.responsible_user}</td>
+            </tr>`;
+}
+
+/**
+ * Формирует HTML-код кнопки догрузки следующей страницы.
+ * @param {string|null} nextCursor - Курсор следующей страницы.
+ * @param {number} loadedCount - Сколько деталей уже загружено.
+ * @param {number|null} total - Общее количество деталей (подсказка сервера).
+ * @returns {string} HTML-код блока или пустая строка.
+ */
+function renderLoadMore(nextCursor, loadedCount, total) {
+    if (!nextCursor) return '';
+    const counter = total !== null && total !== undefined ? ` (${loadedCount} из ${total})` : '';
+    return `<div class="parts-load-more p-4 text-center">
+                <button type="button" class="load-more-parts text-blue-600 hover:underline" data-next-cursor="${encodeURIComponent(nextCursor)}" data-loaded="${loadedCount}" data-total="${total ?? ''}">
+                    Показать еще${counter}
+                </button>
+            </div>`;
+}
+
+/**
+ * Загружает результаты глобального поиска деталей по всем изделиям и выводит их
+ * под строкой поиска. Поля `highlight` приходят с сервера уже экранированными.
+ * @param {string} searchTerm - Строка поиска.
+ */
+async function loadGlobalSearchResults(searchTerm) {
+    const container = document.getElementById('global-search-results');
+    if (!container) return;
+    if (!searchTerm.trim()) {
+        container.innerHTML = '';
+        container.classList.add('hidden');
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/search/parts?${new URLSearchParams({ q: searchTerm })}`);
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const { results } = await response.json();
+        // Пока шел запрос, строку поиска могли изменить
+        if (document.getElementById('searchInput').value !== searchTerm) return;
+
+        if (results.length === 0) {
+            container.innerHTML = '<div class="p-2 text-sm text-gray-500">Детали не найдены.</div>';
+        } else {
+            container.innerHTML = results.map(result => {
+                const status = document.createElement('span');
+                status.textContent = result.current_status || '';
+                return `<a href="${result.history_url}" class="block p-2 hover:bg-gray-50 border-b border-gray-100">
+                            <span class="font-mono font-semibold">${result.highlight.part_id}</span>
+                            <span class="ml-2">${result.highlight.name}</span>
+                            <span class="ml-2 text-sm text-gray-500">${result.highlight.material} · ${result.highlight.product_designation}</span>
+                            <span class="ml-2 text-xs text-gray-400">${status.innerHTML}</span>
+                        </a>`;
+            }).join('');
+        }
+        container.classList.remove('hidden');
+    } catch (error) {
+        console.error('Ошибка поиска деталей:', error);
+        container.innerHTML = '<div class="p-2 text-sm text-red-500">Ошибка поиска.</div>';
+        container.classList.remove('hidden');
+    }
+}
+
 /**
  * Асинхронно загружает с сервера и отображает список деталей для конкретного изделия.
+ * Детали подгружаются постранично: первая страница при раскрытии изделия,
+ * следующие — по кнопке "Показать еще" или при прокрутке до конца списка.
  * @param {HTMLElement} productRow - HTML-элемент строки изделия (<tr>), по которой кликнули.
  * @param {string} productDesignation - Наименование изделия.
  * @param {string} safeKey - Безопасный ключ для ID строки с деталями.
@@ -14,75 +159,23 @@ async function loadDetailsForProduct(productRow, productDesignation, safeKey) {
     
     if (window.dashboardDetailsCache && window.dashboardDetailsCache[cacheKey]) {
         contentCell.innerHTML = window.dashboardDetailsCache[cacheKey];
+        observeLoadMore(contentCell, productDesignation, cacheKey);
         return;
     }
 
     contentCell.innerHTML = `<div class="p-8 text-center text-gray-500">Загрузка...</div>`;
     
     try {
-        const params = new URLSearchParams();
-        const searchTerm = document.getElementById('searchInput').value;
-        const responsibleId = document.getElementById('responsibleFilter').value;
-
-        if (searchTerm) params.append('search', searchTerm);
-        if (responsibleId) params.append('responsible_id', responsibleId);
-
-        const response = await fetch(`/api/parts/${encodeURIComponent(productDesignation)}?${params.toString()}`);
+        const response = await fetch(buildPartsUrl(productDesignation, null));
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         
         const data = await response.json();
-        const { parts, permissions } = data;
-        const csrfToken = document.querySelector('meta[name="csrf-token"]').getAttribute('content');
+        const { parts, permissions, next_cursor, total } = data;
 
         if (parts.length === 0) {
             contentCell.innerHTML = '<div class="p-8 text-center text-gray-500">Детали, соответствующие фильтру, не найдены.</div>';
         } else {
-            const rowsHtml = parts.map(part => {
-                const progress = part.quantity_total > 0 ? (part.quantity_completed / part.quantity_total) * 100 : 0;
-                const progressText = `${part.quantity_completed} из ${part.quantity_total}`;
-                
-                const routeHtml = part.route_stages.length > 0 ? `
-                    <div class="route-timeline flex items-center space-x-1">
-                        ${part.route_stages.map((stage, index) => {
-                            let stageClass = 'bg-gray-300'; // pending
-                            let title = `Ожидание: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
-                            if (stage.status === 'completed') {
-                                stageClass = 'bg-green-500';
-                                title = `Выполнено: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
-                            } else if (stage.status === 'in_progress') {
-                                stageClass = 'bg-blue-500 animate-pulse';
-                                title = `В процессе: ${stage.name} (${stage.qty_done}/${part.quantity_total})`;
-                            }
-                            const barHtml = `<div class="w-full h-1.5 ${stageClass} rounded-full" title="${title}"></div>`;
-                            const separatorHtml = index < part.route_stages.length - 1 ? '<div class="w-2 h-px bg-gray-300"></div>' : '';
-                            return `<div class="flex-1 flex items-center">${barHtml}${separatorHtml}</div>`;
-                        }).join('')}
-                    </div>
-                ` : '<span class="text-gray-400 italic">Маршрут не назначен</span>';
-
-                const progressBarHtml = `<div class="w-full bg-gray-200 rounded-full h-2.5"><div class="bg-blue-600 h-2.5 rounded-full" style="width: ${progress}%"></div></div><small>${progressText}</small>`;
-                const encodedPartId = encodeURIComponent(part.part_id).replace(/[.'()]/g, c => '%' + c.charCodeAt(0).toString(16));
-
-                // --- НАЧАЛО ИСПРАВЛЕНИЯ: Генерируем data-атрибуты корректно ---
-                const dataAttrs = `
-                    data-history-url="${part.history_url}"
-                    data-edit-url="${permissions?.can_edit ? part.edit_url : ''}"
-                    data-qr-url="${permissions?.can_generate_qr ? part.qr_url : ''}"
-                    data-delete-url="${permissions?.can_delete ? part.delete_url : ''}"
-                    data-part-id="${part.part_id}"
-                `;
-                // --- КОНЕЦ ИСПРАВЛЕНИЯ ---
-
-                return `<tr class="hover:bg-gray-100 context-menu-target" id="part-row-${encodedPartId}" ${dataAttrs}>
-                            <td class="px-6 py-4"><input type="checkbox" value="${part.part_id}" class="part-checkbox rounded border-gray-300"></td>
-                            <td class="px-6 py-4"><a href="${part.history_url}" class="text-blue-600 hover:underline font-medium">${part.part_id}</a></td>
-                            <td class="px-6 py-4 text-sm text-gray-900 name-cell">${part.name}</td>
-                            <td class="px-6 py-4 text-sm text-gray-500 material-cell">${part.material}</td>
-                            <td class="px-6 py-4 text-sm route-cell">${routeHtml}</td>
-                            <td class="px-6 py-4 progress-cell">${progressBarHtml}</td>
-                            <td class="px-6 py-4 text-sm text-gray-500 responsible-cell">${part.responsible_user}</td>
-                        </tr>`;
-            }).join('');
+            const rowsHtml = parts.map(part => renderPartRow(part, permissions)).join('');
             
             contentCell.innerHTML = `<table class="min-w-full details-table">
                                         <thead class="bg-gray-100">
@@ -97,18 +190,80 @@ async function loadDetailsForProduct(productRow, productDesignation, safeKey) {
                                             </tr>
                                         </thead>
                                         <tbody class="bg-white divide-y divide-gray-200">${rowsHtml}</tbody>
-                                    </table>`;
+                                    </table>
+                                    ${renderLoadMore(next_cursor, parts.length, total)}`;
         }
         
         if (window.dashboardDetailsCache) {
             window.dashboardDetailsCache[cacheKey] = contentCell.innerHTML;
         }
+        observeLoadMore(contentCell, productDesignation, cacheKey);
     } catch (error) {
         console.error('Ошибка загрузки деталей:', error);
         contentCell.innerHTML = '<div class="p-8 text-center text-red-500">Ошибка загрузки. Попробуйте обновить страницу.</div>';
     }
 }
 
+/**
+ * Догружает следующую страницу деталей и добавляет строки в конец таблицы.
+ * @param {HTMLElement} contentCell - Контейнер с таблицей деталей изделия.
+ * @param {string} productDesignation - Наименование изделия.
+ * @param {string} cacheKey - Ключ кэша для текущего набора фильтров.
+ */
+async function loadMorePartsForProduct(contentCell, productDesignation, cacheKey) {
+    const button = contentCell.querySelector('.load-more-parts');
+    if (!button || button.dataset.loading) return;
+    button.dataset.loading = '1';
+    button.textContent = 'Загрузка...';
+
+    try {
+        const cursor = decodeURIComponent(button.dataset.nextCursor);
+        const response = await fetch(buildPartsUrl(productDesignation, cursor));
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+        const { parts, permissions, next_cursor } = await response.json();
+        const tableBody = contentCell.querySelector('tbody');
+        tableBody.insertAdjacentHTML('beforeend', parts.map(part => renderPartRow(part, permissions)).join(''));
+
+        const loadedCount = parseInt(button.dataset.loaded, 10) + parts.length;
+        const total = button.dataset.total === '' ? null : parseInt(button.dataset.total, 10);
+        contentCell.querySelector('.parts-load-more').outerHTML = renderLoadMore(next_cursor, loadedCount, total);
+
+        if (window.dashboardDetailsCache) {
+            window.dashboardDetailsCache[cacheKey] = contentCell.innerHTML;
+        }
+        observeLoadMore(contentCell, productDesignation, cacheKey);
+    } catch (error) {
+        console.error('Ошибка догрузки деталей:', error);
+        delete button.dataset.loading;
+        button.textContent = 'Ошибка загрузки. Повторить';
+    }
+}
+
+/**
+ * Подключает догрузку следующей страницы по клику и при появлении кнопки в зоне видимости.
+ * @param {HTMLElement} contentCell - Контейнер с таблицей деталей изделия.
+ * @param {string} productDesignation - Наименование изделия.
+ * @param {string} cacheKey - Ключ кэша для текущего набора фильтров.
+ */
+function observeLoadMore(contentCell, productDesignation, cacheKey) {
+    const button = contentCell.querySelector('.load-more-parts');
+    if (!button) return;
+
+    const loadMore = () => loadMorePartsForProduct(contentCell, productDesignation, cacheKey);
+    button.addEventListener('click', loadMore);
+
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                observer.disconnect();
+                loadMore();
+            }
+        }, { rootMargin: '200px' });
+        observer.observe(button);
+    }
+}
+
 /**
  * Обновляет одну строку детали, если она видна на экране.
  * @param {object} data - Данные для обновления.
@@ -118,11 +273,17 @@ function updatePartRow(data) {
     const row = document.getElementById(`part-row-${encodedPartId}`);
     if (!row) return;
 
-    if (data.progress_html) row.querySelector('.progress-cell')?.innerHTML = data.progress_html;
-    if (data.responsible_user) row.querySelector('.responsible-cell')?.textContent = data.responsible_user;
-    if (data.name) row.querySelector('.name-cell').textContent = data.name;
-    if (data.material) row.querySelector('.material-cell').textContent = data.material;
-    if (data.size) row.querySelector('.size-cell').textContent = data.size;
+    const progressCell = row.querySelector('.progress-cell');
+    const responsibleCell = row.querySelector('.responsible-cell');
+    const nameCell = row.querySelector('.name-cell');
+    const materialCell = row.querySelector('.material-cell');
+    const sizeCell = row.querySelector('.size-cell');
+
+    if (data.progress_html && progressCell) progressCell.innerHTML = data.progress_html;
+    if (data.responsible_user && responsibleCell) responsibleCell.textContent = data.responsible_user;
+    if (data.name && nameCell) nameCell.textContent = data.name;
+    if (data.material && materialCell) materialCell.textContent = data.material;
+    if (data.size && sizeCell) sizeCell.textContent = data.size;
 
     row.classList.add('highlight-update');
     setTimeout(() => row.classList.remove('highlight-update'), 3000);
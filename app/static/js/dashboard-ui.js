@@ -174,9 +174,14 @@ document.addEventListener('DOMContentLoaded', function() {
                 productToggle.innerHTML = isHidden ? `${productDesignation} ▾` : `${productDesignation} ▴`;
 
                 if (!isHidden) {
+                    if (typeof joinProductRoom === 'function') {
+                        joinProductRoom(productDesignation);
+                    }
                     if (typeof loadDetailsForProduct === 'function') {
                         loadDetailsForProduct(productRow, productDesignation, safeKey);
                     }
+                } else if (typeof leaveProductRoom === 'function') {
+                    leaveProductRoom(productDesignation, safeKey);
                 }
             }
         });
@@ -203,7 +208,12 @@ document.addEventListener('DOMContentLoaded', function() {
     if (searchInput) {
         searchInput.addEventListener('keyup', () => {
             clearTimeout(searchTimeout);
-            searchTimeout = setTimeout(handleFilterChange, 500);
+            searchTimeout = setTimeout(() => {
+                handleFilterChange();
+                if (typeof loadGlobalSearchResults === 'function') {
+                    loadGlobalSearchResults(searchInput.value);
+                }
+            }, 500);
         });
     }
 
@@ -1,5 +1,38 @@
 // app/static/js/dashboard-websocket.js
 
+// Изделия, на комнаты которых подписан клиент (раскрытые на дашборде)
+const joinedProductRooms = new Set();
+
+/**
+ * Подписывается на уведомления деталей изделия при его раскрытии.
+ * @param {string} productDesignation - Наименование изделия.
+ */
+function joinProductRoom(productDesignation) {
+    joinedProductRooms.add(productDesignation);
+    window.appSocket?.emit('join_product', { product_designation: productDesignation });
+}
+
+/**
+ * Отписывается от уведомлений изделия при сворачивании.
+ * Кэш строк сбрасывается: пока изделие свернуто, обновления не приходят.
+ * @param {string} productDesignation - Наименование изделия.
+ * @param {string} safeKey - Безопасный ключ изделия.
+ */
+function leaveProductRoom(productDesignation, safeKey) {
+    joinedProductRooms.delete(productDesignation);
+    window.appSocket?.emit('leave_product', { product_designation: productDesignation });
+    invalidateCacheForProduct(safeKey);
+}
+
+/**
+ * Повторно входит в комнаты всех раскрытых изделий (после переподключения).
+ */
+function rejoinProductRooms() {
+    joinedProductRooms.forEach(productDesignation => {
+        window.appSocket?.emit('join_product', { product_designation: productDesignation });
+    });
+}
+
 /**
  * Глобальная функция-обработчик для всех входящих WebSocket-событий на дашборде.
  * @param {object} data - Данные, полученные от сервера.
@@ -25,6 +58,15 @@ function dashboardSocketHandler(data) {
                 updatePartRow(data);
             }
             break;
+        case 'bulk_stage_completed':
+            // Пакетное подтверждение этапов: одно событие на все затронутые детали
+            if (data.parts && typeof updatePartRow === 'function') {
+                data.parts.forEach(part => updatePartRow({
+                    part_id: part.part_id,
+                    progress_html: renderProgressBar(part.quantity_completed, part.quantity_total),
+                }));
+            }
+            break;
         case 'bulk_delete':
             if (data.deleted_parts) {
                 data.deleted_parts.forEach(part => {
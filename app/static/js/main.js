@@ -113,15 +113,30 @@ function handleFormChange() {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    // WebSocket
-    const socket = io();
+    // WebSocket. При нескольких воркерах без sticky sessions сервер требует транспорт только WebSocket
+    const websocketOnly = document.querySelector('meta[name="socketio-websocket-only"]')?.content === '1';
+    const socket = websocketOnly ? io({ transports: ['websocket'] }) : io();
+    window.appSocket = socket;
     socket.on('connect', () => {
         console.log('WebSocket connected!');
+        // После переподключения заново входим в комнаты раскрытых изделий
+        if (typeof rejoinProductRooms === 'function') {
+            rejoinProductRooms();
+        }
     });
     socket.on('notification', (data) => {
-        if (typeof dashboardSocketHandler === 'function') {
-            dashboardSocketHandler(data);
-        }
+        // Сервер объединяет частые события в одно сообщение 'batch'
+        const events = data.event === 'batch' ? data.events : [data];
+        events.forEach(eventData => {
+            if (typeof dashboardSocketHandler === 'function') {
+                dashboardSocketHandler(eventData);
+            }
+            if (typeof importJobsSocketHandler === 'function') {
+                importJobsSocketHandler(eventData);
+            }
+        });
+        // Промежуточный прогресс импорта отображается в таблице задач, без всплывающих уведомлений
+        if (events.every(eventData => eventData.event === 'import_progress')) return;
         Swal.fire({
             toast: true,
             position: 'top-end',
@@ -0,0 +1,270 @@
+// app/static/js/offline-queue.js
+
+// Офлайн-очередь подтверждений этапов: операции сохраняются в IndexedDB
+// и отправляются пакетами на идемпотентный эндпоинт, когда есть связь.
+const SCAN_QUEUE_DB = 'scan-queue';
+const SCAN_QUEUE_STORE = 'operations';
+// Ключ localStorage с последними отклоненными сервером операциями
+const SCAN_QUEUE_REJECTED_KEY = 'scanQueueRejected';
+const SCAN_QUEUE_REJECTED_LIMIT = 20;
+// Интервал повторных попыток синхронизации (мс)
+const SCAN_QUEUE_SYNC_INTERVAL = 30000;
+// Размер пакета, отправляемого за один запрос
+const SCAN_QUEUE_BATCH_SIZE = 200;
+
+let scanQueueSyncing = false;
+
+/**
+ * Открывает базу IndexedDB очереди (создает хранилище при первом запуске).
+ * @returns {Promise<IDBDatabase>}
+ */
+function openScanQueueDb() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(SCAN_QUEUE_DB, 1);
+        request.onupgradeneeded = () => {
+            request.result.createObjectStore(SCAN_QUEUE_STORE, { keyPath: 'op_id' });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+/**
+ * Выполняет действие в транзакции хранилища операций.
+ * @param {string} mode - 'readonly' или 'readwrite'.
+ * @param {function(IDBObjectStore): IDBRequest|void} action - Действие над хранилищем.
+ * @returns {Promise<any>} Результат запроса действия.
+ */
+async function withScanQueueStore(mode, action) {
+    const db = await openScanQueueDb();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(SCAN_QUEUE_STORE, mode);
+        const request = action(transaction.objectStore(SCAN_QUEUE_STORE));
+        transaction.oncomplete = () => { db.close(); resolve(request ? request.result : undefined); };
+        transaction.onerror = () => { db.close(); reject(transaction.error); };
+    });
+}
+
+/**
+ * Генерирует уникальный ID операции на клиенте.
+ * @returns {string}
+ */
+function generateOperationId() {
+    if (window.crypto?.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+/**
+ * Сохраняет подтверждение этапа в очередь.
+ * @param {object} operation - {part_id, stage_id, stage_name, quantity, operator_name}.
+ * @returns {Promise<object>} Сохраненная операция с op_id и performed_at.
+ */
+async function queueScanOperation(operation) {
+    const record = Object.assign({ op_id: generateOperationId(), performed_at: new Date().toISOString() }, operation);
+    await withScanQueueStore('readwrite', store => store.put(record));
+    return record;
+}
+
+/**
+ * Возвращает все операции, ожидающие отправки, в порядке их выполнения.
+ * @returns {Promise<object[]>}
+ */
+async function getQueuedScanOperations() {
+    const operations = await withScanQueueStore('readonly', store => store.getAll());
+    return (operations || []).sort((a, b) => a.performed_at.localeCompare(b.performed_at));
+}
+
+/**
+ * Удаляет из очереди операции, обработанные сервером.
+ * @param {string[]} opIds - ID операций.
+ */
+async function removeScanOperations(opIds) {
+    await withScanQueueStore('readwrite', store => { opIds.forEach(opId => store.delete(opId)); });
+}
+
+/**
+ * Запоминает операции, отклоненные сервером, чтобы показать их оператору.
+ * @param {object[]} results - Результаты со статусом 'error'.
+ */
+function rememberRejectedOperations(results) {
+    const rejected = JSON.parse(localStorage.getItem(SCAN_QUEUE_REJECTED_KEY) || '[]');
+    rejected.unshift(...results.map(result => ({ part_id: result.part_id, message: result.message })));
+    localStorage.setItem(SCAN_QUEUE_REJECTED_KEY, JSON.stringify(rejected.slice(0, SCAN_QUEUE_REJECTED_LIMIT)));
+}
+
+/**
+ * Запрашивает свежий CSRF-токен: страница могла быть открыта из кэша service worker'а,
+ * и токен в ее meta-теге к моменту синхронизации уже просрочен.
+ * @returns {Promise<string>}
+ */
+async function fetchCsrfToken() {
+    const response = await fetch(document.querySelector('meta[name="csrf-token-url"]').content, {
+        cache: 'no-store',
+        credentials: 'same-origin',
+    });
+    if (!response.ok) throw new Error(`Не удалось получить CSRF-токен (${response.status})`);
+    return (await response.json()).csrf_token;
+}
+
+/**
+ * Отправляет одну группу операций (одного оператора) на сервер.
+ * Операции удаляются из очереди, только если сервер их обработал.
+ * @param {string} csrfToken - Актуальный CSRF-токен (см. fetchCsrfToken).
+ * @param {string} operatorName - Имя оператора группы.
+ * @param {object[]} operations - Операции группы.
+ */
+async function sendScanOperations(csrfToken, operatorName, operations) {
+    const response = await fetch(document.querySelector('meta[name="offline-sync-url"]').content, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken,
+        },
+        body: JSON.stringify({
+            operator_name: operatorName,
+            items: operations.map(operation => ({
+                op_id: operation.op_id,
+                part_id: operation.part_id,
+                stage_id: operation.stage_id,
+                quantity: operation.quantity,
+                performed_at: operation.performed_at,
+            })),
+        }),
+    });
+    const result = await response.json().catch(() => ({}));
+    if (!response.ok || result.status !== 'success') {
+        // Операции остаются в очереди: повторная отправка безопасна
+        throw new Error(result.message || `Ошибка сервера (${response.status})`);
+    }
+    const rejected = result.results.filter(item => item.status === 'error');
+    if (rejected.length) rememberRejectedOperations(rejected);
+    await removeScanOperations(result.results.map(item => item.op_id));
+}
+
+/**
+ * Синхронизирует очередь с сервером пакетами, сгруппированными по оператору.
+ */
+async function syncScanQueue() {
+    if (scanQueueSyncing || !navigator.onLine || !window.indexedDB) return;
+    scanQueueSyncing = true;
+    let lastError = null;
+    try {
+        const operations = await getQueuedScanOperations();
+        if (!operations.length) return;
+        const csrfToken = await fetchCsrfToken();
+        const groups = new Map();
+        operations.forEach(operation => {
+            const name = operation.operator_name || '';
+            if (!groups.has(name)) groups.set(name, []);
+            groups.get(name).push(operation);
+        });
+        for (const [operatorName, group] of groups) {
+            for (let i = 0; i < group.length; i += SCAN_QUEUE_BATCH_SIZE) {
+                try {
+                    await sendScanOperations(csrfToken, operatorName, group.slice(i, i + SCAN_QUEUE_BATCH_SIZE));
+                } catch (error) {
+                    lastError = error;
+                    break;
+                }
+            }
+        }
+    } catch (error) {
+        // Нет токена (например, связь пропала): операции остаются в очереди до следующей попытки
+        lastError = error;
+    } finally {
+        scanQueueSyncing = false;
+        await renderScanQueueStatus(lastError);
+    }
+}
+
+/**
+ * Показывает количество ожидающих операций и последние отклоненные операции.
+ * @param {Error|null} error - Ошибка последней синхронизации.
+ */
+async function renderScanQueueStatus(error = null) {
+    if (!window.indexedDB) return;
+    const pending = (await getQueuedScanOperations()).length;
+    const badge = document.getElementById('offline-queue-badge');
+    if (badge) {
+        badge.textContent = `Не отправлено: ${pending}`;
+        badge.classList.toggle('hidden', pending === 0);
+    }
+
+    const status = document.getElementById('offline-queue-status');
+    if (!status) return;
+    const rejected = JSON.parse(localStorage.getItem(SCAN_QUEUE_REJECTED_KEY) || '[]');
+    const lines = [];
+    if (pending) {
+        lines.push(`Ожидают отправки: ${pending}. ${navigator.onLine ? 'Отправка…' : 'Нет связи, операции будут отправлены автоматически.'}`);
+    }
+    if (error) lines.push(`Последняя попытка отправки не удалась: ${error.message}`);
+    rejected.forEach(item => lines.push(`Отклонено (${item.part_id}): ${item.message}`));
+    status.innerHTML = '';
+    lines.forEach(line => {
+        const p = document.createElement('p');
+        p.textContent = line;
+        status.appendChild(p);
+    });
+    status.classList.toggle('hidden', lines.length === 0);
+}
+
+/**
+ * Перехватывает отправку формы подтверждения этапа: операция сохраняется
+ * в очередь без ожидания сети, отправка выполняется в фоне.
+ * @param {Event} event - Событие submit формы с атрибутом data-offline-queue.
+ */
+async function handleOfflineQueueSubmit(event) {
+    const form = event.target;
+    const quantityInput = form.querySelector('[name="quantity"]');
+    const operatorInput = form.querySelector('[name="operator_name"]');
+    const message = document.getElementById('offline-queue-message');
+    const quantity = quantityInput && quantityInput.value ? parseInt(quantityInput.value, 10) : null;
+    const operatorName = operatorInput ? operatorInput.value.trim() : (form.dataset.operatorName || '');
+
+    if (quantityInput && quantityInput.value && !(quantity > 0)) {
+        message.textContent = 'Количество должно быть больше нуля.';
+        return;
+    }
+    if (operatorName.length < 3) {
+        message.textContent = "Поле 'Ваше ФИО' обязательно для выполнения этапа.";
+        return;
+    }
+
+    // Ключ идемпотентности формы (если есть) становится ID операции:
+    // повторная отправка той же формы не будет учтена дважды
+    const idempotencyKey = form.querySelector('[name="idempotency_key"]')?.value;
+    form.querySelectorAll('input, button').forEach(element => { element.disabled = true; });
+    await queueScanOperation({
+        ...(idempotencyKey ? { op_id: idempotencyKey } : {}),
+        part_id: form.dataset.partId,
+        stage_id: form.dataset.stageId ? parseInt(form.dataset.stageId, 10) : null,
+        stage_name: form.dataset.stageName || null,
+        quantity: quantity,
+        operator_name: operatorName,
+    });
+    const stageText = form.dataset.stageName ? `Этап '${form.dataset.stageName}'` : 'Следующий этап';
+    message.textContent = `${stageText} подтвержден для детали ${form.dataset.partId}${quantity ? `: ${quantity} шт.` : '.'}`;
+    message.classList.remove('text-red-600');
+    message.classList.add('text-green-700');
+    await renderScanQueueStatus();
+    syncScanQueue();
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/scan-sw.js').catch(error => console.error('Service worker registration failed:', error));
+    }
+    if (!window.indexedDB) return;
+
+    document.querySelectorAll('form[data-offline-queue]').forEach(form => {
+        form.addEventListener('submit', event => {
+            event.preventDefault();
+            handleOfflineQueueSubmit(event);
+        });
+    });
+
+    window.addEventListener('online', syncScanQueue);
+    window.addEventListener('offline', () => renderScanQueueStatus());
+    setInterval(syncScanQueue, SCAN_QUEUE_SYNC_INTERVAL);
+    syncScanQueue();
+});
@@ -0,0 +1,72 @@
+// app/static/js/scan-sw.js
+
+// Service worker офлайн-режима сканирования. Страницы /scan/ загружаются из сети,
+// а без связи отдаются из кэша (или резервная страница /scan_offline).
+// Подтверждения этапов хранит и отправляет offline-queue.js, а не этот воркер.
+// Версия меняется вместе с разметкой страниц: при активации старые копии удаляются
+const SCAN_CACHE = 'scan-offline-v2';
+const OFFLINE_PAGE = '/scan_offline';
+const PRECACHE_URLS = [
+    OFFLINE_PAGE,
+    '/static/dist/output.css',
+    '/static/js/offline-queue.js',
+];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SCAN_CACHE).then(cache => cache.addAll(PRECACHE_URLS)).then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== SCAN_CACHE).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+/**
+ * Сеть, затем кэш: свежая страница сохраняется в кэш, без связи отдается сохраненная.
+ * @param {Request} request - Запрос страницы сканирования.
+ * @returns {Promise<Response>}
+ */
+async function networkFirstScanPage(request) {
+    const cache = await caches.open(SCAN_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        return (await cache.match(request)) || (await cache.match(OFFLINE_PAGE));
+    }
+}
+
+/**
+ * Статические файлы: ответ из кэша с фоновым обновлением из сети.
+ * @param {Request} request - Запрос статического файла.
+ * @returns {Promise<Response>}
+ */
+async function cacheFirstStatic(request) {
+    const cache = await caches.open(SCAN_CACHE);
+    const cached = await cache.match(request, { ignoreSearch: true });
+    const network = fetch(request).then(response => {
+        if (response.ok) cache.put(request, response.clone());
+        return response;
+    }).catch(error => {
+        if (cached) return cached;
+        throw error;
+    });
+    return cached || network;
+}
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin) return;
+
+    if (event.request.mode === 'navigate' && url.pathname.startsWith('/scan/')) {
+        event.respondWith(networkFirstScanPage(event.request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirstStatic(event.request));
+    }
+});
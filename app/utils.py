@@ -2,29 +2,54 @@
 
 import os
 import re
+import logging
 import qrcode
+import qrcode.image.svg
 from io import BytesIO
 import base64
 import urllib.parse
 
+logger = logging.getLogger(__name__)
+
 def create_safe_file_name(name):
     """
     Создает безопасное имя файла, заменяя недопустимые для Windows/Linux символы.
     """
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
-def generate_qr_code(part_id):
+def build_scan_url(part_id):
     """
-    Генерирует QR-код и возвращает его как объект BytesIO в оперативной памяти.
-    Это позволяет отдавать файл напрямую пользователю без сохранения на диске.
-    Возвращает объект BytesIO в случае успеха или None в случае ошибки.
+    Формирует URL страницы сканирования детали, который кодируется в QR-код.
     """
     SERVER_PUBLIC_IP = os.environ.get("SERVER_PUBLIC_IP", "127.0.0.1")
     SERVER_PORT = os.environ.get("SERVER_PORT", "5000")
 
     # URL-кодирование part_id для корректной обработки специальных символов (например, '/')
     safe_part_id = urllib.parse.quote(str(part_id), safe='')
-    url = f"http://{SERVER_PUBLIC_IP}:{SERVER_PORT}/scan/{safe_part_id}"
+    return f"http://{SERVER_PUBLIC_IP}:{SERVER_PORT}/scan/{safe_part_id}"
+
+def render_qr_code(url, fmt='png'):
+    """
+    Рендерит QR-код для произвольной строки и возвращает байты изображения.
+    Функция не зависит от контекста приложения, поэтому может выполняться
+    в отдельном процессе.
+    :param url: Кодируемая строка.
+    :param fmt: Формат изображения: 'png' или 'svg' (SVG не требует PNG-кодирования).
+    """
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qrcode.make(url, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qrcode.make(url).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def generate_qr_code(part_id):
+    """
+    Генерирует QR-код и возвращает его как объект BytesIO в оперативной памяти.
+    Это позволяет отдавать файл напрямую пользователю без сохранения на диске.
+    Возвращает объект BytesIO в случае успеха или None в случае ошибки.
+    """
+    url = build_scan_url(part_id)
     
     try:
         qr_img = qrcode.make(url)
@@ -32,11 +57,9 @@ def generate_qr_code(part_id):
         img_buffer = BytesIO()
         qr_img.save(img_buffer, format='PNG')
         img_buffer.seek(0)
-        
-        print(f"  -> QR-код для детали {part_id} сгенерирован в памяти. URL: {url}")
         return img_buffer
     except Exception as e:
-        print(f"  -> ОШИБКА создания QR-кода для {part_id}: {e}")
+        logger.warning(f"Ошибка создания QR-кода для {part_id}: {e}")
         return None
 
 def generate_qr_code_as_base64(part_id):
@@ -21,6 +21,78 @@ class Config:
     # --- Статические настройки приложения ---
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # --- Фоновый импорт ---
+    # Импорт выполняется в пуле потоков, чтобы не блокировать обработку запросов.
+    # Под eventlet эти потоки зеленые: чтение и разбор файла уходят в потоки ОС (eventlet.tpool),
+    # а вставка отдает управление между пакетами. Построение строк для вставки выполняется
+    # в самом воркере и на время удерживает его (на больших файлах — доли секунды).
+    IMPORT_JOBS_ASYNC = True
+    IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 1))
+
+    # --- Socket.IO и несколько воркеров ---
+    # Количество воркеров Gunicorn (читается также в entrypoint.sh)
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1))
+    # Брокер сообщений Socket.IO: redis://host:6379/0 (Redis или совместимый), 'local://' — внутрипроцессная замена.
+    # Обязателен при WEB_WORKERS > 1, иначе клиенты получат только события своего воркера.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'check-control')
+    # Gunicorn распределяет запросы между воркерами без привязки сессий (sticky sessions),
+    # а long-polling Socket.IO требует, чтобы все запросы клиента шли в один воркер.
+    # Поэтому при нескольких воркерах клиенты подключаются только по WebSocket.
+    # Если перед приложением стоит балансировщик с sticky sessions (например, nginx ip_hash
+    # перед несколькими процессами с -w 1), можно явно указать SOCKETIO_WEBSOCKET_ONLY=0.
+    SOCKETIO_WEBSOCKET_ONLY = os.environ.get('SOCKETIO_WEBSOCKET_ONLY', '1' if WEB_WORKERS > 1 else '0') == '1'
+
+    # --- WebSocket-уведомления ---
+    # Окно (мс), в течение которого уведомления накапливаются и объединяются
+    NOTIFICATION_BATCH_WINDOW_MS = int(os.environ.get('NOTIFICATION_BATCH_WINDOW_MS', 100))
+
+    # --- Кэш сводки панели мониторинга ---
+    # Сводка сбрасывается сервисами при изменении деталей; TTL (сек.) лишь ограничивает
+    # устаревание при изменениях в обход сервисов (например, из CLI без общего хранилища)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+    CACHE_MAX_ITEMS = 256
+    # Общее хранилище поколений кэша для нескольких воркеров (redis://host:6379/1)
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    # Результаты API отчетов (сек.); сбрасываются при изменении истории статусов.
+    # Клиенты получают ETag/Last-Modified и перепроверяют данные условным запросом (304)
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 600))
+
+    # --- Журнал аудита ---
+    # 'async' — записи после фиксации транзакции буферизуются и вставляются пакетами в фоне;
+    # 'sync' — каждая запись вставляется в транзакции действия. Критичные действия
+    # (удаления, отмена этапов, брак, управление пользователями) всегда пишутся синхронно.
+    AUDIT_LOG_MODE = os.environ.get('AUDIT_LOG_MODE', 'async')
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = 500
+    AUDIT_FLUSH_INTERVAL_MS = int(os.environ.get('AUDIT_FLUSH_INTERVAL_MS', 500))
+    # После стольких неудачных попыток вставки запись отбрасывается с полной копией в логе приложения
+    AUDIT_MAX_ATTEMPTS = int(os.environ.get('AUDIT_MAX_ATTEMPTS', 5))
+    # Журнал старше этого числа месяцев переносится командой archive-audit-logs
+    # в сжатые файлы (ARCHIVE_FOLDER, по умолчанию instance/archive) и остается доступен в журнале
+    AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', 12))
+
+    # --- Кэш QR-кодов ---
+    # Формат изображений на странице печати по умолчанию: 'png' или 'svg'
+    QR_FORMAT = os.environ.get('QR_FORMAT', 'png')
+    QR_CACHE_MEMORY_ITEMS = 4096
+    # Количество процессов для рендеринга промахов кэша. По умолчанию 0 — рендеринг в текущем
+    # процессе: пул процессов внутри воркера eventlet небезопасен и умножается на число воркеров.
+    # Пул включается явно (например, для отдельного процесса печати без eventlet).
+    QR_RENDER_WORKERS = int(os.environ.get('QR_RENDER_WORKERS', 0))
+
+    # --- Листы этикеток (PDF) ---
+    # Размер листа и поля в миллиметрах, сетка этикеток и разрешение растра страницы
+    QR_LABEL_PAGE_WIDTH_MM = 210
+    QR_LABEL_PAGE_HEIGHT_MM = 297
+    QR_LABEL_MARGIN_MM = 8
+    QR_LABEL_GAP_MM = 2
+    QR_LABEL_COLUMNS = int(os.environ.get('QR_LABEL_COLUMNS', 3))
+    QR_LABEL_ROWS = int(os.environ.get('QR_LABEL_ROWS', 8))
+    QR_LABEL_DPI = 200
+    # TrueType-шрифт с кириллицей для подписей (по умолчанию ищется DejaVu Sans)
+    LABEL_FONT_PATH = os.environ.get('LABEL_FONT_PATH')
+
 
 class DevelopmentConfig(Config):
     """
@@ -44,6 +116,12 @@ class TestingConfig(Config):
     SERVER_NAME = 'localhost.localdomain' # Для корректной генерации URL в тестах
     WTF_CSRF_ENABLED = False # Отключаем CSRF-защиту для упрощения тестов
     SECRET_KEY = 'a-secret-key-for-testing-purposes' # Используем постоянный ключ
+    IMPORT_JOBS_ASYNC = False # БД в памяти не видна из других потоков
+    QR_RENDER_WORKERS = 0 # Рендерим QR-коды в текущем процессе
+    NOTIFICATION_BATCH_WINDOW_MS = 0 # Уведомления отправляются сразу, без фоновых задач
+    DASHBOARD_CACHE_TTL = 0 # Тесты наполняют БД напрямую, в обход сервисов
+    REPORT_CACHE_TTL = 0
+    AUDIT_LOG_MODE = 'sync' # БД в памяти не видна из других потоков
 
 
 class ProductionConfig(Config):
@@ -64,6 +142,8 @@ class ProductionConfig(Config):
             raise ValueError(f"Переменная {self.ENV_DATABASE_URI} не установлена для production-окружения!")
         if not self.SECRET_KEY:
             raise ValueError(f"Переменная {self.ENV_FLASK_SECRET_KEY} не установлена для production-окружения!")
+        if self.WEB_WORKERS > 1 and not self.SOCKETIO_MESSAGE_QUEUE:
+            raise ValueError("Для WEB_WORKERS > 1 необходимо указать SOCKETIO_MESSAGE_QUEUE (например, redis://redis:6379/0)!")
 
 # --- Техническое улучшение: Типизация ---
 # Словарь для удобного выбора класса конфигурации по имени
@@ -8,6 +8,11 @@ set -e
 echo "--> Starting PostCSS watcher in the background..."
 npm run css:watch &
 
+# Помечаем задачи импорта, прерванные предыдущей остановкой сервера.
+# Миграции здесь могут быть еще не применены: ошибка не должна мешать запуску
+echo "--> Failing interrupted import jobs..."
+flask fail-orphaned-imports || true
+
 # --- НАЧАЛО ИСПРАВЛЕНИЯ ---
 # Заменяем `npm run start:flask`, который использует `flask run`,
 # на прямой запуск wsgi.py. Это необходимо для корректной работы
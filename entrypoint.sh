@@ -43,6 +43,16 @@ echo "==> Seeding initial admin user (if not exists)..."
 flask seed
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
 
-echo "==> Starting Gunicorn server..."
+echo "==> Creating audit log partitions for the coming months..."
+# Без этого после исчерпания созданных месяцев журнал попадает в партицию по умолчанию.
+flask create-audit-partitions
+
+echo "==> Failing import jobs interrupted by the previous shutdown..."
+# Воркеры еще не запущены: задачи в очереди и в работе выполнять уже некому.
+flask fail-orphaned-imports
+
+echo "==> Starting Gunicorn server with ${WEB_WORKERS:-1} worker(s)..."
 # Запускаем основной процесс - веб-сервер Gunicorn.
-exec gunicorn --worker-class eventlet -w 1 --bind 0.0.0.0:5000 wsgi:app
\ No newline at end of file
+# Несколько воркеров (WEB_WORKERS > 1) требуют брокер сообщений SOCKETIO_MESSAGE_QUEUE,
+# клиенты в этом режиме подключаются только по WebSocket (см. config.py).
+exec gunicorn --worker-class eventlet -w "${WEB_WORKERS:-1}" --bind 0.0.0.0:5000 wsgi:app
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Add PartStageProgress materialized counters
+
+Revision ID: 4c1e9b7d2a10
+Revises: a35d608e9564
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e9b7d2a10'
+down_revision = 'a35d608e9564'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('PartStageProgress',
+    sa.Column('part_id', sa.String(), nullable=False),
+    sa.Column('stage_name', sa.String(), nullable=False),
+    sa.Column('quantity_completed', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['part_id'], ['Parts.part_id'], ),
+    sa.PrimaryKeyConstraint('part_id', 'stage_name')
+    )
+
+    # Заполняем счетчики из уже накопленной истории
+    op.execute(
+        """
+        INSERT INTO "PartStageProgress" (part_id, stage_name, quantity_completed)
+        SELECT part_id, status, SUM(quantity)
+        FROM "StatusHistory"
+        WHERE status_type = 'COMPLETED'
+        GROUP BY part_id, status
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('PartStageProgress')
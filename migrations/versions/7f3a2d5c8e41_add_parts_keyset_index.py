@@ -0,0 +1,26 @@
+"""Add composite index for keyset pagination of parts
+
+Revision ID: 7f3a2d5c8e41
+Revises: 4c1e9b7d2a10
+Create Date: 2026-10-17 10:04:12.551937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3a2d5c8e41'
+down_revision = '4c1e9b7d2a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.create_index('ix_Parts_product_designation_part_id', ['product_designation', 'part_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.drop_index('ix_Parts_product_designation_part_id')
@@ -0,0 +1,84 @@
+"""Key the SQLite part search table by part_id instead of Parts.rowid
+
+Revision ID: a4d7e2b9c613
+Revises: f2a8d5c1b946
+Create Date: 2026-10-18 10:42:07.881354
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d7e2b9c613'
+down_revision = 'f2a8d5c1b946'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'part_id, name, material, product_designation'
+TRIGGERS = ('Parts_search_insert', 'Parts_search_delete', 'Parts_search_update')
+# Строка индекса находится по собственному целому ключу детали (см. app/models/search_models.py)
+KEY = '(SELECT id FROM "PartsSearchKeys" WHERE part_id = {}.part_id)'
+INSERT_ROW = (
+    f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) '
+    f'VALUES ({KEY.format("new")}, new.part_id, new.name, new.material, new.product_designation); '
+)
+
+
+def _drop_triggers():
+    for trigger in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+
+
+def upgrade():
+    # Rowid таблицы Parts (первичный ключ — строка) может измениться при VACUUM;
+    # на PostgreSQL поиск идет по индексу самой таблицы и не меняется
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _drop_triggers()
+    op.execute('CREATE TABLE "PartsSearchKeys" (id INTEGER PRIMARY KEY, part_id VARCHAR NOT NULL UNIQUE)')
+    op.execute('INSERT INTO "PartsSearchKeys" (part_id) SELECT part_id FROM "Parts"')
+    op.execute('DELETE FROM "PartsSearch"')
+    op.execute(
+        f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) '
+        'SELECT k.id, p.part_id, p.name, p.material, p.product_designation '
+        'FROM "Parts" p JOIN "PartsSearchKeys" k ON k.part_id = p.part_id'
+    )
+    op.execute(
+        'CREATE TRIGGER "Parts_search_insert" AFTER INSERT ON "Parts" BEGIN '
+        'INSERT INTO "PartsSearchKeys" (part_id) VALUES (new.part_id); '
+        f'{INSERT_ROW}END'
+    )
+    op.execute(
+        'CREATE TRIGGER "Parts_search_delete" AFTER DELETE ON "Parts" BEGIN '
+        f'DELETE FROM "PartsSearch" WHERE rowid = {KEY.format("old")}; '
+        'DELETE FROM "PartsSearchKeys" WHERE part_id = old.part_id; END'
+    )
+    op.execute(
+        f'CREATE TRIGGER "Parts_search_update" AFTER UPDATE OF {COLUMNS} ON "Parts" BEGIN '
+        f'DELETE FROM "PartsSearch" WHERE rowid = {KEY.format("old")}; '
+        'UPDATE "PartsSearchKeys" SET part_id = new.part_id WHERE part_id = old.part_id; '
+        f'{INSERT_ROW}END'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _drop_triggers()
+    op.execute('DROP TABLE "PartsSearchKeys"')
+    op.execute('DELETE FROM "PartsSearch"')
+    op.execute(f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) SELECT rowid, {COLUMNS} FROM "Parts"')
+    new_values = 'new.rowid, new.part_id, new.name, new.material, new.product_designation'
+    op.execute(
+        'CREATE TRIGGER "Parts_search_insert" AFTER INSERT ON "Parts" BEGIN '
+        f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) VALUES ({new_values}); END'
+    )
+    op.execute(
+        'CREATE TRIGGER "Parts_search_delete" AFTER DELETE ON "Parts" BEGIN '
+        'DELETE FROM "PartsSearch" WHERE rowid = old.rowid; END'
+    )
+    op.execute(
+        f'CREATE TRIGGER "Parts_search_update" AFTER UPDATE OF {COLUMNS} ON "Parts" BEGIN '
+        'DELETE FROM "PartsSearch" WHERE rowid = old.rowid; '
+        f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) VALUES ({new_values}); END'
+    )
@@ -0,0 +1,47 @@
+"""Add StageDurations fact table for the stage duration report
+
+Revision ID: a7c3e9f2b514
+Revises: f4b8d2e6a913
+Create Date: 2026-10-17 18:21:37.904215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f2b514'
+down_revision = 'f4b8d2e6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('StageDurations',
+    sa.Column('history_id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.String(), nullable=False),
+    sa.Column('product_designation', sa.String(), nullable=False),
+    sa.Column('stage_name', sa.String(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=False),
+    sa.Column('duration_seconds', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['history_id'], ['StatusHistory.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['part_id'], ['Parts.part_id'], ),
+    sa.PrimaryKeyConstraint('history_id')
+    )
+    with op.batch_alter_table('StageDurations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_StageDurations_finished_at'), ['finished_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_StageDurations_part_id'), ['part_id'], unique=False)
+        batch_op.create_index('ix_StageDurations_product_designation_finished_at', ['product_designation', 'finished_at'], unique=False)
+
+    # Факты по уже накопленной истории заполняются командой `flask rebuild-stage-durations`:
+    # длительности вычисляются в Python одинаково для SQLite и PostgreSQL
+
+
+def downgrade():
+    with op.batch_alter_table('StageDurations', schema=None) as batch_op:
+        batch_op.drop_index('ix_StageDurations_product_designation_finished_at')
+        batch_op.drop_index(batch_op.f('ix_StageDurations_part_id'))
+        batch_op.drop_index(batch_op.f('ix_StageDurations_finished_at'))
+
+    op.drop_table('StageDurations')
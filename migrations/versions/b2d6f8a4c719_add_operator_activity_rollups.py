@@ -0,0 +1,37 @@
+"""Add OperatorActivityRollups hourly/daily aggregates
+
+Revision ID: b2d6f8a4c719
+Revises: a7c3e9f2b514
+Create Date: 2026-10-17 19:05:12.637018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6f8a4c719'
+down_revision = 'a7c3e9f2b514'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Тип statustype уже создан вместе с таблицей StatusHistory
+    status_type = postgresql.ENUM('COMPLETED', 'REWORK', 'SCRAPPED', name='statustype', create_type=False)
+    op.create_table('OperatorActivityRollups',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('operator_name', sa.String(), nullable=False),
+    sa.Column('stage_name', sa.String(), nullable=False),
+    sa.Column('status_type', status_type, nullable=False),
+    sa.Column('entries_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('quantity', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'operator_name', 'stage_name', 'status_type')
+    )
+    # Агрегаты по уже накопленной истории заполняются командой `flask rebuild-operator-rollups`
+
+
+def downgrade():
+    op.drop_table('OperatorActivityRollups')
@@ -0,0 +1,49 @@
+"""Add ImportJobs table for background imports
+
+Revision ID: b8d41f6a2c93
+Revises: 7f3a2d5c8e41
+Create Date: 2026-10-17 11:20:37.184502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d41f6a2c93'
+down_revision = '7f3a2d5c8e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportJobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('stored_filename', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', name='importjobstatus'), nullable=False),
+    sa.Column('rows_parsed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rows_inserted', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rows_skipped', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ImportJobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ImportJobs_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ImportJobs_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ImportJobs_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ImportJobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ImportJobs_user_id'))
+        batch_op.drop_index(batch_op.f('ix_ImportJobs_status'))
+        batch_op.drop_index(batch_op.f('ix_ImportJobs_created_at'))
+
+    op.drop_table('ImportJobs')
+    sa.Enum(name='importjobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,39 @@
+"""Add denormalized Parts.is_top_level flag with partial index
+
+Revision ID: c5e72a9f1d34
+Revises: b8d41f6a2c93
+Create Date: 2026-10-17 13:42:05.318264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e72a9f1d34'
+down_revision = 'b8d41f6a2c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_top_level', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+    # Заполняем признак по существующим связям сборок
+    op.execute(
+        'UPDATE "Parts" SET is_top_level = false '
+        'WHERE EXISTS (SELECT 1 FROM "AssemblyComponents" ac WHERE ac.child_id = "Parts".part_id)'
+    )
+
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_Parts_top_level_product_designation_part_id', ['product_designation', 'part_id'], unique=False,
+            postgresql_where=sa.text('is_top_level'), sqlite_where=sa.text('is_top_level = 1')
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.drop_index('ix_Parts_top_level_product_designation_part_id')
+        batch_op.drop_column('is_top_level')
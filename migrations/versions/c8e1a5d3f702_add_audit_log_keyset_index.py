@@ -0,0 +1,26 @@
+"""Add (category, timestamp, id) index for keyset pagination of AuditLogs
+
+Revision ID: c8e1a5d3f702
+Revises: b2d6f8a4c719
+Create Date: 2026-10-17 19:48:26.105337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e1a5d3f702'
+down_revision = 'b2d6f8a4c719'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('AuditLogs', schema=None) as batch_op:
+        batch_op.create_index('ix_AuditLogs_category_timestamp_id', ['category', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('AuditLogs', schema=None) as batch_op:
+        batch_op.drop_index('ix_AuditLogs_category_timestamp_id')
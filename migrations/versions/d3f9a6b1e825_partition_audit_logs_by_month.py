@@ -0,0 +1,112 @@
+"""Partition AuditLogs by month on PostgreSQL
+
+Revision ID: d3f9a6b1e825
+Revises: c8e1a5d3f702
+Create Date: 2026-10-17 21:12:40.318204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f9a6b1e825'
+down_revision = 'c8e1a5d3f702'
+branch_labels = None
+depends_on = None
+
+# Сколько месяцев вперед создаются партиции (дальше их создает команда archive-audit-logs)
+MONTHS_AHEAD = 3
+
+INDEXES = (
+    ('ix_AuditLogs_category', 'category'),
+    ('ix_AuditLogs_part_id', 'part_id'),
+    ('ix_AuditLogs_timestamp', '"timestamp"'),
+    ('ix_AuditLogs_category_timestamp_id', 'category, "timestamp", id'),
+)
+
+
+def _create_indexes():
+    for name, columns in INDEXES:
+        op.execute(f'CREATE INDEX "{name}" ON "AuditLogs" ({columns})')
+
+
+def upgrade():
+    # Декларативное секционирование есть только в PostgreSQL; в остальных СУБД таблица не меняется
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE "AuditLogs" RENAME TO "AuditLogs_unpartitioned"')
+    op.execute('ALTER TABLE "AuditLogs_unpartitioned" RENAME CONSTRAINT "AuditLogs_pkey" TO "AuditLogs_unpartitioned_pkey"')
+    op.execute('ALTER SEQUENCE "AuditLogs_id_seq" OWNED BY NONE')
+    for name, _ in INDEXES:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"')
+
+    # Ключ секционирования обязан входить в первичный ключ
+    op.execute(
+        'CREATE TABLE "AuditLogs" ('
+        'id INTEGER NOT NULL DEFAULT nextval(\'"AuditLogs_id_seq"\'), '
+        'part_id VARCHAR, '
+        'user_id INTEGER REFERENCES "Users" (id) ON DELETE SET NULL, '
+        '"timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE \'utc\'), '
+        'action VARCHAR(100) NOT NULL, '
+        'details TEXT, '
+        'category VARCHAR(50) NOT NULL DEFAULT \'general\', '
+        'PRIMARY KEY (id, "timestamp")'
+        ') PARTITION BY RANGE ("timestamp")'
+    )
+    op.execute('ALTER SEQUENCE "AuditLogs_id_seq" OWNED BY "AuditLogs".id')
+    # Записи вне созданных месяцев (если партиции не были созданы вовремя) попадают сюда
+    op.execute('CREATE TABLE "AuditLogs_default" PARTITION OF "AuditLogs" DEFAULT')
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start DATE := date_trunc('month', COALESCE(
+                (SELECT MIN("timestamp") FROM "AuditLogs_unpartitioned"), now() AT TIME ZONE 'utc'));
+            last_month DATE := date_trunc('month', now() AT TIME ZONE 'utc') + INTERVAL '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                EXECUTE 'CREATE TABLE ' || quote_ident('AuditLogs_p' || to_char(month_start, 'YYYY_MM'))
+                    || ' PARTITION OF "AuditLogs" FOR VALUES FROM (' || quote_literal(month_start)
+                    || ') TO (' || quote_literal((month_start + INTERVAL '1 month')::date) || ')';
+                month_start := month_start + INTERVAL '1 month';
+            END LOOP;
+        END $$
+    """)
+    op.execute(
+        'INSERT INTO "AuditLogs" (id, part_id, user_id, "timestamp", action, details, category) '
+        'SELECT id, part_id, user_id, COALESCE("timestamp", now() AT TIME ZONE \'utc\'), action, details, category '
+        'FROM "AuditLogs_unpartitioned"'
+    )
+    op.execute('DROP TABLE "AuditLogs_unpartitioned"')
+    _create_indexes()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE "AuditLogs" RENAME TO "AuditLogs_partitioned"')
+    op.execute('ALTER TABLE "AuditLogs_partitioned" RENAME CONSTRAINT "AuditLogs_pkey" TO "AuditLogs_partitioned_pkey"')
+    op.execute('ALTER SEQUENCE "AuditLogs_id_seq" OWNED BY NONE')
+    for name, _ in INDEXES:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_partitioned"')
+
+    op.execute(
+        'CREATE TABLE "AuditLogs" ('
+        'id INTEGER NOT NULL DEFAULT nextval(\'"AuditLogs_id_seq"\') PRIMARY KEY, '
+        'part_id VARCHAR, '
+        'user_id INTEGER REFERENCES "Users" (id) ON DELETE SET NULL, '
+        '"timestamp" TIMESTAMP WITHOUT TIME ZONE, '
+        'action VARCHAR(100) NOT NULL, '
+        'details TEXT, '
+        'category VARCHAR(50) NOT NULL DEFAULT \'general\''
+        ')'
+    )
+    op.execute('ALTER SEQUENCE "AuditLogs_id_seq" OWNED BY "AuditLogs".id')
+    op.execute(
+        'INSERT INTO "AuditLogs" (id, part_id, user_id, "timestamp", action, details, category) '
+        'SELECT id, part_id, user_id, "timestamp", action, details, category FROM "AuditLogs_partitioned"'
+    )
+    # Партиции удаляются вместе с родительской таблицей
+    op.execute('DROP TABLE "AuditLogs_partitioned"')
+    _create_indexes()
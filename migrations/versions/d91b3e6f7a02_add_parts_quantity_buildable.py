@@ -0,0 +1,60 @@
+"""Add materialized Parts.quantity_buildable for rolled-up assembly progress
+
+Revision ID: d91b3e6f7a02
+Revises: c5e72a9f1d34
+Create Date: 2026-10-17 15:08:51.720413
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b3e6f7a02'
+down_revision = 'c5e72a9f1d34'
+branch_labels = None
+depends_on = None
+
+# Максимальная глубина состава, для которой заполняются значения
+MAX_BOM_DEPTH = 50
+
+
+def upgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_buildable', sa.Integer(), server_default='0', nullable=False))
+
+    # Детали без состава: готовность равна выполненному количеству
+    op.execute(
+        'UPDATE "Parts" SET quantity_buildable = CASE WHEN quantity_completed < quantity_total '
+        'THEN quantity_completed ELSE quantity_total END '
+        'WHERE NOT EXISTS (SELECT 1 FROM "AssemblyComponents" ac WHERE ac.parent_id = "Parts".part_id)'
+    )
+
+    # Сборки: каждый проход поднимает значения на один уровень, пока они меняются
+    bind = op.get_bind()
+    least = 'LEAST' if bind.dialect.name == 'postgresql' else 'MIN'
+    value = (
+        f'{least}('
+        '(SELECT MIN(c.quantity_buildable / CASE WHEN ac.quantity > 0 THEN ac.quantity ELSE 1 END) '
+        'FROM "AssemblyComponents" ac JOIN "Parts" c ON c.part_id = ac.child_id '
+        'WHERE ac.parent_id = "Parts".part_id), '
+        'CASE WHEN route_template_id IS NULL THEN quantity_total ELSE quantity_completed END, '
+        'quantity_total)'
+    )
+    statement = (
+        f'UPDATE "Parts" SET quantity_buildable = {value} '
+        'WHERE EXISTS (SELECT 1 FROM "AssemblyComponents" ac WHERE ac.parent_id = "Parts".part_id) '
+        f'AND quantity_buildable <> {value}'
+    )
+    for _ in range(MAX_BOM_DEPTH):
+        if context.is_offline_mode():
+            # В offline-режиме число изменений неизвестно: выводим все проходы (лишние ничего не меняют)
+            op.execute(statement)
+            continue
+        if not bind.execute(sa.text(statement)).rowcount:
+            break
+
+
+def downgrade():
+    with op.batch_alter_table('Parts', schema=None) as batch_op:
+        batch_op.drop_column('quantity_buildable')
@@ -0,0 +1,28 @@
+"""Add StatusHistory.client_op_id for idempotent offline scan sync
+
+Revision ID: e3a7c1f95b28
+Revises: d91b3e6f7a02
+Create Date: 2026-10-17 16:24:37.905116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c1f95b28'
+down_revision = 'd91b3e6f7a02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('StatusHistory', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_op_id', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_StatusHistory_client_op_id'), ['client_op_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('StatusHistory', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_StatusHistory_client_op_id'))
+        batch_op.drop_column('client_op_id')
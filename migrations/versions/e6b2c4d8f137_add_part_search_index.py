@@ -0,0 +1,60 @@
+"""Add indexed part search (pg_trgm GIN index / SQLite FTS5 table)
+
+Revision ID: e6b2c4d8f137
+Revises: d3f9a6b1e825
+Create Date: 2026-10-17 22:05:14.527930
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2c4d8f137'
+down_revision = 'd3f9a6b1e825'
+branch_labels = None
+depends_on = None
+
+# Выражение должно совпадать с PART_SEARCH_DOCUMENT_SQL в app/models/search_models.py
+DOCUMENT = (
+    '("Parts".part_id || \' \' || "Parts".name || \' \' || "Parts".material '
+    '|| \' \' || "Parts".product_designation)'
+)
+COLUMNS = 'part_id, name, material, product_designation'
+NEW_VALUES = 'new.rowid, new.part_id, new.name, new.material, new.product_designation'
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(f'CREATE INDEX "ix_Parts_search_trgm" ON "Parts" USING gin ({DOCUMENT} gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        op.execute(
+            f'CREATE VIRTUAL TABLE "PartsSearch" USING fts5({COLUMNS}, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute(f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) SELECT rowid, {COLUMNS} FROM "Parts"')
+        op.execute(
+            'CREATE TRIGGER "Parts_search_insert" AFTER INSERT ON "Parts" BEGIN '
+            f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) VALUES ({NEW_VALUES}); END'
+        )
+        op.execute(
+            'CREATE TRIGGER "Parts_search_delete" AFTER DELETE ON "Parts" BEGIN '
+            'DELETE FROM "PartsSearch" WHERE rowid = old.rowid; END'
+        )
+        op.execute(
+            f'CREATE TRIGGER "Parts_search_update" AFTER UPDATE OF {COLUMNS} ON "Parts" BEGIN '
+            'DELETE FROM "PartsSearch" WHERE rowid = old.rowid; '
+            f'INSERT INTO "PartsSearch" (rowid, {COLUMNS}) VALUES ({NEW_VALUES}); END'
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Расширение pg_trgm не удаляем: им могут пользоваться другие объекты базы
+        op.execute('DROP INDEX IF EXISTS "ix_Parts_search_trgm"')
+    elif dialect == 'sqlite':
+        for trigger in ('Parts_search_insert', 'Parts_search_delete', 'Parts_search_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+        op.execute('DROP TABLE IF EXISTS "PartsSearch"')
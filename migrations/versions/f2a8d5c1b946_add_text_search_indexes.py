@@ -0,0 +1,65 @@
+"""Add full-text search over part notes, status comments and audit details
+
+Revision ID: f2a8d5c1b946
+Revises: e6b2c4d8f137
+Create Date: 2026-10-17 23:18:52.604117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8d5c1b946'
+down_revision = 'e6b2c4d8f137'
+branch_labels = None
+depends_on = None
+
+# Таблица -> столбец с текстом (см. TEXT_SEARCH_SOURCES в app/models/search_models.py)
+SOURCES = (
+    ('PartNotes', 'text'),
+    ('StatusHistory', 'comment'),
+    ('AuditLogs', 'details'),
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, column in SOURCES:
+        if dialect == 'postgresql':
+            # На секционированной AuditLogs индекс создается и на всех партициях
+            op.execute(
+                f'CREATE INDEX "ix_{table}_{column}_fts" ON "{table}" '
+                f'USING gin (to_tsvector(\'russian\', COALESCE("{table}".{column}, \'\')))'
+            )
+        elif dialect == 'sqlite':
+            fts = f'{table}Search'
+            op.execute(
+                f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+                "body, tokenize = 'unicode61 remove_diacritics 2', prefix = '3')"
+            )
+            op.execute(f'INSERT INTO "{fts}" (rowid, body) SELECT id, {column} FROM "{table}" WHERE {column} IS NOT NULL')
+            op.execute(
+                f'CREATE TRIGGER "{table}_search_insert" AFTER INSERT ON "{table}" '
+                f'WHEN new.{column} IS NOT NULL BEGIN '
+                f'INSERT INTO "{fts}" (rowid, body) VALUES (new.id, new.{column}); END'
+            )
+            op.execute(
+                f'CREATE TRIGGER "{table}_search_delete" AFTER DELETE ON "{table}" BEGIN '
+                f'DELETE FROM "{fts}" WHERE rowid = old.id; END'
+            )
+            op.execute(
+                f'CREATE TRIGGER "{table}_search_update" AFTER UPDATE OF {column} ON "{table}" BEGIN '
+                f'DELETE FROM "{fts}" WHERE rowid = old.id; '
+                f'INSERT INTO "{fts}" (rowid, body) SELECT new.id, new.{column} WHERE new.{column} IS NOT NULL; END'
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, column in SOURCES:
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS "ix_{table}_{column}_fts"')
+        elif dialect == 'sqlite':
+            for action in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS "{table}_search_{action}"')
+            op.execute(f'DROP TABLE IF EXISTS "{table}Search"')
@@ -0,0 +1,38 @@
+"""Add (part_id, timestamp) indexes for the paginated history timeline
+
+Revision ID: f4b8d2e6a913
+Revises: e3a7c1f95b28
+Create Date: 2026-10-17 17:02:11.480562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d2e6a913'
+down_revision = 'e3a7c1f95b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('StatusHistory', schema=None) as batch_op:
+        batch_op.create_index('ix_StatusHistory_part_id_timestamp', ['part_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('PartNotes', schema=None) as batch_op:
+        batch_op.create_index('ix_PartNotes_part_id_timestamp', ['part_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('ResponsibleHistory', schema=None) as batch_op:
+        batch_op.create_index('ix_ResponsibleHistory_part_id_timestamp', ['part_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ResponsibleHistory', schema=None) as batch_op:
+        batch_op.drop_index('ix_ResponsibleHistory_part_id_timestamp')
+
+    with op.batch_alter_table('PartNotes', schema=None) as batch_op:
+        batch_op.drop_index('ix_PartNotes_part_id_timestamp')
+
+    with op.batch_alter_table('StatusHistory', schema=None) as batch_op:
+        batch_op.drop_index('ix_StatusHistory_part_id_timestamp')
@@ -41,6 +41,20 @@ class TestAdminPartRoutesSuccess:
         link = AssemblyComponent.query.filter_by(parent_id=parent_id, child_id='CHILD-01').first()
         assert link is not None
         assert link.quantity == 2
+        assert child.is_top_level is False
+
+    def test_deleting_assembly_makes_children_top_level(self, client, auth_client, database):
+        """Тест: После удаления сборки ее узлы снова считаются верхнеуровневыми."""
+        client = auth_client('admin', 'password123')
+        client.post(url_for('admin.part.add_child_part', parent_part_id='TEST-001'), data={
+            'part_id': 'CHILD-01', 'name': 'Child Part', 'material': 'M', 'quantity_total': 1
+        })
+        client.post(url_for('admin.part.bulk_action'), data={'action': 'delete', 'part_ids': ['TEST-001']})
+
+        db.session.expire_all()
+        child = db.session.get(Part, 'CHILD-01')
+        assert child.is_top_level is True
+        assert AssemblyComponent.query.count() == 0
 
     def test_part_actions(self, client, auth_client, database):
         client = auth_client('admin', 'password123')
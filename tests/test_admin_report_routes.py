@@ -1,10 +1,12 @@
 # tests/test_admin_report_routes.py
 
+import pytest
 from flask import url_for
 from unittest.mock import patch
 from io import BytesIO
-from app.models.models import StatusHistory, Part
+from app.models.models import StatusHistory, Part, Stage
 from app import db
+from app.services import report_service, part_status_service, cache_service
 import datetime
 
 class TestReportRoutes:
@@ -57,7 +59,10 @@ class TestReportRoutes:
         """Тест: API для производительности операторов возвращает корректный JSON."""
         client = auth_client('manager', 'password123')
         
-        db.session.add(StatusHistory(part_id='TEST-001', status='Test', operator_name='Иванов', quantity=1))
+        entry = StatusHistory(part_id='TEST-001', status='Test', operator_name='Иванов', quantity=1)
+        db.session.add(entry)
+        # История добавлена напрямую, минуя сервисы: агрегаты отчета обновляем явно
+        report_service.update_operator_rollups([entry])
         db.session.commit()
 
         response = client.get(url_for('admin.report.api_report_operator_performance'))
@@ -75,6 +80,8 @@ class TestReportRoutes:
         part = db.session.get(Part, 'TEST-001')
         part.date_added = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
         db.session.add(StatusHistory(part_id='TEST-001', status='Резка', operator_name='Иванов', quantity=1, timestamp=datetime.datetime.utcnow() - datetime.timedelta(hours=1)))
+        # История добавлена напрямую, минуя сервисы: факты отчета пересчитываем явно
+        report_service.refresh_stage_durations(['TEST-001'])
         db.session.commit()
         
         response = client.get(url_for('admin.report.api_report_stage_duration'))
@@ -83,4 +90,66 @@ class TestReportRoutes:
         assert 'labels' in data
         assert 'datasets' in data
         assert data['labels'][0] == 'Резка'
-        assert data['datasets'][0]['data'][0] > 0
\ No newline at end of file
+        assert data['datasets'][0]['data'][0] > 0
+    def test_api_stage_duration_filters(self, client, auth_client, database):
+        """Тест: API длительности этапов учитывает фильтры по периоду и изделию."""
+        client = auth_client('manager', 'password123')
+        now = datetime.datetime.utcnow()
+        part = db.session.get(Part, 'TEST-001')
+        part.date_added = now - datetime.timedelta(days=3)
+        db.session.add(StatusHistory(part_id='TEST-001', status='Резка', operator_name='Иванов', quantity=1,
+                                     timestamp=now - datetime.timedelta(days=2)))
+        report_service.refresh_stage_durations(['TEST-001'])
+        db.session.commit()
+
+        day = (now - datetime.timedelta(days=2)).strftime('%Y-%m-%d')
+        data = client.get(url_for('admin.report.api_report_stage_duration', date_from=day, date_to=day)).get_json()
+        assert data['labels'] == ['Резка']
+        assert data['datasets'][0]['data'][0] == pytest.approx(24, abs=0.01)
+
+        data = client.get(url_for('admin.report.api_report_stage_duration', product='Другое изделие')).get_json()
+        assert data['labels'] == []
+
+        response = client.get(url_for('admin.report.api_report_stage_duration', date_from='17.10.2026'))
+        assert response.status_code == 400
+
+    def test_api_operator_reports_include_last_day(self, client, auth_client, database):
+        """Тест: Конечная дата периода включается целиком, временной ряд строится по шагам."""
+        client = auth_client('manager', 'password123')
+        entry = StatusHistory(part_id='TEST-001', status='Резка', operator_name='Иванов', quantity=2,
+                              timestamp=datetime.datetime(2026, 3, 2, 15, 30))
+        db.session.add(entry)
+        report_service.update_operator_rollups([entry])
+        db.session.commit()
+
+        data = client.get(url_for('admin.report.api_report_operator_performance',
+                                  date_from='2026-03-01', date_to='2026-03-02')).get_json()
+        assert data['labels'] == ['Иванов']
+
+        data = client.get(url_for('admin.report.api_report_operator_activity', date_from='2026-03-02',
+                                  date_to='2026-03-02', granularity='hour')).get_json()
+        assert len(data['labels']) == 24
+        assert data['datasets'][0]['data'][15] == 1
+
+        response = client.get(url_for('admin.report.api_report_operator_activity', date_from='2025-01-01',
+                                      date_to='2026-03-02', granularity='hour'))
+        assert response.status_code == 400
+
+    def test_report_cache_and_conditional_get(self, client, auth_client, database, app, monkeypatch):
+        """Тест: Ответ отчета кэшируется до изменения истории и перепроверяется по ETag (304)."""
+        monkeypatch.setitem(app.config, 'REPORT_CACHE_TTL', 300)
+        cache_service.clear()
+        client = auth_client('manager', 'password123')
+        url = url_for('admin.report.api_report_operator_performance')
+
+        first = client.get(url)
+        assert first.status_code == 200 and first.headers['ETag']
+        assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+        part = db.session.get(Part, 'TEST-001')
+        part_status_service.complete_stage(part, Stage.query.filter_by(name='Резка').first(), 1, 'Иванов')
+
+        changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert changed.status_code == 200
+        assert changed.get_json()['labels'] == ['Иванов']
+        cache_service.clear()
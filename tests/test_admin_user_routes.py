@@ -98,4 +98,15 @@ class TestUserAndRoleManagement:
         """Тест: Страницы с логами загружаются успешно."""
         client = auth_client('admin', 'password123')
         assert client.get(url_for('admin.user.audit_log')).status_code == 200
-        assert client.get(url_for('admin.user.user_log')).status_code == 200
\ No newline at end of file
+        assert client.get(url_for('admin.user.user_log')).status_code == 200
+
+    def test_audit_log_filters_and_bad_cursor(self, client, auth_client, database):
+        """Тест: Журнал применяет фильтры, а некорректный курсор возвращает на страницу с сообщением."""
+        client = auth_client('admin', 'password123')
+        response = client.get(url_for('admin.user.audit_log', part='TEST-001', date_from='2026-05-01'))
+        assert response.status_code == 200
+        assert 'value="TEST-001"' in response.data.decode('utf-8')
+
+        response = client.get(url_for('admin.user.audit_log', cursor='bad', part='TEST-001'))
+        assert response.status_code == 302
+        assert 'part=TEST-001' in response.location and 'cursor' not in response.location
\ No newline at end of file
@@ -0,0 +1,89 @@
+# tests/test_api_routes.py
+
+from flask import url_for
+
+from app import db
+from app.models import Part, RouteTemplate
+
+
+class TestPartsApiPagination:
+    """Тесты для keyset-пагинации API деталей изделия."""
+
+    def _add_parts(self, count):
+        route = RouteTemplate.query.filter_by(is_default=True).first()
+        db.session.add_all([
+            Part(part_id=f'PAGE-{i:03d}', product_designation='Большое изделие', name=f'Деталь {i}',
+                 material='Ст3', route_template_id=route.id)
+            for i in range(count)
+        ])
+        db.session.commit()
+
+    def test_pages_are_contiguous_and_ordered(self, client, database):
+        """Тест: Страницы идут подряд по part_id без пропусков и повторов."""
+        self._add_parts(7)
+        url = url_for('main.api.parts_for_product', product_designation='Большое изделие')
+
+        first = client.get(url, query_string={'limit': 3}).get_json()
+        assert [p['part_id'] for p in first['parts']] == ['PAGE-000', 'PAGE-001', 'PAGE-002']
+        assert first['has_more'] is True
+        assert first['total'] == 7
+
+        collected = [p['part_id'] for p in first['parts']]
+        cursor = first['next_cursor']
+        while cursor:
+            page = client.get(url, query_string={'limit': 3, 'after': cursor}).get_json()
+            assert page['total'] is None  # Счетчик считается только для первой страницы
+            collected.extend(p['part_id'] for p in page['parts'])
+            cursor = page['next_cursor']
+
+        assert collected == [f'PAGE-{i:03d}' for i in range(7)]
+
+    def test_last_page_has_no_cursor(self, client, database):
+        """Тест: Последняя страница не содержит курсора продолжения."""
+        self._add_parts(2)
+        url = url_for('main.api.parts_for_product', product_designation='Большое изделие')
+
+        data = client.get(url, query_string={'limit': 5}).get_json()
+        assert len(data['parts']) == 2
+        assert data['has_more'] is False
+        assert data['next_cursor'] is None
+
+    def test_search_filter_uses_part_words(self, client, database):
+        """Тест: Поиск внутри изделия находит детали по началу слов обозначения и наименования."""
+        self._add_parts(12)
+        url = url_for('main.api.parts_for_product', product_designation='Большое изделие')
+
+        data = client.get(url, query_string={'search': 'page-01'}).get_json()
+        assert [p['part_id'] for p in data['parts']] == ['PAGE-010', 'PAGE-011']
+        assert data['total'] == 2
+
+
+class TestPartSearchApi:
+    """Тесты для API глобального поиска деталей."""
+
+    def test_search_returns_ranked_results_with_limit(self, client, database):
+        """Тест: API возвращает найденные детали с подсветкой и учитывает limit."""
+        route = RouteTemplate.query.filter_by(is_default=True).first()
+        db.session.add_all([
+            Part(part_id=f'ШТ-{i}', product_designation=f'Изделие {i}', name='Шток', material='Ст45',
+                 route_template_id=route.id)
+            for i in range(3)
+        ])
+        db.session.commit()
+        url = url_for('main.api.search_parts')
+
+        results = client.get(url, query_string={'q': 'шток', 'limit': 2}).get_json()['results']
+        assert len(results) == 2
+        assert results[0]['highlight']['name'] == '<mark>Шток</mark>'
+        assert client.get(url).get_json() == {'results': []}
+
+
+class TestCsrfTokenApi:
+    """Тесты для API выдачи CSRF-токена офлайн-очереди."""
+
+    def test_returns_fresh_uncached_token(self, client, database):
+        """Тест: Токен выдается в JSON и не кэшируется (страница со старым токеном может быть из кэша)."""
+        response = client.get(url_for('main.api.csrf_token'))
+        assert response.status_code == 200
+        assert response.get_json()['csrf_token']
+        assert response.headers['Cache-Control'] == 'no-store'
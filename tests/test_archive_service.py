@@ -0,0 +1,125 @@
+# tests/test_archive_service.py
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import db
+from app.services import archive_service, query_service
+from app.models import AuditLog, User
+
+
+@pytest.fixture
+def archive_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ARCHIVE_FOLDER', str(tmp_path))
+    return tmp_path / 'AuditLogs'
+
+
+def _add_logs(admin, operator):
+    """Три записи текущего месяца и пять записей четырехмесячной давности."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    old = datetime(now.year, now.month, 1) - timedelta(days=100)
+    db.session.add_all(
+        [AuditLog(part_id='TEST-001', user_id=admin.id, action=f"Новое {i}", category='part',
+                  timestamp=now - timedelta(minutes=i)) for i in range(3)]
+        + [AuditLog(part_id='DELETED-1', user_id=operator.id if i == 0 else admin.id, action=f"Старое {i}",
+                    category='part', timestamp=old + timedelta(minutes=10 - i)) for i in range(4)]
+        + [AuditLog(user_id=admin.id, action="Вход в систему", category='auth', timestamp=old)]
+    )
+    db.session.commit()
+    return old
+
+
+class TestAuditLogArchive:
+    """Тесты для архивации журнала аудита."""
+
+    def test_closed_months_are_moved_to_files(self, database, archive_folder):
+        """Тест: Закрытые месяцы переносятся в сжатый JSONL-файл и удаляются из базы."""
+        admin = User.query.filter_by(username='admin').first()
+        old = _add_logs(admin, User.query.filter_by(username='operator').first())
+
+        result = archive_service.archive_audit_logs(keep_months=2)
+
+        month_key = old.strftime('%Y-%m')
+        assert result == {month_key: 5}
+        assert AuditLog.query.count() == 3
+        with gzip.open(archive_folder / f"{month_key}.jsonl.gz", 'rt', encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        assert {row['action'] for row in rows} == {"Старое 0", "Старое 1", "Старое 2", "Старое 3", "Вход в систему"}
+        assert archive_service.load_manifest()[month_key]['categories'] == {'part': 4, 'auth': 1}
+        # Повторный запуск ничего не переносит и не дублирует записи
+        assert archive_service.archive_audit_logs(keep_months=2) == {}
+        assert not [name for name in os.listdir(archive_folder) if name.endswith('.tmp')]
+
+        with pytest.raises(ValueError):
+            archive_service.archive_audit_logs(keep_months=0)
+
+    def test_month_partition_takes_rows_from_default_partition(self, database, monkeypatch):
+        """Тест: Если записи месяца уже в партиции по умолчанию, она отсоединяется на время переноса записей."""
+        statements = []
+        monkeypatch.setattr(db.session, 'scalar', lambda statement, params=None: True)
+        monkeypatch.setattr(db.session, 'execute', lambda statement, params=None: statements.append(str(statement)))
+
+        archive_service._create_month_partition(datetime(2026, 11, 1))
+
+        assert [statement.split(' (')[0].split(' SELECT')[0] for statement in statements] == [
+            'ALTER TABLE "AuditLogs" DETACH PARTITION "AuditLogs_default"',
+            'CREATE TABLE "AuditLogs_p2026_11" PARTITION OF "AuditLogs" FOR VALUES FROM',
+            'INSERT INTO "AuditLogs"',
+            'DELETE FROM "AuditLogs_default" WHERE "timestamp" >= :start AND "timestamp" < :end',
+            'ALTER TABLE "AuditLogs" ATTACH PARTITION "AuditLogs_default" DEFAULT',
+        ]
+
+    def test_audit_log_pages_continue_into_archive(self, database, archive_folder):
+        """Тест: Журнал прозрачно продолжается архивными записями, фильтры и подсчет их учитывают."""
+        admin = User.query.filter_by(username='admin').first()
+        operator = User.query.filter_by(username='operator').first()
+        old = _add_logs(admin, operator)
+        archive_service.archive_audit_logs(keep_months=2)
+
+        first = query_service.get_audit_log_page(['part'], limit=4)
+        second = query_service.get_audit_log_page(['part'], cursor=first['next_cursor'], limit=4)
+
+        assert [log.action for log, _ in first['items']] == ["Новое 0", "Новое 1", "Новое 2", "Старое 0"]
+        assert [log.action for log, _ in second['items']] == ["Старое 1", "Старое 2", "Старое 3"]
+        assert second['next_cursor'] is None
+        assert first['count']['value'] == 7
+        archived_log, existing_part_id = first['items'][-1]
+        assert archived_log.user.username == 'operator' and existing_part_id is None
+
+        back = query_service.get_audit_log_page(['part'], cursor=second['prev_cursor'], newer=True, limit=4)
+        assert back['items'] == first['items']
+
+        by_user = query_service.get_audit_log_page(['part'], user_id=operator.id)
+        assert [log.action for log, _ in by_user['items']] == ["Старое 0"]
+        assert by_user['count']['value'] == 1
+        in_period = query_service.get_audit_log_page(['part', 'auth'], date_from=old - timedelta(days=1),
+                                                     date_to=old + timedelta(days=1))
+        assert len(in_period['items']) == 5
+
+    def test_archive_pages_read_only_months_up_to_cursor(self, database, archive_folder, monkeypatch):
+        """Тест: Страница архива читает месяцы от курсора и останавливается, набрав страницу."""
+        admin = User.query.filter_by(username='admin').first()
+        current = datetime.now(timezone.utc).replace(tzinfo=None, day=1, hour=0, minute=0, second=0, microsecond=0)
+        months = [archive_service._add_months(current, -offset) for offset in (3, 4, 5)]
+        db.session.add_all([AuditLog(user_id=admin.id, action=f"{month:%Y-%m} {i}", category='part',
+                                     timestamp=month + timedelta(days=1, minutes=i))
+                            for month in months for i in range(2)])
+        db.session.commit()
+        archive_service.archive_audit_logs(keep_months=2)
+
+        read_files = []
+        read_month_file = archive_service._read_month_file
+        monkeypatch.setattr(archive_service, '_read_month_file',
+                            lambda path: read_files.append(os.path.basename(path)) or read_month_file(path))
+
+        first = query_service.get_audit_log_page(['part'], limit=1)
+        assert [log.action for log, _ in first['items']] == [f"{months[0]:%Y-%m} 1"]
+        assert read_files == [f"{months[0]:%Y-%m}.jsonl.gz"]
+
+        read_files.clear()
+        third = query_service.get_audit_log_page(['part'], cursor=f"{months[1] + timedelta(days=1):%Y-%m-%dT%H:%M:%S}|0",
+                                                 limit=2)
+        assert [log.action for log, _ in third['items']] == [f"{months[2]:%Y-%m} 1", f"{months[2]:%Y-%m} 0"]
+        assert read_files == [f"{months[1]:%Y-%m}.jsonl.gz", f"{months[2]:%Y-%m}.jsonl.gz"]
@@ -0,0 +1,136 @@
+# tests/test_assembly_progress_service.py
+
+import io
+from types import SimpleNamespace
+from unittest.mock import patch
+from werkzeug.datastructures import FileStorage
+
+from app.models import Part, AssemblyComponent, RouteTemplate, Stage, User
+from app.services import assembly_progress_service as aps
+from app.services import part_status_service, dashboard_service, part_creation_service, part_import_export_service
+
+
+def _build_assembly(database):
+    """
+    Создает сборку: TEST-001 (без маршрута, 2 шт.) -> УЗЕЛ (маршрут, 2 шт.) x1,
+    УЗЕЛ -> ВИНТ x2 и ГАЙКА x3 (маршрут, по 6 шт.).
+    """
+    route = RouteTemplate.query.filter_by(is_default=True).first()
+    root = database.session.get(Part, 'TEST-001')
+    root.route_template_id = None
+    root.quantity_total = 2
+    for part_id, quantity_total in [('УЗЕЛ', 2), ('ВИНТ', 6), ('ГАЙКА', 6)]:
+        database.session.add(Part(part_id=part_id, product_designation='Тестовое изделие', name=part_id, material='Ст3',
+                                  quantity_total=quantity_total, route_template_id=route.id, is_top_level=False))
+    database.session.flush()
+    for parent_id, child_id, quantity in [('TEST-001', 'УЗЕЛ', 1), ('УЗЕЛ', 'ВИНТ', 2), ('УЗЕЛ', 'ГАЙКА', 3)]:
+        database.session.add(AssemblyComponent(parent_id=parent_id, child_id=child_id, quantity=quantity))
+    database.session.commit()
+
+
+def _complete_route(database, part_id, quantity):
+    """Проводит деталь по всем этапам маршрута на указанное количество."""
+    part = database.session.get(Part, part_id)
+    for stage_name in ('Резка', 'Сверловка'):
+        part_status_service.complete_stage(part, Stage.query.filter_by(name=stage_name).first(), quantity, 'operator')
+
+
+def _buildable(database, part_id):
+    database.session.expire_all()
+    return database.session.get(Part, part_id).quantity_buildable
+
+
+class TestComputeBuildable:
+    """Тесты для расчета количества готовых к сборке единиц."""
+
+    def test_limited_by_own_route_and_children(self):
+        """Тест: Результат ограничен собственным выполнением и комплектностью состава."""
+        assert aps.compute_buildable(10, 5, True, [(9, 2), (20, 3)]) == 4
+        assert aps.compute_buildable(10, 5, True, [(30, 2)]) == 5
+        assert aps.compute_buildable(3, 0, False, [(30, 2)]) == 3
+        assert aps.compute_buildable(4, 7, True, []) == 4
+
+    def test_child_lot_covers_link_quantity(self):
+        """Тест: Узел, заведенный одной партией (1 шт.) на связь из N шт., покрывает связь целиком, когда готов."""
+        assert aps.compute_buildable(3, 3, True, [(1, 4, 1)]) == 3
+        assert aps.compute_buildable(3, 3, True, [(0, 4, 1)]) == 0
+        assert aps.compute_buildable(3, 3, True, [(5, 2, 6)]) == 2
+
+
+class TestAssemblyProgress:
+    """Тесты для инкрементального распространения готовности по составу."""
+
+    def test_child_progress_propagates_to_root(self, database):
+        """Тест: Готовность поднимается по сборкам по мере выполнения дочерних деталей."""
+        _build_assembly(database)
+        _complete_route(database, 'ВИНТ', 4)
+        _complete_route(database, 'ГАЙКА', 6)
+        assert _buildable(database, 'ВИНТ') == 4
+        assert _buildable(database, 'УЗЕЛ') == 0 # Сам узел еще не собран
+
+        _complete_route(database, 'УЗЕЛ', 2)
+        # Винтов хватает на 2 узла (4 // 2), гаек — на 2 (6 // 3)
+        assert _buildable(database, 'УЗЕЛ') == 2
+        assert _buildable(database, 'TEST-001') == 2
+
+        summary = {row['product_designation']: row for row in dashboard_service.get_product_summary()}
+        assert summary['Тестовое изделие']['total_ready'] == 2
+
+    def test_propagation_stops_when_value_unchanged(self, database):
+        """Тест: Если готовность детали не изменилась, родители не пересчитываются."""
+        _build_assembly(database)
+        _complete_route(database, 'ВИНТ', 6)
+
+        with patch.object(aps, '_parents_of', wraps=aps._parents_of) as mock_parents:
+            # Первый этап не меняет итоговое выполненное количество детали
+            part = database.session.get(Part, 'ГАЙКА')
+            part_status_service.complete_stage(part, Stage.query.filter_by(name='Резка').first(), 3, 'operator')
+        mock_parents.assert_not_called()
+
+    def test_rebuild_matches_incremental(self, database):
+        """Тест: Полный пересчет дает те же значения, что и инкрементальный."""
+        _build_assembly(database)
+        for part_id, quantity in [('ВИНТ', 2), ('ГАЙКА', 3), ('УЗЕЛ', 2)]:
+            _complete_route(database, part_id, quantity)
+        expected = {part.part_id: part.quantity_buildable for part in Part.query.all()}
+
+        Part.query.update({Part.quantity_buildable: 0})
+        assert aps.rebuild_assembly_progress() == 4
+        database.session.commit()
+        assert {part.part_id: part.quantity_buildable for part in Part.query.all()} == expected
+        assert expected['TEST-001'] == 1
+
+    def test_bom_built_through_child_form_and_import(self, database):
+        """Тест: Готовность считается для состава, созданного формой узла и импортом (количество в связи)."""
+        admin = User.query.filter_by(username='admin').first()
+        form = SimpleNamespace(**{name: SimpleNamespace(data=value) for name, value in
+                                  [('part_id', 'ВТУЛКА'), ('name', 'Втулка'), ('material', 'Ст3'), ('quantity_total', 4)]})
+        part_creation_service.create_child_part(form, 'TEST-001', admin)
+        _complete_route(database, 'TEST-001', 1)
+        assert _buildable(database, 'TEST-001') == 0
+        _complete_route(database, 'ВТУЛКА', 1)
+        assert _buildable(database, 'TEST-001') == 1
+
+        content = (
+            '"Обозначение","Наименование","Кол-во","Размер","Операции","Прим."\n'
+            '"","Станок","","","",""\n'
+            '"СТ-01СБ","Станина","2","","",""\n'
+            '"СТ-02","Ребро","3","","","Ст3"\n'
+        )
+        part_import_export_service.import_parts_from_excel(
+            FileStorage(stream=io.BytesIO(content.encode('utf-8')), filename='import.csv'), None)
+        _complete_route(database, 'СТ-01СБ', 2)
+        assert _buildable(database, 'СТ-01СБ') == 0
+        _complete_route(database, 'СТ-02', 1)
+        assert _buildable(database, 'СТ-01СБ') == 2
+
+        # Повторный импорт добавляет в существующую сборку новый, еще не готовый узел
+        content = (
+            '"Обозначение","Наименование","Кол-во","Размер","Операции","Прим."\n'
+            '"","Станок","","","",""\n'
+            '"СТ-01СБ","Станина","2","","",""\n'
+            '"СТ-03","Косынка","2","","","Ст3"\n'
+        )
+        part_import_export_service.import_parts_from_excel(
+            FileStorage(stream=io.BytesIO(content.encode('utf-8')), filename='import.csv'), None)
+        assert _buildable(database, 'СТ-01СБ') == 0
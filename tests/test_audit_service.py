@@ -0,0 +1,109 @@
+# tests/test_audit_service.py
+
+import pytest
+from app import db
+from app.services import audit_service
+from app.services.audit_service import AuditWriter
+from app.models import AuditLog, User, Part
+
+
+class TestAuditWriter:
+    """Тесты для буфера журнала аудита."""
+
+    def test_entries_are_written_in_batches(self):
+        """Тест: Записи накапливаются и вставляются пакетами не больше batch_size, задача планируется один раз."""
+        batches, tasks = [], []
+        writer = AuditWriter(batches.append, max_size=100, batch_size=4, start_task=tasks.append)
+        for i in range(10):
+            assert writer.add([{'action': str(i)}])
+
+        assert len(tasks) == 1
+        assert writer.flush() == 10
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert batches[-1][-1] == {'action': '9'}
+
+    def test_queue_is_bounded(self):
+        """Тест: Переполненный буфер не принимает записи."""
+        writer = AuditWriter(lambda rows: None, max_size=3)
+        assert writer.add([{}, {}])
+        assert not writer.add([{}, {}])
+        assert len(writer) == 2
+
+    def test_failed_batch_stays_queued(self):
+        """Тест: Пакет, который не удалось вставить, остается в буфере."""
+        def fail(rows):
+            raise RuntimeError('db down')
+        writer = AuditWriter(fail, batch_size=2)
+        writer.add([{'action': 'a'}, {'action': 'b'}, {'action': 'c'}])
+
+        with pytest.raises(RuntimeError):
+            writer.flush()
+        assert len(writer) == 3
+
+    def test_bad_entry_is_dropped_without_blocking_others(self):
+        """Тест: Некорректная запись не задерживает остальные и отбрасывается после max_attempts попыток."""
+        written, dropped = [], []
+        def write(rows):
+            if any(row['action'] == 'bad' for row in rows):
+                raise ValueError('FK violation')
+            written.extend(row['action'] for row in rows)
+        writer = AuditWriter(write, batch_size=10, max_attempts=2,
+                             on_drop=lambda row, error: dropped.append((row['action'], str(error))))
+        writer.add([{'action': 'a'}, {'action': 'bad'}, {'action': 'b'}])
+
+        assert writer.flush() == 2
+        assert written == ['a', 'b']
+        assert dropped == [('bad', 'FK violation')]
+        assert len(writer) == 0
+
+
+class TestAsyncAuditLog:
+    """Тесты асинхронного режима журнала аудита."""
+
+    @pytest.fixture
+    def async_mode(self, app, monkeypatch):
+        writer = AuditWriter(lambda rows: audit_service._write_batch_in_context(app, rows))
+        monkeypatch.setitem(app.config, 'AUDIT_LOG_MODE', audit_service.AUDIT_MODE_ASYNC)
+        monkeypatch.setattr(audit_service, '_writer', writer)
+        return writer
+
+    def test_entries_are_buffered_after_commit(self, database, async_mode):
+        """Тест: Запись попадает в буфер только после фиксации транзакции и вставляется при отправке."""
+        admin = User.query.filter_by(username='admin').first()
+        audit_service.log_action("Вход в систему", category='auth', user_id=admin.id)
+        assert len(async_mode) == 0
+
+        db.session.commit()
+        assert len(async_mode) == 1
+        assert AuditLog.query.count() == 0
+
+        assert async_mode.flush() == 1
+        assert AuditLog.query.filter_by(action="Вход в систему", user_id=admin.id).count() == 1
+
+    def test_audit_failure_does_not_break_commit(self, database, async_mode):
+        """Тест: Ошибка вставки журнала при переполненном буфере не пробрасывается из commit()."""
+        def fail(rows):
+            raise RuntimeError('db down')
+        async_mode.write_batch = fail
+        async_mode.max_size = 0
+        part = db.session.get(Part, 'TEST-001')
+        audit_service.log_action("Редактирование", category='part', part_id=part.part_id)
+        part.name = 'Переименована'
+
+        db.session.commit()
+
+        assert db.session.get(Part, 'TEST-001').name == 'Переименована'
+
+    def test_rollback_discards_entries(self, database, async_mode):
+        """Тест: При откате транзакции отложенные записи отбрасываются."""
+        audit_service.log_action("Редактирование", category='part', part_id='TEST-001')
+        db.session.rollback()
+        db.session.commit()
+        assert len(async_mode) == 0
+
+    def test_durable_entries_are_written_in_transaction(self, database, async_mode):
+        """Тест: Критичные действия пишутся в транзакции вызывающего кода."""
+        audit_service.log_action("Удаление", category='part', part_id='TEST-001', durable=True)
+        db.session.commit()
+        assert len(async_mode) == 0
+        assert AuditLog.query.filter_by(action="Удаление").count() == 1
@@ -0,0 +1,78 @@
+# tests/test_dashboard_service.py
+
+import pytest
+from unittest.mock import patch
+
+from app.models.models import Part, Stage, RouteTemplate, User
+from app.services import cache_service, dashboard_service, part_status_service, part_management_service
+
+
+@pytest.fixture
+def summary_cache(app, database, monkeypatch):
+    """Включает кэш сводки панели мониторинга (в TestingConfig он отключен)."""
+    monkeypatch.setitem(app.config, 'DASHBOARD_CACHE_TTL', 300)
+    cache_service.clear()
+    yield
+    cache_service.clear()
+
+
+def _summary_by_product():
+    return {row['product_designation']: row for row in dashboard_service.get_product_summary()}
+
+
+class TestProductSummaryCache:
+    """Тесты для кэша сводки по изделиям."""
+
+    def test_repeated_loads_do_not_query_database(self, summary_cache):
+        """Тест: Повторные загрузки панели берут сводку из памяти."""
+        with patch.object(dashboard_service, '_query_product_summary',
+                          wraps=dashboard_service._query_product_summary) as mock_query:
+            for _ in range(5):
+                summary = _summary_by_product()
+        assert mock_query.call_count == 1
+        assert summary['Тестовое изделие']['total_parts'] == 1
+
+    def test_complete_stage_invalidates_summary(self, summary_cache, database):
+        """Тест: Завершение этапа сбрасывает кэш, и сводка отражает новые данные."""
+        assert _summary_by_product()['Тестовое изделие']['total_completed_stages'] == 0
+
+        # Изменение в обход сервисов не сбрасывает кэш
+        database.session.add(Part(part_id='TEST-002', product_designation='Новое изделие', name='Болт', material='Ст3'))
+        database.session.commit()
+        assert 'Новое изделие' not in _summary_by_product()
+
+        part = database.session.get(Part, 'TEST-001')
+        for stage_name in ('Резка', 'Сверловка'):
+            stage = Stage.query.filter_by(name=stage_name).first()
+            part_status_service.complete_stage(part, stage, 1, 'operator')
+
+        summary = _summary_by_product()
+        assert summary['Тестовое изделие']['total_completed_stages'] == 1
+        assert summary['Новое изделие']['total_parts'] == 1
+
+    def test_change_route_invalidates_summary(self, summary_cache, database):
+        """Тест: Смена маршрута детали сбрасывает кэш сводки."""
+        assert 'Новое изделие' not in _summary_by_product()
+        database.session.add(Part(part_id='TEST-002', product_designation='Новое изделие', name='Болт', material='Ст3'))
+        new_route = RouteTemplate(name='Новый маршрут')
+        database.session.add(new_route)
+        database.session.commit()
+
+        part_management_service.change_part_route(database.session.get(Part, 'TEST-001'), new_route,
+                                                  User.query.filter_by(username='admin').first())
+
+        assert _summary_by_product()['Новое изделие']['total_parts'] == 1
+
+    def test_change_during_query_is_not_cached(self, summary_cache):
+        """Тест: Если данные изменились во время расчета, результат не считается актуальным."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                dashboard_service.invalidate_product_summary()
+            return ['summary']
+
+        for _ in range(3):
+            cache_service.get_or_compute(dashboard_service.PRODUCT_SUMMARY_CACHE, compute, ttl=300)
+        assert len(calls) == 2
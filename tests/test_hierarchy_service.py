@@ -0,0 +1,77 @@
+# tests/test_hierarchy_service.py
+
+from flask import url_for
+from sqlalchemy import event
+
+from app import db
+from app.models import Part, AssemblyComponent
+from app.services import hierarchy_service
+
+
+def _build_bom(database):
+    """
+    Создает состав: TEST-001 -> УЗЕЛ-1 (x2) -> ДЕТ/1 (x3) -> ВИНТ (x4),
+    а также УЗЕЛ-2 (x1), в который входит та же ДЕТ/1 (x5).
+    """
+    for part_id, completed in [('УЗЕЛ-1', 1), ('УЗЕЛ-2', 0), ('ДЕТ/1', 2), ('ВИНТ', 2)]:
+        database.session.add(Part(part_id=part_id, product_designation='Тестовое изделие', name=part_id,
+                                  material='Ст3', quantity_total=2, quantity_completed=completed, is_top_level=False))
+    database.session.flush()
+    for parent_id, child_id, quantity in [('TEST-001', 'УЗЕЛ-1', 2), ('УЗЕЛ-1', 'ДЕТ/1', 3), ('ДЕТ/1', 'ВИНТ', 4),
+                                          ('TEST-001', 'УЗЕЛ-2', 1), ('УЗЕЛ-2', 'ДЕТ/1', 5)]:
+        database.session.add(AssemblyComponent(parent_id=parent_id, child_id=child_id, quantity=quantity))
+    database.session.commit()
+
+
+class TestBomTree:
+    """Тесты для загрузки дерева состава изделия."""
+
+    def test_full_tree_is_loaded_with_one_query(self, database):
+        """Тест: Дерево любой глубины загружается одним запросом с количествами по пути."""
+        _build_bom(database)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            tree = hierarchy_service.get_part_hierarchy('TEST-001')['tree']
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert len(statements) == 1
+        nodes = [(node.part_id, node.depth, node.required_quantity) for node in tree.iter_nodes()]
+        assert nodes == [
+            ('TEST-001', 0, 1),
+            ('УЗЕЛ-1', 1, 2), ('ДЕТ/1', 2, 6), ('ВИНТ', 3, 24),
+            ('УЗЕЛ-2', 1, 1), ('ДЕТ/1', 2, 5), ('ВИНТ', 3, 20),
+        ]
+
+    def test_progress_is_rolled_up_by_subtree(self, database):
+        """Тест: Прогресс узла учитывает все вложенные детали."""
+        _build_bom(database)
+        tree = hierarchy_service.get_part_hierarchy('TEST-001')['tree']
+        assembly = tree.children[0]
+
+        assert assembly.part_id == 'УЗЕЛ-1'
+        assert assembly.progress_percent == 50
+        # УЗЕЛ-1: 1 из 2, ДЕТ/1: 2 из 2, ВИНТ: 2 из 2
+        assert (assembly.subtree_completed, assembly.subtree_total) == (5, 6)
+        assert assembly.rolled_up_percent == 83
+
+    def test_ancestor_paths(self, database):
+        """Тест: Для детали строятся все цепочки сборок до верхнего уровня."""
+        _build_bom(database)
+        hierarchy = hierarchy_service.get_part_hierarchy('ВИНТ')
+
+        paths = [[ancestor['part_id'] for ancestor in path] for path in hierarchy['ancestor_paths']]
+        assert sorted(paths) == [['TEST-001', 'УЗЕЛ-1', 'ДЕТ/1'], ['TEST-001', 'УЗЕЛ-2', 'ДЕТ/1']]
+        assert hierarchy['tree'].children == []
+
+    def test_history_page_renders_tree(self, client, database):
+        """Тест: Страница истории отображает состав и сборки, в которые входит деталь."""
+        _build_bom(database)
+        response = client.get(url_for('main.main_pages.history', part_id='УЗЕЛ-1'))
+
+        html = response.data.decode('utf-8')
+        assert response.status_code == 200
+        assert 'Входит в состав' in html
+        assert 'на изделие: 12 шт.' in html
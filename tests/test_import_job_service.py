@@ -0,0 +1,128 @@
+# tests/test_import_job_service.py
+
+import io
+import os
+from flask import url_for
+from werkzeug.datastructures import FileStorage
+
+from app import db
+from app.services import import_job_service
+from app.models import Part, User, ImportJob, ImportJobStatus
+
+
+def _csv_file(content, filename="import.csv"):
+    """Создает FileStorage с CSV-содержимым в памяти."""
+    return FileStorage(stream=io.BytesIO(content.encode('utf-8')), filename=filename, content_type="text/csv")
+
+
+class TestImportJobs:
+    """Тесты для фоновых задач импорта."""
+
+    def test_job_completes_and_stores_counters(self, app, database):
+        """Тест: Задача импорта сохраняет итоговые счетчики, а загруженный файл удаляется."""
+        admin = User.query.filter_by(username='admin').first()
+        content = (
+            '"Обозначение","Наименование","Кол-во","Прим."\n'
+            '"","Изделие Х","",""\n'
+            '"ДЕТ-10","Болт","1","Ст3"\n'
+            '"TEST-001","Уже есть","1",""\n'
+        )
+
+        job = import_job_service.enqueue_import(_csv_file(content), admin)
+
+        assert job.status == ImportJobStatus.COMPLETED
+        assert (job.rows_parsed, job.rows_inserted, job.rows_skipped) == (2, 1, 1)
+        assert job.started_at is not None and job.finished_at is not None
+        assert db.session.get(Part, 'ДЕТ-10') is not None
+        assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], job.stored_filename))
+
+    def test_file_is_parsed_outside_event_loop(self, database, monkeypatch):
+        """Тест: Чтение и разбор файла передаются в функцию выполнения вне цикла событий."""
+        offloaded = []
+        def run_cpu_bound(func, *args):
+            offloaded.append(func.__name__)
+            return func(*args)
+        monkeypatch.setattr(import_job_service, '_run_cpu_bound', run_cpu_bound)
+        admin = User.query.filter_by(username='admin').first()
+        content = '"Обозначение","Наименование","Кол-во","Прим."\n"","Изделие Х","",""\n"ДЕТ-30","Гайка","1",""\n'
+
+        job = import_job_service.enqueue_import(_csv_file(content), admin)
+
+        assert job.status == ImportJobStatus.COMPLETED
+        assert offloaded == ['_read_import_file', '_prepare_import_frame']
+
+    def test_failed_job_keeps_error(self, database):
+        """Тест: Ошибка импорта не пробрасывается, а сохраняется в задаче."""
+        admin = User.query.filter_by(username='admin').first()
+        content = '"Обозначение","Наименование"\n"A-1","Деталь"\n'
+
+        job = import_job_service.enqueue_import(_csv_file(content), admin)
+
+        assert job.status == ImportJobStatus.FAILED
+        assert 'Не найдены обязательные колонки' in job.error
+        assert job.rows_inserted == 0
+
+    def test_job_waits_while_another_import_runs(self, database):
+        """Тест: Пока очередь обрабатывает другой процесс, задача остается в очереди и выполняется после него."""
+        admin = User.query.filter_by(username='admin').first()
+        content = '"Обозначение","Наименование","Кол-во","Прим."\n"","Изделие Х","",""\n"ДЕТ-20","Шайба","1",""\n'
+
+        with import_job_service._import_lock() as acquired:
+            assert acquired
+            job = import_job_service.enqueue_import(_csv_file(content), admin)
+            assert job.status == ImportJobStatus.QUEUED
+            assert import_job_service.process_queue() is False
+
+        assert import_job_service.process_queue() is True
+        db.session.refresh(job)
+        assert job.status == ImportJobStatus.COMPLETED
+        assert db.session.get(Part, 'ДЕТ-20') is not None
+
+    def test_interrupted_jobs_are_failed(self, app, database):
+        """Тест: Задачи, брошенные остановленным процессом, помечаются как прерванные, а их файлы удаляются."""
+        admin = User.query.filter_by(username='admin').first()
+        running = ImportJob(user_id=admin.id, filename='a.csv', stored_filename='import_a.csv',
+                            status=ImportJobStatus.RUNNING)
+        queued = ImportJob(user_id=admin.id, filename='b.csv', stored_filename='import_b.csv',
+                           status=ImportJobStatus.QUEUED)
+        db.session.add_all([running, queued])
+        db.session.commit()
+        stored_path = os.path.join(app.config['UPLOAD_FOLDER'], 'import_a.csv')
+        with open(stored_path, 'w') as f:
+            f.write('x')
+
+        # Задача в работе без владельца блокировки прервана; задача в очереди выполняется (и падает на пустом файле)
+        import_job_service.process_queue()
+        assert running.status == ImportJobStatus.FAILED
+        assert running.error == import_job_service.INTERRUPTED_JOB_ERROR
+        assert not os.path.exists(stored_path)
+        assert queued.status == ImportJobStatus.FAILED
+        assert queued.error != import_job_service.INTERRUPTED_JOB_ERROR
+
+        leftover = ImportJob(user_id=admin.id, filename='c.csv', stored_filename='import_c.csv',
+                             status=ImportJobStatus.QUEUED)
+        db.session.add(leftover)
+        db.session.commit()
+        result = app.test_cli_runner().invoke(app.cli.get_command(None, 'fail-orphaned-imports'))
+        assert 'Прерванных задач импорта: 1' in result.output
+        assert leftover.status == ImportJobStatus.FAILED
+        assert leftover.error == import_job_service.INTERRUPTED_JOB_ERROR
+
+    def test_job_status_endpoint(self, auth_client, database):
+        """Тест: Состояние задачи доступно через JSON-эндпоинт."""
+        client = auth_client('admin', 'password123')
+        admin = User.query.filter_by(username='admin').first()
+        job = ImportJob(user_id=admin.id, filename='parts.xlsx', stored_filename='import_x.xlsx',
+                        status=ImportJobStatus.FAILED, error='Файл поврежден')
+        db.session.add(job)
+        db.session.commit()
+
+        response = client.get(url_for('admin.data.import_job_status', job_id=job.id))
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['status'] == 'failed'
+        assert data['error'] == 'Файл поврежден'
+        assert data['user'] == 'admin'
+
+        response = client.get(url_for('admin.data.import_job_status', job_id=job.id + 1))
+        assert response.status_code == 404
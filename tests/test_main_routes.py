@@ -69,6 +69,66 @@ class TestCoreWorkflow:
         assert response.status_code == 200
         assert 'Все этапы завершены'.encode('utf-8') in response.data
 
+    def test_confirm_stage_resubmission_is_ignored(self, client, database):
+        """Тест: Повторная отправка формы с тем же ключом идемпотентности не учитывается."""
+        stage = Stage.query.filter_by(name='Резка').first()
+        url = url_for('main.actions.confirm_stage', part_id='TEST-001', stage_id=stage.id)
+        data = {'operator_name': 'Tester', 'quantity': 1, 'idempotency_key': 'form-key-1'}
+
+        client.post(url, data=data)
+        response = client.post(url, data=data, follow_redirects=True)
+
+        assert 'Это подтверждение уже было учтено.'.encode('utf-8') in response.data
+        assert StatusHistory.query.filter_by(part_id='TEST-001').count() == 1
+
+    def test_bulk_confirm_api(self, client, database):
+        """Тест: Пакетное подтверждение возвращает результат по каждой позиции."""
+        response = client.post(url_for('main.actions.confirm_stages_bulk'), json={
+            'operator_name': 'Tester',
+            'items': [{'part_id': 'TEST-001'}, {'part_id': 'MISSING'}],
+        })
+        assert response.status_code == 200
+        data = response.get_json()
+        assert (data['accepted'], data['rejected']) == (1, 1)
+        assert data['results'][0]['stage'] == 'Резка'
+        assert data['results'][1]['status'] == 'error'
+
+    def test_bulk_confirm_requires_operator_name(self, client, database):
+        """Тест: Анонимный оператор без ФИО получает ошибку 400, ничего не сохраняется."""
+        response = client.post(url_for('main.actions.confirm_stages_bulk'), json={'items': [{'part_id': 'TEST-001'}]})
+        assert response.status_code == 400
+        assert StatusHistory.query.count() == 0
+
+    def test_sync_stages_is_idempotent(self, client, database):
+        """Тест: Повторная отправка офлайн-очереди не учитывает операции второй раз."""
+        payload = {'operator_name': 'Tester', 'items': [{'op_id': 'op-1', 'part_id': 'TEST-001', 'quantity': 1}]}
+        first = client.post(url_for('main.actions.sync_stages'), json=payload).get_json()
+        second = client.post(url_for('main.actions.sync_stages'), json=payload).get_json()
+
+        assert first['accepted'] == 1
+        assert (second['accepted'], second['duplicates']) == (0, 1)
+        assert StatusHistory.query.filter_by(part_id='TEST-001').count() == 1
+
+    def test_sync_stages_requires_op_id(self, client, database):
+        """Тест: Операции офлайн-очереди без op_id отклоняются целиком."""
+        response = client.post(url_for('main.actions.sync_stages'), json={
+            'operator_name': 'Tester', 'items': [{'part_id': 'TEST-001'}]
+        })
+        assert response.status_code == 400
+
+    def test_scan_service_worker_served_from_root(self, client, database):
+        """Тест: Service worker отдается с корня сайта как JavaScript."""
+        response = client.get(url_for('main.main_pages.scan_service_worker'))
+        assert response.status_code == 200
+        assert response.mimetype == 'application/javascript'
+        response.close()
+
+    def test_batch_scan_page_loads(self, client, database):
+        """Тест: Страница пакетного сканирования доступна без входа в систему."""
+        response = client.get(url_for('main.main_pages.batch_scan'))
+        assert response.status_code == 200
+        assert 'Пакетное сканирование'.encode('utf-8') in response.data
+
 
 class TestNoteAndHistoryRoutes:
     """Тесты для полного покрытия функционала примечаний."""
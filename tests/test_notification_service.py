@@ -0,0 +1,78 @@
+# tests/test_notification_service.py
+
+from app import socketio
+from app.services.notification_service import NotificationBatcher, product_room
+from app.services.part_utils_service import _send_websocket_notification
+
+
+class TestNotificationBatcher:
+    """Тесты для накопителя WebSocket-уведомлений."""
+
+    def _make_batcher(self):
+        sent, tasks = [], []
+        batcher = NotificationBatcher(
+            lambda payload, room: sent.append((room, payload)),
+            window_ms=100, start_task=tasks.append, sleep=lambda seconds: None
+        )
+        return batcher, sent, tasks
+
+    def test_burst_is_coalesced_into_one_frame_per_room(self):
+        """Тест: 1000 событий по 20 деталям двух изделий дают по одному сообщению на комнату."""
+        batcher, sent, tasks = self._make_batcher()
+        for i in range(1000):
+            product = 'A' if i % 2 else 'B'
+            batcher.add({'event': 'stage_completed', 'part_id': f'{product}-{i % 20}', 'message': str(i)},
+                        product_room(product))
+
+        assert len(tasks) == 1 # Фоновая отправка запланирована один раз на окно
+        tasks[0]()
+
+        assert len(sent) == 2
+        for room, payload in sent:
+            assert payload['event'] == 'batch'
+            assert len(payload['events']) == 10
+        # Для каждой детали сохраняются последние данные
+        batch_a = dict(sent)[product_room('A')]['events']
+        assert batch_a[-1] == {'event': 'stage_completed', 'part_id': 'A-19', 'message': '999'}
+
+    def test_single_event_is_sent_as_is(self):
+        """Тест: Одиночное событие отправляется без обертки 'batch'."""
+        batcher, sent, tasks = self._make_batcher()
+        batcher.add({'event': 'bulk_delete', 'message': 'x'})
+        assert batcher.flush() == 1
+        assert sent == [(None, {'event': 'bulk_delete', 'message': 'x'})]
+
+    def test_zero_window_sends_immediately(self):
+        """Тест: При нулевом окне уведомление отправляется сразу."""
+        sent = []
+        batcher = NotificationBatcher(lambda payload, room: sent.append(payload), window_ms=0)
+        batcher.add({'event': 'part_created'})
+        assert sent == [{'event': 'part_created'}]
+
+
+class TestProductRooms:
+    """Тесты для подписки на комнаты изделий."""
+
+    def test_row_events_reach_only_subscribed_clients(self, app, database):
+        """Тест: Обновление детали получают только клиенты, раскрывшие ее изделие."""
+        subscribed = socketio.test_client(app)
+        other = socketio.test_client(app)
+        subscribed.emit('join_product', {'product_designation': 'Тестовое изделие'})
+
+        _send_websocket_notification('part_updated', 'Обновлена деталь', {'part_id': 'TEST-001'})
+
+        received = subscribed.get_received()
+        assert len(received) == 1
+        assert received[0]['args'][0]['product_designation'] == 'Тестовое изделие'
+        assert other.get_received() == []
+
+        # Структурные события по-прежнему получают все клиенты
+        _send_websocket_notification('bulk_delete', 'Удалено', {'deleted_parts': []})
+        assert len(other.get_received()) == 1
+        assert len(subscribed.get_received()) == 1
+
+        subscribed.emit('leave_product', {'product_designation': 'Тестовое изделие'})
+        _send_websocket_notification('part_updated', 'Снова', {'part_id': 'TEST-001'})
+        assert subscribed.get_received() == []
+        subscribed.disconnect()
+        other.disconnect()
@@ -0,0 +1,96 @@
+# tests/test_part_import_export_service.py
+
+import io
+import csv
+from flask import url_for
+from openpyxl import load_workbook
+from werkzeug.datastructures import FileStorage
+
+from app import db
+from app.services import part_import_export_service as pies
+from app.models import Part, AssemblyComponent, RouteTemplate, Stage
+
+
+def _csv_file(content, filename="import.csv"):
+    """Создает FileStorage с CSV-содержимым в памяти."""
+    return FileStorage(stream=io.BytesIO(content.encode('utf-8')), filename=filename, content_type="text/csv")
+
+
+class TestBatchedImport:
+    """Тесты для пакетного импорта деталей из Excel/CSV."""
+
+    def test_import_builds_hierarchy_and_routes(self, database):
+        """Тест: Импорт создает детали, связи сборок и маршруты по операциям."""
+        content = (
+            '"Обозначение","Наименование","Кол-во","Размер","Операции","Прим."\n'
+            '"","Наборка №3","","","",""\n'
+            '"УЗЕЛ-01СБ","Палец","1","","Резка;Покраска",""\n'
+            '"ДЕТ-01","Болт","5","M6","резка, покраска","30ХГСА"\n'
+            '"ДЕТ-02","Гайка","2,5","","","Ст3"\n'
+            '"ДЕТ-02","Гайка (дубль)","1","","",""\n'
+            '"TEST-001","Уже есть","1","","",""\n'
+        )
+        timings = {}
+
+        added, skipped = pies.import_parts_from_excel(_csv_file(content), None, timings)
+
+        assert (added, skipped) == (3, 2)
+        assert {'read', 'parse', 'routes', 'insert', 'total'} <= set(timings)
+
+        parent = db.session.get(Part, 'УЗЕЛ-01СБ')
+        assert parent.product_designation == 'Наборка №3'
+        assert parent.route_template.name == 'Резка -> Покраска'
+
+        links = {(l.parent_id, l.child_id): l.quantity for l in AssemblyComponent.query.all()}
+        assert links == {('УЗЕЛ-01СБ', 'ДЕТ-01'): 5, ('УЗЕЛ-01СБ', 'ДЕТ-02'): 2}
+        # Признак верхнеуровневой детали заполняется при импорте
+        assert parent.is_top_level is True
+        assert db.session.get(Part, 'ДЕТ-01').is_top_level is False
+
+        # Деталь без операций получает маршрут по умолчанию
+        default_route = RouteTemplate.query.filter_by(is_default=True).first()
+        assert db.session.get(Part, 'ДЕТ-02').route_template_id == default_route.id
+
+        # Существующий этап "Резка" переиспользуется без учета регистра
+        assert Stage.query.filter(Stage.name.in_(['Резка', 'резка'])).count() == 1
+        assert Stage.query.filter(Stage.name.in_(['Покраска', 'покраска'])).count() == 1
+
+    def test_import_requires_mandatory_columns(self, database):
+        """Тест: Файл без обязательных колонок отклоняется с понятной ошибкой."""
+        content = '"Обозначение","Наименование"\n"A-1","Деталь"\n'
+        try:
+            pies.import_parts_from_excel(_csv_file(content), None)
+        except ValueError as e:
+            assert 'Не найдены обязательные колонки' in str(e)
+        else:
+            raise AssertionError("Ожидалась ошибка ValueError")
+
+
+class TestStreamingExport:
+    """Тесты для потокового экспорта деталей в CSV/XLSX."""
+
+    def test_csv_export_streams_all_parts(self, auth_client, database):
+        """Тест: CSV-выгрузка отдается потоком и содержит маршрут в виде строки этапов."""
+        client = auth_client('admin', 'password123')
+        response = client.get(url_for('admin.data.export_parts'))
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        text = response.get_data().decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(text), delimiter=';'))
+        assert rows[0] == pies.EXPORT_COLUMNS
+        assert len(rows) == 2
+        row = dict(zip(rows[0], rows[1]))
+        assert row['Обозначение'] == 'TEST-001'
+        assert row['Маршрут'] == 'Резка -> Сверловка'
+
+    def test_xlsx_export_is_valid_workbook(self, auth_client, database):
+        """Тест: XLSX-выгрузка открывается openpyxl и содержит все детали."""
+        client = auth_client('admin', 'password123')
+        response = client.get(url_for('admin.data.export_parts', format='xlsx'))
+
+        assert response.status_code == 200
+        sheet = load_workbook(io.BytesIO(response.get_data()), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert list(rows[0]) == pies.EXPORT_COLUMNS
+        assert rows[1][1] == 'TEST-001'
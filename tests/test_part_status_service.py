@@ -0,0 +1,181 @@
+# tests/test_part_status_service.py
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from app import db
+from app.services import part_status_service as pss
+from app.models import Part, Stage, User, StatusHistory, PartStageProgress
+
+
+class TestStageProgressCounters:
+    """Тесты для материализованных счетчиков прогресса по этапам."""
+
+    def test_complete_stage_updates_counters(self, database):
+        """Тест: `complete_stage` инкрементально наращивает счетчик этапа."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 10
+        stage = Stage.query.filter_by(name='Резка').first()
+
+        pss.complete_stage(part, stage, 3, 'Тестер')
+        pss.complete_stage(part, stage, 4, 'Тестер')
+
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 7}
+        assert part.quantity_completed == 0  # Второй этап еще не выполнен
+
+        second_stage = Stage.query.filter_by(name='Сверловка').first()
+        pss.complete_stage(part, second_stage, 5, 'Тестер')
+        assert part.quantity_completed == 5
+
+    def test_cancel_stage_decrements_counter(self, database):
+        """Тест: Отмена записи истории уменьшает счетчик этапа."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        admin = User.query.filter_by(username='admin').first()
+        stage = Stage.query.filter_by(name='Резка').first()
+
+        pss.complete_stage(part, stage, 2, 'Тестер')
+        pss.complete_stage(part, stage, 1, 'Тестер')
+        history_entry = StatusHistory.query.filter_by(part_id='TEST-001', quantity=2).first()
+
+        pss.cancel_stage_by_history_id(history_entry.id, admin)
+
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 1}
+
+    def test_rebuild_matches_history(self, database):
+        """Тест: Пересборка счетчиков восстанавливает их из StatusHistory."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 4
+        stage = Stage.query.filter_by(name='Резка').first()
+        second_stage = Stage.query.filter_by(name='Сверловка').first()
+        pss.complete_stage(part, stage, 4, 'Тестер')
+        pss.complete_stage(part, second_stage, 2, 'Тестер')
+
+        # Портим материализованные данные, имитируя рассинхронизацию
+        PartStageProgress.query.delete()
+        part.quantity_completed = 0
+        db.session.commit()
+
+        rows_count = pss.rebuild_stage_progress()
+
+        assert rows_count == 2
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 4, 'Сверловка': 2}
+        assert db.session.get(Part, 'TEST-001').quantity_completed == 2
+
+    def test_complete_stage_rejects_over_completion(self, database):
+        """Тест: `complete_stage` не дает выполнить больше остатка на этапе."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 3
+        db.session.commit()
+        stage = Stage.query.filter_by(name='Резка').first()
+
+        pss.complete_stage(part, stage, 2, 'Тестер')
+        with pytest.raises(ValueError, match="осталось 1 шт"):
+            pss.complete_stage(part, stage, 2, 'Тестер')
+
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 2}
+
+    def test_complete_stage_is_idempotent(self, database):
+        """Тест: Повтор операции с тем же ключом идемпотентности не учитывается."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        db.session.commit()
+        stage = Stage.query.filter_by(name='Резка').first()
+
+        assert pss.complete_stage(part, stage, 1, 'Тестер', op_id='key-1') is True
+        assert pss.complete_stage(part, stage, 1, 'Тестер', op_id='key-1') is False
+
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 1}
+
+
+class TestBulkStageCompletion:
+    """Тесты для пакетного подтверждения этапов."""
+
+    def test_next_stage_and_remaining_quantity(self, database):
+        """Тест: Без этапа и количества подтверждается весь остаток следующего этапа."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        db.session.commit()
+
+        results = pss.complete_stages_bulk([{'part_id': 'TEST-001'}, {'part_id': 'TEST-001'}], 'Тестер')
+
+        assert [(r['stage'], r['quantity']) for r in results] == [('Резка', 5), ('Сверловка', 5)]
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 5, 'Сверловка': 5}
+        assert db.session.get(Part, 'TEST-001').quantity_completed == 5
+
+    def test_remaining_is_checked_across_batch(self, database):
+        """Тест: Остаток проверяется с учетом предыдущих позиций того же пакета."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        stage = Stage.query.filter_by(name='Резка').first()
+        db.session.commit()
+
+        results = pss.complete_stages_bulk([
+            {'part_id': 'TEST-001', 'stage_id': stage.id, 'quantity': 3},
+            {'part_id': 'TEST-001', 'stage_id': stage.id, 'quantity': 3},
+            {'part_id': 'TEST-001', 'stage_id': stage.id, 'quantity': 2},
+        ], 'Тестер')
+
+        assert [r['status'] for r in results] == ['ok', 'error', 'ok']
+        assert StatusHistory.query.filter_by(part_id='TEST-001').count() == 2
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 5}
+
+    def test_zero_quantity_is_rejected(self, database):
+        """Тест: Явно указанное нулевое количество отклоняется, а не подтверждает весь остаток."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        db.session.commit()
+
+        results = pss.complete_stages_bulk([{'part_id': 'TEST-001', 'quantity': 0}], 'Тестер')
+
+        assert results[0]['status'] == 'error'
+        assert StatusHistory.query.filter_by(part_id='TEST-001').count() == 0
+        assert pss.get_stage_progress('TEST-001') == {}
+
+    def test_single_notification_for_batch(self, database, monkeypatch):
+        """Тест: На весь пакет отправляется одно уведомление."""
+        sent = []
+        monkeypatch.setattr(pss, '_send_websocket_notification', lambda *args: sent.append(args))
+
+        pss.complete_stages_bulk([{'part_id': 'TEST-001'}, {'part_id': 'TEST-001'}], 'Тестер')
+
+        assert len(sent) == 1
+        assert sent[0][0] == 'bulk_stage_completed'
+        assert sent[0][2]['parts'][0]['quantity_completed'] == 1
+
+    def test_too_many_items_rejected(self, database):
+        """Тест: Слишком большой пакет отклоняется целиком."""
+        items = [{'part_id': 'TEST-001'}] * (pss.BULK_COMPLETION_MAX_ITEMS + 1)
+        with pytest.raises(ValueError, match="не более"):
+            pss.complete_stages_bulk(items, 'Тестер')
+        assert StatusHistory.query.count() == 0
+
+
+class TestOfflineSync:
+    """Тесты для идемпотентной синхронизации офлайн-очереди сканирования."""
+
+    def test_duplicates_are_skipped(self, database):
+        """Тест: Операции с уже записанным op_id и повторы внутри пакета не учитываются."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 5
+        db.session.commit()
+        operation = {'op_id': 'op-1', 'part_id': 'TEST-001', 'stage_id': None, 'quantity': 2}
+
+        first = pss.sync_offline_operations([operation, dict(operation)], 'Тестер')
+        second = pss.sync_offline_operations([operation], 'Тестер')
+
+        assert [r['status'] for r in first] == ['ok', 'duplicate']
+        assert [r['status'] for r in second] == ['duplicate']
+        assert pss.get_stage_progress('TEST-001') == {'Резка': 2}
+        assert StatusHistory.query.filter_by(client_op_id='op-1').count() == 1
+
+    def test_performed_at_is_kept_but_not_in_future(self, database):
+        """Тест: Время выполнения берется из операции, но не может быть в будущем."""
+        past = datetime(2026, 1, 5, 8, 30, tzinfo=timezone.utc)
+        future = datetime.now(timezone.utc) + timedelta(days=1)
+        pss.sync_offline_operations([
+            {'op_id': 'op-past', 'part_id': 'TEST-001', 'stage_id': None, 'quantity': None, 'performed_at': past},
+            {'op_id': 'op-future', 'part_id': 'TEST-001', 'stage_id': None, 'quantity': None, 'performed_at': future},
+        ], 'Тестер')
+
+        assert StatusHistory.query.filter_by(client_op_id='op-past').one().timestamp == past.replace(tzinfo=None)
+        assert StatusHistory.query.filter_by(client_op_id='op-future').one().timestamp < future.replace(tzinfo=None)
@@ -0,0 +1,66 @@
+# tests/test_qr_cache_service.py
+
+import os
+import pytest
+from unittest.mock import patch
+
+from app.services import qr_cache_service
+from config import Config
+from app.utils import build_scan_url, render_qr_code
+
+
+@pytest.fixture
+def qr_cache(app, tmp_path):
+    """Подменяет каталог кэша QR-кодов временным и очищает кэш в памяти."""
+    original_folder = app.config['QR_CACHE_FOLDER']
+    app.config['QR_CACHE_FOLDER'] = str(tmp_path)
+    qr_cache_service.clear_memory_cache()
+    with app.app_context():
+        yield tmp_path
+    app.config['QR_CACHE_FOLDER'] = original_folder
+    qr_cache_service.clear_memory_cache()
+
+
+class TestQrCache:
+    """Тесты для кэша изображений QR-кодов."""
+
+    def test_miss_renders_and_stores_on_disk(self, qr_cache):
+        """Тест: Промах кэша рендерит PNG и сохраняет его на диск."""
+        uris = qr_cache_service.get_part_qr_data_uris(['TEST/001'])
+
+        assert uris['TEST/001'].startswith('data:image/png;base64,')
+        stored = [f for _, _, files in os.walk(qr_cache) for f in files]
+        assert len(stored) == 1 and stored[0].endswith('.png')
+
+    def test_hits_do_not_render_again(self, qr_cache):
+        """Тест: Повторный запрос берется из памяти, а после ее очистки — с диска."""
+        qr_cache_service.get_part_qr_data_uris(['A-1', 'A-2'])
+
+        with patch('app.services.qr_cache_service.render_qr_code') as mock_render:
+            qr_cache_service.get_part_qr_data_uris(['A-1', 'A-2'])
+            qr_cache_service.clear_memory_cache()
+            qr_cache_service.get_part_qr_data_uris(['A-1', 'A-2'])
+            mock_render.assert_not_called()
+
+    def test_large_batch_renders_inline_by_default(self, app, qr_cache, monkeypatch):
+        """Тест: По умолчанию пул процессов не запускается даже для большого пакета промахов."""
+        assert Config.QR_RENDER_WORKERS == 0
+        monkeypatch.setitem(app.config, 'QR_RENDER_WORKERS', Config.QR_RENDER_WORKERS)
+
+        with patch.object(qr_cache_service, '_get_pool') as mock_pool:
+            images = qr_cache_service.get_qr_images([f'URL-{i}' for i in range(40)])
+        mock_pool.assert_not_called()
+        assert len(images) == 40
+
+    def test_svg_format(self, qr_cache):
+        """Тест: SVG-формат кэшируется отдельно от PNG и содержит разметку SVG."""
+        image = qr_cache_service.get_part_qr_image('A-1', 'svg')
+
+        assert b'<svg' in image
+        assert image == render_qr_code(build_scan_url('A-1'), 'svg')
+        assert qr_cache_service.get_part_qr_image('A-1', 'png') != image
+
+    def test_unknown_format_is_rejected(self, qr_cache):
+        """Тест: Неподдерживаемый формат вызывает ValueError."""
+        with pytest.raises(ValueError):
+            qr_cache_service.get_qr_images(['x'], 'gif')
@@ -0,0 +1,58 @@
+# tests/test_qr_label_service.py
+
+import re
+from flask import url_for
+
+from app import db
+from app.models import Part
+
+
+def _check_pdf_structure(data):
+    """Проверяет заголовок, окончание и корректность ссылок xref в PDF."""
+    assert data.startswith(b'%PDF-1.4')
+    assert data.rstrip().endswith(b'%%EOF')
+    startxref = int(re.search(rb'startxref\n(\d+)\n', data).group(1))
+    assert data[startxref:].startswith(b'xref')
+    for number, offset in enumerate(re.findall(rb'(\d{10}) 00000 n ', data), start=1):
+        assert data[int(offset):].startswith(b'%d 0 obj' % number)
+
+
+class TestQrLabelsPdf:
+    """Тесты для PDF-листов этикеток с QR-кодами."""
+
+    def test_pdf_for_selected_parts(self, auth_client, app, tmp_path, monkeypatch, database):
+        """Тест: Для выбранных деталей формируется корректный PDF нужного числа страниц."""
+        monkeypatch.setitem(app.config, 'QR_CACHE_FOLDER', str(tmp_path))
+        for i in range(5):
+            db.session.add(Part(part_id=f'LBL-{i}', product_designation='Этикетки', name=f'Деталь {i}', material='-'))
+        db.session.commit()
+        client = auth_client('admin', 'password123')
+
+        response = client.post(url_for('admin.part.qr_labels_pdf'), data={
+            'part_ids': [f'LBL-{i}' for i in range(5)], 'columns': 2, 'rows': 1
+        })
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+        data = response.get_data()
+        _check_pdf_structure(data)
+        assert data.count(b'/Type /Page ') == 3
+        assert b'/Count 3' in data
+
+    def test_pdf_for_whole_product(self, auth_client, app, tmp_path, monkeypatch, database):
+        """Тест: Можно напечатать этикетки для всех деталей изделия."""
+        monkeypatch.setitem(app.config, 'QR_CACHE_FOLDER', str(tmp_path))
+        client = auth_client('admin', 'password123')
+
+        response = client.post(url_for('admin.part.qr_labels_pdf'), data={'product_designation': 'Тестовое изделие'})
+
+        assert response.status_code == 200
+        data = response.get_data()
+        _check_pdf_structure(data)
+        assert b'/Count 1' in data
+
+    def test_empty_selection_redirects(self, auth_client, database):
+        """Тест: Без выбранных деталей выполняется редирект на панель."""
+        client = auth_client('admin', 'password123')
+        response = client.post(url_for('admin.part.qr_labels_pdf'), data={})
+        assert response.status_code == 302
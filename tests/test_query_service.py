@@ -2,6 +2,8 @@
 
 import pytest
 from datetime import datetime, timedelta
+from flask import url_for
+from sqlalchemy.dialects import postgresql
 
 from app import db
 from app.services import query_service
@@ -102,4 +104,129 @@ def test_get_combined_history(database):
     status_entry = combined_history[3]
     assert status_entry['status'] == 'Резка'
     assert status_entry['operator_name'] == 'Тестер'
-    assert status_entry['quantity'] == 1
\ No newline at end of file
+    assert status_entry['quantity'] == 1
+
+def _history_events(part, admin, operator, stage, now):
+    """Создает события всех типов, часть из них — с одинаковым временем."""
+    return [
+        StatusHistory(part_id=part.part_id, status=stage.name, operator_name='Тестер', quantity=1,
+                      timestamp=now - timedelta(days=2)),
+        StatusHistory(part_id=part.part_id, status=stage.name, operator_name='Тестер', quantity=2, timestamp=now),
+        PartNote(part_id=part.part_id, user_id=admin.id, stage_id=stage.id, text="Примечание", timestamp=now),
+        PartNote(part_id=part.part_id, user_id=admin.id, text="Старое примечание", timestamp=now - timedelta(days=3)),
+        ResponsibleHistory(part_id=part.part_id, user_id=operator.id, timestamp=now),
+    ]
+
+
+def test_history_page_keyset_pagination(database):
+    """
+    Тест: Лента истории собирается одним запросом и постранично отдается
+    по курсору без пропусков и повторов, в том числе при одинаковом времени событий.
+    """
+    part = db.session.get(Part, 'TEST-001')
+    admin = User.query.filter_by(username='admin').first()
+    operator = User.query.filter_by(username='operator').first()
+    stage = Stage.query.filter_by(name='Резка').first()
+    db.session.add_all(_history_events(part, admin, operator, stage, datetime(2026, 5, 1, 12, 0)))
+    db.session.commit()
+
+    full = query_service.get_history_page(part.part_id, limit=None)['items']
+    collected, cursor = [], None
+    while True:
+        page = query_service.get_history_page(part.part_id, cursor, limit=2)
+        collected.extend(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert [(item['type'], item['id']) for item in collected] == [(item['type'], item['id']) for item in full]
+    assert len(collected) == 5
+    assert [item['type'] for item in full[:3]] == ['status', 'responsible', 'note']
+    assert full[1]['details'] == "Назначен новый ответственный: operator"
+    assert full[2]['author_id'] == admin.id and full[2]['stage'] == 'Резка'
+    assert full[0]['status_type'] == 'COMPLETED'
+    assert full[-1]['details'] == "Старое примечание"
+
+
+def test_history_api_returns_next_page(client, database):
+    """Тест: API догрузки истории возвращает HTML событий и курсор следующей страницы."""
+    part = db.session.get(Part, 'TEST-001')
+    admin = User.query.filter_by(username='admin').first()
+    operator = User.query.filter_by(username='operator').first()
+    stage = Stage.query.filter_by(name='Резка').first()
+    db.session.add_all(_history_events(part, admin, operator, stage, datetime(2026, 5, 1, 12, 0)))
+    db.session.commit()
+
+    first = client.get(url_for('main.api.part_history', part_id='TEST-001', limit=3)).get_json()
+    second = client.get(url_for('main.api.part_history', part_id='TEST-001', limit=3,
+                                after=first['next_cursor'])).get_json()
+
+    assert first['next_cursor'] and second['next_cursor'] is None
+    assert 'Старое примечание' in second['html']
+    assert client.get(url_for('main.api.part_history', part_id='TEST-001', after='bad')).status_code == 400
+
+
+def test_audit_log_keyset_pages(database):
+    """Тест: Курсорные страницы журнала аудита проходят все записи вперед и назад без пропусков."""
+    admin = User.query.filter_by(username='admin').first()
+    start = datetime(2026, 5, 1, 12, 0)
+    db.session.add_all([AuditLog(part_id='TEST-001', user_id=admin.id, action=f"Действие {i}", category='part',
+                                 timestamp=start + timedelta(minutes=i)) for i in range(7)])
+    db.session.add(AuditLog(user_id=admin.id, action="Вход в систему", category='auth', timestamp=start))
+    db.session.commit()
+
+    first = query_service.get_audit_log_page(['part'], limit=3)
+    second = query_service.get_audit_log_page(['part'], cursor=first['next_cursor'], limit=3)
+    third = query_service.get_audit_log_page(['part'], cursor=second['next_cursor'], limit=3)
+
+    pages = [[log.action for log, _ in page['items']] for page in (first, second, third)]
+    assert pages == [["Действие 6", "Действие 5", "Действие 4"],
+                     ["Действие 3", "Действие 2", "Действие 1"], ["Действие 0"]]
+    assert first['prev_cursor'] is None and third['next_cursor'] is None
+    assert first['items'][0][1] == 'TEST-001'
+    assert first['count'] == {'value': 7, 'qualifier': ''}
+
+    back = query_service.get_audit_log_page(['part'], cursor=third['prev_cursor'], newer=True, limit=3)
+    assert [log.action for log, _ in back['items']] == pages[1]
+    # Новее курсора меньше полной страницы — возвращается первая страница
+    assert query_service.get_audit_log_page(['part'], cursor=back['prev_cursor'], newer=True, limit=3)['items'] \
+        == first['items']
+
+
+def test_audit_count_explain_renders_in_lists():
+    """Тест: EXPLAIN для оценки количества на PostgreSQL содержит раскрытый IN-список, а не маркер POSTCOMPILE."""
+    conditions = query_service._audit_conditions(date_from=datetime(2026, 5, 1), user_id=1)
+    statement = query_service._audit_count_statement(['part', 'auth'], conditions)
+
+    sql, params = query_service._explain_sql(statement, postgresql.psycopg2.dialect())
+
+    assert 'POSTCOMPILE' not in sql
+    assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT')
+    assert sorted(value for value in params.values() if isinstance(value, str)) == ['auth', 'part']
+    assert all(f'%({name})s' in sql for name in params)
+
+
+def test_audit_log_filters(database):
+    """Тест: Журнал фильтруется по периоду, пользователю и детали; некорректный курсор отклоняется."""
+    admin = User.query.filter_by(username='admin').first()
+    operator = User.query.filter_by(username='operator').first()
+    db.session.add_all([
+        AuditLog(part_id='TEST-001', user_id=admin.id, action="Старое", category='part',
+                 timestamp=datetime(2026, 4, 30, 23, 0)),
+        AuditLog(part_id='TEST-001', user_id=admin.id, action="Админ", category='part',
+                 timestamp=datetime(2026, 5, 1, 23, 0)),
+        AuditLog(part_id='OTHER-1', user_id=operator.id, action="Оператор", category='part',
+                 timestamp=datetime(2026, 5, 1, 10, 0)),
+    ])
+    db.session.commit()
+
+    def actions(**filters):
+        return [log.action for log, _ in query_service.get_audit_log_page(['part'], **filters)['items']]
+
+    assert actions(date_from=datetime(2026, 5, 1), date_to=datetime(2026, 5, 1)) == ["Админ", "Оператор"]
+    assert actions(user_id=operator.id) == ["Оператор"]
+    assert actions(part_id='TEST-001') == ["Админ", "Старое"]
+    # Деталь OTHER-1 не существует — ссылка на нее не выводится
+    assert query_service.get_audit_log_page(['part'], user_id=operator.id)['items'][0][1] is None
+    with pytest.raises(ValueError):
+        query_service.get_audit_log_page(['part'], cursor='bad')
@@ -0,0 +1,150 @@
+# tests/test_report_service.py
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from app import db
+from app.services import part_status_service as pss
+from app.services import report_service, part_management_service
+from app.models import Part, Stage, User, StatusHistory, StageDuration, OperatorActivityRollup
+
+
+def _facts(part_id='TEST-001'):
+    """Возвращает факты детали в виде списка (этап, длительность в секундах)."""
+    rows = StageDuration.query.filter_by(part_id=part_id).order_by(StageDuration.finished_at).all()
+    return [(row.stage_name, round(row.duration_seconds)) for row in rows]
+
+
+class TestStageDurationFacts:
+    """Тесты для таблицы фактов длительности этапов."""
+
+    def test_facts_follow_history_changes(self, database):
+        """Тест: Факты создаются при выполнении этапов и пересчитываются при отмене."""
+        start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 2
+        part.date_added = start
+        db.session.commit()
+        pss.complete_stages_bulk([
+            {'part_id': 'TEST-001', 'performed_at': start + timedelta(hours=1)},
+            {'part_id': 'TEST-001', 'performed_at': start + timedelta(hours=3)},
+        ], 'Тестер')
+
+        assert _facts() == [('Резка', 3600), ('Сверловка', 7200)]
+
+        admin = User.query.filter_by(username='admin').first()
+        first_entry = StatusHistory.query.filter_by(part_id='TEST-001', status='Резка').one()
+        pss.cancel_stage_by_history_id(first_entry.id, admin)
+
+        # После отмены "Сверловка" отсчитывается от добавления детали
+        assert _facts() == [('Сверловка', 3 * 3600)]
+
+    def test_scrap_removes_facts(self, database):
+        """Тест: Отправка в брак удаляет историю детали вместе с фактами."""
+        part = db.session.get(Part, 'TEST-001')
+        stage = Stage.query.filter_by(name='Резка').first()
+        admin = User.query.filter_by(username='admin').first()
+        pss.complete_stage(part, stage, 1, 'Тестер')
+        assert len(_facts()) == 1
+
+        pss.scrap_part(part, stage, 1, admin, 'Трещина')
+
+        assert _facts() == []
+
+    def test_product_rename_moves_facts(self, app, database):
+        """Тест: После смены изделия детали ее этапы попадают в отчет по новому изделию, а не по старому."""
+        part = db.session.get(Part, 'TEST-001')
+        old_product = part.product_designation
+        pss.complete_stage(part, Stage.query.filter_by(name='Резка').first(), 1, 'Тестер')
+        admin = User.query.filter_by(username='admin').first()
+        form = SimpleNamespace(**{name: SimpleNamespace(data=value) for name, value in {
+            'product_designation': 'Новое изделие', 'name': part.name, 'material': part.material,
+            'size': part.size, 'drawing': None}.items()})
+
+        part_management_service.update_part_from_form(part, form, admin, app.config)
+
+        assert [row.stage_name for row in report_service.get_stage_duration_report(product_designation='Новое изделие')] \
+            == ['Резка']
+        assert report_service.get_stage_duration_report(product_designation=old_product) == []
+
+    def test_rebuild_matches_incremental(self, database):
+        """Тест: Полная пересборка дает те же факты, что и инкрементальное обновление."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 3
+        db.session.commit()
+        pss.complete_stages_bulk([{'part_id': 'TEST-001'}, {'part_id': 'TEST-001', 'quantity': 2}], 'Тестер')
+        incremental = _facts()
+
+        StageDuration.query.delete()
+        db.session.commit()
+
+        assert report_service.rebuild_stage_durations() == 2
+        assert _facts() == incremental
+
+    def test_report_date_range_is_inclusive(self, database):
+        """Тест: Отчет включает этапы, выполненные в течение последнего дня периода."""
+        start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+        part = db.session.get(Part, 'TEST-001')
+        part.date_added = start
+        db.session.commit()
+        pss.complete_stages_bulk([{'part_id': 'TEST-001', 'performed_at': start + timedelta(hours=12)}], 'Тестер')
+
+        rows = report_service.get_stage_duration_report(datetime(2026, 3, 2), datetime(2026, 3, 2))
+        assert [(row.stage_name, row.stages_count) for row in rows] == [('Резка', 1)]
+        assert rows[0].avg_duration_seconds == pytest.approx(12 * 3600)
+
+        assert report_service.get_stage_duration_report(datetime(2026, 3, 3)) == []
+
+
+class TestOperatorActivityRollups:
+    """Тесты для почасовых и суточных агрегатов активности операторов."""
+
+    def test_rollups_follow_history_changes(self, database):
+        """Тест: Агрегаты растут при подтверждении этапов и уменьшаются при отмене."""
+        performed_at = datetime(2026, 3, 2, 9, 15, tzinfo=timezone.utc)
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 3
+        db.session.commit()
+        pss.complete_stages_bulk([{'part_id': 'TEST-001', 'quantity': 1, 'performed_at': performed_at},
+                                  {'part_id': 'TEST-001', 'quantity': 2, 'performed_at': performed_at}], 'Тестер')
+
+        rows = report_service.get_operator_performance(datetime(2026, 3, 2), datetime(2026, 3, 2))
+        assert [(row.operator_name, row.stages_completed) for row in rows] == [('Тестер', 2)]
+
+        admin = User.query.filter_by(username='admin').first()
+        pss.cancel_stage_by_history_id(StatusHistory.query.filter_by(quantity=2).one().id, admin)
+
+        activity = report_service.get_operator_activity(datetime(2026, 3, 2), datetime(2026, 3, 2), 'hour')
+        assert activity['series'] == {'Тестер': [0] * 9 + [1] + [0] * 14}
+
+    def test_rebuild_matches_incremental(self, database):
+        """Тест: Пересборка агрегатов совпадает с инкрементальным обновлением."""
+        stage = Stage.query.filter_by(name='Резка').first()
+        admin = User.query.filter_by(username='admin').first()
+        pss.complete_stage(db.session.get(Part, 'TEST-001'), stage, 1, 'Тестер')
+        pss.scrap_part(db.session.get(Part, 'TEST-001'), stage, 1, admin, 'Трещина')
+        incremental = sorted((row.granularity, row.operator_name, row.status_type, row.entries_count)
+                             for row in OperatorActivityRollup.query.filter(OperatorActivityRollup.entries_count > 0))
+
+        report_service.rebuild_operator_rollups()
+
+        rebuilt = sorted((row.granularity, row.operator_name, row.status_type, row.entries_count)
+                         for row in OperatorActivityRollup.query.all())
+        assert rebuilt == incremental
+
+    def test_weekly_series_from_daily_rollups(self, database):
+        """Тест: Недельный ряд собирается из суточных агрегатов, пустые недели заполняются нулями."""
+        part = db.session.get(Part, 'TEST-001')
+        part.quantity_total = 2
+        db.session.commit()
+        pss.complete_stages_bulk([
+            {'part_id': 'TEST-001', 'quantity': 1, 'performed_at': datetime(2026, 3, 3, 10, tzinfo=timezone.utc)},
+            {'part_id': 'TEST-001', 'quantity': 1, 'performed_at': datetime(2026, 3, 19, 10, tzinfo=timezone.utc)},
+        ], 'Тестер')
+
+        activity = report_service.get_operator_activity(datetime(2026, 3, 1), datetime(2026, 3, 22), 'week')
+
+        assert activity['buckets'][0] == datetime(2026, 2, 23)
+        assert activity['series'] == {'Тестер': [0, 1, 0, 1]}
+        with pytest.raises(ValueError):
+            report_service.get_operator_activity(datetime(2026, 1, 1), datetime(2026, 3, 1), 'hour')
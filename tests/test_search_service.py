@@ -0,0 +1,153 @@
+# tests/test_search_service.py
+
+from datetime import datetime, timedelta
+import pytest
+from flask import url_for
+
+from app import db
+from app.models import AuditLog, Part, PartNote, RouteTemplate, Stage, StatusHistory, User
+from app.services import query_service, search_service
+
+
+def _add_parts():
+    route = RouteTemplate.query.filter_by(is_default=True).first()
+    db.session.add_all([
+        Part(part_id='КРН-100', product_designation='Кран', name='Корпус крана', material='Ст20',
+             route_template_id=route.id),
+        Part(part_id='ВАЛ-7', product_designation='Редуктор', name='Вал <ведущий>', material='Сталь 40Х',
+             route_template_id=route.id),
+        Part(part_id='ВТУЛ-3', product_designation='Редуктор', name='Втулка вала', material='Бронза',
+             route_template_id=route.id),
+    ])
+    db.session.commit()
+
+
+class TestPartSearch:
+    """Тесты для глобального поиска деталей."""
+
+    def test_prefix_search_across_products_is_ranked(self, database):
+        """Тест: Поиск по началу слова находит детали всех изделий, совпадение обозначения выше."""
+        _add_parts()
+
+        results = search_service.search_parts('вал')
+
+        assert [r['part_id'] for r in results] == ['ВАЛ-7', 'ВТУЛ-3']
+        assert {r['product_designation'] for r in results} == {'Редуктор'}
+        assert [r['part_id'] for r in search_service.search_parts('корп кран')] == ['КРН-100']
+        assert search_service.search_parts('  ') == []
+
+    def test_highlight_escapes_html(self, database):
+        """Тест: Найденные слова выделяются, остальной текст экранируется."""
+        _add_parts()
+
+        result = search_service.search_parts('ведущ')[0]
+
+        assert result['highlight']['name'] == 'Вал &lt;<mark>ведущ</mark>ий&gt;'
+
+    def test_index_follows_part_changes(self, database):
+        """Тест: Индекс обновляется при изменении и удалении детали."""
+        _add_parts()
+        part = db.session.get(Part, 'КРН-100')
+        part.name = 'Станина'
+        db.session.commit()
+
+        assert search_service.search_parts('корпус') == []
+        assert [r['part_id'] for r in search_service.search_parts('станина')] == ['КРН-100']
+
+        db.session.delete(part)
+        db.session.commit()
+        assert search_service.search_parts('станина') == []
+        assert search_service.rebuild_part_search_index() == 3
+        assert [r['part_id'] for r in search_service.search_parts('тест')] == ['TEST-001']
+
+    def test_search_does_not_depend_on_parts_rowid(self, database):
+        """Тест: Поиск находит нужные детали после перенумерации rowid таблицы Parts (как при VACUUM)."""
+        _add_parts()
+        db.session.execute(db.text('UPDATE "Parts" SET rowid = rowid + 100'))
+        db.session.commit()
+
+        assert [r['part_id'] for r in search_service.search_parts('корпус')] == ['КРН-100']
+        assert db.session.scalars(
+            db.select(Part.part_id).where(search_service.part_search_filter('втулка'))
+        ).all() == ['ВТУЛ-3']
+
+
+def _add_texts():
+    """Тексты с разными формами слова «трещина» в примечании, комментарии и журнале."""
+    admin = User.query.filter_by(username='admin').first()
+    stage = Stage.query.filter_by(name='Резка').first()
+    now = datetime.utcnow()
+    db.session.add_all([
+        PartNote(part_id='TEST-001', user_id=admin.id, stage_id=stage.id, text='Обнаружены трещины <по кромке>',
+                 timestamp=now - timedelta(hours=1)),
+        PartNote(part_id='TEST-001', user_id=admin.id, text='Зачистить заусенцы', timestamp=now),
+        StatusHistory(part_id='TEST-001', status='Сверловка', operator_name='Иванов', quantity=1,
+                      comment='Трещину заварили', timestamp=now - timedelta(hours=2)),
+        AuditLog(part_id='DELETED-1', user_id=admin.id, action='Брак', category='part',
+                 details='Деталь списана: трещина', timestamp=now - timedelta(days=3)),
+    ])
+    db.session.commit()
+    return stage
+
+
+class TestTextSearch:
+    """Тесты для полнотекстового поиска по примечаниям, комментариям и журналу."""
+
+    def test_word_forms_found_in_all_sources(self, database):
+        """Тест: Разные формы слова находятся во всех источниках, от новых записей к старым."""
+        _add_texts()
+
+        page = query_service.get_text_search_page('трещина')
+
+        assert [item['type'] for item in page['items']] == ['note', 'status', 'audit']
+        assert page['items'][0]['snippet'] == 'Обнаружены <mark>трещин</mark>ы &lt;по кромке&gt;'
+        assert page['items'][0]['stage'] == 'Резка' and page['items'][0]['user'] == 'admin'
+        assert page['items'][2]['part_exists'] is False
+        assert page['next_cursor'] is None
+        assert query_service.get_text_search_page('   ')['items'] == []
+
+    def test_filters_and_pagination(self, database):
+        """Тест: Фильтры по этапу и периоду сужают выдачу, страницы идут без повторов."""
+        stage = _add_texts()
+
+        by_stage = query_service.get_text_search_page('трещина', stage_id=stage.id)['items']
+        assert [item['type'] for item in by_stage] == ['note']
+        recent = query_service.get_text_search_page('трещина', date_from=datetime.utcnow() - timedelta(days=1))
+        assert {item['type'] for item in recent['items']} == {'note', 'status'}
+
+        first = query_service.get_text_search_page('трещина', limit=2)
+        second = query_service.get_text_search_page('трещина', cursor=first['next_cursor'], limit=2)
+        assert [item['type'] for item in first['items'] + second['items']] == ['note', 'status', 'audit']
+        assert second['next_cursor'] is None
+
+        with pytest.raises(ValueError):
+            query_service.get_text_search_page('трещина', stage_id=999)
+
+    def test_index_follows_text_changes(self, database):
+        """Тест: Индекс текстов обновляется при изменении и удалении записей."""
+        _add_texts()
+        note = PartNote.query.filter_by(text='Зачистить заусенцы').first()
+        note.text = 'Зачистить трещину'
+        db.session.commit()
+        assert len(query_service.get_text_search_page('трещина')['items']) == 4
+
+        db.session.delete(note)
+        db.session.commit()
+        assert len(query_service.get_text_search_page('трещина')['items']) == 3
+        assert search_service.rebuild_text_search_index() == 3
+
+    def test_search_api_and_page_require_audit_permission(self, client, auth_client, database):
+        """Тест: Поиск по текстам доступен только с правом просмотра журнала."""
+        _add_texts()
+        url = url_for('main.api.search_texts', q='трещина', limit=2)
+        assert client.get(url).status_code == 403
+
+        client = auth_client('manager', 'password123')
+        data = client.get(url).get_json()
+        assert len(data['results']) == 2 and data['next_cursor']
+        assert data['results'][0]['history_url']
+        assert client.get(url_for('main.api.search_texts', q='трещина', date_from='вчера')).status_code == 400
+
+        response = client.get(url_for('admin.user.text_search', q='трещина'))
+        assert response.status_code == 200
+        assert '<mark>Трещин</mark>у заварили' in response.data.decode('utf-8')
@@ -0,0 +1,65 @@
+# tests/test_socket_queue.py
+
+import json
+from flask import Flask
+
+from app import _socketio_queue_options
+from app.socket_queue import LocalQueueManager
+
+
+class TestLocalQueueManager:
+    """Тесты для внутрипроцессного брокера сообщений Socket.IO."""
+
+    def test_messages_reach_all_managers_of_channel(self):
+        """Тест: Сообщение одного «воркера» получают все менеджеры того же канала."""
+        first = LocalQueueManager(channel='test-broadcast')
+        second = LocalQueueManager(channel='test-broadcast')
+        foreign = LocalQueueManager(channel='test-other')
+        try:
+            first._publish({'method': 'emit', 'event': 'notification', 'data': {'event': 'part_updated'}})
+            for manager in (first, second):
+                assert json.loads(next(manager._listen()))['data'] == {'event': 'part_updated'}
+            assert foreign._queue.empty()
+        finally:
+            for manager in (first, second, foreign):
+                manager.close()
+
+    def test_write_only_manager_does_not_subscribe(self):
+        """Тест: Менеджер только для записи (CLI, фоновые задачи) не подписывается на канал."""
+        listener = LocalQueueManager(channel='test-write-only')
+        writer = LocalQueueManager(channel='test-write-only', write_only=True)
+        try:
+            writer._publish({'method': 'emit'})
+            assert writer._queue.empty()
+            assert json.loads(next(listener._listen())) == {'method': 'emit'}
+        finally:
+            listener.close()
+            writer.close()
+
+
+class TestSocketioQueueOptions:
+    """Тесты для выбора брокера сообщений по конфигурации."""
+
+    def _options(self, url):
+        app = Flask(__name__)
+        app.config.update(SOCKETIO_MESSAGE_QUEUE=url, SOCKETIO_CHANNEL='check-control-test')
+        return _socketio_queue_options(app)
+
+    def test_without_queue_single_process_mode(self):
+        """Тест: Без SOCKETIO_MESSAGE_QUEUE брокер не используется."""
+        assert self._options(None) == {}
+
+    def test_redis_url_is_passed_to_flask_socketio(self):
+        """Тест: URL Redis передается в Flask-SocketIO вместе с каналом."""
+        assert self._options('redis://redis:6379/0') == {
+            'message_queue': 'redis://redis:6379/0', 'channel': 'check-control-test'
+        }
+
+    def test_local_url_uses_in_process_manager(self):
+        """Тест: URL local:// подключает внутрипроцессный менеджер."""
+        manager = self._options('local://')['client_manager']
+        try:
+            assert isinstance(manager, LocalQueueManager)
+            assert manager.channel == 'check-control-test'
+        finally:
+            manager.close()